@@ -1,5 +1,7 @@
 import streamlit as st
 
+from core.profiling import profile_rerun, profiling_enabled, render_profile_panel
+
 # 로고 설정
 LOGO = "images/logo.png"
 st.logo(LOGO, size="large")
@@ -35,4 +37,10 @@ pages = {
 pg = st.navigation(pages)
 
 # Run the selected page
-pg.run()
\ No newline at end of file
+# (?profile=1 이면 실행 구간을 측정해서 사이드바에 표시)
+enabled = profiling_enabled()
+with profile_rerun(pg.title, enabled):
+    pg.run()
+
+if enabled:
+    render_profile_panel()
@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# ===============================
+# 페이지 빌드 시간 / 메모리 / 전송량 벤치마크
+# ===============================
+# 각 페이지를 Streamlit AppTest로 headless 실행해서 측정한다.
+# 케이스마다 새 프로세스에서 실행하므로 peak 메모리가 서로 섞이지 않는다.
+#
+#   python -m benchmarks.page_bench                      # 1x, 10x 측정 후 baseline과 비교
+#   python -m benchmarks.page_bench --scales 1 10 100
+#   python -m benchmarks.page_bench --update-baseline    # 결과를 baseline으로 저장
+#
+# cold: 새 프로세스 첫 실행 (스냅샷/큐브/인덱스는 준비 단계에서 디스크에 만들어 둠)
+# warm: 같은 프로세스에서 한 번 더 실행 (st.cache_* 적중)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+SOURCE_CSV = os.path.join(BASE_DIR, "data", "AP_data.csv")
+
+DEFAULT_SCALES = (1, 10)
+CASE_TIMEOUT_S = 900
+
+# 회귀 판정: 새 값 > baseline × 비율 + 여유값 이면 회귀
+THRESHOLDS = {
+    "cold_s": (1.5, 0.25),
+    "warm_s": (1.5, 0.10),
+    "peak_rss_mb": (1.25, 30.0),
+    "total_bytes": (1.10, 2048),
+}
+
+# 이 크기 이상인 요소만 요소별 전송량에 기록
+WIDGET_MIN_BYTES = 1024
+
+DASHBOARD_TABS = {
+    "risk": "📍 위험도",
+    "age": "🕰 노후도",
+    "usage": "📶 이용량",
+    "low_usage": "📉 저이용 AP",
+    "install": "📡 설치 현황",
+    "status_map": "📊 종합 상태",
+}
+
+# 케이스: 실행할 스크립트 + 실행 전에 넣을 session_state
+CASES = {"app": {"file": "app.py"}}
+for slug, tab in DASHBOARD_TABS.items():
+    CASES[f"dashboard_{slug}"] = {
+        "file": "pages/2_AP_현황_대시보드.py",
+        "state": {"dashboard_tab": tab},
+    }
+CASES.update({
+    "map_overview": {"file": "pages/3_AP_상세_지도.py"},
+    # 상세 모드는 AP가 가장 많은 구 기준 (worker에서 정함)
+    "map_detail": {"file": "pages/3_AP_상세_지도.py", "state": {"mode": "detail"}},
+    "tour_map": {"script": "from pages.subpages.tour_map import render\nrender()"},
+    "wifi_speed": {"script": "from pages.subpages.wifi_speed import render\nrender()"},
+    "wifi_speed_top10": {
+        "script": "from pages.subpages.wifi_speed import render\nrender()",
+        "state": {"show_top10_only": True},
+    },
+})
+
+
+# ===============================
+# 데이터 (1x는 실제 데이터, 그 이상은 합성 데이터)
+# ===============================
+
+def write_dataset(factor, workdir, seed=0):
+    """factor배 크기 데이터 파일을 만들고 (경로, 행 수) 반환"""
+    if factor == 1:
+        return SOURCE_CSV, len(pd.read_csv(SOURCE_CSV, usecols=["ap_id"]))
+
+    from core.synthetic import SyntheticAPGenerator
+
+    n_source = len(pd.read_csv(SOURCE_CSV, usecols=["ap_id"]))
+    path = os.path.join(workdir, f"AP_data.x{factor}.parquet")
+    rows = SyntheticAPGenerator(n_source * factor, seed=seed).write_parquet(path)
+    return path, rows
+
+
+# ===============================
+# worker (케이스 하나를 새 프로세스에서 실행)
+# ===============================
+
+def _rss_mb():
+    # 리눅스 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _walk(node):
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        for child in children.values():
+            yield from _walk(child)
+
+
+def _element_bytes(at):
+    """요소 종류별 proto 크기 합계 + 큰 요소 목록"""
+    by_type, widgets = {}, {}
+    counts = {}
+    for node in _walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is None or not hasattr(proto, "ByteSize"):
+            continue
+        kind = getattr(node, "type", type(node).__name__)
+        size = proto.ByteSize()
+        by_type[kind] = by_type.get(kind, 0) + size
+        i = counts.get(kind, 0)
+        counts[kind] = i + 1
+        if size >= WIDGET_MIN_BYTES:
+            widgets[f"{kind}#{i}"] = size
+    return by_type, widgets
+
+
+def _track_media():
+    """st.pyplot 이미지 등 media 파일은 proto 밖으로 전송되므로 저장 시점에 크기 기록"""
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    sizes = []
+    original = MemoryMediaFileStorage.load_and_get_id
+
+    def load_and_get_id(self, path_or_data, mimetype, kind, filename=None):
+        file_id = original(self, path_or_data, mimetype, kind, filename)
+        sizes.append((mimetype, self._files_by_id[file_id].content_size))
+        return file_id
+
+    MemoryMediaFileStorage.load_and_get_id = load_and_get_id
+    return sizes
+
+
+def _make_app(spec, state):
+    from streamlit.testing.v1 import AppTest
+
+    if "file" in spec:
+        at = AppTest.from_file(os.path.join(BASE_DIR, spec["file"]), default_timeout=CASE_TIMEOUT_S)
+    else:
+        at = AppTest.from_string(spec["script"], default_timeout=CASE_TIMEOUT_S)
+    for key, value in state.items():
+        at.session_state[key] = value
+    return at
+
+
+def run_worker(name):
+    spec = CASES[name]
+    state = dict(spec.get("state", {}))
+    if name == "map_detail":
+        from core.aggregates import get_cube
+        counts = get_cube().rollup(("gu",))["count"]
+        state["selected_gu"] = str(counts.idxmax())
+
+    media = _track_media()
+    rss_start = _rss_mb()
+    at = _make_app(spec, state)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    by_type, widgets = _element_bytes(at)
+    for i, (mimetype, size) in enumerate(media):
+        by_type[f"media:{mimetype}"] = by_type.get(f"media:{mimetype}", 0) + size
+        widgets[f"media#{i}"] = size
+    errors = [str(e.value)[:300] for e in at.exception]
+
+    at = _make_app(spec, state)
+    start = time.perf_counter()
+    at.run()
+    warm = time.perf_counter() - start
+
+    return {
+        "cold_s": round(cold, 3),
+        "warm_s": round(warm, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "start_rss_mb": round(rss_start, 1),
+        "total_bytes": int(sum(by_type.values())),
+        "bytes_by_type": by_type,
+        "widgets": widgets,
+        "errors": errors,
+    }
+
+
+def run_prepare():
+    """스냅샷 / 집계 큐브 / 공간 인덱스 / 구 경계를 디스크와 메모리에 준비"""
+    from core.aggregates import get_cube
+    from core.ap_data import ensure_snapshot, load_ap_data
+    from core.geometry import ZOOM_LEVELS, build_district_geojson
+    from core.spatial import get_ap_index
+
+    start = time.perf_counter()
+    ensure_snapshot()
+    snapshot_s = time.perf_counter() - start
+    rows = len(load_ap_data(["ap_id"]))
+    get_cube()
+    get_ap_index()
+    for zoom in ZOOM_LEVELS:
+        build_district_geojson(zoom)
+
+    return {
+        "rows": rows,
+        "snapshot_s": round(snapshot_s, 3),
+        "prepare_s": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+# ===============================
+# 실행 / 비교
+# ===============================
+
+def _spawn(args, env):
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.page_bench", *args],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True,
+            timeout=CASE_TIMEOUT_S * 3,
+        )
+    except subprocess.TimeoutExpired:
+        return {"errors": [f"timeout ({CASE_TIMEOUT_S * 3}s)"]}
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"errors": [proc.stderr.strip()[-500:] or f"exit code {proc.returncode}"]}
+
+
+def run_scale(factor, cases, workdir):
+    data_path, rows = write_dataset(factor, workdir)
+
+    env = dict(os.environ)
+    env.update({
+        "WIFIGHTING_AP_CSV": data_path,
+        "WIFIGHTING_CACHE_DIR": os.path.join(workdir, f"cache.x{factor}"),
+        "WIFIGHTING_MAP_DISK_CACHE": "0",
+        "PYTHONPATH": BASE_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+
+    results = {"prepare": _spawn(["--prepare"], env)}
+    print(f"[{factor}x] {rows:,}행 준비 {results['prepare'].get('prepare_s')}초", flush=True)
+
+    for name in cases:
+        result = _spawn(["--worker", name], env)
+        results[name] = result
+        print(
+            f"[{factor}x] {name:<22} cold {result.get('cold_s')}s  warm {result.get('warm_s')}s  "
+            f"rss {result.get('peak_rss_mb')}MB  bytes {result.get('total_bytes')}"
+            + (f"  ERROR {result['errors'][0][:80]}" if result.get("errors") else ""),
+            flush=True,
+        )
+    return rows, results
+
+
+def compare(results, baseline):
+    """baseline 대비 회귀 목록 [(scale/case, 지표, baseline, 새 값)]"""
+    regressions = []
+    for scale, cases in results["scales"].items():
+        base_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for name, result in cases["cases"].items():
+            base = base_cases.get(name)
+            if not base:
+                continue
+            for metric, (ratio, slack) in THRESHOLDS.items():
+                if metric in result and metric in base and result[metric] > base[metric] * ratio + slack:
+                    regressions.append((f"{scale}/{name}", metric, base[metric], result[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="페이지 빌드 시간 / 메모리 / 전송량 벤치마크")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--out", help="결과 JSON 경로")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--keep-data", action="store_true", help="합성 데이터 / 캐시 폴더 남기기")
+    parser.add_argument("--worker", choices=list(CASES), help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker or args.prepare:
+        print(json.dumps(run_worker(args.worker) if args.worker else run_prepare(), ensure_ascii=False))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="wifighting_bench_")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "thresholds": {k: {"ratio": r, "slack": s} for k, (r, s) in THRESHOLDS.items()},
+        "scales": {},
+    }
+    try:
+        for factor in args.scales:
+            rows, cases = run_scale(factor, args.cases, workdir)
+            results["scales"][f"{factor}x"] = {"rows": rows, "cases": cases}
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"baseline 저장: {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        for case, metric, base, new in regressions:
+            print(f"회귀: {case} {metric} {base} → {new}")
+        if regressions:
+            sys.exit(1)
+        print("baseline 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# 집계 큐브 설정
+# ===============================
+
+DIMENSIONS = ("gu", "install_type", "indoor_outdoor", "install_year")
+
+# 합계/평균을 저장하는 지표 (lat/lon은 구 중심좌표 계산용)
+SUM_MEASURES = (
+    "lat", "lon", "usage_gb", "age_norm", "usage_norm", "usage_norm_log", "density_norm",
+)
+
+# 분위수 스케치(히스토그램)를 저장하는 지표
+SKETCH_MEASURES = ("usage_gb", "age_norm", "usage_norm", "usage_norm_log", "density_norm")
+
+# 전체 데이터 기준 1% 분위수마다 구간 경계 → 전체 백분위 기준 개수 집계는 정확
+N_BINS = 100
+
+# 차원 값이 비어 있는 행을 모으는 값 (문자열 차원, 숫자 차원은 NaN)
+UNKNOWN_LABEL = "미상"
+
+
+class AggregateCube:
+    """
+    gu × install_type × indoor_outdoor × install_year 셀마다
+    개수, 지표 합계, 분위수 히스토그램을 미리 계산해 둔 집계 큐브.
+    모든 집계는 9.5k 행이 아니라 (비어 있지 않은) 셀 단위로 계산한다.
+    """
+
+    def __init__(self, labels, codes, count, sums, hist, edges):
+        self.labels = labels    # {차원: 값 배열}
+        self.codes = codes      # {차원: 셀별 값 번호}
+        self.count = count      # (셀,)
+        self.sums = sums        # (셀, SUM_MEASURES)
+        self.hist = hist        # (셀, SKETCH_MEASURES, N_BINS)
+        self.edges = edges      # (SKETCH_MEASURES, N_BINS + 1)
+        self._rollups = {}
+
+    # -------------------------------
+    # 생성 / 저장
+    # -------------------------------
+
+    @classmethod
+    def build(cls, df):
+        labels, row_codes = {}, []
+        for dim in DIMENSIONS:
+            codes, uniques = pd.factorize(df[dim], sort=True)
+            uniques = np.asarray(uniques)
+            # 문자열은 pickle 없이 저장할 수 있도록 유니코드 배열로
+            values = uniques.astype(str) if uniques.dtype == object else uniques
+            # 빈 값(코드 -1)은 마지막 값 번호 하나로 모음
+            missing = codes < 0
+            if missing.any():
+                codes = np.where(missing, len(values), codes)
+                values = np.append(values, UNKNOWN_LABEL if values.dtype.kind == "U" else np.nan)
+            labels[dim] = values
+            row_codes.append(codes)
+
+        # 행 → 셀 번호 (비어 있지 않은 조합만 셀로 만듦)
+        shape = tuple(len(labels[d]) for d in DIMENSIONS)
+        flat = np.ravel_multi_index(row_codes, shape)
+        cell_keys, cell_of_row = np.unique(flat, return_inverse=True)
+        n_cells = len(cell_keys)
+        cell_codes = np.unravel_index(cell_keys, shape)
+        codes = {d: c.astype(np.int32) for d, c in zip(DIMENSIONS, cell_codes)}
+
+        count = np.bincount(cell_of_row, minlength=n_cells)
+        sums = np.column_stack([
+            np.bincount(cell_of_row, weights=df[m].to_numpy(dtype=float), minlength=n_cells)
+            for m in SUM_MEASURES
+        ])
+
+        edges = np.empty((len(SKETCH_MEASURES), N_BINS + 1))
+        hist = np.empty((n_cells, len(SKETCH_MEASURES), N_BINS), dtype=np.int32)
+        for i, m in enumerate(SKETCH_MEASURES):
+            values = df[m].to_numpy(dtype=float)
+            edges[i] = np.quantile(values, np.linspace(0, 1, N_BINS + 1))
+            # 구간 j = (edges[j], edges[j + 1]] (첫 구간은 최솟값 포함)
+            bins = np.clip(np.searchsorted(edges[i, 1:], values, side="left"), 0, N_BINS - 1)
+            hist[:, i, :] = np.bincount(
+                cell_of_row * N_BINS + bins, minlength=n_cells * N_BINS
+            ).reshape(n_cells, N_BINS)
+
+        return cls(labels, codes, count, sums, hist, edges)
+
+    def save(self, path):
+        arrays = {"count": self.count, "sums": self.sums, "hist": self.hist, "edges": self.edges}
+        for dim in DIMENSIONS:
+            arrays[f"labels_{dim}"] = self.labels[dim]
+            arrays[f"codes_{dim}"] = self.codes[dim]
+
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            labels = {d: z[f"labels_{d}"] for d in DIMENSIONS}
+            codes = {d: z[f"codes_{d}"] for d in DIMENSIONS}
+            return cls(labels, codes, z["count"], z["sums"], z["hist"], z["edges"])
+
+    # -------------------------------
+    # 조회
+    # -------------------------------
+
+    def _cell_mask(self, where):
+        """where: {차원: 허용 값 목록} → 해당 셀 bool mask"""
+        mask = np.ones(len(self.count), dtype=bool)
+        for dim, values in (where or {}).items():
+            allowed = np.flatnonzero(np.isin(self.labels[dim], list(values)))
+            mask &= np.isin(self.codes[dim], allowed)
+        return mask
+
+    def _group(self, by, mask):
+        """선택한 셀을 by 차원 조합으로 묶은 (그룹 번호, 그룹 index)"""
+        shape = tuple(len(self.labels[d]) for d in by)
+        flat = np.ravel_multi_index([self.codes[d][mask] for d in by], shape)
+        keys, group = np.unique(flat, return_inverse=True)
+        parts = np.unravel_index(keys, shape)
+        arrays = [self.labels[d][p] for d, p in zip(by, parts)]
+        if len(by) == 1:
+            index = pd.Index(arrays[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(arrays, names=list(by))
+        return group, index
+
+    def rollup(self, by=("gu",), where=None):
+        """by 차원별 AP 개수(count)와 지표 평균 DataFrame (결과는 캐시됨)"""
+        by = tuple(by)
+        key = (by, tuple(sorted((d, tuple(v)) for d, v in (where or {}).items())))
+        if key not in self._rollups:
+            mask = self._cell_mask(where)
+            group, index = self._group(by, mask)
+            n = len(index)
+            count = np.bincount(group, weights=self.count[mask], minlength=n)
+            data = {"count": count.astype(np.int64)}
+            for i, m in enumerate(SUM_MEASURES):
+                total = np.bincount(group, weights=self.sums[mask, i], minlength=n)
+                data[m] = total / count
+            self._rollups[key] = pd.DataFrame(data, index=index)
+        return self._rollups[key]
+
+    def quantile(self, measure, q, where=None):
+        """지표 분위수. 전체 데이터는 저장된 백분위 경계로, 부분 집합은 히스토그램으로 보간"""
+        i = SKETCH_MEASURES.index(measure)
+        if not where:
+            return float(np.interp(q, np.linspace(0, 1, N_BINS + 1), self.edges[i]))
+
+        counts = self.hist[self._cell_mask(where), i, :].sum(axis=0)
+        cum = np.concatenate([[0], np.cumsum(counts)])
+        return float(np.interp(q * cum[-1], cum, self.edges[i]))
+
+    def count_at_most(self, measure, value, by=("gu",), where=None):
+        """by 차원별로 measure <= value 인 AP 개수 (value가 백분위 경계면 정확한 값)"""
+        i = SKETCH_MEASURES.index(measure)
+        edges = self.edges[i]
+        mask = self._cell_mask(where)
+        hist = self.hist[mask, i, :].astype(float)
+
+        # 오른쪽 경계가 value 이하인 구간은 전부, value가 걸친 구간은 비율만큼
+        k = int(np.searchsorted(edges[1:], value, side="right"))
+        below = hist[:, :k].sum(axis=1)
+        if k < N_BINS:
+            width = edges[k + 1] - edges[k]
+            frac = 0.0 if width == 0 else np.clip((value - edges[k]) / width, 0.0, 1.0)
+            below += hist[:, k] * frac
+
+        group, index = self._group(tuple(by), mask)
+        return pd.Series(np.bincount(group, weights=below, minlength=len(index)), index=index)
+
+
+# ===============================
+# 데이터 버전별 1회 생성 + 디스크 저장 (세션 간 공유)
+# ===============================
+
+def cube_path(version):
+    return os.path.join(cache_dir(), f"ap_cube.{version}.npz")
+
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _load_cube(version):
+    path = cube_path(version)
+    if os.path.exists(path):
+        record_cache("aggregates.cube", "disk")
+        return AggregateCube.load(path)
+
+    record_cache("aggregates.cube", "miss")
+    df = load_ap_data(list(DIMENSIONS) + list(SUM_MEASURES))
+    with span("aggregates.build_cube", rows=len(df)):
+        cube = AggregateCube.build(df)
+    cube.save(path)
+    return cube
+
+
+@cache_lookup("aggregates.cube")
+def get_cube():
+    """현재 데이터 버전의 집계 큐브"""
+    return _load_cube(data_version())
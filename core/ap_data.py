@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from core.profiling import record_cache, span, timed
+
+# ===============================
+# 경로 / 스키마 설정
+# ===============================
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+# 벤치마크 등에서 다른 데이터(CSV 또는 Parquet)/캐시 폴더를 쓰려면 환경 변수로 지정
+CSV_PATH = os.environ.get("WIFIGHTING_AP_CSV", os.path.join(DATA_DIR, "AP_data.csv"))
+CACHE_DIR = os.environ.get("WIFIGHTING_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+SNAPSHOT_DIR_NAME = "snapshots"
+MANIFEST_NAME = "manifest.json"
+
+# 버전별 캐시(컬럼 저장소, 공간 인덱스, 집계 큐브)를 몇 개까지 메모리에 둘지
+# (새 버전으로 바뀌는 동안 이전 버전을 쓰는 세션이 있을 수 있어 2개)
+VERSION_CACHE_ENTRIES = 2
+
+# 범주형으로 저장할 컬럼 (메모리 절약 + groupby 가속)
+CATEGORY_COLUMNS = ["gu", "install_type", "indoor_outdoor"]
+
+COLUMN_DTYPES = {
+    "ap_id": "string",
+    "gu": "category",
+    "address": "string",
+    "install_year": "float64",
+    "install_type_code": "int8",
+    "install_type": "category",
+    "indoor_outdoor": "category",
+    "lon": "float64",
+    "lat": "float64",
+    "usage_gb": "float64",
+    "age_norm": "float64",
+    "usage_norm": "float64",
+    "usage_norm_log": "float64",
+    "density_norm": "float64",
+    "cluster_k3": "int8",
+    "cluster_k3_rank": "int8",
+}
+
+ALL_COLUMNS = list(COLUMN_DTYPES)
+
+_META_VERSION = b"wifighting.data_version"
+
+
+# ===============================
+# ap_id 정규화
+# ===============================
+
+def normalize_ap_id(values):
+    """ap_id를 공백/소수점(.0) 없는 문자열로 통일 (Series 또는 단일 값)"""
+    if isinstance(values, pd.Series):
+        return (
+            values.astype(str)
+            .str.strip()
+            .str.replace(r"\.0$", "", regex=True)
+        )
+
+    text = str(values).strip()
+    return text[:-2] if text.endswith(".0") else text
+
+
+# ===============================
+# CSV → Parquet 스냅샷 변환
+# ===============================
+
+def cache_dir():
+    """파생 데이터 캐시 폴더 (data/cache에 쓸 수 없으면 임시 폴더 사용)"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if os.access(CACHE_DIR, os.W_OK):
+            return CACHE_DIR
+    except OSError:
+        pass
+
+    fallback = os.path.join(tempfile.gettempdir(), "wifighting_cache")
+    os.makedirs(fallback, exist_ok=True)
+    return fallback
+
+
+def snapshot_dir():
+    path = os.path.join(cache_dir(), SNAPSHOT_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def snapshot_path(version):
+    return os.path.join(snapshot_dir(), f"AP_data.{version}.parquet")
+
+
+def _manifest_path():
+    return os.path.join(snapshot_dir(), MANIFEST_NAME)
+
+
+def _csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def file_hash(path):
+    """파일 내용 기반 해시 (앞 12자리)"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def cast_columns(df):
+    """스키마(COLUMN_DTYPES)에 있는 컬럼 dtype 맞추기 (제자리 수정)"""
+    for col, dtype in COLUMN_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_raw_csv(csv_path=CSV_PATH):
+    """
+    원본 CSV를 읽어 스키마(dtype)와 ap_id 형식을 맞춘 DataFrame 반환
+    (.parquet 경로면 Parquet으로 읽음 - 합성 데이터 등)
+    """
+    if csv_path.endswith(".parquet"):
+        df = pd.read_parquet(csv_path)
+    else:
+        df = pd.read_csv(csv_path)
+    df["ap_id"] = normalize_ap_id(df["ap_id"])
+    return cast_columns(df)
+
+
+# ===============================
+# 버전별 스냅샷 + manifest
+# ===============================
+# snapshots/manifest.json
+#   source_signature: 기준 CSV (크기-수정시각). CSV가 바뀌면 이력을 새로 시작
+#   current: 지금 읽는 스냅샷 버전
+#   versions: [{version, parent, created, note, rows}, ...]
+
+def read_manifest():
+    try:
+        with open(_manifest_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(df, version, metadata=None):
+    """DataFrame을 버전 스냅샷 Parquet으로 저장 (manifest는 건드리지 않음)"""
+    out_path = snapshot_path(version)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[_META_VERSION] = version.encode()
+    for key, value in (metadata or {}).items():
+        schema_metadata[f"wifighting.{key}".encode()] = json.dumps(value).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+
+    # 동시에 여러 세션이 변환해도 깨진 파일이 보이지 않도록 임시 파일 → 교체
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def snapshot_metadata(version):
+    """write_snapshot에 넘긴 metadata 복원"""
+    raw = pq.read_schema(snapshot_path(version)).metadata or {}
+    prefix = b"wifighting."
+    return {
+        key[len(prefix):].decode(): json.loads(value)
+        for key, value in raw.items()
+        if key.startswith(prefix) and key != _META_VERSION
+    }
+
+
+def read_snapshot(version=None, columns=None):
+    """스냅샷(columns를 주면 그 컬럼만)을 새 DataFrame으로 읽기 (수정 가능한 복사본, 기본: 현재 버전)"""
+    version = version or data_version()
+    return pq.read_table(snapshot_path(version), columns=columns).to_pandas()
+
+
+def publish_snapshot(df, version, parent, note="", metadata=None):
+    """새 스냅샷을 저장하고 manifest의 현재 버전으로 지정"""
+    write_snapshot(df, version, metadata)
+    manifest = read_manifest()
+    manifest["versions"].append({
+        "version": version,
+        "parent": parent,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "note": note,
+        "rows": len(df),
+    })
+    manifest["current"] = version
+    _write_json(_manifest_path(), manifest)
+    return version
+
+
+def set_current_version(version):
+    """이전 스냅샷으로 되돌리기 (manifest에 있는 버전만)"""
+    manifest = read_manifest()
+    known = {v["version"] for v in manifest["versions"]}
+    if version not in known or not os.path.exists(snapshot_path(version)):
+        raise ValueError(f"알 수 없는 스냅샷 버전: {version}")
+    manifest["current"] = version
+    _write_json(_manifest_path(), manifest)
+
+
+@timed("ap_data.build_snapshot")
+def build_snapshot(csv_path=CSV_PATH):
+    """CSV 전체로 기준 스냅샷을 만들고 manifest 이력을 새로 시작. 데이터 버전 반환"""
+    version = file_hash(csv_path)
+    df = read_raw_csv(csv_path)
+    write_snapshot(df, version)
+    _write_json(_manifest_path(), {
+        "source_signature": _csv_signature(csv_path),
+        "current": version,
+        "versions": [{
+            "version": version,
+            "parent": None,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "note": os.path.basename(csv_path),
+            "rows": len(df),
+        }],
+    })
+    return version
+
+
+def ensure_snapshot(csv_path=CSV_PATH):
+    """
+    현재 스냅샷 (경로, 데이터 버전) 반환.
+    manifest가 없거나 기준 CSV 자체가 바뀌었으면 CSV로 기준 스냅샷을 다시 만든다.
+    """
+    manifest = read_manifest()
+    if manifest and manifest.get("source_signature") == _csv_signature(csv_path):
+        path = snapshot_path(manifest["current"])
+        if os.path.exists(path):
+            return path, manifest["current"]
+
+    version = build_snapshot(csv_path)
+    return snapshot_path(version), version
+
+
+def data_version():
+    """현재 AP 스냅샷 버전 (모든 캐시의 키로 사용)"""
+    return ensure_snapshot()[1]
+
+
+# ===============================
+# 공유 컬럼 저장소 (세션 간 공유, 읽기 전용)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _column_store(version):
+    # version이 바뀌면 새 저장소가 만들어지고 이전 컬럼은 버려짐
+    return {"columns": {}, "lock": threading.Lock()}
+
+
+def load_ap_data(columns=None):
+    """
+    AP 데이터를 필요한 컬럼만 읽어서 반환.
+    모든 세션이 같은 컬럼 데이터를 공유하므로 반환된 DataFrame을 직접 수정하지 말 것
+    (수정이 필요하면 .copy() 후 사용).
+    """
+    path, version = ensure_snapshot()
+    store = _column_store(version)
+    cols = list(columns) if columns is not None else ALL_COLUMNS
+
+    loaded = store["columns"]
+    missing = [c for c in cols if c not in loaded]
+    if missing:
+        with store["lock"]:
+            missing = [c for c in cols if c not in loaded]
+            if missing:
+                with span("ap_data.read_columns", columns=len(missing)):
+                    table = pq.read_table(path, columns=missing)
+                    for col in missing:
+                        loaded[col] = table.column(col).to_pandas()
+    record_cache("ap_data.columns", "miss" if missing else "hit")
+
+    return pd.DataFrame({c: loaded[c] for c in cols}, copy=False)
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import re
+
+import numpy as np
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, data_version, load_ap_data
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# AP ID → 행 번호 조회 인덱스
+# ===============================
+# ap_id를 정수 키(ap_key)로 바꿔 두고 키 → 행 번호 표를 데이터 버전마다 한 번 만든다.
+#   - 숫자 ID ("12", "0012", " 12 ", "12.0", 12, 12.0): 그 정수 값
+#   - 그 외 문자열: 해시 64비트 중 62비트를 음수로 (숫자 ID와 겹치지 않음)
+# 키가 0 ~ 행 수의 DENSE_FACTOR배 안이면 키를 그대로 위치로 쓰는 배열(O(1)),
+# 아니면 정렬된 키 배열 + searchsorted로 찾는다.
+# 문자열 치환이나 DataFrame 전체 비교 없이 클릭 한 번에 배열 조회 한두 번이다.
+# 정규화하면 같은 키가 되는 ap_id("012"와 "12" 등)는 첫 행만 찾고 경고를 남긴다.
+
+DENSE_FACTOR = 4
+DENSE_MIN = 1 << 16
+
+_NUMERIC_ID = re.compile(r"0*(\d{1,18})(?:\.0*)?")
+_HASH_MASK = (1 << 62) - 1
+# 팝업 본문에 "AP ID: xxx" 줄이 있으면 그 값, 없으면 팝업 전체를 ID로 본다
+_POPUP_ID = re.compile(r"AP ID:\s*(\S+)")
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_key(text):
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return -(int.from_bytes(digest, "little") & _HASH_MASK) - 1
+
+
+def ap_key(values):
+    """ap_id(단일 값 또는 배열) → 정수 키 (단일 값이면 int, 배열이면 int64 배열)"""
+    if np.isscalar(values) or values is None:
+        text = str(values).strip()
+        match = _NUMERIC_ID.fullmatch(text)
+        return int(match.group(1)) if match else _hash_key(text)
+
+    text = np.char.strip(np.asarray(values).astype(str))
+    keys = np.empty(len(text), dtype=np.int64)
+    # 대부분은 숫자만 있는 ID: 바로 정수 변환, 나머지만 정규식 / 해시
+    plain = np.char.isdigit(text) & (np.char.str_len(text) <= 18)
+    try:
+        keys[plain] = text[plain].astype(np.int64)
+    except ValueError:
+        # ASCII가 아닌 숫자 문자 등: 전부 하나씩
+        plain[:] = False
+    for i in np.flatnonzero(~plain):
+        keys[i] = ap_key(text[i])
+    return keys
+
+
+class APIndex:
+    """ap_id 배열(행 순서)에 대한 ID → 행 번호 조회"""
+
+    def __init__(self, ap_id):
+        keys = ap_key(ap_id)
+        self.size = len(keys)
+        positions = np.arange(self.size, dtype=np.int64)
+        self._table = None
+
+        if self.size and keys.min() >= 0 and keys.max() < max(DENSE_FACTOR * self.size, DENSE_MIN):
+            # 키 값 = 표의 위치 (뒤에서부터 써서 같은 키는 첫 행이 남음)
+            self._table = np.full(int(keys.max()) + 1, -1, dtype=np.int64)
+            self._table[keys[::-1]] = positions[::-1]
+            duplicated = self._table[keys] != positions
+        else:
+            # 안정 정렬이라 같은 키는 첫 행이 앞에 오고 searchsorted가 그 행을 찾음
+            self._order = np.argsort(keys, kind="stable")
+            self._keys = keys[self._order]
+            duplicated = np.r_[False, self._keys[1:] == self._keys[:-1]]
+
+        self.duplicates = int(duplicated.sum())
+        if self.duplicates:
+            examples = np.asarray(ap_id, dtype=object)[self._duplicate_rows(duplicated)[:5]]
+            logger.warning(
+                "같은 키로 정규화되는 ap_id %d개는 첫 행만 조회됩니다 (예: %s)",
+                self.duplicates, ", ".join(map(str, examples)),
+            )
+
+    def _duplicate_rows(self, duplicated):
+        """생성자에서 계산한 중복 표시 → 원래 행 번호"""
+        return duplicated.nonzero()[0] if self._table is not None else self._order[duplicated]
+
+    def __len__(self):
+        return self.size
+
+    def rows(self, ap_ids):
+        """ap_id 배열 → 행 번호 배열 (없는 ID는 -1)"""
+        keys = ap_key(ap_ids)
+        if self._table is not None:
+            inside = (keys >= 0) & (keys < len(self._table))
+            rows = np.full(len(keys), -1, dtype=np.int64)
+            rows[inside] = self._table[keys[inside]]
+            return rows
+
+        if self.size == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._keys, keys), self.size - 1)
+        return np.where(self._keys[pos] == keys, self._order[pos], -1)
+
+    def row(self, ap_id):
+        """ap_id 하나 → 행 번호 (없으면 None)"""
+        key = ap_key(ap_id)
+        if self._table is not None:
+            row = int(self._table[key]) if 0 <= key < len(self._table) else -1
+        elif self.size:
+            pos = min(int(np.searchsorted(self._keys, key)), self.size - 1)
+            row = int(self._order[pos]) if self._keys[pos] == key else -1
+        else:
+            row = -1
+        return row if row >= 0 else None
+
+
+# ===============================
+# 데이터 버전별 인덱스 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _build_index(version):
+    record_cache("ap_index", "miss")
+    ap_id = load_ap_data(["ap_id"])["ap_id"]
+    with span("ap_index.build", rows=len(ap_id)):
+        return APIndex(ap_id.to_numpy(dtype=object))
+
+
+@cache_lookup("ap_index")
+def get_id_index():
+    """load_ap_data() 행 위치를 돌려주는 현재 데이터 버전의 ap_id 인덱스"""
+    return _build_index(data_version())
+
+
+def find_ap(ap_id, columns=None):
+    """ap_id의 AP 한 행 (pd.Series, 없으면 None). columns로 필요한 컬럼만"""
+    row = get_id_index().row(ap_id)
+    if row is None:
+        return None
+    return load_ap_data(columns).iloc[row]
+
+
+def popup_ap_id(text):
+    """st_folium의 last_object_clicked_popup 본문 → ap_id (없으면 None)"""
+    if not text:
+        return None
+    match = _POPUP_ID.search(text)
+    return match.group(1) if match else text.strip()
+
+
+def find_clicked_ap(map_data, columns=None):
+    """지도에서 마지막으로 클릭한 AP 마커의 행 (pd.Series, 없으면 None)"""
+    ap_id = popup_ap_id((map_data or {}).get("last_object_clicked_popup"))
+    return None if ap_id is None else find_ap(ap_id, columns)
@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from core.aggregates import DIMENSIONS, SUM_MEASURES, AggregateCube, cube_path
+from core.ap_data import cache_dir, data_version, read_snapshot
+from core.cluster_index import MEASURES, _build_from, cluster_index_path
+from core.coverage import (
+    CHUNK_SIZE, _cell_stats, coverage_index, coverage_path, coverage_weights, empty_coverage,
+    fill_coverage,
+)
+from core.district_bundle import BUNDLE_COLUMNS, build_bundles, bundle_dir
+from core.features import (
+    CLUSTER_FEATURES, DENSITY_RADIUS_M, assign_clusters, cluster_state, density_norm, neighbor_stats,
+    ranks_path,
+)
+from core.geometry import GEOJSON_PATH
+from core.scenario import neighbors_path
+from core.spatial import GridIndex
+from core.throughput import MODEL_COLUMNS, MODEL_PATH, ThroughputModel, ap_terms_path
+
+# ===============================
+# 전체 AP 일괄 계산 (여러 프로세스, 중단 후 이어서 실행)
+# ===============================
+# 페이지가 처음 열릴 때 계산하던 파생 데이터를 데이터 버전마다 미리 전부 만들어
+# 각 모듈이 읽는 캐시 파일 그대로 저장한다. 페이지는 파일이 있으면 읽기만 한다.
+#
+#   python -m core.batch [--workers 8] [--stages neighbors coverage ...] [--force]
+#
+# 단계 (→ 저장 파일, 읽는 곳)
+#   neighbors         AP별 반경 30m 이웃 수 / 최근접 거리 → ap_neighbors.*.npz (core.scenario)
+#   ranks             AP별 cluster_k3_rank 재배정   → ap_ranks.*.npy       (비교용, 페이지는 스냅샷 컬럼 사용)
+#   throughput        AP별 예상 처리량 AP 항       → ap_terms.*.npy       (core.throughput)
+#   coverage          격자 칸별 최근접 AP 거리 / 반경 안 AP 수 / 부하 → coverage.*.npz (core.coverage)
+#   cube              구 × 유형 × 실내외 × 연도 집계 → ap_cube.*.npz      (core.aggregates)
+#   cluster_index     전체 AP 묶음 인덱스            → ap_clusters.*.npz  (core.cluster_index)
+#   district_bundles  구별 상세 지도 묶음            → district_bundles.*/ (core.district_bundle)
+#
+# throughput은 예측값이 아니라 AP마다 고정된 log 처리량 AP 항이다. 예측은 사용자 위치까지 거리가
+# 있어야 하므로 조회할 때 (AP 항 + 거리 항)의 exp 한 번으로 계산한다.
+# ranks는 neighbors 결과(최근접 거리)로 density_norm을 다시 계산해 스냅샷 군집 중심에 배정하므로
+# neighbors가 끝난 뒤에 시작한다 (DEPENDS).
+#
+# AP / 격자 칸 단위 단계는 AP_CHUNK / CELL_CHUNK개씩 나눈 작업을, 나머지 단계는 통째로 하나의
+# 작업을 같은 프로세스 풀에 넣는다. 작업 프로세스는 스냅샷에서 필요한 컬럼과 공간 인덱스를
+# 처음 한 번만 만들고, chunk 결과는 작업 폴더(batch.{버전}/)에 조각 파일로 바로 저장한다.
+# 중간에 멈춰도 다시 실행하면 이미 저장된 조각 / 단계는 건너뛴다.
+# 한 단계의 조각이 다 모이면 합쳐서 최종 파일을 쓰고 조각은 지운다.
+
+AP_CHUNK = 50_000
+CELL_CHUNK = 20_000
+
+CHUNKED_STAGES = ("neighbors", "ranks", "throughput", "coverage")
+WHOLE_STAGES = ("cube", "cluster_index", "district_bundles")
+STAGES = CHUNKED_STAGES + WHOLE_STAGES
+
+# 먼저 끝나야 하는 단계 (단계 → 선행 단계)
+DEPENDS = {"ranks": "neighbors"}
+
+PLAN_NAME = "plan.json"
+
+
+def artifact_path(stage, version):
+    return {
+        "neighbors": neighbors_path,
+        "ranks": ranks_path,
+        "throughput": ap_terms_path,
+        "coverage": coverage_path,
+        "cube": cube_path,
+        "cluster_index": cluster_index_path,
+        "district_bundles": bundle_dir,
+    }[stage](version)
+
+
+def work_dir(version):
+    return os.path.join(cache_dir(), f"batch.{version}")
+
+
+def part_path(work, stage, i):
+    return os.path.join(work, f"{stage}.{i:05d}.npz")
+
+
+def _save_npz(path, **arrays):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+# ===============================
+# 작업 프로세스
+# ===============================
+# 프로세스마다 한 번만 읽는 스냅샷 컬럼 / 공간 인덱스 / 모델.
+# 같은 버전의 스냅샷 파일을 직접 읽으므로 실행 중에 현재 버전이 바뀌어도 섞이지 않는다.
+_worker_state = {}
+
+
+def _init_worker(version):
+    _worker_state.clear()
+    _worker_state["version"] = version
+    _worker_state["columns"] = {}
+
+
+def _frame(columns):
+    loaded = _worker_state["columns"]
+    missing = [c for c in columns if c not in loaded]
+    if missing:
+        table = read_snapshot(_worker_state["version"], missing)
+        loaded.update({c: table[c] for c in missing})
+    return pd.DataFrame({c: loaded[c] for c in columns}, copy=False)
+
+
+def _cached(key, build):
+    if key not in _worker_state:
+        _worker_state[key] = build()
+    return _worker_state[key]
+
+
+def _lat_lon():
+    df = _frame(["lat", "lon"])
+    return df["lat"].to_numpy(dtype=float), df["lon"].to_numpy(dtype=float)
+
+
+def _neighbors_chunk(start, stop):
+    lat, lon = _lat_lon()
+    # neighbor_stats 기본 인덱스와 같은 칸 크기
+    index = _cached("neighbor_index", lambda: GridIndex(lat, lon, cell_m=max(DENSITY_RADIUS_M, 50.0)))
+    counts, nearest = neighbor_stats(lat, lon, index=index, rows=np.arange(start, stop))
+    return {"counts": counts.astype(np.int32), "nearest": nearest}
+
+
+def _ranks_chunk(start, stop, state):
+    saved = _cached("neighbors", lambda: dict(np.load(neighbors_path(_worker_state["version"]))))
+    df = _frame(CLUSTER_FEATURES[:2]).iloc[start:stop]
+    density = density_norm(saved["nearest"][start:stop], saved["counts"][start:stop])
+    # CLUSTER_FEATURES 순서 (age_norm, usage_norm_log, density_norm)
+    _, ranks = assign_clusters(np.column_stack([df.to_numpy(dtype=float), density]), state)
+    return {"values": ranks.astype(np.int8)}
+
+
+def _throughput_chunk(start, stop):
+    model = _cached("model", lambda: ThroughputModel.load(MODEL_PATH))
+    return {"values": model.ap_term(_frame(MODEL_COLUMNS).iloc[start:stop])}
+
+
+def _coverage_chunk(clat, clon, radius_m):
+    lat, lon = _lat_lon()
+    index = _cached("coverage_index", lambda: coverage_index(lat, lon, radius_m))
+    weights = _cached("coverage_weights", lambda: coverage_weights(_frame(["usage_gb"])["usage_gb"]))
+    nearest, count, usage = _cell_stats(index, clat, clon, radius_m, weights, CHUNK_SIZE)
+    return {"nearest": nearest, "count": count, "usage": usage}
+
+
+_CHUNK_FUNCS = {
+    "neighbors": _neighbors_chunk,
+    "ranks": _ranks_chunk,
+    "throughput": _throughput_chunk,
+    "coverage": _coverage_chunk,
+}
+
+
+def _run_chunk(stage, i, path, args):
+    start = time.perf_counter()
+    _save_npz(path, **_CHUNK_FUNCS[stage](*args))
+    return stage, i, time.perf_counter() - start
+
+
+def _run_whole(stage):
+    start = time.perf_counter()
+    version = _worker_state["version"]
+    if stage == "cube":
+        AggregateCube.build(_frame(list(DIMENSIONS) + list(SUM_MEASURES))).save(cube_path(version))
+    elif stage == "cluster_index":
+        df = _frame(["lat", "lon"] + list(MEASURES))
+        _build_from(df, np.arange(len(df))).save(cluster_index_path(version))
+    elif stage == "district_bundles":
+        build_bundles(version, _frame(BUNDLE_COLUMNS))
+    return stage, None, time.perf_counter() - start
+
+
+# ===============================
+# 작업 나누기 / 합치기 (주 프로세스)
+# ===============================
+
+def _ranges(n, size):
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def _chunk_args(stage, version, n_rows, coverage_grid):
+    """단계 → 작업별 인자 목록"""
+    if stage == "coverage":
+        clat, clon = coverage_grid.cell_centers(*np.nonzero(coverage_grid.gu >= 0))
+        radius_m = coverage_grid.radius_m
+        return [(clat[a:b], clon[a:b], radius_m) for a, b in _ranges(len(clat), CELL_CHUNK)]
+    if stage == "ranks":
+        # 군집 중심 / rank는 스냅샷 라벨에서 한 번만 복원해 모든 작업에 넘김
+        state = cluster_state(read_snapshot(version, CLUSTER_FEATURES + ["cluster_k3", "cluster_k3_rank"]))
+        return [(a, b, state) for a, b in _ranges(n_rows, AP_CHUNK)]
+    return _ranges(n_rows, AP_CHUNK)
+
+
+def _merge(stage, version, parts, coverage_grid):
+    """조각 파일들 → 최종 파일"""
+    loaded = [np.load(path) for path in parts]
+    if stage == "coverage":
+        grid = fill_coverage(coverage_grid, *(
+            np.concatenate([z[name] for z in loaded]) for name in ("nearest", "count", "usage")
+        ))
+        grid.save(artifact_path(stage, version))
+    elif stage == "neighbors":
+        _save_npz(artifact_path(stage, version), **{
+            name: np.concatenate([z[name] for z in loaded]) for name in ("counts", "nearest")
+        })
+    else:
+        _save_npy(artifact_path(stage, version), np.concatenate([z["values"] for z in loaded]))
+
+
+def _check_plan(work):
+    """조각 크기가 바뀌었으면 예전 조각은 맞지 않으므로 버림"""
+    plan = {"ap_chunk": AP_CHUNK, "cell_chunk": CELL_CHUNK}
+    path = os.path.join(work, PLAN_NAME)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            if json.load(f) == plan:
+                return
+        shutil.rmtree(work)
+    os.makedirs(work, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f)
+
+
+def remove_artifact(stage, version):
+    path = artifact_path(stage, version)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def run_batch(stages=STAGES, workers=None, force=False, log=print):
+    """
+    stages를 여러 프로세스로 계산해 현재 데이터 버전의 캐시 파일로 저장.
+    반환: {단계: 작업 시간 합계(초)}와 전체 경과 시간(초)
+    """
+    version = data_version()
+    workers = workers or os.cpu_count() or 1
+    stages = [s for s in STAGES if s in stages]
+    if force:
+        for stage in stages:
+            remove_artifact(stage, version)
+
+    work = work_dir(version)
+    _check_plan(work)
+    if force:
+        for name in os.listdir(work):
+            if name.split(".")[0] in stages:
+                os.remove(os.path.join(work, name))
+
+    todo = [s for s in stages if not os.path.exists(artifact_path(s, version))]
+    for stage in stages:
+        if stage not in todo:
+            log(f"{stage}: 이미 있음 → {artifact_path(stage, version)}")
+    for stage, needs in DEPENDS.items():
+        if stage in todo and needs not in todo and not os.path.exists(artifact_path(needs, version)):
+            todo.insert(0, needs)
+
+    n_rows = len(read_snapshot(version, ["lat"]))
+    coverage_grid = None
+    if "coverage" in todo:
+        with open(GEOJSON_PATH, encoding="utf-8") as f:
+            coverage_grid = empty_coverage(json.load(f))
+
+    started = time.perf_counter()
+    busy = {stage: 0.0 for stage in todo}
+    parts = {}
+    pending = {}
+
+    def submit(pool, stage):
+        if stage in WHOLE_STAGES:
+            pending[pool.submit(_run_whole, stage)] = stage
+            return
+        args = _chunk_args(stage, version, n_rows, coverage_grid)
+        parts[stage] = [part_path(work, stage, i) for i in range(len(args))]
+        resumed = 0
+        for i, (path, a) in enumerate(zip(parts[stage], args)):
+            if os.path.exists(path):
+                resumed += 1
+            else:
+                pending[pool.submit(_run_chunk, stage, i, path, a)] = stage
+        log(f"{stage}: 작업 {len(args)}개" + (f" (저장된 조각 {resumed}개 이어서)" if resumed else ""))
+        if resumed == len(args):
+            finish(pool, stage)
+
+    def finish(pool, stage):
+        if stage in parts:
+            _merge(stage, version, parts[stage], coverage_grid)
+            for path in parts[stage]:
+                os.remove(path)
+        log(f"{stage}: 완료 ({time.perf_counter() - started:.1f}초) → {artifact_path(stage, version)}")
+        for later, needs in DEPENDS.items():
+            if needs == stage and later in todo:
+                submit(pool, later)
+
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(version,))
+    try:
+        # 오래 걸리는 통째 작업을 먼저 넣고 chunk 작업으로 나머지 프로세스를 채움
+        for stage in sorted(todo, key=lambda s: s not in WHOLE_STAGES):
+            if DEPENDS.get(stage) not in todo:
+                submit(pool, stage)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = pending.pop(future)
+                _, _, seconds = future.result()
+                busy[stage] += seconds
+                if not any(s == stage for s in pending.values()):
+                    finish(pool, stage)
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        log(f"중단됨: 저장된 조각은 {work}에 남아 있어 다시 실행하면 이어서 계산합니다")
+        raise
+    pool.shutdown()
+
+    # 다른 단계의 조각(--stages로 이번에 고르지 않은 단계)이 남아 있으면 작업 폴더 유지
+    if not [n for n in os.listdir(work) if n != PLAN_NAME and ".tmp." not in n]:
+        shutil.rmtree(work, ignore_errors=True)
+    return busy, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전체 AP 파생 데이터 일괄 계산 (중단 후 이어서 실행)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="계산 프로세스 수")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="계산할 단계")
+    parser.add_argument("--force", action="store_true", help="이미 있는 결과도 다시 계산")
+    args = parser.parse_args()
+
+    busy, elapsed = run_batch(args.stages, args.workers, args.force)
+    total = sum(busy.values())
+    for stage, seconds in busy.items():
+        print(f"  {stage:<17} 작업 시간 {seconds:7.1f}초")
+    if total:
+        print(f"경과 {elapsed:.1f}초, 작업 시간 합계 {total:.1f}초 "
+              f"(프로세스 {args.workers}개, 평균 {total / elapsed:.1f}개 동시 사용)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+
+import folium
+from branca.colormap import linear
+from branca.element import MacroElement
+from jinja2 import Template
+
+# ===============================
+# 지표 전환형 Choropleth (경계는 한 번만, 지표는 브라우저에서 전환)
+# ===============================
+
+# 캐시된 HTML에서 처음 보여줄 지표를 나중에 바꿔 끼우기 위한 자리표시자
+INITIAL_METRIC_TOKEN = "__initial_metric__"
+
+NAME_PROPERTY = "SIG_KOR_NM"
+
+
+class MetricLayerControl(MacroElement):
+    """지표별 base layer 선택 → GeoJson 색상/범례만 다시 칠하는 Leaflet 컨트롤"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var layer = {{ this.layer_name }};
+            var metrics = {{ this.metrics_json }};
+            var bases = {};
+            var byLabel = {};
+            metrics.forEach(function (m) {
+                bases[m.label] = L.layerGroup();
+                byLabel[m.label] = m;
+            });
+
+            var legend = L.control({position: "bottomright"});
+            legend.onAdd = function () {
+                this._div = L.DomUtil.create("div", "metric-legend");
+                this._div.style.cssText = "background:white;padding:6px 8px;"
+                    + "border-radius:4px;font-size:12px;"
+                    + "box-shadow:0 1px 4px rgba(0,0,0,0.3);";
+                return this._div;
+            };
+            legend.addTo(map);
+
+            function show(m) {
+                layer.setStyle(function (feature) {
+                    return {fillColor: feature.properties[m.fill] || "#ffffff"};
+                });
+                legend._div.innerHTML = "<b>" + m.caption + "</b>"
+                    + "<div style='width:180px;height:10px;margin:4px 0;"
+                    + "background:linear-gradient(to right," + m.colors.join(",") + ")'></div>"
+                    + "<span>" + m.vmin + "</span>"
+                    + "<span style='float:right'>" + m.vmax + "</span>";
+            }
+
+            L.control.layers(bases, null, {collapsed: false}).addTo(map);
+            map.on("baselayerchange", function (e) { show(byLabel[e.name]); });
+
+            var initial = metrics.filter(function (m) {
+                return m.key === "{{ this.initial }}";
+            })[0] || metrics[0];
+            bases[initial.label].addTo(map);
+            show(initial);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layer, metrics, initial):
+        super().__init__()
+        self._name = "MetricLayerControl"
+        self.layer_name = layer.get_name()
+        self.metrics_json = json.dumps(metrics, ensure_ascii=False)
+        self.initial = initial
+
+
+def make_metric_choropleth(geojson, gu_values, captions, zoom=11,
+                           initial=INITIAL_METRIC_TOKEN):
+    """
+    gu_values: index=구 이름, columns=지표 인 DataFrame
+    captions: {지표 컬럼: 표시 이름}
+    모든 지표 값/색상을 feature 속성으로 붙인 GeoJson 레이어 하나만 만든다.
+    """
+    m = folium.Map(
+        location=[37.5665, 126.9780],
+        zoom_start=zoom,
+        tiles="cartodbpositron",
+    )
+
+    metrics = []
+    fills = {}
+    for key, caption in captions.items():
+        values = gu_values[key]
+        colormap = linear.YlGnBu_09.scale(values.min(), values.max())
+        fills[key] = {gu: colormap.rgb_hex_str(v) for gu, v in values.items()}
+        metrics.append({
+            "key": key,
+            "label": caption,
+            "caption": caption,
+            "fill": f"_fill_{key}",
+            "colors": [
+                colormap.rgb_hex_str(colormap.vmin + (colormap.vmax - colormap.vmin) * i / 8)
+                for i in range(9)
+            ],
+            "vmin": f"{values.min():.3f}",
+            "vmax": f"{values.max():.3f}",
+        })
+
+    # 캐시된 원본 geojson은 건드리지 않고 속성만 새로 만든 feature 사용
+    features = []
+    for feature in geojson["features"]:
+        gu_name = feature["properties"][NAME_PROPERTY]
+        props = dict(feature["properties"])
+        for key in captions:
+            v = gu_values[key].get(gu_name)
+            props[key] = None if v is None else round(float(v), 3)
+            props[f"_fill_{key}"] = fills[key].get(gu_name, "#ffffff")
+        features.append({**feature, "properties": props})
+
+    first_fill = metrics[0]["fill"]
+    layer = folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        style_function=lambda feature: {
+            "fillColor": feature["properties"][first_fill],
+            "color": "black",
+            "weight": 1,
+            "fillOpacity": 0.7,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=[NAME_PROPERTY] + list(captions),
+            aliases=["구 이름:"] + [f"{c}:" for c in captions.values()],
+        ),
+    ).add_to(m)
+
+    MetricLayerControl(layer, metrics, initial).add_to(m)
+
+    return m
+
+
+def with_initial_metric(html, metric):
+    """make_metric_choropleth로 렌더링한 HTML에서 처음 보여줄 지표 지정"""
+    return html.replace(INITIAL_METRIC_TOKEN, metric)
@@ -0,0 +1,383 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# 계층형 AP 묶음 인덱스 (서버에서 미리 계산하는 supercluster 방식)
+# ===============================
+# 줌마다 화면 RADIUS_PX 픽셀 격자로 AP를 묶어 (중심, 개수, 지표 합계)를 미리 계산해 둔다.
+# 격자 칸 번호를 Z-order(모턴) 코드로 정렬하면
+#   - 줌 z 칸의 부모(z-1)는 key >> 2, 자식(z+1)은 key << 2 ~ (key << 2) + 3
+#   - 한 칸에 속한 AP는 정렬된 AP 배열에서 연속 구간 [start, start + count)
+# 이라서 범위 조회, 묶음 펼치기(자식/AP 목록), 펼쳐지는 줌 계산이 모두 searchsorted 몇 번이다.
+# → 화면 하나에 보내는 묶음 수는 전체 AP 수와 무관하게 화면 크기에 비례
+
+MIN_ZOOM = 8
+MAX_ZOOM = 17          # 이 줌까지 묶음, 더 확대하면 개별 AP
+
+# 묶음 격자 한 칸 크기 (화면 픽셀)
+RADIUS_PX = 60
+
+# 묶음마다 평균을 함께 내려보내는 지표
+MEASURES = ("usage_norm", "density_norm", "age_norm")
+
+# 주제별(구, 설치유형 등) 부분 인덱스 캐시 수
+SUBSET_CACHE_ENTRIES = 64
+
+_TILE_PX = 256
+_ID_ZOOM_BITS = 5
+
+
+# ===============================
+# 웹 메르카토르 격자 / 모턴 코드
+# ===============================
+
+def world_px(lat, lon, zoom):
+    """위경도 → 줌 zoom 지도 전체 기준 픽셀 좌표 (x, y)"""
+    lat = np.clip(np.asarray(lat, dtype=float), -85.05112878, 85.05112878)
+    lon = np.asarray(lon, dtype=float)
+    scale = _TILE_PX * 2.0 ** zoom
+    x = (lon + 180.0) / 360.0 * scale
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def _spread_bits(v):
+    """정수의 비트 사이사이에 0을 끼움 (32비트 → 64비트)"""
+    v = np.asarray(v).astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                        (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _compact_bits(v):
+    """_spread_bits의 역연산"""
+    v = np.asarray(v).astype(np.uint64) & np.uint64(0x5555555555555555)
+    for shift, mask in ((1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F),
+                        (4, 0x00FF00FF00FF00FF), (8, 0x0000FFFF0000FFFF),
+                        (16, 0x00000000FFFFFFFF)):
+        v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton(cx, cy):
+    """격자 칸 (x, y) → 모턴 코드"""
+    return _spread_bits(cx) | (_spread_bits(cy) << np.uint64(1))
+
+
+def morton_xy(key):
+    """모턴 코드 → 격자 칸 (x, y)"""
+    key = np.asarray(key).astype(np.uint64)
+    return _compact_bits(key).astype(np.int64), _compact_bits(key >> np.uint64(1)).astype(np.int64)
+
+
+# ===============================
+# 묶음 인덱스
+# ===============================
+
+class ClusterIndex:
+    """
+    MIN_ZOOM ~ MAX_ZOOM 줌별로 미리 묶어 둔 AP 계층 인덱스.
+    반환하는 row는 생성 시 넘긴 rows(보통 load_ap_data() 행 위치) 값이다.
+    묶음 id = (모턴 코드 << 5) | 줌
+    """
+
+    def __init__(self, rows, values, levels, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM,
+                 radius_px=RADIUS_PX, measures=MEASURES):
+        self.rows = rows            # (n,) 모턴 순서로 정렬한 AP 행 위치
+        self.values = values        # (n, 2 + 지표 수) 같은 순서의 lat, lon, 지표
+        self.levels = levels        # {줌: {"keys", "start", "count", "sums"}}
+        self.min_zoom = int(min_zoom)
+        self.max_zoom = int(max_zoom)
+        self.radius_px = float(radius_px)
+        self.measures = tuple(measures)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, lat, lon, measures=None, rows=None, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM,
+              radius_px=RADIUS_PX):
+        """
+        lat, lon: 좌표 배열, measures: {지표 이름: 배열}, rows: 반환할 행 번호 (기본 0 ~ n-1)
+        좌표가 없는(NaN) 점은 빼고 만든다.
+        """
+        measures = dict(measures or {})
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        rows = np.arange(len(lat)) if rows is None else np.asarray(rows)
+        values = np.column_stack(
+            [lat, lon] + [np.asarray(v, dtype=float) for v in measures.values()]
+        )
+
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        rows, values = rows[valid].astype(np.int64), values[valid]
+
+        x, y = world_px(values[:, 0], values[:, 1], max_zoom)
+        keys = morton(np.floor(x / radius_px), np.floor(y / radius_px))
+        order = np.argsort(keys, kind="stable")
+        keys, rows, values = keys[order], rows[order], values[order]
+
+        # 부모 칸은 자식 칸 AP 구간을 그대로 이어 붙인 구간 → 줌마다 구간 경계만 다시 찾음
+        levels = {}
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            level_keys = keys >> np.uint64(2 * (max_zoom - zoom))
+            if len(level_keys):
+                start = np.concatenate([[0], np.flatnonzero(np.diff(level_keys)) + 1])
+            else:
+                start = np.empty(0, dtype=np.int64)
+            levels[zoom] = {
+                "keys": level_keys[start],
+                "start": start.astype(np.int64),
+                "count": np.diff(np.append(start, len(keys))).astype(np.int64),
+                "sums": (np.add.reduceat(values, start, axis=0) if len(start)
+                         else np.empty((0, values.shape[1]))),
+            }
+
+        return cls(rows, values, levels, min_zoom, max_zoom, radius_px, tuple(measures))
+
+    LEVEL_ARRAYS = ("keys", "start", "count", "sums")
+
+    def arrays(self):
+        """저장용 배열 {이름: 배열} (rows, values, z{줌}_{keys|start|count|sums})"""
+        arrays = {"rows": self.rows, "values": self.values}
+        for zoom, level in self.levels.items():
+            for name in self.LEVEL_ARRAYS:
+                arrays[f"z{zoom}_{name}"] = level[name]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius_px=RADIUS_PX,
+                    measures=MEASURES):
+        """arrays()의 역. 메모리 맵 배열을 넘기면 복사하지 않고 그대로 쓴다"""
+        levels = {
+            zoom: {name: arrays[f"z{zoom}_{name}"] for name in cls.LEVEL_ARRAYS}
+            for zoom in range(int(min_zoom), int(max_zoom) + 1)
+        }
+        return cls(arrays["rows"], arrays["values"], levels, min_zoom, max_zoom, radius_px,
+                   measures)
+
+    def save(self, path):
+        arrays = self.arrays()
+        arrays["meta"] = np.array([self.min_zoom, self.max_zoom, self.radius_px])
+        arrays["measures"] = np.array(self.measures, dtype=str)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            min_zoom, max_zoom, radius_px = z["meta"].tolist()
+            return cls.from_arrays(z, min_zoom, max_zoom, radius_px, z["measures"].tolist())
+
+    # -------------------------------
+    # 묶음 id
+    # -------------------------------
+
+    @staticmethod
+    def cluster_id(key, zoom):
+        return (np.asarray(key).astype(np.int64) << _ID_ZOOM_BITS) | int(zoom)
+
+    def _locate(self, cluster_id):
+        """묶음 id → (줌, 그 줌 배열에서의 위치)"""
+        cluster_id = int(cluster_id)
+        zoom = cluster_id & ((1 << _ID_ZOOM_BITS) - 1)
+        level = self.levels.get(zoom)
+        key = np.uint64(cluster_id >> _ID_ZOOM_BITS)
+        i = int(np.searchsorted(level["keys"], key)) if level is not None else 0
+        if level is None or i >= len(level["keys"]) or level["keys"][i] != key:
+            raise KeyError(f"없는 묶음 id입니다: {cluster_id}")
+        return zoom, i
+
+    # -------------------------------
+    # 결과 DataFrame
+    # -------------------------------
+
+    def _frame(self, zoom, idx):
+        """줌 zoom 칸들 → id, lat, lon, count, row(AP 1개일 때만), 지표 평균, expansion_zoom"""
+        level = self.levels[zoom]
+        count = level["count"][idx]
+        means = level["sums"][idx] / np.maximum(count, 1)[:, None]
+        row = np.where(count == 1, self.rows[level["start"][idx]] if len(idx) else 0, -1)
+
+        frame = pd.DataFrame({
+            "id": self.cluster_id(level["keys"][idx], zoom),
+            "lat": means[:, 0],
+            "lon": means[:, 1],
+            "count": count,
+            "row": row,
+        })
+        for j, name in enumerate(self.measures):
+            frame[name] = means[:, 2 + j]
+        frame["expansion_zoom"] = self._expansion_zoom(zoom, idx)
+        return frame
+
+    def _point_frame(self, positions):
+        """정렬된 AP 위치 → 개별 AP (count=1) DataFrame"""
+        values = self.values[positions]
+        frame = pd.DataFrame({
+            "id": np.full(len(positions), -1, dtype=np.int64),
+            "lat": values[:, 0],
+            "lon": values[:, 1],
+            "count": np.ones(len(positions), dtype=np.int64),
+            "row": self.rows[positions],
+        })
+        for j, name in enumerate(self.measures):
+            frame[name] = values[:, 2 + j]
+        frame["expansion_zoom"] = self.max_zoom + 1
+        return frame
+
+    def _children_range(self, zoom, idx):
+        """줌 zoom 칸들의 자식(zoom+1) 위치 구간 [lo, hi)"""
+        keys = self.levels[zoom]["keys"][idx]
+        child_keys = self.levels[zoom + 1]["keys"]
+        lo = np.searchsorted(child_keys, keys << np.uint64(2))
+        hi = np.searchsorted(child_keys, (keys + np.uint64(1)) << np.uint64(2))
+        return lo, hi
+
+    def _expansion_zoom(self, zoom, idx):
+        """칸마다 둘 이상으로 나뉘는 첫 줌 (끝까지 안 나뉘면 max_zoom + 1 = 개별 AP)"""
+        idx = np.asarray(idx, dtype=np.int64)
+        result = np.full(len(idx), self.max_zoom + 1, dtype=np.int64)
+        pending = np.flatnonzero(self.levels[zoom]["count"][idx] > 1)
+        current = idx[pending]
+
+        for level in range(zoom, self.max_zoom):
+            if len(pending) == 0:
+                break
+            lo, hi = self._children_range(level, current)
+            split = hi - lo > 1
+            result[pending[split]] = level + 1
+            pending, current = pending[~split], lo[~split]
+        return result
+
+    # -------------------------------
+    # 조회
+    # -------------------------------
+
+    def _cells_in_bbox(self, zoom, south, west, north, east):
+        """줌 zoom에서 사각형과 겹치는 칸 위치"""
+        level = self.levels[zoom]
+        (x0, x1), (y0, y1) = world_px([north, south], [west, east], zoom)
+        cx0, cx1 = int(x0 // self.radius_px), int(x1 // self.radius_px)
+        cy0, cy1 = int(y0 // self.radius_px), int(y1 // self.radius_px)
+        cx0, cy0 = max(cx0, 0), max(cy0, 0)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+
+        # 사각형 안 칸의 모턴 코드는 (왼쪽 위 ~ 오른쪽 아래) 모서리 코드 사이에 있음
+        lo = np.searchsorted(level["keys"], morton(cx0, cy0))
+        hi = np.searchsorted(level["keys"], morton(cx1, cy1), side="right")
+        cand = np.arange(lo, hi)
+        cx, cy = morton_xy(level["keys"][cand])
+        return cand[(cx >= cx0) & (cx <= cx1) & (cy >= cy0) & (cy <= cy1)]
+
+    def _leaf_positions(self, zoom, idx):
+        """칸들에 속한 정렬된 AP 위치를 이어 붙임"""
+        level = self.levels[zoom]
+        start, lengths = level["start"][idx], level["count"][idx]
+        total = int(lengths.sum())
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(start - offsets, lengths) + np.arange(total)
+
+    def clusters(self, south, west, north, east, zoom):
+        """
+        사각형(남, 서, 북, 동) 안의 묶음/AP DataFrame.
+        AP가 하나뿐인 칸과 MAX_ZOOM보다 확대한 경우의 개별 AP는 count=1, row=행 위치.
+        """
+        zoom = int(zoom)
+        if not self.levels or len(self) == 0:
+            return self._point_frame(np.empty(0, dtype=np.int64))
+
+        if zoom > self.max_zoom:
+            idx = self._cells_in_bbox(self.max_zoom, south, west, north, east)
+            positions = self._leaf_positions(self.max_zoom, idx)
+            lat, lon = self.values[positions, 0], self.values[positions, 1]
+            inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+            return self._point_frame(positions[inside])
+
+        zoom = max(zoom, self.min_zoom)
+        return self._frame(zoom, self._cells_in_bbox(zoom, south, west, north, east))
+
+    def children(self, cluster_id):
+        """한 단계 확대했을 때 묶음이 나뉘는 묶음/AP DataFrame"""
+        zoom, i = self._locate(cluster_id)
+        if zoom == self.max_zoom:
+            return self._point_frame(self._leaf_positions(zoom, [i]))
+        lo, hi = self._children_range(zoom, [i])
+        return self._frame(zoom + 1, np.arange(lo[0], hi[0]))
+
+    def leaves(self, cluster_id, limit=None):
+        """묶음에 속한 모든 AP 행 위치"""
+        zoom, i = self._locate(cluster_id)
+        level = self.levels[zoom]
+        start = int(level["start"][i])
+        stop = start + int(level["count"][i])
+        if limit is not None:
+            stop = min(stop, start + int(limit))
+        return self.rows[start:stop]
+
+    def expansion_zoom(self, cluster_id):
+        """묶음이 둘 이상으로 나뉘는 줌"""
+        zoom, i = self._locate(cluster_id)
+        return int(self._expansion_zoom(zoom, [i])[0])
+
+
+# ===============================
+# 데이터 버전별 1회 생성 (전체는 디스크 저장, 부분 인덱스는 메모리)
+# ===============================
+
+def cluster_index_path(version):
+    return os.path.join(cache_dir(), f"ap_clusters.{version}.npz")
+
+
+def _build_from(df, rows):
+    measures = {name: df[name].to_numpy()[rows] for name in MEASURES}
+    return ClusterIndex.build(
+        df["lat"].to_numpy()[rows], df["lon"].to_numpy()[rows], measures, rows=rows
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _load_cluster_index(version):
+    path = cluster_index_path(version)
+    if os.path.exists(path):
+        record_cache("cluster_index", "disk")
+        return ClusterIndex.load(path)
+
+    record_cache("cluster_index", "miss")
+    df = load_ap_data(["lat", "lon"] + list(MEASURES))
+    with span("cluster_index.build", rows=len(df)):
+        index = _build_from(df, np.arange(len(df)))
+    index.save(path)
+    return index
+
+
+@st.cache_resource(show_spinner=False, max_entries=SUBSET_CACHE_ENTRIES)
+def _build_subset_index(version, column, value):
+    record_cache("cluster_index", "miss")
+    df = load_ap_data([column, "lat", "lon"] + list(MEASURES))
+    rows = np.flatnonzero((df[column] == value).to_numpy())
+    with span("cluster_index.build", rows=len(rows), subset=f"{column}={value}"):
+        return _build_from(df, rows)
+
+
+@cache_lookup("cluster_index")
+def get_cluster_index(column=None, value=None):
+    """
+    load_ap_data() 행 위치를 돌려주는 묶음 인덱스.
+    column/value를 주면 그 값의 AP만 묶은 인덱스 (예: ("gu", "강남구"))
+    """
+    if column is None:
+        return _load_cluster_index(data_version())
+    return _build_subset_index(data_version(), column, value)
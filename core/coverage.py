@@ -0,0 +1,395 @@
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import folium
+import numpy as np
+import pandas as pd
+import streamlit as st
+from branca.colormap import LinearColormap
+from matplotlib import colormaps
+
+from core.ap_data import VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data
+from core.geometry import GEOJSON_PATH, geometry_polygons, rasterize_polygons
+from core.profiling import cache_lookup, record_cache, span
+from core.spatial import EARTH_RADIUS_M, REF_LAT, GridIndex, haversine_m
+
+# ===============================
+# 서울 격자 커버리지 분석
+# ===============================
+# 서울 구 경계 안을 CELL_M 격자로 나누고 칸(중심점)마다
+#   - nearest_m : 가장 가까운 AP까지 거리
+#   - count     : 반경 RADIUS_M 안 AP 수
+#   - load_gb   : 예상 부하 = AP마다 이용량을 반경 안 칸들에 고르게 나눠 더한 값 (칸당 GB)
+# 를 CHUNK_SIZE칸씩 벡터 연산으로 (명령행에서는 여러 프로세스로) 계산해
+# 데이터 버전별로 배열(npz)에 저장한다.
+#
+#   python -m core.coverage [--cell-m 50] [--radius-m 100] [--workers 4]
+
+CELL_M = 50.0
+RADIUS_M = 100.0
+CHUNK_SIZE = 100_000
+
+GU_PROPERTY = "SIG_KOR_NM"
+
+# 지도 표시: 지표별 (설명, 색 지도, 색 범위 상한 분위수)
+METRICS = {
+    "nearest_m": ("가장 가까운 AP까지 거리 (m)", "RdYlGn_r", 0.95),
+    "count": ("반경 안 AP 수", "YlGnBu", 0.99),
+    "load_gb": ("예상 부하 (칸당 GB)", "YlOrRd", 0.99),
+}
+OVERLAY_OPACITY = 0.65
+
+# 색 단계 수 (단계를 나눠야 PNG 압축이 잘 됨)
+COLOR_LEVELS = 24
+
+_M_PER_DEG_LAT = math.radians(1) * EARTH_RADIUS_M
+_M_PER_DEG_LON = _M_PER_DEG_LAT * math.cos(math.radians(REF_LAT))
+
+
+class CoverageGrid:
+    """
+    격자 칸 (ny, nx) 배열 모음. 행 0이 남쪽, 열 0이 서쪽.
+    구 경계 밖 칸은 gu = -1, 지표는 NaN(count는 0)
+    """
+
+    def __init__(self, lat0, lon0, cell_m, radius_m, gu, gu_names, nearest_m, count, load_gb):
+        self.lat0 = float(lat0)
+        self.lon0 = float(lon0)
+        self.cell_m = float(cell_m)
+        self.radius_m = float(radius_m)
+        self.gu = gu                    # (ny, nx) 구 번호
+        self.gu_names = gu_names        # 구 번호 → 이름
+        self.nearest_m = nearest_m
+        self.count = count
+        self.load_gb = load_gb
+
+    @property
+    def shape(self):
+        return self.gu.shape
+
+    @property
+    def dlat(self):
+        return self.cell_m / _M_PER_DEG_LAT
+
+    @property
+    def dlon(self):
+        return self.cell_m / _M_PER_DEG_LON
+
+    @property
+    def bounds(self):
+        """[[남, 서], [북, 동]]"""
+        ny, nx = self.shape
+        return [[self.lat0, self.lon0], [self.lat0 + ny * self.dlat, self.lon0 + nx * self.dlon]]
+
+    def cell_centers(self, rows, cols):
+        return self.lat0 + (rows + 0.5) * self.dlat, self.lon0 + (cols + 0.5) * self.dlon
+
+    def metric(self, name):
+        return getattr(self, name)
+
+    def disk_cells(self, lat, lon, radius_m=None, chunk_size=CHUNK_SIZE):
+        """
+        점마다 반경(기본: 격자 반경) 안에 중심이 있는 구 경계 안 칸의 평탄 번호 (행 * nx + 열).
+        반환: (ptr, cells) - 점 i의 칸은 cells[ptr[i]:ptr[i + 1]]
+        """
+        radius_m = self.radius_m if radius_m is None else float(radius_m)
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        ny, nx = self.shape
+        reach = int(math.ceil(radius_m / self.cell_m)) + 1
+        dr, dc = (a.ravel() for a in np.mgrid[-reach:reach + 1, -reach:reach + 1])
+        # 반경이 커서 후보 칸이 많으면 한 번에 처리하는 점 수를 줄임 (기본 반경 기준 메모리 유지)
+        chunk_size = max(1, chunk_size * 49 // len(dr))
+
+        counts, cells = [], []
+        for start in range(0, len(lat), chunk_size):
+            qlat, qlon = lat[start:start + chunk_size, None], lon[start:start + chunk_size, None]
+            rows = np.floor((qlat - self.lat0) / self.dlat).astype(np.int64) + dr
+            cols = np.floor((qlon - self.lon0) / self.dlon).astype(np.int64) + dc
+            valid = (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+            rows, cols = np.where(valid, rows, 0), np.where(valid, cols, 0)
+            clat, clon = self.cell_centers(rows, cols)
+            hit = valid & (self.gu[rows, cols] >= 0) & (haversine_m(qlat, qlon, clat, clon) <= radius_m)
+            counts.append(hit.sum(axis=1))
+            cells.append((rows * nx + cols)[hit])
+
+        ptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(np.concatenate(counts), out=ptr[1:])
+        return ptr, np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+
+    def save(self, path):
+        arrays = {
+            "meta": np.array([self.lat0, self.lon0, self.cell_m, self.radius_m]),
+            "gu": self.gu, "gu_names": np.array(self.gu_names, dtype=str),
+            "nearest_m": self.nearest_m, "count": self.count, "load_gb": self.load_gb,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            lat0, lon0, cell_m, radius_m = z["meta"].tolist()
+            return cls(lat0, lon0, cell_m, radius_m, z["gu"], z["gu_names"].tolist(),
+                       z["nearest_m"], z["count"], z["load_gb"])
+
+    # -------------------------------
+    # 요약
+    # -------------------------------
+
+    def summary_by_gu(self, gap_m=None):
+        """
+        구별 칸 수, 커버 비율(가장 가까운 AP가 gap_m 이내, 기본 반경), 평균/95% 거리,
+        평균 AP 수, 예상 부하 합계
+        """
+        gap_m = self.radius_m if gap_m is None else gap_m
+        inside = self.gu >= 0
+        gu = self.gu[inside]
+        nearest = self.nearest_m[inside]
+        n = len(self.gu_names)
+        cells = np.bincount(gu, minlength=n)
+
+        frame = pd.DataFrame({
+            "cells": cells,
+            "area_km2": cells * (self.cell_m / 1000) ** 2,
+            "covered_share": np.bincount(gu, weights=nearest <= gap_m, minlength=n) / np.maximum(cells, 1),
+            "mean_nearest_m": np.bincount(gu, weights=nearest, minlength=n) / np.maximum(cells, 1),
+            "p95_nearest_m": [
+                float(np.quantile(nearest[gu == g], 0.95)) if cells[g] else np.nan for g in range(n)
+            ],
+            "mean_count": np.bincount(gu, weights=self.count[inside], minlength=n) / np.maximum(cells, 1),
+            "load_gb": np.bincount(gu, weights=self.load_gb[inside], minlength=n),
+        }, index=pd.Index(self.gu_names, name="gu"))
+        return frame.sort_values("covered_share")
+
+
+# ===============================
+# 계산
+# ===============================
+
+def district_raster(geojson, lon0, lat0, dlon, dlat, nx, ny):
+    """칸마다 구 번호 (밖은 -1) + 구 이름 목록"""
+    gu = np.full((ny, nx), -1, dtype=np.int16)
+    names = []
+    for feature in geojson["features"]:
+        polygons = geometry_polygons(feature["geometry"])
+        inside = rasterize_polygons(polygons, lon0, lat0, dlon, dlat, nx, ny)
+        gu[inside & (gu < 0)] = len(names)
+        names.append(feature["properties"][GU_PROPERTY])
+    return gu, names
+
+
+def coverage_index(lat, lon, radius_m=RADIUS_M):
+    # 반경 조회가 대부분이라 칸 크기를 반경에 맞춤 (neighbor_counts와 같은 기준)
+    return GridIndex(lat, lon, cell_m=max(radius_m, 50.0))
+
+
+def coverage_weights(usage_gb):
+    """count_within 가중치: (AP 수, 이용량) 두 열"""
+    usage_gb = np.nan_to_num(np.asarray(usage_gb, dtype=float))
+    return np.column_stack([np.ones(len(usage_gb)), usage_gb])
+
+
+def _cell_stats(index, lat, lon, radius_m, weights, chunk_size):
+    """칸 중심점들 → (가장 가까운 AP 거리, 반경 안 AP 수, 반경 안 이용량 합계)"""
+    _, nearest = index.nearest(lat, lon, chunk_size=chunk_size)
+    count, usage = index.count_within(lat, lon, radius_m, chunk_size=chunk_size, weights=weights).T
+    return nearest, count, usage
+
+
+# 작업 프로세스마다 한 번만 받아 두는 (인덱스, 가중치)
+_worker_state = {}
+
+
+def _init_worker(index, weights):
+    _worker_state["index"] = index
+    _worker_state["weights"] = weights
+
+
+def _cell_stats_chunk(lat, lon, radius_m, chunk_size):
+    return _cell_stats(_worker_state["index"], lat, lon, radius_m, _worker_state["weights"], chunk_size)
+
+
+def _cell_stats_parallel(index, lat, lon, radius_m, weights, chunk_size, workers):
+    """칸을 chunk_size개씩 나눠 여러 프로세스에서 계산 (인덱스는 프로세스마다 한 번만 전달)"""
+    starts = range(0, len(lat), chunk_size)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(index, weights)) as pool:
+        parts = list(pool.map(
+            _cell_stats_chunk,
+            [lat[i:i + chunk_size] for i in starts],
+            [lon[i:i + chunk_size] for i in starts],
+            [radius_m] * len(starts),
+            [chunk_size] * len(starts),
+        ))
+    return tuple(np.concatenate(values) for values in zip(*parts))
+
+
+def empty_coverage(geojson, cell_m=CELL_M, radius_m=RADIUS_M):
+    """구 경계 GeoJSON → 구 번호만 채운 CoverageGrid (지표는 fill로 채움)"""
+    points = np.concatenate([
+        ring for f in geojson["features"] for polygon in geometry_polygons(f["geometry"])
+        for ring in polygon
+    ])
+    (lon_min, lat_min), (lon_max, lat_max) = points.min(axis=0), points.max(axis=0)
+    dlat, dlon = cell_m / _M_PER_DEG_LAT, cell_m / _M_PER_DEG_LON
+    nx = int(math.ceil((lon_max - lon_min) / dlon))
+    ny = int(math.ceil((lat_max - lat_min) / dlat))
+
+    with span("coverage.rasterize", cells=nx * ny):
+        gu, names = district_raster(geojson, lon_min, lat_min, dlon, dlat, nx, ny)
+
+    return CoverageGrid(
+        lat_min, lon_min, cell_m, radius_m, gu, names,
+        nearest_m=np.full((ny, nx), np.nan, dtype=np.float32),
+        count=np.zeros((ny, nx), dtype=np.int32),
+        load_gb=np.full((ny, nx), np.nan, dtype=np.float32),
+    )
+
+
+def fill_coverage(grid, nearest, count, usage):
+    """
+    구 경계 안 칸(np.nonzero(grid.gu >= 0) 순서)별 _cell_stats 결과를 grid에 채움.
+    AP 한 대의 이용량이 반경 안 칸들에 고르게 퍼진다고 보면 칸 하나의 몫은 1 / (원 안 칸 수)
+    """
+    rows, cols = np.nonzero(grid.gu >= 0)
+    cells_per_ap = math.pi * grid.radius_m ** 2 / grid.cell_m ** 2
+    grid.nearest_m[rows, cols] = nearest
+    grid.count[rows, cols] = count
+    grid.load_gb[rows, cols] = usage / cells_per_ap
+    return grid
+
+
+def build_coverage(lat, lon, usage_gb, geojson, cell_m=CELL_M, radius_m=RADIUS_M,
+                   index=None, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    AP 좌표/이용량 + 구 경계 GeoJSON → CoverageGrid.
+    workers > 1이면 칸 chunk를 여러 프로세스로 나눠 계산 (명령행 일괄 계산용)
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if index is None:
+        index = coverage_index(lat, lon, radius_m)
+
+    grid = empty_coverage(geojson, cell_m, radius_m)
+    clat, clon = grid.cell_centers(*np.nonzero(grid.gu >= 0))
+
+    weights = coverage_weights(usage_gb)
+    with span("coverage.cells", cells=len(clat), workers=workers):
+        if workers > 1:
+            nearest, count, usage = _cell_stats_parallel(
+                index, clat, clon, radius_m, weights, chunk_size, workers
+            )
+        else:
+            nearest, count, usage = _cell_stats(index, clat, clon, radius_m, weights, chunk_size)
+
+    return fill_coverage(grid, nearest, count, usage)
+
+
+# ===============================
+# 지도 레이어 (칸 하나 = 이미지 픽셀 하나)
+# ===============================
+
+def color_range(grid, metric):
+    values = grid.metric(metric)[grid.gu >= 0].astype(float)
+    quantile = METRICS[metric][2]
+    vmax = float(np.nanquantile(values, quantile)) if len(values) else 1.0
+    return 0.0, max(vmax, 1e-9)
+
+
+def coverage_image(grid, metric):
+    """지표 → RGBA uint8 이미지 (행 0이 북쪽, 구 경계 밖은 투명)"""
+    _, cmap_name, _ = METRICS[metric]
+    vmin, vmax = color_range(grid, metric)
+    values = grid.metric(metric).astype(float)
+    scaled = np.clip((values - vmin) / (vmax - vmin), 0.0, 1.0)
+    scaled = np.round(np.nan_to_num(scaled) * (COLOR_LEVELS - 1)) / (COLOR_LEVELS - 1)
+
+    rgba = colormaps[cmap_name](scaled, bytes=True)
+    rgba[..., 3] = np.where(grid.gu >= 0, 255, 0)
+    return rgba[::-1]
+
+
+def add_coverage_layer(m, grid, metric):
+    """
+    folium 지도에 커버리지 이미지 + 색 범례 추가.
+    이미지는 위경도 등간격 격자지만 서울 범위(위도 0.3도)에서는 메르카토르와의 차이가
+    한 칸보다 작아서 투영 변환 없이 올린다.
+    """
+    caption, cmap_name, _ = METRICS[metric]
+    vmin, vmax = color_range(grid, metric)
+
+    folium.raster_layers.ImageOverlay(
+        image=coverage_image(grid, metric),
+        bounds=grid.bounds,
+        opacity=OVERLAY_OPACITY,
+        name=caption,
+    ).add_to(m)
+
+    cmap = colormaps[cmap_name]
+    LinearColormap(
+        [cmap(t) for t in np.linspace(0, 1, 8)], vmin=vmin, vmax=vmax, caption=caption,
+    ).to_step(COLOR_LEVELS).add_to(m)
+    return m
+
+
+# ===============================
+# 데이터 버전별 1회 계산 + 디스크 저장
+# ===============================
+
+def coverage_path(version, cell_m=CELL_M, radius_m=RADIUS_M):
+    return os.path.join(cache_dir(), f"coverage.{version}.{cell_m:g}m.{radius_m:g}m.npz")
+
+
+def _compute(cell_m, radius_m, workers=1):
+    df = load_ap_data(["lat", "lon", "usage_gb"])
+    with open(GEOJSON_PATH, encoding="utf-8") as f:
+        geojson = json.load(f)
+    return build_coverage(
+        df["lat"], df["lon"], df["usage_gb"], geojson, cell_m, radius_m, workers=workers
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _load_coverage(version, cell_m, radius_m):
+    path = coverage_path(version, cell_m, radius_m)
+    if os.path.exists(path):
+        record_cache("coverage", "disk")
+        return CoverageGrid.load(path)
+
+    record_cache("coverage", "miss")
+    with span("coverage.build", cell_m=cell_m, radius_m=radius_m):
+        grid = _compute(cell_m, radius_m)
+    grid.save(path)
+    return grid
+
+
+@cache_lookup("coverage")
+def get_coverage(cell_m=CELL_M, radius_m=RADIUS_M):
+    """현재 데이터 버전의 커버리지 격자 (세션 간 공유, 읽기 전용)"""
+    return _load_coverage(data_version(), float(cell_m), float(radius_m))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="서울 격자 커버리지 계산")
+    parser.add_argument("--cell-m", type=float, default=CELL_M, help="격자 칸 크기 (m)")
+    parser.add_argument("--radius-m", type=float, default=RADIUS_M, help="AP 수 / 부하 반경 (m)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="계산 프로세스 수")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    grid = _compute(args.cell_m, args.radius_m, args.workers)
+    path = coverage_path(data_version(), args.cell_m, args.radius_m)
+    grid.save(path)
+
+    print(f"{int((grid.gu >= 0).sum()):,}칸 계산: {time.perf_counter() - start:.1f}초 → {path}")
+    print(grid.summary_by_gu().round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
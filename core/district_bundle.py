@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data
+from core.cluster_index import MAX_ZOOM, MEASURES, MIN_ZOOM, RADIUS_PX, ClusterIndex
+from core.marker_layout import LAYOUT_VERSION, fan_out
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# 자치구별 상세 지도 묶음 (미리 계산 + 메모리 맵)
+# ===============================
+# 구를 처음 고를 때마다 하던 일 (전체 df에서 구 필터, 중심 계산, 구 묶음 인덱스 생성,
+# 겹친 AP 펼치기)을 데이터 버전마다 25개 구 전부 한 번에 미리 해서 디스크에 둔다.
+#
+#   python -m core.district_bundle
+#
+# 캐시 폴더/district_bundles.{버전}.layout{펼치기 방식 버전}/
+#   meta.json          구 이름, 구별 AP 수 / 범위(남, 서, 북, 동) / 중심, 배열별 구 구간
+#   points_rows.npy    구별로 정렬한 AP 행 위치 (load_ap_data() 기준)
+#   points_plot.npy    같은 순서의 표시용 좌표 (겹친 AP를 펼친 plot_lat, plot_lon)
+#   rows.npy, values.npy, z{줌}_{keys|start|count|sums}.npy
+#                      구별 ClusterIndex 배열을 구 순서대로 이어 붙인 것
+#
+# 모든 배열을 메모리 맵으로 열고 구마다 그 구간만 잘라(복사 없이) 쓰므로
+# 상세 보기 진입은 구 이름 → 묶음 조회 한 번이다. 첫 클릭과 백 번째 클릭이 같다.
+
+
+class DistrictBundle:
+    """한 구의 상세 지도 데이터 (모든 배열은 읽기 전용 메모리 맵 조각)"""
+
+    def __init__(self, gu, count, bounds, centroid, rows, plot, clusters):
+        self.gu = gu
+        self.count = int(count)
+        self.bounds = tuple(bounds)          # (남, 서, 북, 동)
+        self.centroid = tuple(centroid)      # (위도, 경도) 평균
+        self.rows = rows                     # 정렬한 AP 행 위치
+        self.plot = plot                     # (n, 2) 표시용 위도, 경도
+        self.clusters = clusters             # 이 구의 ClusterIndex
+
+    def __len__(self):
+        return self.count
+
+    def plot_positions(self, rows):
+        """AP 행 위치 배열 → 표시용 (위도, 경도) 배열 (이 구의 AP만 넘길 것)"""
+        pos = np.searchsorted(self.rows, rows)
+        return self.plot[pos, 0], self.plot[pos, 1]
+
+
+# ===============================
+# 만들기
+# ===============================
+
+def bundle_dir(version):
+    return os.path.join(cache_dir(), f"district_bundles.{version}.layout{LAYOUT_VERSION}")
+
+
+BUNDLE_COLUMNS = ["gu", "lat", "lon"] + list(MEASURES)
+
+
+def _build_arrays(df=None):
+    """모든 구의 묶음 배열 {이름: 구별 배열 목록}과 meta (df: BUNDLE_COLUMNS, 기본: 현재 데이터)"""
+    df = load_ap_data(BUNDLE_COLUMNS) if df is None else df
+    codes, gus = pd.factorize(df["gu"].astype(str), sort=True)
+    lat, lon = df["lat"].to_numpy(dtype=float), df["lon"].to_numpy(dtype=float)
+    measures = {name: df[name].to_numpy() for name in MEASURES}
+
+    # 구 번호로 한 번 정렬해 두면 구별 행은 연속 구간 (구마다 전체 비교 없음)
+    order = np.argsort(codes, kind="stable")
+    bounds_at = np.searchsorted(codes[order], np.arange(len(gus) + 1))
+
+    parts, meta_gus = {}, []
+    for i, gu in enumerate(gus):
+        rows = order[bounds_at[i]:bounds_at[i + 1]].astype(np.int64)
+        valid = rows[np.isfinite(lat[rows]) & np.isfinite(lon[rows])]
+        index = ClusterIndex.build(
+            lat[rows], lon[rows], {name: v[rows] for name, v in measures.items()}, rows=rows
+        )
+        plot_lat, plot_lon, _ = fan_out(lat[rows], lon[rows])
+
+        arrays = index.arrays()
+        arrays["points_rows"] = rows
+        arrays["points_plot"] = np.column_stack([plot_lat, plot_lon])
+        for name, array in arrays.items():
+            parts.setdefault(name, []).append(array)
+
+        meta_gus.append({
+            "gu": gu,
+            "count": int(len(rows)),
+            "bounds": ([float(lat[valid].min()), float(lon[valid].min()),
+                        float(lat[valid].max()), float(lon[valid].max())] if len(valid) else None),
+            "centroid": ([float(lat[valid].mean()), float(lon[valid].mean())]
+                         if len(valid) else None),
+        })
+
+    return parts, meta_gus
+
+
+def build_bundles(version, df=None):
+    """현재 데이터(또는 df)로 모든 구 묶음을 만들어 bundle_dir(version)에 저장"""
+    with span("district_bundle.build"):
+        parts, meta_gus = _build_arrays(df)
+
+    path = bundle_dir(version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    offsets = {}
+    for name, arrays in parts.items():
+        offsets[name] = np.cumsum([0] + [len(a) for a in arrays]).tolist()
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.concatenate(arrays))
+
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "gus": meta_gus,
+            "offsets": offsets,
+            "clusters": {
+                "min_zoom": MIN_ZOOM, "max_zoom": MAX_ZOOM,
+                "radius_px": RADIUS_PX, "measures": list(MEASURES),
+            },
+        }, f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # 다른 프로세스가 먼저 만들었으면 그쪽 사용
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+def open_bundles(path):
+    """저장한 묶음 폴더 → {구 이름: DistrictBundle} (배열은 메모리 맵)"""
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in meta["offsets"]
+    }
+
+    bundles = {}
+    for i, info in enumerate(meta["gus"]):
+        part = {
+            name: array[meta["offsets"][name][i]:meta["offsets"][name][i + 1]]
+            for name, array in arrays.items()
+        }
+        bundles[info["gu"]] = DistrictBundle(
+            info["gu"], info["count"], info["bounds"] or (), info["centroid"] or (),
+            part.pop("points_rows"), part.pop("points_plot"),
+            ClusterIndex.from_arrays(part, **meta["clusters"]),
+        )
+    return bundles
+
+
+# ===============================
+# 데이터 버전별 1회 로드 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _load_bundles(version):
+    path = bundle_dir(version)
+    if os.path.exists(path):
+        record_cache("district_bundle", "disk")
+    else:
+        record_cache("district_bundle", "miss")
+        build_bundles(version)
+    return open_bundles(path)
+
+
+@cache_lookup("district_bundle")
+def get_district_bundles():
+    """현재 데이터 버전의 {구 이름: DistrictBundle}"""
+    return _load_bundles(data_version())
+
+
+def get_district_bundle(gu):
+    """구 하나의 DistrictBundle (없는 구면 None)"""
+    return get_district_bundles().get(str(gu))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자치구별 상세 지도 묶음 미리 만들기")
+    parser.add_argument("--force", action="store_true", help="이미 있어도 다시 만들기")
+    args = parser.parse_args()
+
+    version = data_version()
+    path = bundle_dir(version)
+    if args.force and os.path.exists(path):
+        shutil.rmtree(path)
+
+    start = time.perf_counter()
+    if not os.path.exists(path):
+        build_bundles(version)
+    bundles = open_bundles(path)
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"{len(bundles)}개 구, AP {sum(map(len, bundles.values())):,}개: "
+          f"{time.perf_counter() - start:.1f}초, {size / 1e6:,.1f}MB → {path}")
+
+
+if __name__ == "__main__":
+    main()
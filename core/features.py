@@ -0,0 +1,348 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.ap_data import CSV_PATH, cache_dir
+from core.spatial import GridIndex
+
+# ===============================
+# AP 점수 컬럼 생성 파이프라인
+# ===============================
+# 원본 AP 목록(서울 열린데이터 export + 이용량)에서 대시보드가 쓰는
+# age_norm / usage_norm / usage_norm_log / density_norm / cluster_k3 / cluster_k3_rank
+# 컬럼을 매번 같은 결과로 다시 계산한다.
+# 배포 중인 data/AP_data.csv의 점수 컬럼은 이 파이프라인 이전에 만들어진 값이라 그대로 둔다
+# (특히 cluster_k3는 seed 고정 k-means로 재현되지 않는다). 기본 실행은 다시 계산한 값과
+# 입력 CSV에 이미 있는 점수 컬럼의 차이만 보고하고, 출력 경로를 줄 때만 파일을 쓴다.
+#
+#   python -m core.features [원본.csv]                         # 입력 CSV의 점수 컬럼과 차이 보고
+#   python -m core.features 원본.csv 출력.csv                  # 다시 계산한 CSV 저장
+
+RAW_COLUMNS = [
+    "ap_id", "gu", "address", "install_year", "install_type_code",
+    "install_type", "indoor_outdoor", "lon", "lat", "usage_gb",
+]
+
+FEATURE_COLUMNS = [
+    "age_norm", "usage_norm", "usage_norm_log", "density_norm", "cluster_k3", "cluster_k3_rank",
+]
+
+# 밀집도: 반경 안 가장 가까운 다른 AP까지 거리가 반경 절반(권장 간격)에서 벗어난 정도.
+# 반경 안 다른 AP가 DENSITY_MIN_NEIGHBORS대 미만이면 0
+DENSITY_RADIUS_M = 30.0
+DENSITY_MIN_NEIGHBORS = 2
+
+# 구별 이용량: 구 평균 대비 배율을 전체 상위 5% 경계에서 잘라 0~1 정규화
+USAGE_CAP_QUANTILE = 0.95
+
+# 군집: (노후도, 로그 이용량, 밀집도) 3차원 k-means
+CLUSTER_FEATURES = ["age_norm", "usage_norm_log", "density_norm"]
+N_CLUSTERS = 3
+KMEANS_SEED = 42
+KMEANS_N_INIT = 4
+KMEANS_MAX_ITER = 100
+KMEANS_SAMPLE = 50_000
+
+CSV_DIGITS = 9
+
+# 차이 보고에서 같은 값으로 보는 허용 오차 (배포 CSV 반올림 자릿수 고려)
+DIFF_TOLERANCE = 1e-5
+
+
+def _minmax(values):
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    return _scale(values, lo, hi)
+
+
+def _scale(values, lo, hi):
+    if hi == lo:
+        return np.zeros_like(values, dtype=float)
+    return (values - lo) / (hi - lo)
+
+
+def age_norm(install_year, year_range=None):
+    """설치 연도가 오래될수록 1 (최신 연도 0). year_range=(최소, 최대)를 주면 그 범위 기준"""
+    year = np.asarray(install_year, dtype=float)
+    lo, hi = year_range if year_range is not None else (year.min(), year.max())
+    return _scale(hi - year, 0.0, hi - lo)
+
+
+def usage_norm_log(usage_gb, log_range=None):
+    """log(1 + 이용량)의 min-max 정규화. log_range를 주면 그 범위 기준"""
+    log_usage = np.log1p(np.asarray(usage_gb, dtype=float))
+    if log_range is None:
+        return _minmax(log_usage)
+    return _scale(log_usage, *log_range)
+
+
+def usage_state(usage_gb, gu):
+    """usage_norm 기준값: 구별 평균 이용량, 구 평균 대비 배율의 최솟값 / 상한(상위 5% 경계)"""
+    usage = pd.Series(np.asarray(usage_gb, dtype=float))
+    gu = np.asarray(gu).astype(str)
+    gu_mean = usage.groupby(gu).mean()
+    rel = usage.to_numpy() / gu_mean.reindex(gu).to_numpy()
+    return {
+        "gu_mean": {str(k): float(v) for k, v in gu_mean.items()},
+        "rel_lo": float(rel.min()),
+        "rel_cap": float(np.quantile(rel, USAGE_CAP_QUANTILE)),
+    }
+
+
+def usage_norm(usage_gb, gu, state=None):
+    """
+    구별 이용량 정규화. 이용량 ÷ 소속 구 평균을 상위 5% 경계에서 1로 잘라낸다
+    (소수 대용량 AP 때문에 나머지가 모두 0 근처로 몰리지 않도록).
+    state: usage_state 결과 (기본: 넘긴 값으로 계산, 일부 AP만 다시 계산할 때는 전체 기준값)
+    """
+    usage = np.asarray(usage_gb, dtype=float)
+    gu = np.asarray(gu).astype(str)
+    if state is None:
+        state = usage_state(usage, gu)
+
+    mean = pd.Series(state["gu_mean"], dtype=float).reindex(gu).to_numpy()
+    # 기준값에 없는 구는 그 AP 자신을 평균으로 본다
+    mean = np.where(np.isfinite(mean) & (mean > 0), mean, np.maximum(usage, 1e-9))
+    lo, cap = state["rel_lo"], state["rel_cap"]
+    scale = cap - lo if cap > lo else 1.0
+    return np.clip((usage / mean - lo) / scale, 0.0, 1.0)
+
+
+def neighbor_stats(lat, lon, radius_m=DENSITY_RADIUS_M, index=None, rows=None, chunk_size=100_000):
+    """
+    각 AP 반경 radius_m 안의 (다른 AP 수, 가장 가까운 다른 AP까지 거리 m — 없으면 inf).
+    자기 자신은 위치로 제외하므로 같은 좌표의 다른 AP는 거리 0으로 센다.
+    rows를 주면 그 위치의 AP만 계산 (index는 전체 lat/lon으로 만든 것)
+    """
+    if index is None:
+        index = GridIndex(lat, lon, cell_m=max(radius_m, 50.0))
+    rows = np.arange(len(index)) if rows is None else np.asarray(rows, dtype=np.int64)
+    counts = np.zeros(len(rows), dtype=np.int64)
+    nearest = np.full(len(rows), np.inf)
+
+    for start in range(0, len(rows), chunk_size):
+        part = rows[start:start + chunk_size]
+        query, cand, dist = index.pairs_within(index.lat[part], index.lon[part], radius_m)
+        other = cand != part[query]
+        query, dist = query[other] + start, dist[other]
+        counts += np.bincount(query, minlength=len(rows))
+        np.minimum.at(nearest, query, dist)
+    return counts, nearest
+
+
+def neighbor_counts(lat, lon, radius_m=DENSITY_RADIUS_M, index=None, rows=None):
+    """각 AP 반경 radius_m 안에 있는 다른 AP 수 (자기 자신 제외)"""
+    return neighbor_stats(lat, lon, radius_m, index, rows)[0]
+
+
+def density_norm(nearest_m, counts, radius_m=DENSITY_RADIUS_M):
+    """
+    가장 가까운 다른 AP까지 거리가 반경 절반에서 벗어난 정도 (0~1).
+    너무 붙어 있어도(같은 지점) 반경 끝에 걸쳐 있어도 1, 반경 안 이웃이 2대 미만이면 0
+    """
+    nearest = np.asarray(nearest_m, dtype=float)
+    counts = np.asarray(counts)
+    half = radius_m / 2
+    spread = np.clip(np.abs(np.where(np.isfinite(nearest), nearest, radius_m) - half) / half, 0.0, 1.0)
+    return np.where(counts >= DENSITY_MIN_NEIGHBORS, spread, 0.0)
+
+
+# ===============================
+# k-means (seed 고정)
+# ===============================
+
+def _sq_dist(X, centers):
+    return (
+        (X ** 2).sum(axis=1)[:, None]
+        - 2 * X @ centers.T
+        + (centers ** 2).sum(axis=1)[None, :]
+    )
+
+
+def _kmeans_once(X, k, rng, max_iter):
+    # k-means++ 초기값
+    centers = np.empty((k, X.shape[1]))
+    centers[0] = X[rng.integers(len(X))]
+    d2 = ((X - centers[0]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        probs = d2 / d2.sum() if d2.sum() > 0 else None
+        centers[c] = X[rng.choice(len(X), p=probs)]
+        d2 = np.minimum(d2, ((X - centers[c]) ** 2).sum(axis=1))
+
+    labels = None
+    for _ in range(max_iter):
+        new_labels = _sq_dist(X, centers).argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        sizes = np.bincount(labels, minlength=k)
+        for j in range(X.shape[1]):
+            sums = np.bincount(labels, weights=X[:, j], minlength=k)
+            centers[:, j] = np.where(sizes > 0, sums / np.maximum(sizes, 1), centers[:, j])
+
+    inertia = np.maximum(_sq_dist(X, centers).min(axis=1), 0).sum()
+    return labels, centers, inertia
+
+
+def kmeans(X, k=N_CLUSTERS, seed=KMEANS_SEED, n_init=KMEANS_N_INIT, max_iter=KMEANS_MAX_ITER):
+    """
+    seed 고정 k-means (n_init번 중 inertia가 가장 작은 결과).
+    행이 KMEANS_SAMPLE개보다 많으면 seed 고정 표본으로 중심을 구한 뒤 전체를 배정한다.
+    """
+    X = np.asarray(X, dtype=float)
+    rng = np.random.default_rng(seed)
+    fit_X = X
+    if len(X) > KMEANS_SAMPLE:
+        fit_X = X[np.sort(rng.choice(len(X), KMEANS_SAMPLE, replace=False))]
+
+    best = None
+    for _ in range(n_init):
+        result = _kmeans_once(fit_X, k, rng, max_iter)
+        if best is None or result[2] < best[2]:
+            best = result
+
+    centers = best[1]
+    return _sq_dist(X, centers).argmin(axis=1), centers
+
+
+def cluster_ranks(centers):
+    """
+    군집 중심의 위험도(노후도 + 밀집도 - 로그 이용량) 순서로 0(양호) / 1(유지관리) / 2(교체권장)
+    반환값: 군집 번호 → rank 배열
+    """
+    age, usage_log, density = (centers[:, CLUSTER_FEATURES.index(c)] for c in CLUSTER_FEATURES)
+    risk = age + density - usage_log
+    ranks = np.empty(len(centers), dtype=np.int64)
+    ranks[np.argsort(risk, kind="stable")] = np.arange(len(centers))
+    return ranks
+
+
+def score_ranges(df):
+    """age_norm / usage_norm_log / usage_norm 정규화에 쓰인 전체 기준값"""
+    year = df["install_year"].to_numpy(dtype=float)
+    log_usage = np.log1p(df["usage_gb"].to_numpy(dtype=float))
+    return {
+        "year_range": [float(year.min()), float(year.max())],
+        "log_usage_range": [float(log_usage.min()), float(log_usage.max())],
+        "usage": usage_state(df["usage_gb"], df["gu"]),
+    }
+
+
+def cluster_state(df):
+    """
+    현재 cluster_k3 라벨로 군집 중심과 rank를 복원
+    (새로 들어온 AP를 다시 학습하지 않고 가장 가까운 중심에 배정할 때 사용)
+    """
+    X = df[CLUSTER_FEATURES].to_numpy(dtype=float)
+    labels = df["cluster_k3"].to_numpy()
+    ranks = df["cluster_k3_rank"].to_numpy()
+    present = np.unique(labels)
+    return {
+        "labels": present.tolist(),
+        "centers": [X[labels == k].mean(axis=0).tolist() for k in present],
+        "ranks": [int(ranks[labels == k][0]) for k in present],
+    }
+
+
+def assign_clusters(X, state):
+    """cluster_state 중심 중 가장 가까운 군집의 (cluster_k3, cluster_k3_rank) 배열"""
+    nearest = _sq_dist(np.asarray(X, dtype=float), np.asarray(state["centers"])).argmin(axis=1)
+    return np.asarray(state["labels"])[nearest], np.asarray(state["ranks"])[nearest]
+
+
+def ranks_path(version):
+    """
+    버전별 다시 배정한 cluster_k3_rank (python -m core.batch의 ranks 단계).
+    스냅샷 군집 중심에 현재 이웃 기준 density_norm으로 배정한 값이라 배포 컬럼과 비교용이고,
+    페이지는 스냅샷의 cluster_k3_rank를 그대로 쓴다
+    """
+    return os.path.join(cache_dir(), f"ap_ranks.{version}.{DENSITY_RADIUS_M:g}m.npy")
+
+
+# ===============================
+# 전체 파이프라인
+# ===============================
+
+def compute_features(raw):
+    """원본 AP DataFrame(RAW_COLUMNS)에 점수 컬럼을 붙인 새 DataFrame 반환"""
+    df = raw[RAW_COLUMNS].copy()
+    lat = df["lat"].to_numpy(dtype=float)
+    lon = df["lon"].to_numpy(dtype=float)
+
+    df["age_norm"] = age_norm(df["install_year"])
+    df["usage_norm"] = usage_norm(df["usage_gb"], df["gu"])
+    df["usage_norm_log"] = usage_norm_log(df["usage_gb"])
+    counts, nearest = neighbor_stats(lat, lon)
+    df["density_norm"] = density_norm(nearest, counts)
+
+    labels, centers = kmeans(df[CLUSTER_FEATURES].to_numpy())
+    # 군집 번호 자체도 위험도 순서로 맞춰서 cluster_k3 == cluster_k3_rank
+    ranks = cluster_ranks(centers)
+    df["cluster_k3"] = ranks[labels]
+    df["cluster_k3_rank"] = ranks[labels]
+
+    return df
+
+
+def feature_diff(shipped, computed, tolerance=DIFF_TOLERANCE):
+    """
+    입력 CSV에 있던 점수 컬럼 vs 다시 계산한 값 비교표
+    (컬럼별 허용 오차를 넘는 행 수 / 최대 차이 / 차이가 가장 큰 구)
+    """
+    rows = []
+    for col in FEATURE_COLUMNS:
+        if col not in shipped:
+            continue
+        diff = pd.Series(
+            np.abs(computed[col].to_numpy(dtype=float) - shipped[col].to_numpy(dtype=float)),
+            index=shipped.index,
+        )
+        changed = diff > tolerance
+        rows.append({
+            "column": col,
+            "changed": int(changed.sum()),
+            "max_diff": float(diff.max()),
+            "top_gu": diff.groupby(shipped["gu"].astype(str)).max().idxmax() if changed.any() else "",
+        })
+    return pd.DataFrame(rows).set_index("column")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AP 점수 컬럼 재계산 (기본: 입력 CSV의 점수 컬럼과 차이 보고)")
+    parser.add_argument("input", nargs="?", default=CSV_PATH, help="원본 AP CSV")
+    parser.add_argument("output", nargs="?", help="결과 CSV (생략하면 차이만 보고)")
+    parser.add_argument("--overwrite-shipped", action="store_true",
+                        help="출력 경로가 배포 CSV(data/AP_data.csv)여도 덮어쓰기")
+    args = parser.parse_args()
+
+    if args.output and os.path.abspath(args.output) == os.path.abspath(CSV_PATH) and not args.overwrite_shipped:
+        parser.error("배포 CSV를 덮어쓰려면 --overwrite-shipped 를 붙이세요 (점수 / 군집이 바뀝니다)")
+
+    raw = pd.read_csv(args.input)
+    start = time.perf_counter()
+    df = compute_features(raw)
+    elapsed = time.perf_counter() - start
+    print(f"{len(df):,}개 AP 처리: {elapsed:.2f}초")
+
+    if set(FEATURE_COLUMNS) & set(raw.columns):
+        print(f"\n입력 CSV 점수 컬럼과 차이 (허용 오차 {DIFF_TOLERANCE:g})")
+        print(feature_diff(raw, df).to_string())
+        if "cluster_k3_rank" in raw:
+            print("\ncluster_k3_rank (행: 입력 CSV, 열: 다시 계산)")
+            print(pd.crosstab(raw["cluster_k3_rank"], df["cluster_k3_rank"]).to_string())
+    else:
+        print(df[FEATURE_COLUMNS].describe().T[["mean", "min", "max"]])
+        print(df["cluster_k3_rank"].value_counts().sort_index())
+
+    if args.output:
+        # 배포 CSV와 같이 점수는 유효숫자 CSV_DIGITS자리로 저장
+        for col in ("age_norm", "usage_norm", "usage_norm_log", "density_norm"):
+            df[col] = df[col].map(lambda v: float(f"{v:.{CSV_DIGITS}g}"))
+        df.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
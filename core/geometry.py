@@ -0,0 +1,255 @@
+import json
+import math
+import os
+from collections import defaultdict
+
+import numpy as np
+import streamlit as st
+
+from core.ap_data import DATA_DIR, cache_dir, file_hash
+from core.profiling import cache_lookup, record_cache
+from core.spatial import REF_LAT, project
+
+# ===============================
+# 서울 구 경계 단순화 설정
+# ===============================
+
+GEOJSON_PATH = os.path.join(DATA_DIR, "seoul_gu.geojson")
+
+# 미리 만들어 두는 줌 레벨 (범위 밖 줌은 가장 가까운 레벨 사용)
+ZOOM_LEVELS = (9, 10, 11, 12, 13, 14)
+
+KEEP_PROPERTIES = ("SIG_CD", "SIG_KOR_NM", "SIG_ENG_NM")
+
+
+def tolerance_for_zoom(zoom):
+    """해당 줌에서 화면 1픽셀에 해당하는 거리(m) = 단순화 허용 오차"""
+    return 156543.03392 * math.cos(math.radians(REF_LAT)) / 2 ** zoom
+
+
+def digits_for_tolerance(tolerance_m):
+    """허용 오차의 1/10 해상도를 유지하는 소수점 자릿수 (좌표 양자화)"""
+    tolerance_deg = tolerance_m / 111_320
+    return int(math.ceil(math.log10(10 / tolerance_deg)))
+
+
+def pick_zoom_level(zoom):
+    return min(max(int(round(zoom)), ZOOM_LEVELS[0]), ZOOM_LEVELS[-1])
+
+
+# ===============================
+# Douglas–Peucker (경계 공유 유지)
+# ===============================
+
+def _douglas_peucker(points, tolerance):
+    """평면 좌표 (n, 2) 배열에서 남길 점의 bool mask"""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        seg = points[end] - points[start]
+        rel = points[start + 1:end] - points[start]
+        seg_len = math.hypot(seg[0], seg[1])
+        if seg_len == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+
+    return keep
+
+
+def _simplify_ring(ring, owners, tolerance_m, digits):
+    """
+    링 하나를 단순화. 이웃 구와 공유하는 경계는 양쪽이 같은 결과가 나오도록
+    소유 링 집합이 바뀌는 꼭짓점을 고정하고, 구간마다 정해진 방향으로 단순화한다.
+    """
+    pts = np.asarray(ring, dtype=float)
+    if len(pts) > 1 and np.array_equal(pts[0], pts[-1]):
+        pts = pts[:-1]
+    n = len(pts)
+    if n < 3:
+        return None
+
+    keys = [owners[tuple(c)] for c in pts.tolist()]
+    fixed = {
+        i for i in range(n)
+        if keys[i] != keys[i - 1] or keys[i] != keys[(i + 1) % n]
+    }
+    if len(fixed) < 2:
+        first = min(range(n), key=lambda i: (pts[i, 0], pts[i, 1]))
+        far = int(np.argmax(np.hypot(*(pts - pts[first]).T)))
+        fixed |= {first, far}
+    fixed = sorted(fixed)
+
+    x, y = project(pts[:, 1], pts[:, 0])
+    xy = np.column_stack([x, y])
+
+    keep = np.zeros(n, dtype=bool)
+    keep[fixed] = True
+    for a, b in zip(fixed, fixed[1:] + [fixed[0] + n]):
+        idx = np.arange(a, b + 1) % n
+        reverse = tuple(pts[idx[0]]) > tuple(pts[idx[-1]])
+        chunk = xy[idx[::-1]] if reverse else xy[idx]
+        mask = _douglas_peucker(chunk, tolerance_m)
+        keep[idx[mask[::-1] if reverse else mask]] = True
+
+    out = np.round(pts[keep], digits)
+    changed = np.any(out != np.roll(out, 1, axis=0), axis=1)
+    out = out[changed] if changed.any() else out[:1]
+    if len(out) < 3:
+        return None
+
+    coords = out.tolist()
+    return coords + [coords[0]]
+
+
+def simplify_geojson(geojson, tolerance_m, digits):
+    """구 경계 GeoJSON 전체를 단순화 + 양자화한 새 GeoJSON dict 반환"""
+    polygons = []  # (feature 번호, [링 좌표, ...])
+    for fi, feature in enumerate(geojson["features"]):
+        geom = feature["geometry"]
+        parts = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+        for rings in parts:
+            polygons.append((fi, rings))
+
+    # 꼭짓점 좌표 → 해당 꼭짓점을 가진 링 번호 집합
+    owners = defaultdict(set)
+    ring_no = 0
+    for _, rings in polygons:
+        for ring in rings:
+            for c in ring:
+                owners[tuple(c)].add(ring_no)
+            ring_no += 1
+    owners = {c: frozenset(s) for c, s in owners.items()}
+
+    parts_by_feature = defaultdict(list)
+    for fi, rings in polygons:
+        new_rings = []
+        for ri, ring in enumerate(rings):
+            simple = _simplify_ring(ring, owners, tolerance_m, digits)
+            if simple is None and ri == 0:
+                # 외곽 링이 사라지면 단순화 없이 양자화만 적용
+                simple = np.round(np.asarray(ring, dtype=float), digits).tolist()
+            if simple is not None:
+                new_rings.append(simple)
+        parts_by_feature[fi].append(new_rings)
+
+    features = []
+    for fi, feature in enumerate(geojson["features"]):
+        parts = parts_by_feature[fi]
+        if len(parts) == 1:
+            geometry = {"type": "Polygon", "coordinates": parts[0]}
+        else:
+            geometry = {"type": "MultiPolygon", "coordinates": parts}
+        properties = {
+            k: v for k, v in feature["properties"].items() if k in KEEP_PROPERTIES
+        }
+        features.append({"type": "Feature", "properties": properties, "geometry": geometry})
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+# ===============================
+# polygon 유틸
+# ===============================
+
+def geometry_polygons(geometry):
+    """GeoJSON Polygon / MultiPolygon → [[외곽 ring, 구멍 ring, ...], ...] (ring은 (N, 2) 배열)"""
+    coords = geometry["coordinates"]
+    if geometry["type"] == "Polygon":
+        coords = [coords]
+    return [[np.asarray(ring, dtype=float) for ring in polygon] for polygon in coords]
+
+
+def rasterize_polygons(polygons, lon0, lat0, dlon, dlat, nx, ny):
+    """
+    격자 칸 중심이 polygon 안에 있는지 (ny, nx) bool 배열 - even-odd 규칙, 스캔라인 방식.
+    칸 (i, j)의 중심 = (lat0 + (i + 0.5) * dlat, lon0 + (j + 0.5) * dlon), i = 0이 남쪽 행.
+    변마다 걸치는 행과의 교차점만 구하므로 칸 수가 아니라 (변 수 × 걸치는 행 수)에 비례한다.
+    """
+    rings = [ring for polygon in polygons for ring in polygon]
+    x1 = np.concatenate([r[:-1, 0] for r in rings])
+    y1 = np.concatenate([r[:-1, 1] for r in rings])
+    x2 = np.concatenate([r[1:, 0] for r in rings])
+    y2 = np.concatenate([r[1:, 1] for r in rings])
+
+    # 변이 걸치는 행: min(y1, y2) <= 행 중심 < max(y1, y2)
+    row_lo = np.clip(np.ceil((np.minimum(y1, y2) - lat0) / dlat - 0.5), 0, ny).astype(np.int64)
+    row_hi = np.clip(np.ceil((np.maximum(y1, y2) - lat0) / dlat - 0.5), 0, ny).astype(np.int64)
+    spans = np.maximum(row_hi - row_lo, 0)
+    total = int(spans.sum())
+
+    edge = np.repeat(np.arange(len(x1)), spans)
+    row = np.repeat(row_lo - (np.cumsum(spans) - spans), spans) + np.arange(total)
+    py = lat0 + (row + 0.5) * dlat
+    x_at = x1[edge] + (py - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+
+    # 교차점 왼쪽 칸(중심 < 교차점)마다 교차 횟수 +1 → 홀수면 안쪽
+    col = np.clip(np.ceil((x_at - lon0) / dlon - 0.5), 0, nx).astype(np.int64)
+    marks = np.zeros((ny, nx + 1), dtype=np.int64)
+    np.add.at(marks, (row, 0), 1)
+    np.add.at(marks, (row, col), -1)
+    return (np.cumsum(marks, axis=1)[:, :nx] % 2) == 1
+
+
+# ===============================
+# 디스크 캐시 + 줌별 로드
+# ===============================
+
+def build_district_geojson(zoom, src_path=GEOJSON_PATH):
+    """줌 레벨용 단순화 경계를 만들어 디스크에 저장 (이미 있으면 읽기만)"""
+    level = pick_zoom_level(zoom)
+    out_path = os.path.join(
+        cache_dir(), f"seoul_gu.{file_hash(src_path)}.z{level}.geojson"
+    )
+    if os.path.exists(out_path):
+        record_cache("geometry.districts", "disk")
+        with open(out_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    record_cache("geometry.districts", "miss")
+    with open(src_path, encoding="utf-8") as f:
+        source = json.load(f)
+
+    tolerance = tolerance_for_zoom(level)
+    simplified = simplify_geojson(source, tolerance, digits_for_tolerance(tolerance))
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(simplified, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, out_path)
+
+    return simplified
+
+
+@st.cache_resource(show_spinner=False)
+def _load_level(level):
+    return build_district_geojson(level)
+
+
+@cache_lookup("geometry.districts")
+def load_district_geojson(zoom=11):
+    """지도 줌에 맞게 단순화된 서울 구 경계 (세션 간 공유, 읽기 전용)"""
+    return _load_level(pick_zoom_level(zoom))
+
+
+if __name__ == "__main__":
+    # python -m core.geometry : 모든 줌 레벨 미리 생성
+    src_size = os.path.getsize(GEOJSON_PATH)
+    for level in ZOOM_LEVELS:
+        geo = build_district_geojson(level)
+        size = len(json.dumps(geo, ensure_ascii=False, separators=(",", ":")).encode())
+        print(f"z{level}: {size / 1024:.1f} KB ({src_size / size:.1f}x 감소)")
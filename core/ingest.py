@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.ap_data import (
+    CATEGORY_COLUMNS, cast_columns, data_version, file_hash, normalize_ap_id,
+    publish_snapshot, read_manifest, read_snapshot, set_current_version, snapshot_metadata,
+)
+from core.features import (
+    CLUSTER_FEATURES, DENSITY_RADIUS_M, RAW_COLUMNS, age_norm, assign_clusters, cluster_state,
+    density_norm, neighbor_counts, neighbor_stats, score_ranges, usage_norm, usage_norm_log,
+)
+from core.spatial import GridIndex
+
+# ===============================
+# AP 변경분(delta) 증분 반영
+# ===============================
+# delta 파일(CSV/Parquet): RAW_COLUMNS + op 컬럼
+#   op = upsert (기본값, 신규/변경) | delete (삭제, ap_id만 있으면 됨)
+#
+#   python -m core.ingest apply 변경분.csv
+#   python -m core.ingest list
+#   python -m core.ingest rollback <버전>
+#
+# 바뀐 행과 반경 안 이웃 AP의 점수만 다시 계산하고 새 버전 스냅샷을 만든다.
+# 각 페이지 캐시는 스냅샷 버전을 키로 쓰므로 새 버전이 지정되면 다음 실행부터
+# 자동으로 새 데이터를 읽는다.
+#
+# 정규화 기준값(연도 / 로그 이용량 범위, 구별 평균 이용량과 배율 상한)과 군집 중심은
+# 기준 스냅샷(feature_state의 base 버전) 값으로 고정한다. 그래서 바뀌지 않은 AP의 점수는
+# 그대로이고, 범위를 벗어난 새 값은 0~1로 자른다.
+# 기준값을 새로 잡으려면 python -m core.features 로 전체를 다시 계산한다.
+
+OP_COLUMN = "op"
+UPSERT, DELETE = "upsert", "delete"
+
+# 스냅샷에만 저장하는 내부 컬럼 (이웃 AP 수, 밀집도 증분 계산용)
+NEIGHBOR_COLUMN = "neighbor_count"
+
+
+def read_delta(path):
+    """delta 파일을 읽어 ap_id 정규화 + op 검증 (같은 ap_id는 마지막 행만 사용)"""
+    if path.endswith(".parquet"):
+        delta = pd.read_parquet(path)
+    else:
+        delta = pd.read_csv(path)
+
+    if OP_COLUMN not in delta.columns:
+        delta[OP_COLUMN] = UPSERT
+    delta[OP_COLUMN] = delta[OP_COLUMN].fillna(UPSERT).str.strip().str.lower()
+    unknown = set(delta[OP_COLUMN]) - {UPSERT, DELETE}
+    if unknown:
+        raise ValueError(f"알 수 없는 op 값: {sorted(unknown)}")
+
+    delta["ap_id"] = normalize_ap_id(delta["ap_id"])
+    delta = delta.drop_duplicates("ap_id", keep="last")
+
+    upserts = delta[delta[OP_COLUMN] == UPSERT]
+    missing = [c for c in RAW_COLUMNS if c not in delta.columns]
+    if len(upserts) and missing:
+        raise ValueError(f"upsert 행에 필요한 컬럼이 없음: {missing}")
+    if len(upserts) and upserts[RAW_COLUMNS].isna().any().any():
+        raise ValueError("upsert 행에 빈 값이 있음")
+
+    # 삭제만 있는 delta(ap_id, op)도 같은 컬럼으로 맞춤
+    return delta.reindex(columns=RAW_COLUMNS + [OP_COLUMN]).reset_index(drop=True)
+
+
+def feature_state(df, base=None):
+    """스냅샷 metadata에 없을 때(기준 스냅샷) 현재 점수에서 상태 복원 (base: 기준 버전)"""
+    state = score_ranges(df)
+    state.update(cluster_state(df))
+    state["base"] = base
+    return state
+
+
+def _near(points_lat, points_lon, lat, lon, radius_m):
+    """(lat, lon) 각 행이 points 중 하나로부터 radius_m 안에 있는지 bool 배열"""
+    if len(points_lat) == 0:
+        return np.zeros(len(lat), dtype=bool)
+    index = GridIndex(points_lat, points_lon, cell_m=max(radius_m, 50.0))
+    return index.count_within(lat, lon, radius_m) > 0
+
+
+def apply_delta_frame(df, delta, state):
+    """
+    스냅샷 DataFrame(df, NEIGHBOR_COLUMN 포함)에 delta를 반영한 새 DataFrame과 변경 요약 반환.
+    state는 기준 스냅샷의 정규화 기준값/군집 중심 (바꾸지 않음)
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(object)
+
+    row_of = pd.Index(df["ap_id"])
+    deletes = delta.loc[delta[OP_COLUMN] == DELETE, "ap_id"]
+    upserts = delta[delta[OP_COLUMN] == UPSERT]
+
+    # 위치가 바뀌거나 사라지는 AP의 이전 좌표/구 (주변 밀집도 갱신 대상)
+    old_pos = row_of.get_indexer(pd.concat([deletes, upserts["ap_id"]]))
+    old_pos = old_pos[old_pos >= 0]
+    old_lat = df["lat"].to_numpy()[old_pos]
+    old_lon = df["lon"].to_numpy()[old_pos]
+    touched_gu = set(df["gu"].to_numpy()[old_pos]) | set(upserts["gu"].dropna())
+
+    # 변경: 제자리 덮어쓰기 / 신규: 끝에 추가 / 삭제: 제거 (나머지 행 순서 유지)
+    pos = row_of.get_indexer(upserts["ap_id"])
+    changed = upserts[pos >= 0]
+    added = upserts[pos < 0]
+    for col in RAW_COLUMNS:
+        df.loc[pos[pos >= 0], col] = changed[col].to_numpy()
+    dirty = np.zeros(len(df), dtype=bool)
+    dirty[pos[pos >= 0]] = True
+
+    df = pd.concat([df, added[RAW_COLUMNS]], ignore_index=True)
+    dirty = np.concatenate([dirty, np.ones(len(added), dtype=bool)])
+
+    keep = ~df["ap_id"].isin(deletes).to_numpy()
+    df = df[keep].reset_index(drop=True)
+    dirty = dirty[keep]
+
+    lat = df["lat"].to_numpy(dtype=float)
+    lon = df["lon"].to_numpy(dtype=float)
+
+    # 연도 / 이용량 점수: 바뀐 행만, 기준 스냅샷 기준값으로
+    year = df.loc[dirty, "install_year"]
+    usage = df.loc[dirty, "usage_gb"]
+    df.loc[dirty, "age_norm"] = np.clip(age_norm(year, state["year_range"]), 0.0, 1.0)
+    df.loc[dirty, "usage_norm_log"] = np.clip(usage_norm_log(usage, state["log_usage_range"]), 0.0, 1.0)
+    df.loc[dirty, "usage_norm"] = usage_norm(usage, df.loc[dirty, "gu"], state["usage"])
+
+    # 밀집도: 바뀐 행 + 이전/새 위치 반경 안에 있는 이웃만 다시 셈
+    moved_lat = np.concatenate([old_lat, lat[dirty]])
+    moved_lon = np.concatenate([old_lon, lon[dirty]])
+    recount = dirty | _near(moved_lat, moved_lon, lat, lon, DENSITY_RADIUS_M)
+    if recount.any():
+        index = GridIndex(lat, lon, cell_m=max(DENSITY_RADIUS_M, 50.0))
+        counts, nearest = neighbor_stats(lat, lon, index=index, rows=np.flatnonzero(recount))
+        df.loc[recount, NEIGHBOR_COLUMN] = counts
+        df.loc[recount, "density_norm"] = density_norm(nearest, counts)
+
+    # 군집: 점수가 바뀐 행만 기존 중심에 다시 배정
+    reassign = recount | dirty
+    if reassign.any():
+        labels, ranks = assign_clusters(df.loc[reassign, CLUSTER_FEATURES].to_numpy(), state)
+        df.loc[reassign, "cluster_k3"] = labels
+        df.loc[reassign, "cluster_k3_rank"] = ranks
+
+    df[NEIGHBOR_COLUMN] = df[NEIGHBOR_COLUMN].astype(np.int32)
+    cast_columns(df)
+
+    summary = {
+        "added": int(len(added)),
+        "changed": int(len(changed)),
+        "deleted": int((~keep).sum()),
+        "districts": sorted(str(g) for g in touched_gu),
+        "density_recounted": int(recount.sum()),
+        "reclustered": int(reassign.sum()),
+        "feature_base": state.get("base"),
+    }
+    return df, summary
+
+
+def apply_delta(path, note=None):
+    """현재 스냅샷에 delta 파일을 반영해 새 버전으로 지정. (새 버전, 변경 요약) 반환"""
+    parent = data_version()
+    version = hashlib.sha1(f"{parent}:{file_hash(path)}".encode()).hexdigest()[:12]
+    if any(v["version"] == version for v in read_manifest()["versions"]):
+        # 같은 버전에 같은 delta를 다시 넣은 경우: 이미 만든 스냅샷 사용
+        set_current_version(version)
+        return version, None
+
+    delta = read_delta(path)
+    df = read_snapshot(parent)
+    state = snapshot_metadata(parent).get("feature_state")
+    # 기준 스냅샷이거나 이용량 기준값(usage)이 없는 이전 형식이면 현재 점수에서 복원
+    if state is None or "usage" not in state:
+        state = feature_state(df, base=parent)
+    if NEIGHBOR_COLUMN not in df.columns:
+        df[NEIGHBOR_COLUMN] = neighbor_counts(df["lat"].to_numpy(), df["lon"].to_numpy()).astype(np.int32)
+
+    df, summary = apply_delta_frame(df, delta, state)
+    publish_snapshot(
+        df, version, parent,
+        note=note or os.path.basename(path),
+        metadata={"feature_state": state, "delta": summary},
+    )
+    return version, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AP 변경분 증분 반영 / 스냅샷 버전 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+    apply_cmd = sub.add_parser("apply", help="delta 파일 반영")
+    apply_cmd.add_argument("delta", help="변경분 CSV 또는 Parquet")
+    apply_cmd.add_argument("--note", help="버전 설명")
+    sub.add_parser("list", help="스냅샷 버전 목록")
+    rollback_cmd = sub.add_parser("rollback", help="이전 버전으로 되돌리기")
+    rollback_cmd.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "apply":
+        start = time.perf_counter()
+        version, summary = apply_delta(args.delta, args.note)
+        elapsed = time.perf_counter() - start
+        if summary is None:
+            print(f"이미 반영된 변경분입니다 (버전 {version})")
+            return
+        print(f"새 스냅샷 {version}: {elapsed:.2f}초")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+
+    elif args.command == "list":
+        data_version()
+        manifest = read_manifest()
+        for v in manifest["versions"]:
+            mark = "*" if v["version"] == manifest["current"] else " "
+            print(f"{mark} {v['version']}  {v['created']}  {v['rows']:>7,}행  {v['note']}")
+
+    elif args.command == "rollback":
+        set_current_version(args.version)
+        print(f"현재 버전: {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from importlib.metadata import PackageNotFoundError, version
+
+import folium
+import streamlit as st
+from streamlit_folium import st_folium
+
+from core.ap_data import cache_dir, data_version
+from core.profiling import current_run, record_cache, record_payload, span
+
+# ===============================
+# 렌더링된 지도 캐시 설정
+# ===============================
+# 키: (데이터 버전, 지도 종류, 파라미터) → 값: 렌더링된 HTML 또는 st_folium 인자
+# 메모리 LRU(바이트 예산) → 디스크(gzip, 프로세스 재시작 후에도 유지) 순으로 찾는다.
+
+MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+DISK_BUDGET_BYTES = 256 * 1024 * 1024
+
+# WIFIGHTING_MAP_DISK_CACHE=0 이면 디스크 캐시를 쓰지 않음
+DISK_CACHE_ENABLED = os.environ.get("WIFIGHTING_MAP_DISK_CACHE", "1") != "0"
+MAP_CACHE_DIR_NAME = "maps"
+
+# st_folium 렌더링 결과 캐시는 streamlit_folium 내부 함수를 직접 부른다.
+# 확인한 버전이 아니거나 함수가 없으면(또는 WIFIGHTING_FOLIUM_PRIVATE_API=0)
+# 공개 st_folium으로 매번 렌더링한다.
+STREAMLIT_FOLIUM_TESTED = ("0.20.",)
+
+try:
+    from streamlit_folium import (
+        _component_func, _get_feature_group_string, _get_map_string, _get_siblings,
+        generate_js_hash, get_full_id,
+    )
+    FOLIUM_PRIVATE_API = version("streamlit-folium").startswith(STREAMLIT_FOLIUM_TESTED)
+except (ImportError, PackageNotFoundError):
+    FOLIUM_PRIVATE_API = False
+FOLIUM_PRIVATE_API = FOLIUM_PRIVATE_API and os.environ.get("WIFIGHTING_FOLIUM_PRIVATE_API", "1") != "0"
+
+
+def _key_digest(key):
+    text = json.dumps(key, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:20]
+
+
+class MapCache:
+    """
+    바이트 예산을 넘으면 가장 오래 안 쓴 항목부터 버리는 LRU 캐시.
+    disk_dir를 주면 메모리에서 밀려난 항목도 디스크에서 다시 읽는다.
+    같은 키를 여러 세션이 동시에 요청하면 한 번만 만든다.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BUDGET_BYTES, disk_dir=None,
+                 disk_max_bytes=DISK_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()   # digest → (값, 바이트)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building = {}             # digest → 만드는 중인 Lock
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    # -------------------------------
+    # 메모리 계층
+    # -------------------------------
+
+    def _get_memory(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def _put_memory(self, digest, value, size):
+        with self._lock:
+            if digest in self._entries:
+                self._bytes -= self._entries.pop(digest)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[digest] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.stats["evictions"] += 1
+
+    # -------------------------------
+    # 디스크 계층
+    # -------------------------------
+
+    def _disk_path(self, digest, version):
+        return os.path.join(self.disk_dir, f"{version}-{digest}.json.gz")
+
+    def _get_disk(self, digest, version):
+        if not self.disk_dir:
+            return None
+        try:
+            with gzip.open(self._disk_path(digest, version), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _put_disk(self, digest, version, encoded):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(digest, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wb", compresslevel=5) as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        """디스크 예산을 넘으면 오래된 파일부터 삭제"""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".json.gz"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # -------------------------------
+    # 조회
+    # -------------------------------
+
+    def get_or_build(self, key, build):
+        """
+        key: (데이터 버전, 지도 종류, 파라미터) - JSON으로 바꿀 수 있는 값
+        build: 캐시에 없을 때 호출, str 또는 JSON으로 바꿀 수 있는 dict 반환
+        """
+        version = key[0]
+        digest = _key_digest(key)
+
+        value = self._get_memory(digest)
+        if value is not None:
+            self._count("hits")
+            record_cache("map_cache", "hit")
+            return value
+
+        with self._lock:
+            building = self._building.setdefault(digest, threading.Lock())
+
+        try:
+            with building:
+                # 기다리는 동안 다른 세션이 만들었으면 그대로 사용
+                value = self._get_memory(digest)
+                if value is not None:
+                    self._count("hits")
+                    record_cache("map_cache", "hit")
+                    return value
+
+                value = self._get_disk(digest, version)
+                if value is not None:
+                    self._count("disk_hits")
+                    record_cache("map_cache", "disk")
+                    encoded = None
+                else:
+                    self._count("misses")
+                    record_cache("map_cache", "miss")
+                    value = build()
+                    encoded = json.dumps(value, ensure_ascii=False).encode()
+
+                size = len(encoded) if encoded is not None else len(json.dumps(value, ensure_ascii=False))
+                self._put_memory(digest, value, size)
+                if encoded is not None:
+                    self._put_disk(digest, version, encoded)
+        finally:
+            # build()가 실패해도 다음 요청이 다시 만들 수 있도록 항상 정리
+            with self._lock:
+                self._building.pop(digest, None)
+        return value
+
+
+# ===============================
+# 공유 캐시 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False)
+def get_map_cache():
+    disk_dir = os.path.join(cache_dir(), MAP_CACHE_DIR_NAME) if DISK_CACHE_ENABLED else None
+    return MapCache(disk_dir=disk_dir)
+
+
+def _build_map(build):
+    with span("folium.build"):
+        return build()
+
+
+def cached_map_html(kind, params, build):
+    """
+    build()가 만든 folium 지도를 렌더링한 HTML (components.html용).
+    params: 지도를 결정하는 값 dict (데이터 버전은 자동으로 키에 포함)
+    """
+    def render():
+        m = _build_map(build)
+        with span("folium.render"):
+            return m.get_root().render()
+
+    with span(f"map.{kind}"):
+        html = get_map_cache().get_or_build((data_version(), kind, params), render)
+    record_payload(f"map.{kind}", html)
+    return html
+
+
+def _folium_payload(m):
+    """st_folium이 매번 하는 렌더링 결과 (streamlit_folium 0.20 기준)"""
+    m.render()
+    css_links, js_links = [], []
+
+    def walk(element):
+        if isinstance(element, folium.elements.JSCSSMixin):
+            yield element
+        for child in getattr(element, "_children", {}).values():
+            yield from walk(child)
+
+    for element in walk(m):
+        css_links.extend(href for _, href in element.default_css)
+        js_links.extend(src for _, src in element.default_js)
+
+    try:
+        (s, w), (n, e) = m.get_bounds()
+    except AttributeError:
+        s = w = n = e = None
+
+    return {
+        "script": _get_map_string(m),
+        "html": _get_siblings(m),
+        "id": get_full_id(m),
+        "css_links": css_links,
+        "js_links": js_links,
+        "bounds": {"_southWest": {"lat": s, "lng": w}, "_northEast": {"lat": n, "lng": e}},
+        "zoom": m.options.get("zoom"),
+        "center": m.location,
+    }
+
+
+def cached_folium_payload(kind, params, build):
+    """build()가 만든 folium 지도의 st_folium 렌더링 결과 (데이터 버전, kind, params로 캐시)"""
+    def render():
+        m = _build_map(build)
+        with span("folium.render"):
+            return _folium_payload(m)
+
+    with span(f"map.{kind}"):
+        payload = get_map_cache().get_or_build((data_version(), kind, params), render)
+    record_payload(f"map.{kind}", payload["script"])
+    record_payload(f"map.{kind}", payload["html"])
+    return payload
+
+
+def folium_component(payload, key, height=700, width=500, returned_objects=None,
+                     feature_group=None, center=None):
+    """
+    렌더링 결과로 st_folium 컴포넌트를 그림.
+    feature_group: 지도를 다시 만들지 않고 바꿔 끼울 레이어 JS, center: 값이 바뀔 때만 옮길 지도 중심
+    """
+    defaults = {
+        "last_clicked": None,
+        "last_object_clicked": None,
+        "last_object_clicked_tooltip": None,
+        "last_object_clicked_popup": None,
+        "all_drawings": None,
+        "last_active_drawing": None,
+        "bounds": payload["bounds"],
+        "zoom": payload["zoom"],
+        "last_circle_radius": None,
+        "last_circle_polygon": None,
+    }
+    if returned_objects is not None:
+        defaults = {k: v for k, v in defaults.items() if k in returned_objects}
+
+    with span("st_folium.component"):
+        return _component_func(
+            script=payload["script"],
+            html=payload["html"],
+            id=payload["id"],
+            key=key,
+            height=height,
+            width=width,
+            returned_objects=returned_objects,
+            default=defaults,
+            zoom=None,
+            center=center,
+            feature_group=feature_group,
+            return_on_hover=False,
+            layer_control=None,
+            pixelated=False,
+            css_links=payload["css_links"],
+            js_links=payload["js_links"],
+        )
+
+
+def st_folium_cached(kind, params, build, key=None, height=700, width=500,
+                     returned_objects=None):
+    """
+    st_folium과 같은 지도 컴포넌트를 그리되, 지도 렌더링 결과를
+    (데이터 버전, kind, params) 키로 캐시해서 다시 쓴다. 반환값은 st_folium과 같다.
+    """
+    if not FOLIUM_PRIVATE_API:
+        m = _build_map(build)
+        with span(f"st_folium.{kind}"):
+            return st_folium(m, key=key, height=height, width=width,
+                             returned_objects=returned_objects)
+
+    payload = cached_folium_payload(kind, params, build)
+    return folium_component(
+        payload, generate_js_hash(payload["script"], key, False),
+        height=height, width=width, returned_objects=returned_objects,
+    )
+
+
+def st_folium_profiled(kind, m, **kwargs):
+    """
+    캐시하지 않는 지도용 st_folium. 측정이 켜져 있으면 전송할 지도 스크립트 크기도 기록
+    (크기를 재려고 한 번 더 렌더링하므로 측정 중에만)
+    """
+    if current_run() is not None and FOLIUM_PRIVATE_API:
+        m.render()
+        record_payload(f"map.{kind}", _get_map_string(m))
+        record_payload(f"map.{kind}", _get_siblings(m))
+    with span(f"st_folium.{kind}"):
+        return st_folium(m, **kwargs)
@@ -0,0 +1,104 @@
+import numpy as np
+
+from core.profiling import timed
+from core.spatial import EARTH_RADIUS_M, GridIndex
+
+# ===============================
+# 겹치는 마커 펼치기 (같은/거의 같은 좌표의 AP를 주변에 배치)
+# ===============================
+
+# 이 거리(m) 안의 점은 같은 위치로 봄 (가까운 점을 따라 이어진 점은 모두 한 그룹)
+TOLERANCE_M = 1.0
+
+# 묶는 방식이 바뀌면 올림 (미리 계산한 구별 묶음 캐시 폴더 이름에 들어감)
+LAYOUT_VERSION = 2
+
+# 펼친 마커 사이 간격(m) - 기존 0.0001도(약 11m) 원형 배치와 같은 크기
+SPACING_M = 11.0
+
+# 이 개수까지는 원 하나에 고르게, 더 많으면 해바라기(황금각) 나선으로 배치
+RING_CAPACITY = 8
+
+_GOLDEN_ANGLE = np.pi * (3.0 - np.sqrt(5.0))
+
+# 나선 반지름 = spacing × 0.65 × √(순서 + 0.5) 일 때 가장 가까운 이웃 간격 ≈ spacing
+_SPIRAL_SCALE = 0.65
+
+
+def _connected_labels(n, a, b):
+    """점 n개와 연결 쌍 (a[i], b[i]) → 연결 요소마다 가장 작은 점 번호 (배열 union-find)"""
+    parent = np.arange(n)
+    while True:
+        # 각 쌍의 두 대표 중 큰 쪽을 작은 쪽에 붙임
+        ra, rb = parent[a], parent[b]
+        merge = ra != rb
+        if not merge.any():
+            return parent
+        np.minimum.at(parent, np.maximum(ra, rb)[merge], np.minimum(ra, rb)[merge])
+        # 경로 압축: 모든 점이 대표를 바로 가리킬 때까지
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+def coincident_groups(lat, lon, tolerance_m=TOLERANCE_M):
+    """
+    서로 tolerance_m 안에 있는 점끼리(이어진 점 포함) 묶음.
+    반환: (그룹 번호, 그룹 크기, 그룹 안 순서) 배열 - 그룹 안 순서는 입력 순서를 따른다.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # 칸 크기를 반경의 2배로 두면 주변 3×3 칸만 봄
+    grid = GridIndex(lat, lon, cell_m=2 * tolerance_m)
+    a, b, _ = grid.pairs_within(lat, lon, tolerance_m)
+    labels = _connected_labels(len(lat), a, b)
+    _, group, size = np.unique(labels, return_inverse=True, return_counts=True)
+
+    # 그룹별로 정렬한 뒤 (위치 - 그룹 시작 위치) = 그룹 안 순서
+    order = np.argsort(group, kind="stable")
+    starts = np.cumsum(size) - size
+    rank = np.empty(len(group), dtype=np.int64)
+    rank[order] = np.arange(len(group)) - starts[group[order]]
+
+    return group, size[group], rank
+
+
+def fan_out_offsets(size, rank, spacing_m=SPACING_M, ring_capacity=RING_CAPACITY):
+    """그룹 크기/순서 → 펼칠 평면 오프셋(m) (dx 동쪽, dy 북쪽). 혼자인 점은 (0, 0)"""
+    size = np.asarray(size)
+    rank = np.asarray(rank, dtype=float)
+
+    # 작은 그룹: 반지름 spacing_m 원 위에 등간격
+    angle = 2 * np.pi * rank / np.maximum(size, 1)
+    radius = np.full(len(size), float(spacing_m))
+
+    # 큰 그룹: 해바라기 나선 (이웃 간격이 대략 spacing_m로 일정)
+    spiral = size > ring_capacity
+    angle[spiral] = rank[spiral] * _GOLDEN_ANGLE
+    radius[spiral] = spacing_m * _SPIRAL_SCALE * np.sqrt(rank[spiral] + 0.5)
+
+    radius[size <= 1] = 0.0
+    return radius * np.sin(angle), radius * np.cos(angle)
+
+
+@timed("marker_layout.fan_out")
+def fan_out(lat, lon, tolerance_m=TOLERANCE_M, spacing_m=SPACING_M,
+            ring_capacity=RING_CAPACITY):
+    """
+    겹치는 점을 원/나선으로 펼친 (표시용 위도, 표시용 경도, 그룹 크기) 배열 반환.
+    원래 좌표는 바꾸지 않으므로 팝업 등에는 원래 lat/lon을 그대로 쓰면 된다.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    _, size, rank = coincident_groups(lat, lon, tolerance_m)
+    dx, dy = fan_out_offsets(size, rank, spacing_m, ring_capacity)
+
+    plot_lat = lat + np.degrees(dy / EARTH_RADIUS_M)
+    plot_lon = lon + np.degrees(dx / (EARTH_RADIUS_M * np.cos(np.radians(lat))))
+    return plot_lat, plot_lon, size
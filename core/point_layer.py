@@ -0,0 +1,178 @@
+import json
+import re
+
+import pandas as pd
+from branca.element import MacroElement
+from folium import Icon
+from folium.utilities import camelize
+from jinja2 import Template
+
+from core.profiling import span
+
+# ===============================
+# 컬럼형 포인트 레이어 (마커별 JS 대신 배열 하나 + canvas 렌더링)
+# ===============================
+
+# 템플릿 자리표시자: {컬럼} 또는 {컬럼:.2f}
+_FIELD_PATTERN = re.compile(r"\{(\w+)(?::\.(\d+)f)?\}")
+
+COORD_DECIMALS = 6
+
+
+class PointLayer(MacroElement):
+    """
+    점 좌표/스타일 번호/툴팁·팝업에 쓰는 컬럼만 배열로 내려보내고
+    브라우저에서 canvas CircleMarker로 그리는 레이어.
+    툴팁/팝업은 처음 올리거나 클릭할 때 만들어서 st_folium 클릭 값
+    (last_object_clicked_popup)도 기존 folium 팝업과 똑같이 넘어간다.
+    click_zoom을 주면 클릭한 점을 중심으로 그만큼(숫자) 또는 그 컬럼의 줌까지(컬럼 이름) 확대한다 (묶음 마커용).
+    icon을 주면 CircleMarker 대신 모든 점이 같은 아이콘 하나를 공유하는 folium.Icon 모양 마커로 그린다
+    (화면에 보이는 적은 수의 AP를 유형별 아이콘으로 보여줄 때).
+    부모가 MarkerCluster면 addLayers로 한 번에 추가한다.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function () {
+            var data = {{ this.payload }};
+            var renderer = L.canvas({padding: 0.5});
+
+            function field(name, i) {
+                var col = data.columns[name];
+                return col.dict ? col.dict[col.codes[i]] : col.values[i];
+            }
+            function format(template, i) {
+                return template.replace(/\\{(\\w+)(?::\\.(\\d+)f)?\\}/g, function (_, name, digits) {
+                    var v = field(name, i);
+                    return digits === undefined ? v : Number(v).toFixed(Number(digits));
+                });
+            }
+            function onClick() {
+                if (!this.getPopup()) {
+                    var el = document.createElement("div");
+                    el.innerHTML = format(data.popup, this.options.pointIndex);
+                    this.bindPopup(el).openPopup();
+                }
+            }
+            function onZoomClick() {
+                var map = this._map;
+                var zoom = typeof data.click_zoom === "string"
+                    ? field(data.click_zoom, this.options.pointIndex)
+                    : map.getZoom() + data.click_zoom;
+                map.setView(this.getLatLng(), Math.min(zoom, map.getMaxZoom()));
+            }
+            function onHover() {
+                if (!this.getTooltip()) {
+                    this.bindTooltip(format(data.tooltip, this.options.pointIndex)).openTooltip();
+                }
+            }
+
+            var icon = data.icon ? L.AwesomeMarkers.icon(data.icon) : null;
+            var markers = new Array(data.lat.length);
+            for (var i = 0; i < markers.length; i++) {
+                var marker;
+                if (icon) {
+                    marker = L.marker([data.lat[i], data.lon[i]], {icon: icon, pointIndex: i});
+                } else {
+                    var style = data.styles[data.style ? data.style[i] : 0];
+                    marker = L.circleMarker(
+                        [data.lat[i], data.lon[i]],
+                        L.extend({renderer: renderer, pointIndex: i}, style)
+                    );
+                }
+                if (data.popup) { marker.on("click", onClick); }
+                if (data.tooltip) { marker.on("mouseover", onHover); }
+                if (data.click_zoom) { marker.on("click", onZoomClick); }
+                markers[i] = marker;
+            }
+
+            var parent = {{ this._parent.get_name() }};
+            if (parent.addLayers) {
+                parent.addLayers(markers);
+                return parent;
+            }
+            return L.featureGroup(markers).addTo(parent);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, payload):
+        super().__init__()
+        self._name = "PointLayer"
+        # </script> 로 끝나지 않도록 "</" 이스케이프
+        self.payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).replace(
+            "</", "<\\/"
+        )
+
+
+def _template_fields(*templates):
+    """템플릿에 쓰인 {컬럼:.Nf} → {컬럼: 소수점 자릿수 또는 None}"""
+    fields = {}
+    for template in templates:
+        for name, digits in _FIELD_PATTERN.findall(template or ""):
+            digits = int(digits) if digits else None
+            prev = fields.get(name)
+            fields[name] = digits if prev is None else max(prev, digits or 0)
+    return fields
+
+
+def _encode_column(series, decimals):
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.round(decimals) if decimals is not None else series
+        return {"values": values.tolist()}
+
+    # 문자열은 사전(dict) + 번호 배열로 압축
+    codes, uniques = pd.factorize(series.astype(str))
+    return {"dict": uniques.tolist(), "codes": codes.tolist()}
+
+
+def _leaflet_style(style):
+    return {camelize(k): v for k, v in style.items()}
+
+
+def add_point_layer(parent, df, style, style_by=None, tooltip=None, popup=None,
+                    position=("lat", "lon"), click_zoom=None, icon=None):
+    """
+    parent: folium Map, FeatureGroup 또는 MarkerCluster
+    position: 마커를 찍을 (위도, 경도) 컬럼 (예: fan_out으로 펼친 표시용 좌표)
+    style: 기본 CircleMarker 옵션 (folium 인자 이름, 예: fill_color)
+    style_by: (컬럼, {값: 덮어쓸 옵션}) → 값별 스타일
+    tooltip / popup: "{컬럼}", "{컬럼:.2f}" 자리표시자를 쓰는 HTML 템플릿
+    click_zoom: 클릭하면 그 점으로 확대할 줌 단계 수, 또는 확대할 줌이 든 컬럼 이름
+    icon: folium.Icon 인자 dict (예: {"icon": "bus", "color": "red", "prefix": "fa"}) - 주면 style 대신 사용
+    """
+    with span("point_layer", rows=len(df)) as s:
+        payload = _point_payload(df, style, style_by, tooltip, popup, position)
+        payload["click_zoom"] = click_zoom
+        payload["icon"] = Icon(**icon).options if icon is not None else None
+        if isinstance(click_zoom, str):
+            payload["columns"][click_zoom] = _encode_column(df[click_zoom], None)
+        layer = PointLayer(payload)
+        layer.add_to(parent)
+        s.set(chars=len(layer.payload))
+    return layer
+
+
+def _point_payload(df, style, style_by, tooltip, popup, position):
+    lat_col, lon_col = position
+    payload = {
+        "lat": df[lat_col].round(COORD_DECIMALS).tolist(),
+        "lon": df[lon_col].round(COORD_DECIMALS).tolist(),
+        "styles": [_leaflet_style(style)],
+        "style": None,
+        "tooltip": tooltip,
+        "popup": popup,
+        "columns": {},
+    }
+
+    if style_by is not None:
+        column, overrides = style_by
+        keys = list(overrides)
+        payload["styles"] = [_leaflet_style({**style, **overrides[k]}) for k in keys]
+        lookup = {k: i for i, k in enumerate(keys)}
+        payload["style"] = [lookup.get(v, 0) for v in df[column].tolist()]
+
+    for name, decimals in _template_fields(tooltip, popup).items():
+        payload["columns"][name] = _encode_column(df[name], decimals)
+
+    return payload
@@ -0,0 +1,365 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+# ===============================
+# 실행(rerun)별 구간 시간 측정
+# ===============================
+# Streamlit은 위젯이 바뀔 때마다 페이지 스크립트 전체를 다시 실행한다.
+# 한 번의 실행 안에서 어느 단계(데이터 로드, 집계, folium 생성, 렌더링,
+# st_folium 전송, st.pyplot)에 시간이 드는지 기록한다.
+#
+#   with span("tour_map.folium", rows=len(df)): ...
+#   @timed("aggregates.build")
+#   record_cache("map_cache", "hit")      # hit / disk / miss
+#   @cache_lookup("aggregates.cube")      # st.cache_* 함수 적중률
+#   record_payload("point_layer", html)  # 바이트 수 또는 문자열
+#
+# 측정은 URL에 ?profile=1 을 붙이면 켜지고(세션 동안 유지) ?profile=0 으로 끈다.
+# 꺼져 있으면 span()은 공유 no-op 객체를 돌려주므로 ContextVar 조회 한 번만 든다.
+# 켜져 있으면 실행마다 사이드바에 타임라인/캐시 적중률/전송량 패널을 그리고
+# JSON Lines 파일(data/cache/profile.jsonl)에 한 줄씩 남긴다.
+# 파일이 PROFILE_LOG_MAX_BYTES를 넘으면 profile.jsonl.1로 옮기고 새 파일에 이어 쓴다 (이전 파일 1개만 보관).
+
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_SESSION_KEY = "_profile_enabled"
+PROFILE_RUNS_KEY = "_profile_runs"
+PROFILE_LOG_NAME = "profile.jsonl"
+
+# 로그 파일 하나의 최대 크기 (넘으면 .1로 교체)
+PROFILE_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# 세션에 보관할 최근 실행 수 (패널의 JSONL 내려받기용)
+MAX_SESSION_RUNS = 50
+
+# 타임라인에서 이 시간(ms)보다 짧은 구간은 표에만 표시
+MIN_TIMELINE_MS = 0.5
+
+_current_run = contextvars.ContextVar("wifighting_profile_run", default=None)
+_log_lock = threading.Lock()
+
+
+class RerunProfile:
+    """한 번의 스크립트 실행에서 모은 구간 / 캐시 조회 / 전송량 기록"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = datetime.now().isoformat(timespec="milliseconds")
+        self.total_ms = None
+        self.spans = []       # {"name", "start_ms", "ms", "depth", "attrs"}
+        self.caches = {}      # 이름 → {"hit": n, "disk": n, "miss": n}
+        self.payloads = {}    # 이름 → 바이트 (같은 이름은 합산)
+        self._t0 = time.perf_counter()
+        self._depth = 0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._t0) * 1000
+
+    def finish(self):
+        self.total_ms = self.elapsed_ms()
+
+    def to_dict(self):
+        return {
+            "page": self.page,
+            "started": self.started,
+            "total_ms": round(self.total_ms or self.elapsed_ms(), 3),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+            "caches": self.caches,
+            "payloads": self.payloads,
+        }
+
+
+class _Span:
+    __slots__ = ("run", "name", "attrs", "start", "depth")
+
+    def __init__(self, run, name, attrs):
+        self.run = run
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """구간에 값 추가 (예: 행 수, 캐시 결과)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.depth = self.run._depth
+        self.run._depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        run = self.run
+        run._depth -= 1
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        run.spans.append({
+            "name": self.name,
+            "start_ms": round((self.start - run._t0) * 1000, 3),
+            "ms": round((end - self.start) * 1000, 3),
+            "depth": self.depth,
+            "attrs": self.attrs,
+        })
+        return False
+
+
+class _NullSpan:
+    """측정이 꺼져 있을 때 쓰는 아무 일도 하지 않는 구간"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# ===============================
+# 측정 API (페이지 / core 모듈에서 사용)
+# ===============================
+
+def current_run():
+    """측정 중인 실행 (꺼져 있으면 None)"""
+    return _current_run.get()
+
+
+def span(name, **attrs):
+    """with span("이름"): ... 구간 시간 측정 (꺼져 있으면 no-op)"""
+    run = _current_run.get()
+    if run is None:
+        return _NULL_SPAN
+    return _Span(run, name, attrs)
+
+
+def timed(name=None):
+    """함수 전체를 구간으로 측정하는 데코레이터 (이름 기본값: 함수 이름)"""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _current_run.get()
+            if run is None:
+                return func(*args, **kwargs)
+            with _Span(run, label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorate
+
+
+def record_cache(name, result):
+    """캐시 조회 결과 기록. result: "hit" / "disk" / "miss" """
+    run = _current_run.get()
+    if run is None:
+        return
+    counts = run.caches.setdefault(name, {"hit": 0, "disk": 0, "miss": 0})
+    counts[result] += 1
+
+
+def cache_lookup(name):
+    """
+    캐시된 함수를 부르는 쪽에 붙이는 데코레이터: 호출 시간을 재고
+    호출 중에 record_cache(name, "miss" / "disk")가 없었으면 hit로 센다.
+    (st.cache_data / st.cache_resource 본문은 miss일 때만 실행되므로 본문에서 기록)
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _current_run.get()
+            if run is None:
+                return func(*args, **kwargs)
+            before = dict(run.caches.get(name, {}))
+            with _Span(run, name, {}) as s:
+                result = func(*args, **kwargs)
+                after = run.caches.get(name, {})
+                changed = [k for k, n in after.items() if n != before.get(k, 0)]
+                if not changed:
+                    record_cache(name, "hit")
+                s.set(cache=changed[0] if changed else "hit")
+            return result
+
+        return wrapper
+    return decorate
+
+
+def record_payload(name, data):
+    """
+    브라우저로 보내는 데이터 크기 기록. data: 바이트 수(int) / str / bytes
+    (str은 측정이 켜져 있을 때만 UTF-8 바이트 수를 센다)
+    """
+    run = _current_run.get()
+    if run is None:
+        return
+    if isinstance(data, str):
+        data = len(data.encode("utf-8"))
+    elif isinstance(data, (bytes, bytearray)):
+        data = len(data)
+    run.payloads[name] = run.payloads.get(name, 0) + int(data)
+
+
+# ===============================
+# 실행 단위 측정 (app.py에서 사용)
+# ===============================
+
+def profiling_enabled():
+    """?profile=1 / ?profile=0 으로 이 세션의 측정을 켜고 끈다"""
+    value = st.query_params.get(PROFILE_QUERY_PARAM)
+    if value is not None:
+        st.session_state[PROFILE_SESSION_KEY] = value not in ("0", "false", "off")
+    return st.session_state.get(PROFILE_SESSION_KEY, False)
+
+
+def profile_log_path():
+    # ap_data가 이 모듈을 쓰므로 순환 import를 피해 함수 안에서 가져옴
+    from core.ap_data import cache_dir
+
+    return os.environ.get("WIFIGHTING_PROFILE_LOG", os.path.join(cache_dir(), PROFILE_LOG_NAME))
+
+
+def append_jsonl(path, record, max_bytes=PROFILE_LOG_MAX_BYTES):
+    """한 줄 추가. 파일이 max_bytes를 넘었으면 먼저 path.1로 옮긴다"""
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _log_lock:
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            os.replace(path, f"{path}.1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextlib.contextmanager
+def profile_rerun(page, enabled):
+    """
+    with profile_rerun(페이지 이름, enabled): 스크립트 실행 전체를 측정.
+    페이지가 st.rerun() / st.stop()으로 끝나도 기록은 남긴다.
+    """
+    if not enabled:
+        yield None
+        return
+
+    run = RerunProfile(page)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        run.finish()
+        _current_run.reset(token)
+        _save_run(run.to_dict())
+
+
+def _save_run(record):
+    runs = st.session_state.setdefault(PROFILE_RUNS_KEY, [])
+    runs.append(record)
+    del runs[:-MAX_SESSION_RUNS]
+    try:
+        append_jsonl(profile_log_path(), record)
+    except OSError:
+        pass
+
+
+# ===============================
+# 사이드바 패널
+# ===============================
+
+def _cache_rows(caches):
+    rows = []
+    for name, counts in sorted(caches.items()):
+        total = sum(counts.values())
+        rows.append({
+            "캐시": name,
+            "hit": counts["hit"],
+            "disk": counts["disk"],
+            "miss": counts["miss"],
+            "적중률": (counts["hit"] + counts["disk"]) / total if total else None,
+        })
+    return rows
+
+
+def _sum_caches(runs):
+    total = {}
+    for run in runs:
+        for name, counts in run["caches"].items():
+            acc = total.setdefault(name, {"hit": 0, "disk": 0, "miss": 0})
+            for result, n in counts.items():
+                acc[result] += n
+    return total
+
+
+def render_profile_panel():
+    """마지막 실행의 타임라인 / 캐시 적중률 / 전송량을 사이드바에 표시"""
+    runs = st.session_state.get(PROFILE_RUNS_KEY)
+    if not runs:
+        return
+    last = runs[-1]
+
+    with st.sidebar.expander("⏱ 실행 시간 측정", expanded=True):
+        st.caption(f"{last['page']} · {last['started'][11:]}")
+        total_bytes = sum(last["payloads"].values())
+        col1, col2 = st.columns(2)
+        col1.metric("전체", f"{last['total_ms']:.0f} ms")
+        col2.metric("전송량", f"{total_bytes / 1024:,.0f} KB")
+
+        spans = pd.DataFrame(last["spans"], columns=["name", "start_ms", "ms", "depth", "attrs"])
+        if len(spans):
+            spans["end_ms"] = spans["start_ms"] + spans["ms"]
+            # 깊이만큼 들여 쓴 이름을 실행 순서대로 → 플레임 그래프처럼 보임
+            spans["label"] = [
+                f"{i:02d} " + "· " * d + n
+                for i, (d, n) in enumerate(zip(spans["depth"], spans["name"]))
+            ]
+            timeline = spans[spans["ms"] >= MIN_TIMELINE_MS]
+            chart = (
+                alt.Chart(timeline)
+                .mark_bar()
+                .encode(
+                    x=alt.X("start_ms:Q", title="ms"),
+                    x2="end_ms:Q",
+                    y=alt.Y("label:N", sort=None, title=None),
+                    color=alt.Color("depth:O", legend=None),
+                    tooltip=["name", "ms", "start_ms", "depth"],
+                )
+                .properties(height=max(120, 18 * len(timeline)))
+            )
+            st.altair_chart(chart, width="stretch")
+            st.dataframe(
+                spans.assign(attrs=spans["attrs"].map(lambda a: json.dumps(a, ensure_ascii=False)))
+                [["name", "ms", "start_ms", "depth", "attrs"]],
+                hide_index=True,
+            )
+
+        if last["caches"]:
+            st.markdown("**캐시 적중률** (이번 실행)")
+            st.dataframe(pd.DataFrame(_cache_rows(last["caches"])), hide_index=True)
+
+            st.markdown(f"**캐시 적중률** (최근 {len(runs)}회 누적)")
+            st.dataframe(pd.DataFrame(_cache_rows(_sum_caches(runs))), hide_index=True)
+
+        if last["payloads"]:
+            st.markdown("**전송량 (바이트)**")
+            st.dataframe(
+                pd.Series(last["payloads"], name="bytes").sort_values(ascending=False),
+            )
+
+        st.download_button(
+            f"JSONL 내려받기 (최근 {len(runs)}회)",
+            "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in runs),
+            file_name="wifighting_profile.jsonl",
+            mime="application/json",
+        )
+        st.caption(f"서버 기록: {profile_log_path()}")
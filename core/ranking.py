@@ -0,0 +1,349 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data
+from core.profiling import cache_lookup, record_cache, span
+from core.spatial import GridIndex, haversine_m, project
+from core.throughput import MODEL_COLUMNS, MODEL_PATH, get_throughput_model
+
+# ===============================
+# Wi-Fi 추천 순위 엔진 (점수 함수 조합 + 상위 k개)
+# ===============================
+# 종합 점수 = Σ 가중치 × 점수 함수 (점수 함수는 모두 0~1, 클수록 좋음)
+#   - AP 점수 함수 ("ap"):        AP 속성만 보는 값 (위치와 무관해서 가중치마다 한 번만 계산)
+#   - 거리 점수 함수 ("distance"): 거리(m) → 0~1, 거리가 멀수록 작아지는 함수
+# 정렬 대신 argpartition으로 상위 k개만 고르고, 여러 지점(버스정류소 등)을 한 번에 계산한다.
+#
+# 거리 점수가 있으면 지점마다 반경 r 안의 AP만 점수를 매기고
+#   r 안의 k번째 점수 ≥ (거리 점수 가중합(r) + 후보 AP 점수 최댓값)
+# 이면 r 밖의 AP는 순위에 들 수 없으므로 끝, 아니면 r을 두 배로 넓힌다 (전체를 본 것과 같은 결과).
+#
+#   python -m core.ranking bus-stops [--k 5] [--weight distance=0.5 --weight speed=0.5]
+
+TOP_K = 10
+
+# 거리 점수가 절반이 되는 거리 (m)
+DISTANCE_HALF_M = 200.0
+
+# 실내 AP는 바깥에서 잡으면 벽 감쇠가 있으므로 감점
+INDOOR_OUTDOOR_SCORES = {"실외": 1.0, "실내": 0.6}
+UNKNOWN_PLACEMENT_SCORE = 0.8
+
+# 반경 탐색: 처음 반경 안에 기대하는 AP 수 (k의 배수), 한 번에 계산할 지점 수,
+# 최대 반경 (격자 칸 수, 넘으면 후보 전체 계산), 전체 계산 때 한 번에 만드는 지점 × AP 쌍 수
+SEARCH_FACTOR = 4
+QUERY_CHUNK = 1024
+MAX_REACH_CELLS = 16
+DENSE_PAIRS = 4_000_000
+
+# 순위 엔진 격자 한 칸에 평균적으로 들어갈 AP 수 (데이터가 많을수록 칸을 작게)
+CELL_POINTS = TOP_K
+CELL_RANGE_M = (25.0, 250.0)
+
+# 가중치 조합별 AP 점수 가중합 캐시 수
+STATIC_CACHE_ENTRIES = 32
+
+SCORERS = {}
+
+
+def scorer(name, label, kind="ap"):
+    """점수 함수 등록 (kind: "ap" → f(features) / "distance" → f(거리 m 배열))"""
+    def register(fn):
+        SCORERS[name] = (label, kind, fn)
+        return fn
+    return register
+
+
+@scorer("distance", "거리 (가까울수록)", kind="distance")
+def distance_decay(distance_m):
+    return 0.5 ** (np.asarray(distance_m, dtype=float) / DISTANCE_HALF_M)
+
+
+@scorer("speed", "여유 대역 (1 - 이용량 점수)")
+def spare_capacity(features):
+    return 1.0 - features["usage_norm"]
+
+
+@scorer("throughput", "예상 처리량 (실험용 - 합성 측정값 학습 모델)")
+def expected_throughput(features):
+    # 모델의 상위 5% 속도를 1로 보는 0~1 점수.
+    # 실측 속도 기록이 생기기 전까지는 합성 측정값으로 학습한 모델이라 기본 정렬 방식에는 쓰지 않는다
+    model = get_throughput_model()
+    return model.predict(features) / model.reference_mbps
+
+
+@scorer("placement", "실외 AP 우선 (실내 AP 감점)")
+def placement(features):
+    scores = features["indoor_outdoor"].map(INDOOR_OUTDOOR_SCORES).astype(float)
+    return scores.fillna(UNKNOWN_PLACEMENT_SCORE).to_numpy()
+
+
+# 화면의 정렬 방식 → 가중치
+PRESETS = {
+    "가까운 순": {"distance": 1.0},
+    "Wi-Fi 빠른 순": {"speed": 1.0},
+    "가까움 + 빠름 혼합": {"distance": 0.5, "speed": 0.5},
+}
+
+
+# 점수 함수가 쓰는 AP 컬럼
+FEATURE_COLUMNS = list(dict.fromkeys(["indoor_outdoor", "usage_norm"] + MODEL_COLUMNS))
+
+
+class RankingEngine:
+    """load_ap_data() 행 순서의 AP에 대한 점수 계산 / 상위 k개 조회"""
+
+    def __init__(self, features, lat, lon):
+        self.index = _grid_for(lat, lon)
+        self.size = len(features)
+        self._static = {}
+        self.ap_scores = {}
+        for name, (_, kind, fn) in SCORERS.items():
+            if kind == "ap":
+                values = np.nan_to_num(np.asarray(fn(features), dtype=float), nan=0.0)
+                self.ap_scores[name] = np.clip(values, 0.0, 1.0)
+
+    def _split(self, weights):
+        """가중치 → (AP 점수 가중합 배열, [(가중치, 거리 점수 함수)])"""
+        unknown = set(weights) - set(SCORERS)
+        if unknown:
+            raise KeyError(f"없는 점수 함수입니다: {sorted(unknown)}")
+
+        local = [(float(w), SCORERS[name][2]) for name, w in weights.items()
+                 if w and SCORERS[name][1] == "distance"]
+        key = tuple(sorted((name, float(w)) for name, w in weights.items()
+                           if w and SCORERS[name][1] == "ap"))
+
+        # AP 점수 가중합은 가중치 조합마다 한 번만 (화면에서 같은 가중치로 위치만 바꾸는 경우)
+        static = self._static.get(key)
+        if static is None:
+            static = np.zeros(self.size)
+            for name, weight in key:
+                static += weight * self.ap_scores[name]
+            if len(self._static) >= STATIC_CACHE_ENTRIES:
+                self._static.pop(next(iter(self._static)))
+            self._static[key] = static
+        return static, local
+
+    @staticmethod
+    def _local_score(local, distance_m):
+        return sum(weight * fn(distance_m) for weight, fn in local) if local else 0.0
+
+    def top_k(self, lat, lon, weights, k=TOP_K, candidates=None):
+        """
+        지점(하나 또는 배열)마다 종합 점수 상위 k개 AP.
+        candidates: 후보 AP (bool 마스크 또는 행 위치, 기본 전체)
+        반환: (행 위치, 점수, 거리 m) 각각 (지점 수, k) 배열, 후보가 k개보다 적으면 행 -1 / 점수 -inf
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        # 후보 제한이 없으면 mask = None (전체 AP 배열을 그대로 사용)
+        mask = None
+        if candidates is not None:
+            candidates = np.asarray(candidates)
+            mask = candidates
+            if candidates.dtype != bool:
+                mask = np.zeros(self.size, dtype=bool)
+                mask[candidates] = True
+
+        rows = np.full((len(lat), k), -1, dtype=np.int64)
+        scores = np.full((len(lat), k), -np.inf)
+        static, local = self._split(weights)
+        n_cand = self.size if mask is None else int(mask.sum())
+        if k <= 0 or n_cand == 0 or len(lat) == 0:
+            return rows, scores, np.full((len(lat), k), np.inf)
+
+        with span("ranking.top_k", queries=len(lat), k=k, candidates=n_cand):
+            if not local:
+                # 위치와 무관: 후보 전체에서 한 번만 고르고 모든 지점에 같은 순위
+                cand = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+                values = static if mask is None else static[cand]
+                best = cand[_top_positions(values[None, :], k)[0]]
+                rows[:, :len(best)] = best
+                scores[:, :len(best)] = static[best]
+            else:
+                self._top_k_local(lat, lon, k, mask, n_cand, static, local, rows, scores)
+
+        dist = np.full((len(lat), k), np.inf)
+        found = rows >= 0
+        qi = np.nonzero(found)[0]
+        dist[found] = haversine_m(lat[qi], lon[qi], self.index.lat[rows[found]],
+                                  self.index.lon[rows[found]])
+        return rows, scores, dist
+
+    def _top_k_local(self, lat, lon, k, mask, n_cand, static, local, rows, scores):
+        """거리 점수가 있을 때: 반경을 넓혀 가며 지점별 상위 k개가 확정될 때까지"""
+        static_max = float((static if mask is None else static[mask]).max())
+        # 후보가 고르게 퍼져 있다고 보고 반경 안에 SEARCH_FACTOR·k개쯤 들어오는 반경부터
+        area = self.index.nx * self.index.ny * self.index.cell_m ** 2
+        radius = max(np.sqrt(SEARCH_FACTOR * k * area / (np.pi * n_cand)), self.index.cell_m)
+
+        pending = np.arange(len(lat))
+        while len(pending) and radius <= MAX_REACH_CELLS * self.index.cell_m:
+            bound = self._local_score(local, radius) + static_max
+            done = np.zeros(len(pending), dtype=bool)
+            for start in range(0, len(pending), QUERY_CHUNK):
+                chunk = pending[start:start + QUERY_CHUNK]
+                query, cand, dist = self.index.pairs_within(lat[chunk], lon[chunk], radius)
+                if mask is not None:
+                    keep = mask[cand]
+                    query, cand, dist = query[keep], cand[keep], dist[keep]
+                value = static[cand] + self._local_score(local, dist)
+
+                top_rows, top_scores = _group_top_k(query, cand, value, len(chunk), k)
+                # r 밖의 AP 점수 상한보다 k번째 점수가 크거나 같으면 확정
+                settled = top_scores[:, -1] >= bound
+                rows[chunk[settled]] = top_rows[settled]
+                scores[chunk[settled]] = top_scores[settled]
+                done[start:start + len(chunk)] = settled
+            pending = pending[~done]
+            radius *= 2
+
+        # 남은 지점 (후보가 적거나 거리 가중치가 작아 반경으로 확정이 안 되는 경우): 후보 전체 계산
+        cand = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+        step = max(1, DENSE_PAIRS // len(cand))
+        for start in range(0, len(pending), step):
+            chunk = pending[start:start + step]
+            dist = haversine_m(lat[chunk, None], lon[chunk, None],
+                               self.index.lat[cand][None, :], self.index.lon[cand][None, :])
+            value = static[cand][None, :] + self._local_score(local, dist)
+            best = _top_positions(value, k)
+            rows[chunk, :best.shape[1]] = cand[best]
+            scores[chunk, :best.shape[1]] = np.take_along_axis(value, best, axis=1)
+
+
+def _grid_for(lat, lon):
+    """AP 밀도에 맞춘 칸 크기의 GridIndex (칸 하나에 CELL_POINTS개 안팎)"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    if valid.sum() < 2:
+        return GridIndex(lat, lon)
+    (x0, x1), (y0, y1) = project(
+        [np.nanmin(lat), np.nanmax(lat)], [np.nanmin(lon), np.nanmax(lon)]
+    )
+    area = max(abs(x1 - x0) * abs(y1 - y0), 1.0)
+    cell_m = np.clip(np.sqrt(area * CELL_POINTS / valid.sum()), *CELL_RANGE_M)
+    return GridIndex(lat, lon, cell_m=float(cell_m))
+
+
+def _top_positions(values, k, ties=None):
+    """
+    (지점, n) 점수 행렬 → 행마다 점수 높은 순 상위 k개 열 위치.
+    같은 점수면 ties(같은 모양, 기본 열 번호) 값이 작은 쪽 먼저
+    """
+    k = min(k, values.shape[1])
+    if k < values.shape[1]:
+        part = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    picked = np.take_along_axis(values, part, axis=1)
+    tie = part if ties is None else np.take_along_axis(ties, part, axis=1)
+    order = np.lexsort((tie, -picked), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _group_top_k(query, cand, value, n_query, k):
+    """(지점 번호, AP 행, 점수) 쌍 → 지점별 상위 k개 (행, 점수), 모자라면 -1 / -inf"""
+    counts = np.bincount(query, minlength=n_query)
+    width = max(int(counts.max()) if len(counts) else 0, k)
+
+    # 지점별로 모아 (지점, 최대 개수) 행렬에 채움
+    order = np.argsort(query, kind="stable")
+    query, cand, value = query[order], cand[order], value[order]
+    slot = np.arange(len(query)) - np.repeat(np.cumsum(counts) - counts, counts)
+    grid_value = np.full((n_query, width), -np.inf)
+    grid_row = np.full((n_query, width), -1, dtype=np.int64)
+    grid_value[query, slot] = value
+    grid_row[query, slot] = cand
+
+    best = _top_positions(grid_value, k, ties=grid_row)
+    return np.take_along_axis(grid_row, best, axis=1), np.take_along_axis(grid_value, best, axis=1)
+
+
+# ===============================
+# 데이터 버전별 1회 생성 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _build_engine(version, model_mtime):
+    record_cache("ranking", "miss")
+    features = load_ap_data(FEATURE_COLUMNS + ["lat", "lon"])
+    with span("ranking.build", rows=len(features)):
+        return RankingEngine(features, features["lat"].to_numpy(), features["lon"].to_numpy())
+
+
+@cache_lookup("ranking")
+def get_ranking_engine():
+    """load_ap_data() 행 순서의 순위 엔진 (현재 데이터 버전)"""
+    return _build_engine(data_version(), os.path.getmtime(MODEL_PATH))
+
+
+def ranked_frame(df, rows, scores, dist):
+    """한 지점의 top_k 결과 → 순위 / 종합 점수 / 거리 컬럼을 붙인 df 행들"""
+    found = rows >= 0
+    return df.iloc[rows[found]].assign(score=scores[found], distance_m=dist[found])
+
+
+# ===============================
+# 버스정류소 추천 미리 계산
+# ===============================
+
+BUS_STOP_TYPE = "버스정류소"
+
+
+def bus_stop_recommendations(weights, k=TOP_K):
+    """버스정류소 AP 위치마다 추천 AP 상위 k개 (정류소 ap_id, 순위, ap_id, 점수, 거리)"""
+    df = load_ap_data(["ap_id", "install_type", "lat", "lon"])
+    stops = np.flatnonzero((df["install_type"] == BUS_STOP_TYPE).to_numpy())
+    rows, scores, dist = get_ranking_engine().top_k(
+        df["lat"].to_numpy()[stops], df["lon"].to_numpy()[stops], weights, k
+    )
+
+    found = rows >= 0
+    ap_id = df["ap_id"].to_numpy()
+    return pd.DataFrame({
+        "stop_ap_id": np.repeat(ap_id[stops], k)[found.ravel()],
+        "rank": np.tile(np.arange(1, k + 1), len(stops))[found.ravel()],
+        "ap_id": ap_id[rows[found]],
+        "score": scores[found],
+        "distance_m": dist[found],
+    })
+
+
+def _parse_weights(items):
+    weights = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        weights[name] = float(value)
+    return weights or dict(PRESETS["가까움 + 빠름 혼합"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wi-Fi 추천 순위 일괄 계산")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stops_cmd = sub.add_parser("bus-stops", help="버스정류소 위치마다 추천 AP 상위 k개")
+    stops_cmd.add_argument("--k", type=int, default=TOP_K)
+    stops_cmd.add_argument("--weight", action="append",
+                           help=f"점수 함수=가중치 (여러 번, 함수: {', '.join(SCORERS)})")
+    stops_cmd.add_argument("--out", help="결과 Parquet 경로 (기본: 캐시 폴더)")
+    args = parser.parse_args()
+
+    weights = _parse_weights(args.weight)
+    start = time.perf_counter()
+    result = bus_stop_recommendations(weights, args.k)
+    elapsed = time.perf_counter() - start
+
+    path = args.out or os.path.join(cache_dir(), f"bus_stop_top{args.k}.{data_version()}.parquet")
+    result.to_parquet(path, index=False)
+    print(f"정류소 {result['stop_ap_id'].nunique():,}곳 × 상위 {args.k}개 ({weights}): "
+          f"{elapsed:.2f}초 → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+import argparse
+import heapq
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, data_version, load_ap_data
+from core.coverage import get_coverage
+from core.profiling import cache_lookup, record_cache, span
+from core.spatial import haversine_m
+
+# ===============================
+# 예산 제약 AP 교체 / 이전 / 철거 계획
+# ===============================
+# cluster_k3_rank가 1(유지관리) / 2(교체권장)인 AP마다 아래 조치 중 하나를 골라
+# 예산 안에서 목적함수를 가장 크게 늘리는 조합을 비용 대비 효과 순 greedy(지연 평가)로 고른다.
+#
+# 목적함수 (커버리지 격자 칸 c 기준)
+#   F = Σ_c d_c · Q_c  +  load_weight · Σ_c min(u_c, a · E_c)  -  overlap_weight · Σ_c max(0, k_c - overlap_limit)
+#   Q_c : 반경 안 AP 중 가장 좋은 품질 (LEVEL_QUALITY, 반경 안 AP가 없으면 0)
+#   E_c : 반경 안 AP 품질 합 (품질 1 AP 몇 대 분의 처리 용량인지)
+#   k_c : 반경 안 AP 수
+#   u_c : 칸 예상 부하 / 서울 평균 부하
+#   d_c : 1(면적) + usage_weight · u_c
+#   a   : 품질 1 AP 한 대가 감당하는 부하 (AP가 있는 칸의 AP당 부하 CAPACITY_QUANTILE 분위수)
+# 둘째 항은 남은 AP가 감당하는 수요라서, 부하가 큰 칸의 AP를 철거하면 그만큼 잃는다.
+# 조치
+#   replace  : 같은 자리에서 새 장비로 교체 (품질 1)
+#   relocate : RELOCATE_MAX_M 안 커버리지 공백 칸 중 효과가 가장 큰 곳으로 옮기면서 교체
+#   remove   : 철거 (과밀 칸의 중복만 줄어들고 커버 / 처리 용량은 잃을 수 있음)
+#
+# 교체 / 이전의 효과는 다른 조치를 고를수록 줄어들기만 해서(submodular) 지연 평가로 다시 계산할
+# 조치 수를 크게 줄인다. 철거 / 이전 전 자리의 손실은 주변 AP 교체로 작아질 수도 있어 그 부분은 근사다.
+#
+#   python -m core.replacement --budget 20000
+
+ACTIONS = {"replace": "교체", "relocate": "이전", "remove": "철거"}
+
+# 품질 단계: rank 0(양호) 또는 교체한 AP / rank 1(유지관리) / rank 2(교체권장)
+LEVEL_QUALITY = np.array([1.0, 0.6, 0.3])
+
+# 조치별 기본 단가 (만원, 예시 값) × 설치유형별 배율
+BASE_COSTS = {"replace": 120.0, "relocate": 200.0, "remove": 30.0}
+TYPE_COST_FACTORS = {"공원(하천)": 1.3, "주요거리": 1.2, "전통시장": 1.2, "버스정류소": 1.1}
+
+USAGE_WEIGHT = 1.0
+LOAD_WEIGHT = 1.0
+CAPACITY_QUANTILE = 0.5
+OVERLAP_LIMIT = 4
+OVERLAP_WEIGHT = 0.1
+
+# 이전 후보지: AP에서 RELOCATE_MAX_M 안 공백 칸 중 가까운 RELOCATE_CANDIDATES개
+RELOCATE_MAX_M = 500.0
+RELOCATE_CANDIDATES = 16
+
+# 처음 효과를 한 번에 계산할 후보 수 (이전 후보지 칸까지 펼치면 후보당 수백 개)
+INITIAL_CHUNK = 10_000
+
+
+def default_costs(install_types):
+    """설치유형 × 조치 기본 단가 표 (만원)"""
+    return pd.DataFrame(
+        {action: [cost * TYPE_COST_FACTORS.get(t, 1.0) for t in install_types]
+         for action, cost in BASE_COSTS.items()},
+        index=pd.Index(list(install_types), name="install_type"),
+    )
+
+
+class ReplacementProblem:
+    """
+    계획 계산에 쓰는 격자 / 후보 AP 배열 (데이터 버전별 1회 생성, 읽기 전용).
+    칸 번호는 커버리지 격자의 평탄 번호.
+    """
+
+    def __init__(self, df, coverage):
+        self.coverage = coverage
+        ny, nx = coverage.shape
+        inside = (coverage.gu >= 0).ravel()
+
+        # 칸별 단계별 AP 수 (n칸, 3)
+        rank = df["cluster_k3_rank"].to_numpy().astype(np.int64)
+        ptr, cells = coverage.disk_cells(df["lat"].to_numpy(), df["lon"].to_numpy())
+        level = np.repeat(rank, np.diff(ptr))
+        self.levels = np.bincount(
+            cells * 3 + level, minlength=ny * nx * 3
+        ).reshape(-1, 3).astype(np.int32)
+
+        load = np.nan_to_num(coverage.load_gb.ravel().astype(float))
+        mean_load = load[inside].mean() if inside.any() else 0.0
+        self.load_scale = 1.0 / mean_load if mean_load > 0 else 0.0
+        self.load = np.where(inside, load, 0.0)
+        self.inside = inside
+
+        # 품질 1 AP 한 대가 감당하는 부하 (서울 평균 부하 단위)
+        count = self.levels.sum(axis=1)
+        covered = inside & (count > 0)
+        per_ap = self.load[covered] / count[covered]
+        self.ap_capacity = (
+            float(np.quantile(per_ap, CAPACITY_QUANTILE)) * self.load_scale if len(per_ap) else 0.0
+        )
+
+        # 후보: 유지관리 / 교체권장 AP
+        cand = np.flatnonzero(rank >= 1)
+        self.rows = cand
+        self.ap_id = df["ap_id"].to_numpy()[cand]
+        self.gu = df["gu"].astype(str).to_numpy()[cand]
+        self.install_type = df["install_type"].astype(str).to_numpy()[cand]
+        self.level = rank[cand]
+        self.lat = df["lat"].to_numpy(dtype=float)[cand]
+        self.lon = df["lon"].to_numpy(dtype=float)[cand]
+        self.ptr, self.cells = coverage.disk_cells(self.lat, self.lon)
+
+        self._relocation_sites()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _relocation_sites(self):
+        """
+        후보 AP마다 RELOCATE_MAX_M 안 공백 칸(반경 안 AP 없음) 중 가까운 RELOCATE_CANDIDATES개와
+        그 칸들의 반경 안 칸
+        """
+        grid = self.coverage
+        nx = grid.shape[1]
+        gap = self.inside & (self.levels.sum(axis=1) == 0)
+
+        found, owners = [], []
+        for start in range(0, len(self), INITIAL_CHUNK):
+            lat = self.lat[start:start + INITIAL_CHUNK]
+            lon = self.lon[start:start + INITIAL_CHUNK]
+            ptr, near = grid.disk_cells(lat, lon, radius_m=RELOCATE_MAX_M)
+            owner = np.repeat(np.arange(len(lat)), np.diff(ptr))
+            keep = gap[near]
+            near, owner = near[keep], owner[keep]
+
+            # AP마다 가까운 순으로 RELOCATE_CANDIDATES개
+            clat, clon = grid.cell_centers(near // nx, near % nx)
+            order = np.lexsort((haversine_m(lat[owner], lon[owner], clat, clon), owner))
+            near, owner = near[order], owner[order]
+            keep = np.arange(len(owner)) - np.searchsorted(owner, owner) < RELOCATE_CANDIDATES
+            found.append(near[keep])
+            owners.append(owner[keep] + start)
+
+        near = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+
+        self.site_ptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner, minlength=len(self)), out=self.site_ptr[1:])
+        used, self.sites = np.unique(near, return_inverse=True)
+        self.site_lat, self.site_lon = grid.cell_centers(used // nx, used % nx)
+        self.site_cell_ptr, self.site_cells = grid.disk_cells(self.site_lat, self.site_lon)
+
+    def ap_cells(self, i):
+        return self.cells[self.ptr[i]:self.ptr[i + 1]]
+
+    def site_cells_of(self, site):
+        return self.site_cells[self.site_cell_ptr[site]:self.site_cell_ptr[site + 1]]
+
+    def candidate_sites(self, i):
+        return self.sites[self.site_ptr[i]:self.site_ptr[i + 1]]
+
+    def cost_matrix(self, costs):
+        """후보 × ACTIONS 단가 배열 (표에 없는 설치유형은 기본 단가)"""
+        table = default_costs(sorted(set(self.install_type))).copy()
+        table.update(costs)
+        return table.reindex(self.install_type)[list(ACTIONS)].to_numpy(dtype=float)
+
+
+def _gather(ptr, values, idx):
+    """CSR(ptr, values)에서 idx 행들의 값을 이어 붙인 배열과 값마다 idx 안 순번"""
+    starts = ptr[idx]
+    lengths = ptr[idx + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    pos = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+    return values[pos], np.repeat(np.arange(len(idx)), lengths)
+
+
+def _capacity(levels):
+    return levels @ LEVEL_QUALITY
+
+
+def _quality(levels):
+    return np.where(
+        levels[:, 0] > 0, LEVEL_QUALITY[0],
+        np.where(levels[:, 1] > 0, LEVEL_QUALITY[1], np.where(levels[:, 2] > 0, LEVEL_QUALITY[2], 0.0)),
+    )
+
+
+class _Objective:
+    """조치별 목적함수 변화량 계산 (levels는 계획 중 바뀌는 칸별 단계별 AP 수)"""
+
+    def __init__(self, problem, usage_weight, overlap_limit, overlap_weight, load_weight):
+        self.problem = problem
+        self.usage = np.where(problem.inside, problem.load * problem.load_scale, 0.0)
+        self.demand = np.where(problem.inside, 1.0 + usage_weight * self.usage, 0.0)
+        self.load_weight = load_weight
+        self.overlap_limit = overlap_limit
+        self.overlap_weight = overlap_weight
+        self.levels = problem.levels.copy()
+
+    def _excess(self, levels):
+        return np.maximum(levels.sum(axis=1) - self.overlap_limit, 0)
+
+    def _served(self, cells, levels):
+        return np.minimum(self.usage[cells], self.problem.ap_capacity * _capacity(levels))
+
+    def _change(self, cells, before, after):
+        """칸마다 before → after로 바뀔 때 목적함수 변화량"""
+        return (
+            self.demand[cells] * (_quality(after) - _quality(before))
+            + self.load_weight * (self._served(cells, after) - self._served(cells, before))
+            - self.overlap_weight * (self._excess(after) - self._excess(before))
+        )
+
+    def total(self):
+        cells = np.flatnonzero(self.problem.inside)
+        levels = self.levels[cells]
+        return float(
+            self.demand[cells] @ _quality(levels)
+            + self.load_weight * self._served(cells, levels).sum()
+            - self.overlap_weight * self._excess(levels).sum()
+        )
+
+    def gains(self, idx, action):
+        """
+        후보 idx들에 action을 했을 때 (변화량 배열, 이전 후보지 배열 - relocate가 아니면 -1).
+        후보끼리는 서로 영향이 없다고 보고(각각 현재 상태 기준) 한 번에 계산
+        """
+        p = self.problem
+        no_site = np.full(len(idx), -1, dtype=np.int64)
+        cells, owner = _gather(p.ptr, p.cells, idx)
+        rows = np.arange(len(cells))
+        before = self.levels[cells]
+        removed = before.copy()
+        removed[rows, p.level[idx][owner]] -= 1
+        if action == "replace":
+            after = removed.copy()
+            after[:, 0] += 1
+            return np.bincount(owner, self._change(cells, before, after), minlength=len(idx)), no_site
+
+        loss = np.bincount(owner, self._change(cells, before, removed), minlength=len(idx))
+        if action == "remove":
+            return loss, no_site
+
+        # 이전: 옮기기 전 자리에서 뺀 상태에서 후보지마다 새 AP를 더한 효과, 그중 가장 큰 곳
+        sites, site_owner = _gather(p.site_ptr, p.sites, idx)
+        site_cells, pair = _gather(p.site_cell_ptr, p.site_cells, sites)
+        pair_owner = site_owner[pair]
+        base = self.levels[site_cells]
+        n = len(self.levels)
+        overlap = np.flatnonzero(np.isin(pair_owner * n + site_cells, owner * n + cells))
+        base[overlap, p.level[idx][pair_owner[overlap]]] -= 1
+        after = base.copy()
+        after[:, 0] += 1
+        add = np.bincount(pair, self._change(site_cells, base, after), minlength=len(sites))
+
+        best = np.full(len(idx), -np.inf)
+        best_site = no_site.copy()
+        if len(sites):
+            order = np.lexsort((-add, site_owner))
+            first = order[np.r_[True, site_owner[order][1:] != site_owner[order][:-1]]]
+            best[site_owner[first]] = add[first]
+            best_site[site_owner[first]] = sites[first]
+        return loss + best, best_site
+
+    def apply(self, i, action, site):
+        """후보 i에 action을 확정해서 levels 갱신"""
+        p = self.problem
+        removed_cells = p.ap_cells(i)
+        if action == "replace":
+            added_cells = removed_cells
+        elif action == "relocate":
+            added_cells = p.site_cells_of(site)
+        else:
+            added_cells = removed_cells[:0]
+        np.subtract.at(self.levels[:, p.level[i]], removed_cells, 1)
+        np.add.at(self.levels[:, 0], added_cells, 1)
+
+
+def plan_replacements(problem, budget, costs=None, actions=tuple(ACTIONS),
+                      usage_weight=USAGE_WEIGHT, overlap_limit=OVERLAP_LIMIT,
+                      overlap_weight=OVERLAP_WEIGHT, load_weight=LOAD_WEIGHT):
+    """
+    예산(만원) 안에서 조치를 고른 계획 DataFrame과 요약 dict 반환.
+    계획 행 순서가 선택 순서이고, cum_cost / cum_gain이 한계 효과 곡선.
+    costs: 설치유형 × 조치 단가 표 (default_costs 형식, 일부만 줘도 됨)
+    """
+    objective = _Objective(problem, usage_weight, overlap_limit, overlap_weight, load_weight)
+    cost = problem.cost_matrix(costs if costs is not None else pd.DataFrame())
+    action_col = {a: list(ACTIONS).index(a) for a in actions}
+    start_value = objective.total()
+
+    # 1) 모든 (후보, 조치)의 처음 효과 (벡터 연산) - 이후로는 이 값이 상한
+    with span("replacement.initial", candidates=len(problem)):
+        heap = []
+        best_single = None
+        for start in range(0, len(problem), INITIAL_CHUNK):
+            idx = np.arange(start, min(start + INITIAL_CHUNK, len(problem)))
+            for action, col in action_col.items():
+                gains, sites = objective.gains(idx, action)
+                c = cost[idx, col]
+                ok = (gains > 0) & (c <= budget)
+                heap += [(-g / cc, i, action) for g, cc, i in zip(gains[ok], c[ok], idx[ok].tolist())]
+                if ok.any():
+                    j = np.flatnonzero(ok)[gains[ok].argmax()]
+                    if best_single is None or gains[j] > best_single[-1]:
+                        best_single = (int(idx[j]), action, int(sites[j]), float(c[j]), float(gains[j]))
+        heapq.heapify(heap)
+
+    # 2) 지연 평가 greedy: 꺼낸 조치만 현재 상태로 다시 계산, 여전히 1등이면 확정
+    steps = []
+    used = np.zeros(len(problem), dtype=bool)
+    spent = gained = 0.0
+    evaluations = 0
+    with span("replacement.greedy"):
+        while heap:
+            _, i, action = heapq.heappop(heap)
+            c = cost[i, action_col[action]]
+            if used[i] or spent + c > budget:
+                continue
+            gains, sites = objective.gains(np.array([i]), action)
+            gain, site = float(gains[0]), int(sites[0])
+            evaluations += 1
+            if gain <= 0:
+                continue
+            if heap and gain / c < -heap[0][0]:
+                heapq.heappush(heap, (-gain / c, i, action))
+                continue
+
+            objective.apply(i, action, site)
+            used[i] = True
+            spent += c
+            gained += gain
+            steps.append((i, action, site, c, gain))
+
+    # 예산 제약 greedy는 효과가 큰 단일 조치 하나보다 못할 수 있어 비교 (근사 보장용)
+    if best_single is not None and best_single[-1] > gained:
+        steps = [best_single]
+
+    plan = _plan_frame(problem, steps)
+    summary = {
+        "budget": float(budget),
+        "spent": float(plan["cost"].sum()),
+        "objective_before": start_value,
+        "objective_after": start_value + float(plan["gain"].sum()),
+        "candidates": len(problem),
+        "evaluations": len(problem) * len(action_col) + evaluations,
+    }
+    return plan, summary
+
+
+def _plan_frame(problem, steps):
+    idx = np.array([s[0] for s in steps], dtype=np.int64)
+    site = np.array([s[2] for s in steps], dtype=np.int64)
+    moved = site >= 0
+    target = np.where(moved, site, 0)
+    has_sites = len(problem.site_lat) > 0
+
+    plan = pd.DataFrame({
+        "ap_id": problem.ap_id[idx],
+        "gu": problem.gu[idx],
+        "install_type": problem.install_type[idx],
+        "rank": problem.level[idx],
+        "action": [s[1] for s in steps],
+        "cost": [float(s[3]) for s in steps],
+        "gain": [float(s[4]) for s in steps],
+        "lat": problem.lat[idx],
+        "lon": problem.lon[idx],
+        "target_lat": np.where(moved, problem.site_lat[target] if has_sites else np.nan, np.nan),
+        "target_lon": np.where(moved, problem.site_lon[target] if has_sites else np.nan, np.nan),
+    })
+    plan["cum_cost"] = plan["cost"].cumsum()
+    plan["cum_gain"] = plan["gain"].cumsum()
+    plan["gain_per_cost"] = plan["gain"] / plan["cost"]
+    return plan
+
+
+# ===============================
+# 데이터 버전별 문제 배열 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _build_problem(version):
+    record_cache("replacement.problem", "miss")
+    df = load_ap_data(["ap_id", "gu", "install_type", "lat", "lon", "cluster_k3_rank"])
+    with span("replacement.build_problem", rows=len(df)):
+        return ReplacementProblem(df, get_coverage())
+
+
+@cache_lookup("replacement.problem")
+def get_replacement_problem():
+    """현재 데이터 버전의 교체 계획 문제 (읽기 전용)"""
+    return _build_problem(data_version())
+
+
+@cache_lookup("replacement.plan")
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_plan(version, budget, costs, actions, usage_weight, overlap_limit, overlap_weight,
+                 load_weight):
+    record_cache("replacement.plan", "miss")
+    return plan_replacements(
+        get_replacement_problem(), budget, costs, actions,
+        usage_weight, overlap_limit, overlap_weight, load_weight,
+    )
+
+
+def get_replacement_plan(budget, costs=None, actions=tuple(ACTIONS), usage_weight=USAGE_WEIGHT,
+                         overlap_limit=OVERLAP_LIMIT, overlap_weight=OVERLAP_WEIGHT,
+                         load_weight=LOAD_WEIGHT):
+    """plan_replacements 결과를 (데이터 버전, 인자) 키로 캐시"""
+    return _cached_plan(
+        data_version(), float(budget), costs, tuple(actions),
+        float(usage_weight), int(overlap_limit), float(overlap_weight), float(load_weight),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예산 제약 AP 교체 / 이전 / 철거 계획")
+    parser.add_argument("--budget", type=float, required=True, help="예산 (만원)")
+    parser.add_argument("--actions", nargs="+", choices=list(ACTIONS), default=list(ACTIONS))
+    parser.add_argument("--output", help="계획 CSV 저장 경로")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    problem = get_replacement_problem()
+    built = time.perf_counter()
+    plan, summary = plan_replacements(problem, args.budget, actions=tuple(args.actions))
+    done = time.perf_counter()
+
+    print(f"후보 {len(problem):,}개: 준비 {built - start:.1f}초, 계획 {done - built:.1f}초")
+    print(f"  예산 {summary['budget']:,.0f} / 사용 {summary['spent']:,.0f}만원, 조치 {len(plan):,}건")
+    print(f"  목적함수 {summary['objective_before']:,.1f} → {summary['objective_after']:,.1f}")
+    print(plan["action"].value_counts().rename(index=ACTIONS).to_string())
+    if args.output:
+        plan.to_csv(args.output, index=False, encoding="utf-8-sig")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import (
+    VERSION_CACHE_ENTRIES, cache_dir, data_version, load_ap_data, snapshot_metadata,
+)
+from core.ap_index import APIndex, get_id_index
+from core.coverage import get_coverage
+from core.features import (
+    DENSITY_RADIUS_M, age_norm, assign_clusters, density_norm, neighbor_stats, usage_norm,
+    usage_norm_log,
+)
+from core.ingest import feature_state
+from core.profiling import cache_lookup, record_cache, span
+from core.spatial import GridIndex, haversine_m
+
+# ===============================
+# AP 재배치 what-if 시뮬레이션
+# ===============================
+# 기준 상태(데이터 버전별 1회 계산, 세션 간 공유) 위에 세션별 편집(삭제 / 이동 / 추가)을 쌓는다.
+# 편집 한 번마다 반경 DENSITY_RADIUS_M 안 이웃 AP의 이웃 수 / density_norm / cluster_k3_rank와
+# 커버리지 반경 안 격자 칸만 다시 계산하고, 구별 집계에는 바뀐 행의 차이만 더한다.
+# 정규화 기준값, 군집 중심은 기준 값을 그대로 쓴다 (core.ingest와 같은 기준).
+#
+# 기준 상태의 density_norm / cluster_k3_rank는 스냅샷 컬럼 그대로이고, 편집 후에는
+# core.features와 같은 식으로 다시 계산하므로 편집 영향이 없는 AP는 값이 바뀌지 않는다.
+
+RANK_LABELS = {0: "양호", 1: "유지관리", 2: "교체권장"}
+
+REMOVE, MOVE, ADD = "remove", "move", "add"
+
+# 구별 집계 열 (합계로 저장하고 평균은 출력할 때 계산)
+_AGG_COLUMNS = ["ap_count", "density_sum", "usage_sum"] + [f"rank_{r}" for r in RANK_LABELS]
+
+
+def _aggregate(out, gu, density, usage, rank, sign=1.0):
+    """구별 집계 배열 out에 행들의 기여분을 sign(+1 / -1)만큼 더함"""
+    values = np.column_stack([
+        np.ones(len(gu)), density, usage,
+        *(np.asarray(rank) == r for r in RANK_LABELS),
+    ])
+    np.add.at(out, np.asarray(gu), sign * values)
+
+
+class ScenarioBase:
+    """
+    시뮬레이션 기준 상태 (읽기 전용, 세션 간 공유).
+    행 번호는 load_ap_data()의 행 순서와 같다.
+    """
+
+    def __init__(self, df, counts, state, coverage, index=None):
+        self.state = state
+        self.coverage = coverage
+
+        # 구 번호는 커버리지 격자와 같은 순서 (격자 밖 구가 있으면 뒤에 추가)
+        names = list(coverage.gu_names)
+        names += sorted(set(df["gu"].astype(str)) - set(names))
+        self.gu_names = names
+
+        self.ap_id = df["ap_id"].to_numpy()
+        # ap_id → 행 번호 (index: df 행 순서와 같은 APIndex가 이미 있으면 재사용)
+        self.row_of = index if index is not None else APIndex(self.ap_id)
+        self.lat = df["lat"].to_numpy(dtype=float)
+        self.lon = df["lon"].to_numpy(dtype=float)
+        self.gu = pd.Index(names).get_indexer(df["gu"].astype(str))
+        self.usage_gb = df["usage_gb"].to_numpy(dtype=float)
+        self.install_year = df["install_year"].to_numpy(dtype=float)
+        self.age_norm = df["age_norm"].to_numpy(dtype=float)
+        self.usage_norm = df["usage_norm"].to_numpy(dtype=float)
+        self.usage_norm_log = df["usage_norm_log"].to_numpy(dtype=float)
+
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.density_norm = df["density_norm"].to_numpy(dtype=float)
+        self.rank = df["cluster_k3_rank"].to_numpy(dtype=np.int64)
+
+        self.index = GridIndex(self.lat, self.lon, cell_m=max(DENSITY_RADIUS_M, 50.0))
+
+        # 새 AP의 구별 기본 이용량
+        n = len(names)
+        self.gu_usage = pd.Series(self.usage_gb).groupby(self.gu).median().reindex(range(n)).to_numpy()
+
+        self.agg = np.zeros((n, len(_AGG_COLUMNS)))
+        _aggregate(self.agg, self.gu, self.density_norm, self.usage_norm, self.rank)
+
+        # 커버리지 공백 칸: 반경 안 AP가 하나도 없는 칸
+        inside = coverage.gu >= 0
+        self.cells = np.bincount(coverage.gu[inside], minlength=n)
+        self.gap_cells = np.bincount(coverage.gu[inside & (coverage.count == 0)], minlength=n)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _assign(self, age, usage_log, density):
+        # CLUSTER_FEATURES 순서 (age_norm, usage_norm_log, density_norm)
+        _, ranks = assign_clusters(np.column_stack([age, usage_log, density]), self.state)
+        return ranks
+
+    def gu_at(self, lat, lon):
+        """좌표가 속한 구 번호 (커버리지 격자 기준, 서울 밖이면 ValueError)"""
+        grid = self.coverage
+        row = int(np.floor((lat - grid.lat0) / grid.dlat))
+        col = int(np.floor((lon - grid.lon0) / grid.dlon))
+        ny, nx = grid.shape
+        if not (0 <= row < ny and 0 <= col < nx) or grid.gu[row, col] < 0:
+            raise ValueError(f"서울 구 경계 밖 좌표입니다: ({lat:.6f}, {lon:.6f})")
+        return int(grid.gu[row, col])
+
+
+class RelocationScenario:
+    """
+    세션별 편집 상태. 기준 행은 0 ~ n-1, 추가한 AP는 n부터 번호를 붙인다.
+    바뀐 행 / 격자 칸의 값과 구별 집계 변화량만 들고 있어서 세션마다 전체 배열을 복사하지 않는다.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.removed = set()     # 삭제(또는 이동 전 위치)된 행
+        self.extra = []          # 추가한 AP 속성 dict
+        self.counts = {}         # 바뀐 행만: 행 → 이웃 수
+        self.density = {}
+        self.rank = {}
+        self.agg = np.zeros_like(base.agg)
+        self.cover = {}          # 바뀐 격자 칸만: 평탄 번호 → 반경 안 AP 수
+        self.gap = np.zeros(len(base.gu_names), dtype=np.int64)
+        self.edits = []          # 적용한 편집 기록
+        self.new_ids = 0         # 추가한 AP 번호 (NEW-1, NEW-2, ...)
+
+    # -------------------------------
+    # 행 값 조회
+    # -------------------------------
+
+    def __len__(self):
+        return len(self.base) + len(self.extra) - len(self.removed)
+
+    def alive(self, row):
+        return 0 <= row < len(self.base) + len(self.extra) and row not in self.removed
+
+    def find(self, ap_id):
+        """ap_id의 현재 행 번호 (없거나 삭제됐으면 ValueError)"""
+        for i in range(len(self.extra) - 1, -1, -1):
+            row = len(self.base) + i
+            if self.extra[i]["ap_id"] == ap_id and row not in self.removed:
+                return row
+        pos = self.base.row_of.row(ap_id)
+        if pos is None or pos in self.removed:
+            raise ValueError(f"AP를 찾을 수 없습니다: {ap_id}")
+        return pos
+
+    def column(self, name, rows):
+        """
+        rows(행 번호 배열)의 현재 값. name은 ScenarioBase 속성 이름
+        (lat, lon, gu, usage_gb, install_year, age_norm, usage_norm, usage_norm_log,
+        counts, density_norm, rank)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self.base)
+        base_col = getattr(self.base, name)
+        out = base_col[np.minimum(rows, n - 1)].astype(float)
+        for i in np.flatnonzero(rows >= n):
+            out[i] = self.extra[rows[i] - n].get(name, np.nan)
+
+        overlay = {"counts": self.counts, "density_norm": self.density, "rank": self.rank}.get(name)
+        if overlay:
+            for i, row in enumerate(rows.tolist()):
+                if row in overlay:
+                    out[i] = overlay[row]
+        return out
+
+    def attrs(self, row):
+        """행 하나의 현재 값 dict"""
+        names = ["lat", "lon", "gu", "usage_gb", "install_year", "age_norm", "usage_norm",
+                 "usage_norm_log", "counts", "density_norm", "rank"]
+        out = {name: self.column(name, [row])[0] for name in names}
+        n = len(self.base)
+        out["ap_id"] = self.base.ap_id[row] if row < n else self.extra[row - n]["ap_id"]
+        out["gu"] = int(out["gu"])
+        out["rank"] = int(out["rank"])
+        return out
+
+    def neighbors(self, lat, lon):
+        """(lat, lon) 반경 DENSITY_RADIUS_M 안의 현재 AP 행 번호"""
+        pos, _ = self.base.index.query_radius(lat, lon, DENSITY_RADIUS_M)
+        rows = [p for p in pos.tolist() if p not in self.removed]
+
+        if self.extra:
+            n = len(self.base)
+            lat_x = np.array([a["lat"] for a in self.extra])
+            lon_x = np.array([a["lon"] for a in self.extra])
+            near = np.flatnonzero(haversine_m(lat, lon, lat_x, lon_x) <= DENSITY_RADIUS_M)
+            rows += [n + i for i in near.tolist() if n + i not in self.removed]
+        return np.array(rows, dtype=np.int64)
+
+    # -------------------------------
+    # 증분 갱신
+    # -------------------------------
+
+    def _account(self, rows, sign):
+        if len(rows) == 0:
+            return
+        _aggregate(
+            self.agg, self.column("gu", rows).astype(np.int64), self.column("density_norm", rows),
+            self.column("usage_norm", rows), self.column("rank", rows), sign,
+        )
+
+    def _neighbor_stats(self, rows):
+        """rows 각각의 현재 (반경 안 다른 AP 수, 가장 가까운 다른 AP 거리)"""
+        lat, lon = self.column("lat", rows), self.column("lon", rows)
+        counts = np.zeros(len(rows), dtype=np.int64)
+        nearest = np.full(len(rows), np.inf)
+        for i, row in enumerate(rows.tolist()):
+            near = self.neighbors(lat[i], lon[i])
+            near = near[near != row]
+            if len(near):
+                counts[i] = len(near)
+                nearest[i] = haversine_m(lat[i], lon[i], self.column("lat", near),
+                                         self.column("lon", near)).min()
+        return counts, nearest
+
+    def _score(self, rows):
+        """rows의 이웃 수 / density_norm / rank를 현재 배치로 다시 계산"""
+        counts, nearest = self._neighbor_stats(rows)
+        density = density_norm(nearest, counts)
+        ranks = self.base._assign(
+            self.column("age_norm", rows), self.column("usage_norm_log", rows), density
+        )
+        for row, count, d, r in zip(rows.tolist(), counts.tolist(), density.tolist(), ranks.tolist()):
+            self.counts[row] = int(count)
+            self.density[row] = d
+            self.rank[row] = int(r)
+
+    def _rescore(self, rows):
+        """_score + 구별 집계에서 이전 값을 빼고 새 값을 더함"""
+        if len(rows) == 0:
+            return
+        self._account(rows, -1.0)
+        self._score(rows)
+        self._account(rows, 1.0)
+
+    def _cover(self, lat, lon, delta):
+        """커버리지 반경 안 격자 칸의 AP 수를 delta만큼 바꾸고 구별 공백 칸 수 갱신"""
+        grid = self.base.coverage
+        _, cells = grid.disk_cells(lat, lon)
+        gu, count = grid.gu.ravel(), grid.count.ravel()
+        for cell in cells.tolist():
+            before = self.cover.get(cell, count[cell])
+            after = before + delta
+            self.cover[cell] = after
+            if (before == 0) != (after == 0):
+                self.gap[gu[cell]] += 1 if after == 0 else -1
+
+    def _remove(self, row):
+        attrs = self.attrs(row)
+        self._account(np.array([row]), -1.0)
+        self.removed.add(row)
+
+        self._rescore(self.neighbors(attrs["lat"], attrs["lon"]))
+        self._cover(attrs["lat"], attrs["lon"], -1)
+        return attrs
+
+    def _add(self, lat, lon, ap_id, usage_gb=None, install_year=None):
+        base = self.base
+        state = base.state
+        gu = base.gu_at(lat, lon)
+        usage_gb = float(base.gu_usage[gu] if usage_gb is None else usage_gb)
+        install_year = float(state["year_range"][1] if install_year is None else install_year)
+
+        near = self.neighbors(lat, lon)
+        row = len(base) + len(self.extra)
+        self.extra.append({
+            "ap_id": ap_id, "lat": float(lat), "lon": float(lon), "gu": gu,
+            "usage_gb": usage_gb, "install_year": install_year,
+            "age_norm": float(age_norm([install_year], state["year_range"])[0]),
+            "usage_norm": float(usage_norm([usage_gb], [base.gu_names[gu]], state["usage"])[0]),
+            "usage_norm_log": float(usage_norm_log([usage_gb], state["log_usage_range"])[0]),
+        })
+
+        self._rescore(near)
+        self._score(np.array([row]))
+        self._account(np.array([row]), 1.0)
+        self._cover(lat, lon, 1)
+        return row
+
+    # -------------------------------
+    # 편집
+    # -------------------------------
+
+    def _validate(self, edits):
+        rows = []
+        for edit in edits:
+            op = edit["op"]
+            if op not in (REMOVE, MOVE, ADD):
+                raise ValueError(f"알 수 없는 편집: {op}")
+            if op in (REMOVE, MOVE):
+                row = self.find(edit["ap_id"])
+                if row in rows:
+                    raise ValueError(f"같은 AP를 한 번에 두 번 편집할 수 없습니다: {edit['ap_id']}")
+                rows.append(row)
+            if op in (MOVE, ADD):
+                self.base.gu_at(edit["lat"], edit["lon"])
+        return rows
+
+    def apply(self, edits):
+        """
+        편집 목록을 한 번에 적용하고 걸린 시간(초) 반환.
+        edits: {"op": "remove", "ap_id"} / {"op": "move", "ap_id", "lat", "lon"}
+               / {"op": "add", "lat", "lon", ["ap_id", "usage_gb", "install_year"]}
+        잘못된 편집이 하나라도 있으면 아무것도 바꾸지 않고 ValueError.
+        """
+        start = time.perf_counter()
+        with span("scenario.apply", edits=len(edits)):
+            rows = self._validate(edits)
+            rows = iter(rows)
+            for edit in edits:
+                op = edit["op"]
+                if op == REMOVE:
+                    self._remove(next(rows))
+                elif op == MOVE:
+                    attrs = self._remove(next(rows))
+                    self._add(edit["lat"], edit["lon"], attrs["ap_id"],
+                              attrs["usage_gb"], attrs["install_year"])
+                else:
+                    ap_id = edit.get("ap_id")
+                    if not ap_id:
+                        self.new_ids += 1
+                        ap_id = f"NEW-{self.new_ids}"
+                    self._add(edit["lat"], edit["lon"], ap_id,
+                              edit.get("usage_gb"), edit.get("install_year"))
+                self.edits.append(dict(edit))
+        return time.perf_counter() - start
+
+    # -------------------------------
+    # 결과
+    # -------------------------------
+
+    def summary_by_gu(self, base=False):
+        """구별 AP 수, 평균 density_norm / usage_norm, rank별 AP 수, 커버리지 공백 칸 비율"""
+        agg = self.base.agg if base else self.base.agg + self.agg
+        gap = self.base.gap_cells if base else self.base.gap_cells + self.gap
+        count = np.maximum(agg[:, 0], 1)
+        frame = pd.DataFrame({
+            "ap_count": agg[:, 0].round().astype(np.int64),
+            "density_mean": agg[:, 1] / count,
+            "usage_mean": agg[:, 2] / count,
+            **{f"rank_{r}": agg[:, 3 + i].round().astype(np.int64) for i, r in enumerate(RANK_LABELS)},
+            "gap_share": gap / np.maximum(self.base.cells, 1),
+        }, index=pd.Index(self.base.gu_names, name="gu"))
+        return frame
+
+    def changed_rows(self):
+        """이웃 수가 바뀐 현재 AP의 기준 / 시나리오 값"""
+        n = len(self.base)
+        rows = np.array(sorted(r for r in self.counts if r not in self.removed), dtype=np.int64)
+        old = rows < n
+        base_rows = np.where(old, rows, 0)
+
+        def before(name):
+            return np.where(old, getattr(self.base, name)[base_rows], np.nan)
+
+        return pd.DataFrame({
+            "ap_id": [self.attrs(r)["ap_id"] for r in rows.tolist()],
+            "gu": [self.base.gu_names[g] for g in self.column("gu", rows).astype(int)],
+            "lat": self.column("lat", rows),
+            "lon": self.column("lon", rows),
+            "counts_before": before("counts"),
+            "counts": self.column("counts", rows),
+            "density_before": before("density_norm"),
+            "density_norm": self.column("density_norm", rows),
+            "rank_before": before("rank"),
+            "rank": self.column("rank", rows),
+            "added": ~old,
+        })
+
+    def removed_rows(self):
+        """삭제(이동 전 위치 포함)된 기준 AP의 ap_id / 좌표"""
+        rows = np.array(sorted(r for r in self.removed if r < len(self.base)), dtype=np.int64)
+        return pd.DataFrame({
+            "ap_id": self.base.ap_id[rows],
+            "lat": self.base.lat[rows],
+            "lon": self.base.lon[rows],
+        })
+
+
+# ===============================
+# 기준 상태 (데이터 버전별 1회 계산, 세션 간 공유)
+# ===============================
+
+BASE_COLUMNS = [
+    "ap_id", "gu", "lat", "lon", "usage_gb", "install_year", "age_norm", "usage_norm",
+    "usage_norm_log", "density_norm", "cluster_k3", "cluster_k3_rank",
+]
+
+
+def neighbors_path(version):
+    """버전별 반경 이웃 수 / 가장 가까운 다른 AP 거리 (counts, nearest)"""
+    return os.path.join(cache_dir(), f"ap_neighbors.{version}.{DENSITY_RADIUS_M:g}m.npz")
+
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _build_base(version):
+    df = load_ap_data(BASE_COLUMNS)
+
+    # 기준 이웃 수는 대규모 데이터에서 가장 오래 걸리므로 버전별로 디스크에 저장
+    path = neighbors_path(version)
+    if os.path.exists(path):
+        record_cache("scenario.base", "disk")
+        with np.load(path) as saved:
+            counts = saved["counts"]
+    else:
+        record_cache("scenario.base", "miss")
+        with span("scenario.neighbor_counts", rows=len(df)):
+            counts, nearest = neighbor_stats(df["lat"].to_numpy(), df["lon"].to_numpy())
+        counts = counts.astype(np.int32)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, counts=counts, nearest=nearest)
+        os.replace(tmp_path, path)
+
+    with span("scenario.build_base", rows=len(df)):
+        # 편집한 행의 점수는 스냅샷의 기준값(core.ingest와 같은 feature_state)으로 계산
+        state = snapshot_metadata(version).get("feature_state")
+        if state is None or "usage" not in state:
+            state = feature_state(df, base=version)
+        return ScenarioBase(df, counts, state, get_coverage(), get_id_index())
+
+
+@cache_lookup("scenario.base")
+def get_scenario_base():
+    """현재 데이터 버전의 시뮬레이션 기준 상태 (세션 간 공유, 읽기 전용)"""
+    return _build_base(data_version())
@@ -0,0 +1,383 @@
+import numpy as np
+import streamlit as st
+
+from core.ap_data import VERSION_CACHE_ENTRIES, data_version, load_ap_data
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# 거리 계산 / 평면 투영
+# ===============================
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# 서울시청 기준 등거리 원통 투영 (서울 범위에서 오차 0.3% 이내)
+REF_LAT = 37.5665
+REF_LON = 126.9780
+
+# 투영 오차만큼 후보 탐색 범위를 넉넉하게 잡음
+_SEARCH_PAD = 1.01
+
+# 최근접 탐색 시작 고리를 미리 계산하는 최대 거리 (격자 칸 수)
+_MAX_START_RING = 64
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """두 지점(또는 배열) 사이의 대원 거리(m), 벡터 연산"""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def project(lat, lon):
+    """위경도를 서울 기준 평면 좌표(m)로 변환"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    x = np.radians(lon - REF_LON) * EARTH_RADIUS_M * np.cos(np.radians(REF_LAT))
+    y = np.radians(lat - REF_LAT) * EARTH_RADIUS_M
+    return x, y
+
+
+# ===============================
+# 격자 기반 공간 인덱스
+# ===============================
+
+def _ring_offsets(ring):
+    """중심 칸에서 체비셰프 거리가 정확히 ring인 칸들의 (dx 배열, dy 배열)"""
+    if ring == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    side = np.arange(-ring, ring + 1)
+    inner = side[1:-1]
+    dx = np.concatenate([side, side, np.full(len(inner), -ring), np.full(len(inner), ring)])
+    dy = np.concatenate([np.full(len(side), -ring), np.full(len(side), ring), inner, inner])
+    return dx, dy
+
+
+def _chebyshev_transform(occupied, max_ring):
+    """
+    bool 격자에서 칸마다 True 칸까지의 체비셰프 거리, max_ring에서 자름
+    (행 방향 1차원 거리 → 위아래 max_ring 행까지 최소화)
+    """
+    ny, nx = occupied.shape
+    x = np.arange(nx)
+    big = nx + ny + max_ring
+
+    # 같은 행 안에서 가장 가까운 True 칸까지의 거리
+    left = np.maximum.accumulate(np.where(occupied, x, -big), axis=1)
+    right = np.minimum.accumulate(np.where(occupied, x, 2 * big)[:, ::-1], axis=1)[:, ::-1]
+    row_dist = np.minimum(np.minimum(x - left, right - x), max_ring)
+
+    rings = row_dist.copy()
+    for dy in range(1, min(ny, max_ring)):
+        rings[dy:] = np.minimum(rings[dy:], np.maximum(row_dist[:-dy], dy))
+        rings[:-dy] = np.minimum(rings[:-dy], np.maximum(row_dist[dy:], dy))
+    return rings
+
+
+class GridIndex:
+    """
+    평면 좌표를 cell_m 크기 격자로 나눠 정렬해 둔 공간 인덱스.
+    반환하는 위치(index)는 생성 시 넘긴 배열의 순서(0 ~ n-1)를 따른다.
+    """
+
+    def __init__(self, lat, lon, cell_m=250.0):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_m = float(cell_m)
+
+        x, y = project(self.lat, self.lon)
+        if len(x) == 0:
+            x = y = np.zeros(1)
+
+        self.x0 = float(x.min())
+        self.y0 = float(y.min())
+        cx, cy = self._cell_of(x, y)
+        self.nx = int(cx.max()) + 1
+        self.ny = int(cy.max()) + 1
+
+        keys = cy[: len(self.lat)] * self.nx + cx[: len(self.lat)]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+        # 격자 전체를 덮는 대각선 길이 (kNN 탐색 종료 조건)
+        self.span_m = float(np.hypot(self.nx, self.ny) * self.cell_m)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _cell_of(self, x, y):
+        cx = np.floor((np.asarray(x) - self.x0) / self.cell_m).astype(np.int64)
+        cy = np.floor((np.asarray(y) - self.y0) / self.cell_m).astype(np.int64)
+        return cx, cy
+
+    def _candidates_in_box(self, xmin, xmax, ymin, ymax):
+        """평면 사각형과 겹치는 격자 칸에 속한 점 위치 (정확한 판정 전 후보)"""
+        (cx0, cx1), (cy0, cy1) = self._cell_of([xmin, xmax], [ymin, ymax])
+        cx0, cx1 = max(cx0, 0), min(cx1, self.nx - 1)
+        cy0, cy1 = max(cy0, 0), min(cy1, self.ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+
+        # 격자 한 행(cy)의 칸들은 key가 연속이므로 행마다 구간 하나로 찾음
+        rows = np.arange(cy0, cy1 + 1) * self.nx
+        lo = np.searchsorted(self.sorted_keys, rows + cx0, side="left")
+        hi = np.searchsorted(self.sorted_keys, rows + cx1, side="right")
+        lengths = hi - lo
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(lo - offsets, lengths) + np.arange(total)
+        return self.order[positions]
+
+    def query_bbox(self, south, west, north, east):
+        """위경도 사각형(남, 서, 북, 동) 안의 점 위치 (생성 시 순서대로 정렬)"""
+        # 투영이 위도/경도 각각의 1차 함수라 사각형은 평면에서도 사각형
+        (xmin, xmax), (ymin, ymax) = project([south, north], [west, east])
+        cand = self._candidates_in_box(xmin, xmax, ymin, ymax)
+        lat, lon = self.lat[cand], self.lon[cand]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(cand[inside])
+
+    def distances(self, lat, lon):
+        """한 지점에서 모든 점까지의 거리(m) - 인덱스 없이 전체 계산하는 fallback"""
+        return haversine_m(lat, lon, self.lat, self.lon)
+
+    def query_radius(self, lat, lon, radius_m):
+        """반경 radius_m 안의 점 (위치, 거리)를 가까운 순으로 반환"""
+        x, y = project(lat, lon)
+        pad = radius_m * _SEARCH_PAD + 1.0
+        cand = self._candidates_in_box(x - pad, x + pad, y - pad, y + pad)
+
+        dist = haversine_m(lat, lon, self.lat[cand], self.lon[cand])
+        inside = dist <= radius_m
+        cand, dist = cand[inside], dist[inside]
+
+        order = np.argsort(dist, kind="stable")
+        return cand[order], dist[order]
+
+    def query_knn(self, lat, lon, k=10):
+        """가장 가까운 k개 점 (위치, 거리)를 가까운 순으로 반환"""
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        x, y = project(lat, lon)
+        reach = self.span_m + float(np.hypot(x - self.x0, y - self.y0))
+
+        # 반경을 두 배씩 넓히며 k개가 모일 때까지 탐색
+        radius = self.cell_m
+        while radius <= reach:
+            idx, dist = self.query_radius(lat, lon, radius)
+            if len(idx) >= k:
+                return idx[:k], dist[:k]
+            radius *= 2
+
+        dist = self.distances(lat, lon)
+        idx = np.argsort(dist, kind="stable")[:k]
+        return idx, dist[idx]
+
+    def count_within(self, lat, lon, radius_m, chunk_size=100_000, weights=None):
+        """
+        여러 지점 각각에 대해 반경 radius_m 안의 점 개수 (벡터 연산).
+        weights((점,) 또는 (점, k) 배열)를 주면 개수 대신 반경 안 점들의 값 합계를 돌려준다.
+        지점을 chunk_size개씩 나눠 계산하므로 메모리는 chunk 크기에 비례한다.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        if weights is None:
+            columns = [None]
+            counts = np.zeros((len(lat), 1), dtype=np.int64)
+        else:
+            weights = np.asarray(weights, dtype=float)
+            columns = list(weights.reshape(len(weights), -1).T)
+            counts = np.zeros((len(lat), len(columns)))
+        reach = int(np.ceil(radius_m * _SEARCH_PAD / self.cell_m))
+
+        for start in range(0, len(lat), chunk_size):
+            qlat = lat[start:start + chunk_size]
+            qlon = lon[start:start + chunk_size]
+            qcx, qcy = self._cell_of(*project(qlat, qlon))
+            n = len(qlat)
+
+            # 주변 격자 칸을 하나씩 옮겨가며 모든 지점을 한 번에 처리
+            for oy in range(-reach, reach + 1):
+                for ox in range(-reach, reach + 1):
+                    cx, cy = qcx + ox, qcy + oy
+                    valid = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+                    keys = np.where(valid, cy * self.nx + cx, -1)
+                    lo = np.searchsorted(self.sorted_keys, keys, side="left")
+                    hi = np.searchsorted(self.sorted_keys, keys, side="right")
+                    lengths = np.where(valid, hi - lo, 0)
+                    total = int(lengths.sum())
+                    if total == 0:
+                        continue
+
+                    query = np.repeat(np.arange(n), lengths)
+                    offsets = np.cumsum(lengths) - lengths
+                    cand = self.order[np.repeat(lo - offsets, lengths) + np.arange(total)]
+                    dist = haversine_m(qlat[query], qlon[query], self.lat[cand], self.lon[cand])
+                    hit = dist <= radius_m
+                    for j, column in enumerate(columns):
+                        counts[start:start + n, j] += np.bincount(
+                            query[hit], weights=None if column is None else column[cand[hit]],
+                            minlength=n,
+                        )
+
+        if weights is None or weights.ndim == 1:
+            return counts[:, 0]
+        return counts
+
+    def pairs_within(self, lat, lon, radius_m):
+        """
+        여러 지점 각각의 반경 radius_m 안 점을 (지점 번호, 점 위치, 거리 m) 배열 세 개로 반환.
+        radius_m은 지점마다 다른 배열이어도 된다. 결과 크기가 지점 × 반경 안 점 수이므로
+        지점이 많으면 나눠서 부를 것.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        radius_m = np.broadcast_to(np.asarray(radius_m, dtype=float), lat.shape)
+        qcx, qcy = self._cell_of(*project(lat, lon))
+        query_reach = np.ceil(radius_m * _SEARCH_PAD / self.cell_m).astype(np.int64)
+        reach = int(query_reach.max()) if len(lat) else -1
+
+        queries, points, dists = [], [], []
+        for oy in range(-reach, reach + 1):
+            for ox in range(-reach, reach + 1):
+                cx, cy = qcx + ox, qcy + oy
+                valid = ((cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+                         & (query_reach >= max(abs(ox), abs(oy))))
+                keys = np.where(valid, cy * self.nx + cx, -1)
+                lo = np.searchsorted(self.sorted_keys, keys, side="left")
+                hi = np.searchsorted(self.sorted_keys, keys, side="right")
+                lengths = np.where(valid, hi - lo, 0)
+                total = int(lengths.sum())
+                if total == 0:
+                    continue
+
+                query = np.repeat(np.arange(len(lat)), lengths)
+                offsets = np.cumsum(lengths) - lengths
+                cand = self.order[np.repeat(lo - offsets, lengths) + np.arange(total)]
+                dist = haversine_m(lat[query], lon[query], self.lat[cand], self.lon[cand])
+                hit = dist <= radius_m[query]
+                queries.append(query[hit])
+                points.append(cand[hit])
+                dists.append(dist[hit])
+
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(queries), np.concatenate(points), np.concatenate(dists)
+
+    def _start_ring(self, cx, cy, max_ring=_MAX_START_RING):
+        """
+        지점 칸마다 점이 있는 칸까지의 체비셰프 거리 하한 (max_ring에서 자름).
+        지점들을 둘러싼 창(±max_ring 칸) 안의 점만 보므로 계산량은 격자 전체가 아니라 창 크기에 비례
+        (창 밖의 점은 어느 지점에서든 max_ring 칸보다 멀다).
+        """
+        outside = np.maximum(
+            np.maximum(-cx, cx - (self.nx - 1)).clip(min=0),
+            np.maximum(-cy, cy - (self.ny - 1)).clip(min=0),
+        )
+        x0, x1 = max(int(cx.min()) - max_ring, 0), min(int(cx.max()) + max_ring, self.nx - 1)
+        y0, y1 = max(int(cy.min()) - max_ring, 0), min(int(cy.max()) + max_ring, self.ny - 1)
+        if x0 > x1 or y0 > y1:
+            return outside
+
+        occupied = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=bool)
+        ky, kx = np.divmod(np.unique(self.sorted_keys), self.nx)
+        keep = (kx >= x0) & (kx <= x1) & (ky >= y0) & (ky <= y1)
+        occupied[ky[keep] - y0, kx[keep] - x0] = True
+
+        rings = _chebyshev_transform(occupied, max_ring)
+        return np.maximum(rings[np.clip(cy, y0, y1) - y0, np.clip(cx, x0, x1) - x0], outside)
+
+    def _nearest_step(self, qlat, qlon, qcx, qcy, active, ox, oy, idx, dist):
+        """지점(active)마다 격자 칸 (ox, oy)만큼 옮긴 칸들의 점으로 최근접 결과(idx, dist) 갱신"""
+        cx = (qcx[active][:, None] + ox).ravel()
+        cy = (qcy[active][:, None] + oy).ravel()
+        valid = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+        keys = np.where(valid, cy * self.nx + cx, -1)
+        lo = np.searchsorted(self.sorted_keys, keys, side="left")
+        hi = np.searchsorted(self.sorted_keys, keys, side="right")
+        lengths = np.where(valid, hi - lo, 0)
+        total = int(lengths.sum())
+        if total == 0:
+            return
+
+        offsets = np.cumsum(lengths) - lengths
+        cand = self.order[np.repeat(lo - offsets, lengths) + np.arange(total)]
+        query = np.repeat(np.repeat(active, len(ox)), lengths)
+        d = haversine_m(qlat[query], qlon[query], self.lat[cand], self.lon[cand])
+
+        # 지점별 후보가 연속 구간이라 구간별 최솟값으로 갱신
+        per_query = lengths.reshape(len(active), len(ox)).sum(axis=1)
+        has = per_query > 0
+        starts = (np.cumsum(per_query) - per_query)[has]
+        seg_min = np.minimum.reduceat(d, starts)
+        better = seg_min < dist[active[has]]
+        won = (d == np.repeat(seg_min, per_query[has])) & np.repeat(better, per_query[has])
+        dist[query[won]] = d[won]
+        idx[query[won]] = cand[won]
+
+    def nearest(self, lat, lon, chunk_size=100_000):
+        """
+        여러 지점 각각의 가장 가까운 점 (위치, 거리 m) - 벡터 연산.
+        격자 칸을 고리(ring) 단위로 넓혀 가며 찾는다. 점이 있는 칸이 처음 나오는 고리부터 보고,
+        다음 고리가 지금까지 찾은 거리보다 멀어지면 그 지점은 탐색을 끝낸다.
+        (점이 없으면 위치 -1, 거리 inf)
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        best_idx = np.full(len(lat), -1, dtype=np.int64)
+        best_dist = np.full(len(lat), np.inf)
+        if len(self) == 0:
+            return best_idx, best_dist
+
+        for start in range(0, len(lat), chunk_size):
+            qlat = lat[start:start + chunk_size]
+            qlon = lon[start:start + chunk_size]
+            qcx, qcy = self._cell_of(*project(qlat, qlon))
+            idx = best_idx[start:start + chunk_size]
+            dist = best_dist[start:start + chunk_size]
+            first = self._start_ring(qcx, qcy)
+            pending = np.arange(len(qlat))
+
+            ring = int(first.min())
+            while len(pending):
+                active = pending[first[pending] <= ring]
+                ox, oy = _ring_offsets(ring)
+                # 남은 지점이 적으면 고리의 여러 칸을 한 번에 계산 (지점 × 칸 쌍이 chunk_size 이하)
+                block = max(1, chunk_size // max(len(active), 1))
+                for b in range(0, len(ox) if len(active) else 0, block):
+                    self._nearest_step(qlat, qlon, qcx, qcy, active, ox[b:b + block], oy[b:b + block],
+                                       idx, dist)
+
+                # 다음 고리의 점은 적어도 ring 칸만큼 떨어져 있음
+                done = dist[pending] * _SEARCH_PAD <= ring * self.cell_m
+                pending = pending[~done]
+                ring += 1
+
+        return best_idx, best_dist
+
+
+# ===============================
+# 전체 AP 인덱스 (데이터 버전별 1회 생성, 세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _build_ap_index(version):
+    record_cache("spatial.ap_index", "miss")
+    df = load_ap_data(["lat", "lon"])
+    with span("spatial.build_index", rows=len(df)):
+        return GridIndex(df["lat"].to_numpy(), df["lon"].to_numpy())
+
+
+@cache_lookup("spatial.ap_index")
+def get_ap_index():
+    """load_ap_data()의 행 순서와 같은 순서의 전체 AP 공간 인덱스"""
+    return _build_ap_index(data_version())
@@ -0,0 +1,354 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.ap_data import COLUMN_DTYPES, CSV_PATH, normalize_ap_id
+from core.features import (
+    CLUSTER_FEATURES, DENSITY_RADIUS_M, age_norm, assign_clusters, cluster_ranks, density_norm,
+    kmeans, usage_norm, usage_norm_log, usage_state,
+)
+from core.geometry import GEOJSON_PATH, geometry_polygons
+from core.spatial import EARTH_RADIUS_M, REF_LAT, project
+
+# ===============================
+# 부하 테스트용 합성 AP 데이터 생성
+# ===============================
+# AP_data.csv와 같은 컬럼/스키마의 데이터를 원하는 행 수만큼 만든다.
+#
+#   python -m core.synthetic 1000000 data/cache/AP_data.synthetic.parquet
+#
+# - 위치: 구 경계 polygon 안. 구별 AP 수 비율은 실제 데이터를 따르고,
+#   구마다 몇 개의 거점(hotspot) 주변에 몰리게 + 나머지는 구 전체에 고르게 배치
+# - 한 주소(site)에 AP 여러 대: 실제 데이터의 같은 좌표 AP 수 분포를 그대로 사용
+# - 설치연도 / 설치유형 / 실내외: 같은 구의 실제 AP 한 대를 골라 site 단위로 복사
+# - usage_gb: 설치유형 + 구별 log1p 평균/표준편차에 꼬리가 두꺼운 t 분포 잡음
+# - 점수 컬럼: core.features와 같은 식. 전체 데이터가 있어야 정해지는 값
+#   (구별 평균 이용량과 배율 상한, 군집 중심)은 먼저 작은 pilot 표본으로 정해 둔다.
+#   밀집도는 생성 분포에서 반경 안 이웃 수 / 가장 가까운 이웃 거리를 뽑아 계산해서
+#   chunk끼리 서로 볼 필요가 없다.
+#
+# 한 번에 chunk_size행씩 만들어 Parquet에 바로 쓰므로 메모리는 출력 크기와 무관하다.
+
+DEFAULT_CHUNK_SIZE = 100_000
+PILOT_ROWS = 30_000
+
+HOTSPOTS_PER_GU = 24
+HOTSPOT_SIGMA_M = 250.0
+HOTSPOT_SHARE = 0.6
+
+# log1p(usage_gb) 잡음: 자유도 6 t 분포 (분산 1로 맞춤)
+USAGE_TAIL_DF = 6
+
+GU_PROPERTY = "SIG_KOR_NM"
+
+_M_PER_DEG_LAT = math.radians(1) * EARTH_RADIUS_M
+_M_PER_DEG_LON = _M_PER_DEG_LAT * math.cos(math.radians(REF_LAT))
+
+
+# ===============================
+# polygon 유틸
+# ===============================
+
+def points_in_polygons(lon, lat, polygons, edge_chunk=256, point_chunk=16_384):
+    """
+    even-odd 규칙 점-다각형 포함 판정 (구멍 / 여러 조각 포함), 벡터 연산.
+    (점 point_chunk개 × 변 edge_chunk개) 블록씩 계산해서 메모리를 일정하게 유지
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    inside = np.zeros(len(lon), dtype=bool)
+
+    rings = [ring for polygon in polygons for ring in polygon]
+    x1 = np.concatenate([r[:-1, 0] for r in rings])
+    y1 = np.concatenate([r[:-1, 1] for r in rings])
+    x2 = np.concatenate([r[1:, 0] for r in rings])
+    y2 = np.concatenate([r[1:, 1] for r in rings])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (x2 - x1) / (y2 - y1)
+
+    for p in range(0, len(lon), point_chunk):
+        px = lon[p:p + point_chunk, None]
+        py = lat[p:p + point_chunk, None]
+        odd = np.zeros(len(px), dtype=bool)
+        for e in range(0, len(x1), edge_chunk):
+            ey1, ey2 = y1[e:e + edge_chunk], y2[e:e + edge_chunk]
+            crosses = (ey1 > py) != (ey2 > py)
+            x_at = x1[e:e + edge_chunk] + (py - ey1) * slope[e:e + edge_chunk]
+            odd ^= (crosses & (px < x_at)).sum(axis=1) % 2 == 1
+        inside[p:p + point_chunk] = odd
+
+    return inside
+
+
+def _polygon_area_m2(polygons):
+    area = 0.0
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            x, y = project(ring[:, 1], ring[:, 0])
+            ring_area = abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+            area += ring_area if i == 0 else -ring_area
+    return area
+
+
+class _District:
+    """구 하나의 경계 / 면적 / 거점"""
+
+    def __init__(self, name, geometry, rng):
+        self.name = name
+        self.polygons = geometry_polygons(geometry)
+        points = np.concatenate([p[0] for p in self.polygons])
+        self.lon_min, self.lat_min = points.min(axis=0)
+        self.lon_max, self.lat_max = points.max(axis=0)
+        self.area_m2 = _polygon_area_m2(self.polygons)
+        self.hot_lon, self.hot_lat = self.sample_uniform(HOTSPOTS_PER_GU, rng)
+
+    def _fill(self, n, rng, draw):
+        lon_out, lat_out, have = [], [], 0
+        while have < n:
+            lon, lat = draw(max(2 * (n - have), 64))
+            keep = points_in_polygons(lon, lat, self.polygons)
+            lon_out.append(lon[keep])
+            lat_out.append(lat[keep])
+            have += int(keep.sum())
+        return np.concatenate(lon_out)[:n], np.concatenate(lat_out)[:n]
+
+    def sample_uniform(self, n, rng):
+        return self._fill(n, rng, lambda m: (
+            rng.uniform(self.lon_min, self.lon_max, m),
+            rng.uniform(self.lat_min, self.lat_max, m),
+        ))
+
+    def sample_hotspots(self, n, rng):
+        def draw(m):
+            h = rng.integers(len(self.hot_lon), size=m)
+            return (
+                self.hot_lon[h] + rng.normal(0, HOTSPOT_SIGMA_M, m) / _M_PER_DEG_LON,
+                self.hot_lat[h] + rng.normal(0, HOTSPOT_SIGMA_M, m) / _M_PER_DEG_LAT,
+            )
+        return self._fill(n, rng, draw)
+
+    def site_intensity(self, lon, lat, n_sites):
+        """생성 분포 기준 site 밀도 (개/m²) - polygon 밖으로 잘린 부분은 무시한 근사"""
+        dx = (np.asarray(lon)[:, None] - self.hot_lon[None, :]) * _M_PER_DEG_LON
+        dy = (np.asarray(lat)[:, None] - self.hot_lat[None, :]) * _M_PER_DEG_LAT
+        gauss = np.exp(-(dx ** 2 + dy ** 2) / (2 * HOTSPOT_SIGMA_M ** 2)) / (2 * np.pi * HOTSPOT_SIGMA_M ** 2)
+        return n_sites * (HOTSPOT_SHARE * gauss.mean(axis=1) + (1 - HOTSPOT_SHARE) / self.area_m2)
+
+
+# ===============================
+# 생성기
+# ===============================
+
+class SyntheticAPGenerator:
+    """
+    n_rows개 합성 AP를 chunk 단위로 만드는 생성기 (seed가 같으면 결과도 같음).
+    reference: 분포를 따라 할 실제 AP 데이터 CSV
+    """
+
+    def __init__(self, n_rows, seed=0, reference=CSV_PATH, geojson=GEOJSON_PATH):
+        self.n_rows = int(n_rows)
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        ref = pd.read_csv(reference)
+        with open(geojson, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        self.districts = {
+            name: _District(name, feat["geometry"], rng)
+            for feat in features
+            for name in [feat["properties"][GU_PROPERTY]]
+        }
+        ref = ref[ref["gu"].isin(list(self.districts))]
+        self.reference = ref[
+            ["gu", "install_year", "install_type_code", "install_type", "indoor_outdoor"]
+        ].reset_index(drop=True)
+
+        # 구별 AP 수 (실제 비율대로 다항 분포)
+        share = ref["gu"].value_counts(normalize=True).reindex(list(self.districts), fill_value=0)
+        self.gu_rows = dict(zip(share.index, rng.multinomial(self.n_rows, share.to_numpy())))
+
+        # 같은 좌표 AP 수 분포
+        self.site_sizes = ref.groupby(["lat", "lon"]).size().to_numpy()
+        self.mean_site_size = float(self.site_sizes.mean())
+
+        # 이용량: log1p 기준 설치유형 평균 + 구 효과, 설치유형 표준편차
+        log_usage = np.log1p(ref["usage_gb"])
+        overall = log_usage.mean()
+        self.usage_mu_type = log_usage.groupby(ref["install_type"]).mean().to_dict()
+        self.usage_sd_type = log_usage.groupby(ref["install_type"]).std().fillna(log_usage.std()).to_dict()
+        self.usage_gu_shift = (log_usage.groupby(ref["gu"]).mean() - overall).to_dict()
+        self.usage_range = (float(ref["usage_gb"].min()), float(ref["usage_gb"].max()) * 4)
+
+        # 점수 정규화 범위 (생성 분포의 범위로 고정)
+        self.year_range = (float(ref["install_year"].min()), float(ref["install_year"].max()))
+        self.log_usage_range = tuple(np.log1p(self.usage_range))
+
+        # 범주형 컬럼은 chunk마다 같은 범주 목록을 써야 Parquet 스키마가 같아짐
+        self.categories = {
+            "gu": list(self.districts),
+            "install_type": sorted(ref["install_type"].unique()),
+            "indoor_outdoor": sorted(ref["indoor_outdoor"].unique()),
+        }
+
+        self._fit_pilot()
+
+    # -------------------------------
+    # 원본 컬럼 (점수 제외)
+    # -------------------------------
+
+    def _sites_for(self, n, rng):
+        sizes = rng.choice(self.site_sizes, size=max(1, int(n / self.mean_site_size * 1.2) + 8))
+        while sizes.sum() < n:
+            sizes = np.concatenate([sizes, rng.choice(self.site_sizes, size=len(sizes))])
+        cut = int(np.searchsorted(np.cumsum(sizes), n))
+        sizes = sizes[:cut + 1].copy()
+        sizes[-1] -= sizes.sum() - n
+        return sizes
+
+    def _raw_chunk(self, gu, n, rng):
+        district = self.districts[gu]
+        sizes = self._sites_for(n, rng)
+        n_sites = len(sizes)
+
+        hot = rng.random(n_sites) < HOTSPOT_SHARE
+        lon = np.empty(n_sites)
+        lat = np.empty(n_sites)
+        lon[hot], lat[hot] = district.sample_hotspots(int(hot.sum()), rng)
+        lon[~hot], lat[~hot] = district.sample_uniform(int((~hot).sum()), rng)
+
+        # site마다 같은 구의 실제 AP 하나를 골라 설치 정보 복사
+        pool = np.flatnonzero(self.reference["gu"].to_numpy() == gu)
+        if len(pool) == 0:
+            pool = np.arange(len(self.reference))
+        site_ref = self.reference.iloc[rng.choice(pool, size=n_sites)].reset_index(drop=True)
+
+        row_site = np.repeat(np.arange(n_sites), sizes)
+        df = site_ref.iloc[row_site].reset_index(drop=True)
+        df["gu"] = gu
+        df["lon"] = lon[row_site]
+        df["lat"] = lat[row_site]
+        df["address"] = [f"{gu} 합성로 {s}" for s in row_site]
+
+        install_type = df["install_type"].to_numpy()
+        mu = np.vectorize(self.usage_mu_type.get)(install_type) + self.usage_gu_shift.get(gu, 0.0)
+        sd = np.vectorize(self.usage_sd_type.get)(install_type)
+        noise = rng.standard_t(USAGE_TAIL_DF, n) * np.sqrt((USAGE_TAIL_DF - 2) / USAGE_TAIL_DF)
+        df["usage_gb"] = np.clip(np.expm1(mu + sd * noise), *self.usage_range)
+
+        # 반경 안 이웃 = 같은 site의 다른 AP(거리 0) + 주변 site AP
+        # 주변 AP 수는 site 밀도 × 면적 × site당 AP 수를 평균으로 하는 Poisson,
+        # 그중 가장 가까운 AP 거리는 원 안 균등 분포 k개의 최솟값 (R·sqrt(Beta(1, k)))
+        n_sites_gu = self.gu_rows[gu] / self.mean_site_size
+        intensity = district.site_intensity(lon, lat, n_sites_gu)
+        expected = intensity * np.pi * DENSITY_RADIUS_M ** 2 * self.mean_site_size
+        around = rng.poisson(expected[row_site])
+        with np.errstate(divide="ignore"):
+            nearest = DENSITY_RADIUS_M * np.sqrt(1.0 - rng.random(n) ** (1.0 / around))
+        nearest = np.where(around > 0, nearest, np.inf)
+        df["_neighbors"] = (sizes - 1)[row_site] + around
+        df["_nearest_m"] = np.where(sizes[row_site] > 1, 0.0, nearest)
+        return df
+
+    # -------------------------------
+    # 점수 컬럼
+    # -------------------------------
+
+    def _fit_pilot(self):
+        """작은 표본으로 구별 이용량 기준값 / 군집 중심 결정"""
+        rng = np.random.default_rng(self.seed + 1)
+        total = sum(self.gu_rows.values()) or 1
+        parts = [
+            self._raw_chunk(gu, max(200, round(PILOT_ROWS * n / total)), rng)
+            for gu, n in self.gu_rows.items()
+        ]
+        pilot = pd.concat(parts, ignore_index=True)
+
+        self.usage_state = usage_state(pilot["usage_gb"], pilot["gu"])
+
+        scored = self._scores(pilot, with_clusters=False)
+        labels, centers = kmeans(scored[CLUSTER_FEATURES].to_numpy())
+        ranks = cluster_ranks(centers)
+        # compute_features와 같이 군집 번호 = 위험도 순서
+        self.cluster_state = {
+            "labels": ranks.tolist(),
+            "centers": centers.tolist(),
+            "ranks": ranks.tolist(),
+        }
+
+    def _scores(self, df, with_clusters=True):
+        df["age_norm"] = age_norm(df["install_year"], self.year_range)
+        df["usage_norm"] = usage_norm(df["usage_gb"], df["gu"], self.usage_state)
+        df["usage_norm_log"] = usage_norm_log(df["usage_gb"], self.log_usage_range)
+        df["density_norm"] = density_norm(df["_nearest_m"], df["_neighbors"])
+        if with_clusters:
+            labels, ranks = assign_clusters(df[CLUSTER_FEATURES].to_numpy(), self.cluster_state)
+            df["cluster_k3"] = labels
+            df["cluster_k3_rank"] = ranks
+        return df
+
+    # -------------------------------
+    # chunk 생성 / 저장
+    # -------------------------------
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """AP_data.csv 스키마의 DataFrame을 chunk_size행 이하씩 생성"""
+        rng = np.random.default_rng(self.seed + 2)
+        next_id = 1
+        for gu, n_gu in self.gu_rows.items():
+            for start in range(0, n_gu, chunk_size):
+                n = min(chunk_size, n_gu - start)
+                df = self._scores(self._raw_chunk(gu, n, rng))
+                df["ap_id"] = normalize_ap_id(pd.Series(np.arange(next_id, next_id + n)))
+                next_id += n
+                yield self._with_schema(df)
+
+    def _with_schema(self, df):
+        df = df[list(COLUMN_DTYPES)].copy()
+        for col, dtype in COLUMN_DTYPES.items():
+            if col in self.categories:
+                df[col] = pd.Categorical(df[col], categories=self.categories[col])
+            else:
+                df[col] = df[col].astype(dtype)
+        return df
+
+    def write_parquet(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """chunk마다 Parquet row group으로 바로 기록. 쓴 행 수 반환"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        writer = None
+        rows = 0
+        try:
+            for df in self.chunks(chunk_size):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+                rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, path)
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="부하 테스트용 합성 AP 데이터 생성")
+    parser.add_argument("rows", type=int, help="생성할 AP 수")
+    parser.add_argument("output", help="출력 Parquet 경로")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = SyntheticAPGenerator(args.rows, seed=args.seed).write_parquet(args.output, args.chunk_size)
+    print(f"{rows:,}행 생성: {time.perf_counter() - start:.1f}초 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import (
+    DATA_DIR, VERSION_CACHE_ENTRIES, cache_dir, data_version, file_hash, load_ap_data,
+    normalize_ap_id,
+)
+from core.ap_index import get_id_index
+from core.profiling import cache_lookup, record_cache, span
+
+# ===============================
+# 사용자 1명당 예상 Wi-Fi 처리량 (Mbps) 회귀 모델
+# ===============================
+# log(처리량) = AP 항 + 거리 항 (선형 회귀, 계수는 JSON 배열로 저장)
+#   AP 항:   1, log(동시 사용자 수), age_norm, 실내 여부, density_norm, 설치유형 (공공시설 기준 더미)
+#   거리 항: log1p(거리 / 10m), 거리 / 100m
+# 예측은 NumPy 행렬곱 한 번이다. AP 항은 데이터 버전마다 전체 AP에 대해 한 번 계산해 두고
+# 지점별 예측은 (AP 항 + 거리 항)의 exp (학습 측정값 최대치로 자름).
+# 동시 사용자 수는 1 + usage_gb / GB_PER_USER (합성 측정값과 같은 식)이라 처리량이 사용자 수에 반비례하는 관계를
+# 로그 공간에서 그대로 맞출 수 있다.
+#
+#   python -m core.throughput train [측정.csv] [--simulate 200000]   # 학습 + holdout 평가 → 모델 저장
+#   python -m core.throughput predict                                  # 서울 전체 예측 시간
+#
+# 측정 CSV(속도 측정 기록): ap_id, distance_m, throughput_mbps
+# 측정 기록이 없으면 simulate_measurements()의 합성 측정값으로 학습한다 (아래 가정 참고).
+# 이때 holdout도 같은 생성식에서 나온 값이라 실제 정확도가 아니라 생성식을 얼마나 되찾는지만 보여준다
+# → 지표는 metrics["self_check"]에 따로 두고, 사용자 화면의 정렬 / 속도 표시에는 쓰지 않는다.
+
+MODEL_PATH = os.path.join(DATA_DIR, "throughput_model.json")
+
+INSTALL_TYPES = ["공공시설", "주요거리", "복지시설", "공원(하천)", "문화관광", "버스정류소", "전통시장"]
+AP_FEATURES = ["log_users", "age_norm", "indoor", "density_norm"] + [
+    f"type:{t}" for t in INSTALL_TYPES[1:]
+]
+DISTANCE_FEATURES = ["log_distance", "distance_100m"]
+
+# 모델 입력 AP 컬럼
+MODEL_COLUMNS = ["usage_gb", "age_norm", "indoor_outdoor", "density_norm", "install_type"]
+
+# 거리를 모를 때(AP 자체 비교) 쓰는 기준 거리
+REFERENCE_DISTANCE_M = 10.0
+
+# 이용량(GB) → 동시 사용자 수 환산 (사용자 1명당 GB)
+GB_PER_USER = 100.0
+
+# 0~1 점수로 바꿀 때 1로 보는 속도: 전체 AP 예측의 상위 5%
+REFERENCE_QUANTILE = 0.95
+
+RIDGE = 1e-3
+HOLDOUT_SHARE = 0.2
+SEED = 42
+
+# ===============================
+# 합성 측정값 (실측 기록이 없을 때 학습용, 예시 가정)
+# ===============================
+# 처리량 = 세대별 최대 속도 × 설치유형 / 실내외 계수 × 거리 감쇠 × 간섭 / 동시 사용자 수 × 잡음
+#   - 세대: 설치연도 2016 미만 Wi-Fi 4, 2020 미만 Wi-Fi 5, 이후 Wi-Fi 6
+#   - 동시 사용자 수: 1 + usage_gb / GB_PER_USER
+#   - 거리 감쇠: 1 / (1 + (거리 / SIM_RANGE_M)^1.5), 측정 거리는 1 ~ SIM_MAX_DISTANCE_M
+#   - 간섭: 주변 AP가 많을수록 (density_norm) 감소, 잡음: 로그정규 (σ = SIM_NOISE)
+SIM_GENERATIONS = [(2016, 150.0), (2020, 400.0), (np.inf, 600.0)]
+SIM_TYPE_FACTORS = {"버스정류소": 0.75, "전통시장": 0.8, "주요거리": 0.85, "공원(하천)": 0.95}
+SIM_PLACEMENT_FACTORS = {"실내": 1.0, "실외": 0.85}
+SIM_RANGE_M = 60.0
+SIM_MAX_DISTANCE_M = 150.0
+SIM_INTERFERENCE = 0.4
+SIM_NOISE = 0.3
+
+
+def log_users(usage_gb):
+    """이용량(GB) → log(동시 사용자 수)"""
+    usage_gb = np.clip(np.asarray(usage_gb, dtype=float), 0.0, None)
+    return np.log1p(usage_gb / GB_PER_USER)
+
+
+def ap_design(frame):
+    """AP DataFrame(MODEL_COLUMNS) → AP 항 설계 행렬 (n, 1 + len(AP_FEATURES))"""
+    # 범주형 컬럼은 비교가 코드 단위라 문자열로 바꾸지 않는다
+    install_type = frame["install_type"]
+    columns = [
+        np.ones(len(frame)),
+        log_users(frame["usage_gb"]),
+        frame["age_norm"].to_numpy(dtype=float),
+        (frame["indoor_outdoor"] == "실내").to_numpy(dtype=float),
+        frame["density_norm"].to_numpy(dtype=float),
+    ] + [(install_type == t).to_numpy(dtype=float) for t in INSTALL_TYPES[1:]]
+    return np.nan_to_num(np.column_stack(columns))
+
+
+def _category_values(series, values, default=0.0):
+    """범주 → 값 (범주형이면 범주 수만큼만 찾고 코드로 펼침)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        table = np.array([values.get(c, default) for c in series.cat.categories] + [default])
+        return table[series.cat.codes.to_numpy()]
+    return series.map(values).astype(float).fillna(default).to_numpy()
+
+
+def distance_design(distance_m):
+    """거리 배열(모양 그대로) → 거리 항 설계 (..., len(DISTANCE_FEATURES))"""
+    distance_m = np.clip(np.asarray(distance_m, dtype=float), 0.0, None)
+    return np.stack([np.log1p(distance_m / 10.0), distance_m / 100.0], axis=-1)
+
+
+class ThroughputModel:
+    """log(Mbps) 선형 모델. coef = [AP 항 계수..., 거리 항 계수...]"""
+
+    def __init__(self, coef, metrics=None, reference_mbps=None, max_distance_m=None, max_mbps=None):
+        self.coef = np.asarray(coef, dtype=float)
+        self.metrics = dict(metrics or {})
+        self.reference_mbps = reference_mbps   # 0~1 점수로 바꿀 때 1로 보는 속도
+        self.max_distance_m = max_distance_m   # 학습한 측정 거리 상한 (넘으면 예측하지 않음)
+        self.max_mbps = max_mbps               # 학습 측정값 최대치 (예측 상한)
+
+    @property
+    def ap_coef(self):
+        return self.coef[:1 + len(AP_FEATURES)]
+
+    @property
+    def distance_coef(self):
+        return self.coef[1 + len(AP_FEATURES):]
+
+    def ap_term(self, frame):
+        """AP마다 log(Mbps)의 AP 항 (ap_design(frame) @ ap_coef와 같은 값, 행렬을 만들지 않고 컬럼별로)"""
+        coef = self.ap_coef
+        term = coef[0] + np.nan_to_num(
+            coef[1] * log_users(frame["usage_gb"])
+            + coef[2] * frame["age_norm"].to_numpy(dtype=float)
+            + coef[4] * frame["density_norm"].to_numpy(dtype=float)
+        )
+        term += _category_values(frame["indoor_outdoor"], {"실내": coef[3]})
+        term += _category_values(frame["install_type"], dict(zip(INSTALL_TYPES[1:], coef[5:])))
+        return term
+
+    def distance_term(self, distance_m):
+        return distance_design(distance_m) @ self.distance_coef
+
+    def predict(self, frame, distance_m=REFERENCE_DISTANCE_M, ap_term=None):
+        """
+        예상 처리량 (Mbps). distance_m은 숫자, (n,) 또는 (지점, n) 배열 (AP 축이 마지막).
+        ap_term을 미리 계산해 두었으면 frame 대신 그걸 쓴다.
+        학습한 거리 범위(max_distance_m)를 넘는 곳은 NaN (Wi-Fi 범위 밖, 외삽하지 않음),
+        학습 측정값 최대치(max_mbps)를 넘는 예측은 최대치로 자른다
+        """
+        if ap_term is None:
+            ap_term = self.ap_term(frame)
+        distance_m = np.asarray(distance_m, dtype=float)
+        mbps = np.exp(ap_term + self.distance_term(distance_m))
+        if self.max_mbps is not None:
+            mbps = np.minimum(mbps, self.max_mbps)
+        if self.max_distance_m is not None:
+            mbps = np.where(distance_m <= self.max_distance_m, mbps, np.nan)
+        return mbps
+
+    # -------------------------------
+    # 학습 / 저장
+    # -------------------------------
+
+    @staticmethod
+    def design(frame, distance_m):
+        return np.column_stack([ap_design(frame), distance_design(distance_m)])
+
+    @classmethod
+    def fit(cls, frame, distance_m, throughput_mbps, ridge=RIDGE):
+        """측정값(AP 행 frame, 거리, 처리량)으로 log 처리량 ridge 회귀 (절편은 벌점 없음)"""
+        x = cls.design(frame, distance_m)
+        y = np.log(np.clip(np.asarray(throughput_mbps, dtype=float), 1e-3, None))
+        penalty = np.sqrt(ridge) * np.eye(x.shape[1])[1:]
+        coef, *_ = np.linalg.lstsq(
+            np.vstack([x, penalty]), np.concatenate([y, np.zeros(len(penalty))]), rcond=None
+        )
+        model = cls(coef, max_distance_m=float(np.max(distance_m)),
+                    max_mbps=float(np.max(throughput_mbps)))
+        model.reference_mbps = float(np.quantile(model.predict(frame), REFERENCE_QUANTILE))
+        return model
+
+    def evaluate(self, frame, distance_m, throughput_mbps):
+        """holdout 지표: log 공간 RMSE / R², 상대 오차 중앙값, 오차 25% 이내 비율"""
+        actual = np.asarray(throughput_mbps, dtype=float)
+        predicted = self.predict(frame, distance_m)
+        log_err = np.log(predicted) - np.log(np.clip(actual, 1e-3, None))
+        log_actual = np.log(np.clip(actual, 1e-3, None))
+        rel = np.abs(predicted - actual) / np.clip(actual, 1e-3, None)
+        return {
+            "rows": int(len(actual)),
+            "rmse_log": float(np.sqrt(np.mean(log_err ** 2))),
+            "r2_log": float(1 - np.sum(log_err ** 2) / np.sum((log_actual - log_actual.mean()) ** 2)),
+            "median_rel_error": float(np.median(rel)),
+            "within_25pct": float(np.mean(rel <= 0.25)),
+        }
+
+    def save(self, path=MODEL_PATH):
+        payload = {
+            "target": "log(throughput_mbps)",
+            "features": ["bias"] + AP_FEATURES + DISTANCE_FEATURES,
+            "coef": [round(float(c), 8) for c in self.coef],
+            "reference_distance_m": REFERENCE_DISTANCE_M,
+            "reference_mbps": self.reference_mbps,
+            "max_distance_m": self.max_distance_m,
+            "max_mbps": self.max_mbps,
+            "metrics": self.metrics,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        expected = ["bias"] + AP_FEATURES + DISTANCE_FEATURES
+        if payload["features"] != expected:
+            raise ValueError(f"모델 특성 목록이 코드와 다릅니다: {path} (다시 학습 필요)")
+        return cls(payload["coef"], payload.get("metrics"), payload.get("reference_mbps"),
+                   payload.get("max_distance_m"), payload.get("max_mbps"))
+
+
+# ===============================
+# 학습 데이터
+# ===============================
+
+def simulate_measurements(n, seed=SEED):
+    """현재 AP 데이터에서 AP / 거리를 뽑아 가정한 식으로 만든 합성 측정값 (AP 행 위치, 거리, 처리량)"""
+    rng = np.random.default_rng(seed)
+    df = load_ap_data(MODEL_COLUMNS + ["install_year"])
+    rows = rng.integers(0, len(df), n)
+    distance = rng.uniform(1.0, SIM_MAX_DISTANCE_M, n)
+    sample = df.iloc[rows]
+
+    year = sample["install_year"].to_numpy(dtype=float)
+    capacity = np.select([year < limit for limit, _ in SIM_GENERATIONS],
+                         [mbps for _, mbps in SIM_GENERATIONS])
+    type_factor = sample["install_type"].astype(str).map(SIM_TYPE_FACTORS).fillna(1.0).to_numpy()
+    placement = sample["indoor_outdoor"].astype(str).map(SIM_PLACEMENT_FACTORS).fillna(0.9).to_numpy()
+    users = 1.0 + sample["usage_gb"].to_numpy(dtype=float) / GB_PER_USER
+    decay = 1.0 / (1.0 + (distance / SIM_RANGE_M) ** 1.5)
+    interference = 1.0 - SIM_INTERFERENCE * sample["density_norm"].to_numpy(dtype=float)
+    noise = np.exp(rng.normal(0.0, SIM_NOISE, n))
+
+    throughput = capacity * type_factor * placement * decay * interference / users * noise
+    return rows, distance, throughput
+
+
+def read_measurements(path):
+    """측정 CSV → (AP 행 위치, 거리, 처리량). 현재 데이터에 없는 AP의 측정은 뺀다"""
+    measured = pd.read_csv(path, dtype={"ap_id": str})
+    rows = get_id_index().rows(normalize_ap_id(measured["ap_id"]).to_numpy(dtype=object))
+    known = rows >= 0
+    return (rows[known], measured["distance_m"].to_numpy(dtype=float)[known],
+            measured["throughput_mbps"].to_numpy(dtype=float)[known])
+
+
+def holdout_split(rows, share=HOLDOUT_SHARE, seed=SEED):
+    """AP 단위로 나눈 holdout 여부 (같은 AP의 측정이 학습/평가 양쪽에 들어가지 않도록)"""
+    unique = np.unique(rows)
+    rng = np.random.default_rng(seed)
+    test_aps = rng.choice(unique, int(round(len(unique) * share)), replace=False)
+    return np.isin(rows, test_aps)
+
+
+def train(rows, distance, throughput, ridge=RIDGE, share=HOLDOUT_SHARE, seed=SEED, simulated=False):
+    """
+    AP 단위 holdout으로 평가한 뒤 전체로 다시 학습한 모델.
+    simulated=True(합성 측정값)면 holdout 지표를 자기 일관성 검사(metrics["self_check"])로 저장
+    """
+    df = load_ap_data(MODEL_COLUMNS)
+    frame = df.iloc[rows]
+    test = holdout_split(rows, share, seed)
+
+    model = ThroughputModel.fit(frame[~test], distance[~test], throughput[~test], ridge)
+    metrics = {"holdout": model.evaluate(frame[test], distance[test], throughput[test])}
+
+    # 비교 기준: 평균 하나로 예측 (log 공간)
+    baseline = ThroughputModel(np.zeros(1 + len(AP_FEATURES) + len(DISTANCE_FEATURES)))
+    baseline.coef[0] = np.log(throughput[~test]).mean()
+    metrics["baseline_holdout"] = baseline.evaluate(frame[test], distance[test], throughput[test])
+
+    final = ThroughputModel.fit(frame, distance, throughput, ridge)
+    if simulated:
+        metrics = {"self_check": {
+            "note": "합성 측정값(simulate_measurements)의 holdout - 생성식 재현 정도일 뿐 실제 정확도 아님",
+            **metrics,
+        }}
+    final.metrics = {
+        "source": "simulated" if simulated else "measurements",
+        **metrics, "train_rows": int(len(rows)), "ridge": ridge,
+    }
+    return final
+
+
+# ===============================
+# 현재 데이터 버전 전체 AP 예측 (세션 간 공유)
+# ===============================
+
+@st.cache_resource(show_spinner=False)
+def _load_model(path, mtime):
+    return ThroughputModel.load(path)
+
+
+def get_throughput_model():
+    """저장된 모델 (파일이 바뀌면 다시 읽음)"""
+    return _load_model(MODEL_PATH, os.path.getmtime(MODEL_PATH))
+
+
+def ap_terms_path(version, model_path=MODEL_PATH):
+    """데이터 버전 × 모델 파일 내용별 AP 항 배열"""
+    return os.path.join(cache_dir(), f"ap_terms.{version}.{file_hash(model_path)}.npy")
+
+
+@st.cache_resource(show_spinner=False, max_entries=VERSION_CACHE_ENTRIES)
+def _ap_terms(version, mtime):
+    path = ap_terms_path(version)
+    if os.path.exists(path):
+        record_cache("throughput", "disk")
+        return np.load(path)
+
+    record_cache("throughput", "miss")
+    frame = load_ap_data(MODEL_COLUMNS)
+    with span("throughput.ap_terms", rows=len(frame)):
+        terms = get_throughput_model().ap_term(frame)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, terms)
+    os.replace(tmp_path, path)
+    return terms
+
+
+@cache_lookup("throughput")
+def get_ap_terms():
+    """load_ap_data() 행 순서의 AP 항 (log Mbps)"""
+    return _ap_terms(data_version(), os.path.getmtime(MODEL_PATH))
+
+
+def expected_mbps(rows, distance_m=REFERENCE_DISTANCE_M):
+    """AP 행 위치(와 거리)의 예상 처리량 (Mbps)"""
+    terms = get_ap_terms()[np.asarray(rows)]
+    return get_throughput_model().predict(None, distance_m, ap_term=terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예상 Wi-Fi 처리량 모델")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="학습 + holdout 평가 후 모델 저장")
+    train_cmd.add_argument("measurements", nargs="?", help="측정 CSV (ap_id, distance_m, throughput_mbps)")
+    train_cmd.add_argument("--simulate", type=int, default=200_000, help="측정 CSV가 없을 때 합성 측정 수")
+    train_cmd.add_argument("--ridge", type=float, default=RIDGE)
+    train_cmd.add_argument("--seed", type=int, default=SEED)
+    train_cmd.add_argument("--out", default=MODEL_PATH)
+    sub.add_parser("predict", help="서울 전체 AP 예측 시간 측정")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        if args.measurements:
+            rows, distance, throughput = read_measurements(args.measurements)
+        else:
+            rows, distance, throughput = simulate_measurements(args.simulate, args.seed)
+        start = time.perf_counter()
+        model = train(rows, distance, throughput, args.ridge, seed=args.seed,
+                      simulated=not args.measurements)
+        model.save(args.out)
+        print(f"측정 {len(rows):,}건 학습: {time.perf_counter() - start:.2f}초 → {args.out}")
+        evaluation = model.metrics.get("self_check", model.metrics)
+        if "self_check" in model.metrics:
+            print("자기 일관성 검사 (합성 측정값, 실제 정확도 아님)")
+        for name in ("holdout", "baseline_holdout"):
+            print(name, json.dumps(evaluation[name], ensure_ascii=False))
+
+    elif args.command == "predict":
+        model = ThroughputModel.load()
+        frame = load_ap_data(MODEL_COLUMNS)
+        start = time.perf_counter()
+        terms = model.ap_term(frame)
+        mid = time.perf_counter()
+        mbps = model.predict(None, REFERENCE_DISTANCE_M, ap_term=terms)
+        end = time.perf_counter()
+        print(f"AP {len(frame):,}개: AP 항 {(mid - start) * 1000:.1f}ms, "
+              f"예측 {(end - mid) * 1000:.1f}ms, 중앙값 {np.median(mbps):.1f} Mbps")
+
+
+if __name__ == "__main__":
+    main()
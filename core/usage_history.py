@@ -0,0 +1,423 @@
+import argparse
+import functools
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.ap_data import cache_dir, data_version, snapshot_path
+from core.ap_index import APIndex
+from core.usage_stream import CHUNK_LINES, read_events
+
+# ===============================
+# AP 이용량 이력 저장소 (월 단위 파티션 + 해상도 피라미드)
+# ===============================
+# 이용량 이벤트(core.usage_stream과 같은 CSV / JSONL)를 월별 폴더에 누적한다.
+#
+#   python -m core.usage_history build usage.jsonl [--follow]
+#   python -m core.usage_history info
+#   python -m core.usage_history query --gu 강남구 --days 30
+#
+# 캐시 폴더/usage_history/2026-09/
+#   meta.json              기간, 해상도별 구간 범위, 구 이름, 데이터가 있는 첫/마지막 시각
+#   ap_id.npy, gu.npy      행 순서 (파티션을 만들 때의 스냅샷 AP 목록)
+#   hour/day/week.npy      AP × 구간 이용량 합 (float32, 해상도별로 따로 저장)
+#   gu_hour/day/week.npy   구 × 구간 이용량 합 (서울 전체는 구 합계)
+#
+# 한 AP의 한 달치가 파일 안에서 연속이라 메모리 맵으로 필요한 조각만 읽는다.
+# 시간 → 일 → 주 합계는 넣을 때 같이 더해 두고, 조회할 때는 기간에 맞는 해상도
+# (구간 수 MAX_POINTS 이하 중 가장 촘촘한 것)를 골라서 그 구간만 잘라 온다.
+# 주는 월요일 시작이라 월 경계에 걸친 주는 두 파티션 값을 더한다.
+#
+# 파티션의 AP 목록에 없는 AP(나중에 추가된 AP 등) 이벤트는 세기만 한다.
+# 읽은 위치는 FLUSH_EVERY_S초마다 배열과 함께 저장한다
+# (저장 사이에 멈추면 마지막 저장 이후 더한 이벤트가 다시 더해질 수 있음).
+
+HISTORY_DIR_NAME = "usage_history"
+SOURCES_NAME = "sources.json"
+
+FLUSH_EVERY_S = 10.0
+
+LEVELS = ["hour", "day", "week"]
+LEVEL_LABELS = {"hour": "시간", "day": "일", "week": "주"}
+MAX_POINTS = 500
+
+# 기간 선택지 (일, None = 전체)
+TREND_RANGES = {"7일": 7, "30일": 30, "90일": 90, "1년": 365, "전체": None}
+
+
+def history_dir():
+    path = os.path.join(cache_dir(), HISTORY_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ===============================
+# 시간 번호 ↔ 구간 번호
+# ===============================
+# 시간 번호: core.usage_stream.event_hours와 같은 한국 시간 기준 시간 수
+
+def to_bucket(hours, level):
+    """시간 번호 → 해상도별 구간 번호 (일: 날짜 수, 주: 1970-01-05 월요일부터 주 수)"""
+    hours = np.asarray(hours, dtype=np.int64)
+    if level == "hour":
+        return hours
+    days = hours // 24
+    return days if level == "day" else (days + 3) // 7
+
+
+def bucket_start(buckets, level):
+    """구간 번호 → 구간 시작 시각 (datetime64)"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if level == "hour":
+        return buckets.astype("datetime64[h]")
+    if level == "day":
+        return buckets.astype("datetime64[D]")
+    return (buckets * 7 - 3).astype("datetime64[D]")
+
+
+def pick_level(start, end, max_points=MAX_POINTS):
+    """[start, end) 시간 범위를 max_points 구간 이하로 보여 주는 가장 촘촘한 해상도"""
+    for level in LEVELS[:-1]:
+        if to_bucket(end - 1, level) - to_bucket(start, level) + 1 <= max_points:
+            return level
+    return LEVELS[-1]
+
+
+def _month_hours(month):
+    start = np.datetime64(month, "M")
+    return (
+        int(start.astype("datetime64[h]").astype(np.int64)),
+        int((start + 1).astype("datetime64[h]").astype(np.int64)),
+    )
+
+
+# ===============================
+# 파티션 (읽기)
+# ===============================
+
+def months():
+    """저장된 월 파티션 이름 목록 (오래된 순)"""
+    root = history_dir()
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, "meta.json"))
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _partition(path, stamp):
+    # stamp(행 목록 파일 수정 시각)가 바뀌면 = 파티션을 다시 만들었으면 새로 연다.
+    # 배열은 쓰는 쪽이 제자리에서 더하므로 열어 둔 메모리 맵으로 새 값이 보인다
+    meta = _read_json(os.path.join(path, "meta.json"))
+    ap_id = np.load(os.path.join(path, "ap_id.npy"))
+    arrays = {}
+    for level in LEVELS:
+        arrays[level] = np.load(os.path.join(path, f"{level}.npy"), mmap_mode="r")
+        arrays[f"gu_{level}"] = np.load(os.path.join(path, f"gu_{level}.npy"), mmap_mode="r")
+    return {
+        "meta": meta,
+        "rows": APIndex(ap_id),
+        "gu_index": pd.Index(meta["gu_names"]),
+        "arrays": arrays,
+    }
+
+
+def open_partition(month):
+    path = os.path.join(history_dir(), month)
+    return _partition(path, os.stat(os.path.join(path, "ap_id.npy")).st_mtime_ns)
+
+
+def time_range():
+    """이력이 있는 (첫 시각, 마지막 시각) 시간 번호, 없으면 None"""
+    firsts, lasts = [], []
+    for month in months():
+        meta = _read_json(os.path.join(history_dir(), month, "meta.json"))
+        if meta["first"] is not None:
+            firsts.append(meta["first"])
+            lasts.append(meta["last"])
+    if not firsts:
+        return None
+    return min(firsts), max(lasts)
+
+
+def usage_series(ap_id=None, gu=None, start=None, end=None, level=None):
+    """
+    [start, end) 시간 번호 범위의 이용량 합 시계열 (index: 구간 시작 시각).
+    ap_id → AP 하나, gu → 구 하나, 둘 다 없으면 서울 전체.
+    start / end 기본값은 이력 전체, level 기본값은 pick_level.
+    """
+    span_ = time_range()
+    if span_ is None:
+        return pd.Series(dtype=float)
+    start = span_[0] if start is None else start
+    end = span_[1] + 1 if end is None else end
+    level = level or pick_level(start, end)
+    lo, hi = to_bucket(start, level), to_bucket(end - 1, level) + 1
+
+    buckets, values = [], []
+    for month in months():
+        month_start, month_end = _month_hours(month)
+        if month_end <= start or month_start >= end:
+            continue
+        part = open_partition(month)
+        p_lo, p_hi = part["meta"]["buckets"][level]
+        a, b = max(lo, p_lo), min(hi, p_hi)
+        if a >= b:
+            continue
+
+        cols = slice(a - p_lo, b - p_lo)
+        if ap_id is not None:
+            row = part["rows"].row(ap_id)
+            if row is None:
+                continue
+            values.append(np.asarray(part["arrays"][level][row, cols], dtype=np.float64))
+        elif gu is not None:
+            g = part["gu_index"].get_indexer([gu])[0]
+            if g < 0:
+                continue
+            values.append(np.asarray(part["arrays"][f"gu_{level}"][g, cols]))
+        else:
+            values.append(part["arrays"][f"gu_{level}"][:, cols].sum(axis=0))
+        buckets.append(np.arange(a, b))
+
+    if not buckets:
+        return pd.Series(dtype=float)
+    buckets = np.concatenate(buckets)
+    values = np.concatenate(values)
+    # 월 경계에 걸친 주: 두 파티션 값 합치기
+    uniq, inverse = np.unique(buckets, return_inverse=True)
+    values = np.bincount(inverse, weights=values, minlength=len(uniq))
+    return pd.Series(values, index=pd.DatetimeIndex(bucket_start(uniq, level)), name=level)
+
+
+# ===============================
+# 파티션 (쓰기)
+# ===============================
+
+def _create_partition(path, month, ap_id, gu, gu_names):
+    """빈 파티션을 임시 폴더에 만들고 이름 바꾸기 (읽는 쪽에 반쯤 만든 폴더가 보이지 않도록)"""
+    month_start, month_end = _month_hours(month)
+    buckets = {
+        level: [int(to_bucket(month_start, level)), int(to_bucket(month_end - 1, level)) + 1]
+        for level in LEVELS
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, "ap_id.npy"), np.asarray(ap_id, dtype=str))
+    np.save(os.path.join(tmp_path, "gu.npy"), np.asarray(gu, dtype=np.int16))
+    for level, (lo, hi) in buckets.items():
+        np.lib.format.open_memmap(
+            os.path.join(tmp_path, f"{level}.npy"), mode="w+", dtype=np.float32,
+            shape=(len(ap_id), hi - lo),
+        ).flush()
+        np.save(os.path.join(tmp_path, f"gu_{level}.npy"), np.zeros((len(gu_names), hi - lo)))
+    _write_json(os.path.join(tmp_path, "meta.json"), {
+        "month": month,
+        "hours": [month_start, month_end],
+        "buckets": buckets,
+        "gu_names": list(gu_names),
+        "data_version": data_version(),
+        "first": None,
+        "last": None,
+        "events": 0,
+        "unknown": 0,
+    })
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # 다른 프로세스가 먼저 만들었으면 그쪽 사용
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+class HistoryWriter:
+    """이벤트 chunk를 월 파티션에 더하는 쓰기 전용 객체 (새 파티션의 AP 목록 = 현재 스냅샷)"""
+
+    def __init__(self):
+        snapshot = pd.read_parquet(snapshot_path(data_version()), columns=["ap_id", "gu"])
+        gu = pd.Categorical(snapshot["gu"].astype(str))
+        self.ap_id = snapshot["ap_id"].to_numpy(dtype=str)
+        self.gu_names = list(gu.categories)
+        self.gu = gu.codes
+        self._open = {}
+
+    def _writable(self, month):
+        if month not in self._open:
+            path = os.path.join(history_dir(), month)
+            if not os.path.exists(path):
+                _create_partition(path, month, self.ap_id, self.gu, self.gu_names)
+            meta = _read_json(os.path.join(path, "meta.json"))
+            arrays = {}
+            for level in LEVELS:
+                arrays[level] = np.load(os.path.join(path, f"{level}.npy"), mmap_mode="r+")
+                arrays[f"gu_{level}"] = np.load(os.path.join(path, f"gu_{level}.npy"), mmap_mode="r+")
+            self._open[month] = {
+                "path": path,
+                "meta": meta,
+                "rows": APIndex(np.load(os.path.join(path, "ap_id.npy"))),
+                "gu": np.load(os.path.join(path, "gu.npy")),
+                "arrays": arrays,
+            }
+        return self._open[month]
+
+    def append(self, events):
+        """이벤트 DataFrame(ap_id, hour, usage_gb)을 월별로 나눠 모든 해상도에 더하기"""
+        hours = events["hour"].to_numpy()
+        month_of = hours.astype("datetime64[h]").astype("datetime64[M]")
+        for month in np.unique(month_of):
+            in_month = month_of == month
+            part = self._writable(str(month))
+            rows = part["rows"].rows(events["ap_id"].to_numpy()[in_month])
+            known = rows >= 0
+            h = hours[in_month][known]
+            usage = events["usage_gb"].to_numpy()[in_month][known]
+            rows = rows[known]
+            g = part["gu"][rows]
+
+            meta = part["meta"]
+            for level in LEVELS:
+                cols = to_bucket(h, level) - meta["buckets"][level][0]
+                np.add.at(part["arrays"][level], (rows, cols), usage)
+                np.add.at(part["arrays"][f"gu_{level}"], (g, cols), usage)
+
+            meta["unknown"] += int((~known).sum())
+            meta["events"] += int(known.sum())
+            if len(h):
+                lo, hi = int(h.min()), int(h.max())
+                meta["first"] = lo if meta["first"] is None else min(meta["first"], lo)
+                meta["last"] = hi if meta["last"] is None else max(meta["last"], hi)
+
+    def flush(self):
+        """쓴 내용을 파일에 반영 (배열은 제자리, meta는 임시 파일 → 교체)"""
+        for part in self._open.values():
+            for array in part["arrays"].values():
+                array.flush()
+            _write_json(os.path.join(part["path"], "meta.json"), part["meta"])
+
+
+def build(path, follow=False, chunk_lines=CHUNK_LINES, flush_every_s=FLUSH_EVERY_S, log=print):
+    """이벤트 파일을 이어서 읽어 이력에 더하기 (파일별 읽은 위치는 sources.json)"""
+    sources_path = os.path.join(history_dir(), SOURCES_NAME)
+    sources = _read_json(sources_path, {})
+    source = os.path.abspath(path)
+    writer = HistoryWriter()
+
+    events_total = 0
+    last_flush = time.monotonic()
+
+    def commit(offset):
+        nonlocal last_flush
+        writer.flush()
+        sources[source] = offset
+        _write_json(sources_path, sources)
+        last_flush = time.monotonic()
+        if follow:
+            log(f"{events_total:,}건 반영 (offset {offset:,})")
+
+    # 메모리 맵 flush는 큰 파일에서 느리므로 flush_every_s초마다 위치와 함께 저장
+    offset = None
+    for events, offset in read_events(path, sources.get(source, 0), chunk_lines, follow):
+        writer.append(events)
+        events_total += len(events)
+        if time.monotonic() - last_flush >= flush_every_s:
+            commit(offset)
+    if offset is not None:
+        commit(offset)
+    return events_total
+
+
+# ===============================
+# 대시보드용 추이 그래프
+# ===============================
+
+def show_usage_trend(key, ap_id=None, gu=None, height=220):
+    """기간을 고르면 맞는 해상도로 이용량 추이 선 그래프 (이력이 없으면 안내만)"""
+    span_ = time_range()
+    if span_ is None:
+        st.caption("이용량 이력이 아직 없습니다 (python -m core.usage_history build <이벤트 파일>)")
+        return
+
+    choice = st.radio(
+        "기간", list(TREND_RANGES), index=1, horizontal=True, key=key,
+        label_visibility="collapsed",
+    )
+    first, last = span_
+    days = TREND_RANGES[choice]
+    start = first if days is None else max(first, last + 1 - days * 24)
+    level = pick_level(start, last + 1)
+    series = usage_series(ap_id, gu, start, last + 1, level)
+    if series.empty:
+        st.caption("선택한 기간에 이용량 이력이 없습니다")
+        return
+
+    st.line_chart(series.rename("이용량(GB)"), height=height)
+    st.caption(f"{LEVEL_LABELS[level]} 단위 합계 · {len(series)}개 구간")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AP 이용량 이력 저장소 (월 파티션 + 시간/일/주 피라미드)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="이벤트 파일(CSV / JSONL)을 이력에 더하기")
+    build_cmd.add_argument("path")
+    build_cmd.add_argument("--follow", action="store_true", help="파일 끝에서 멈추지 않고 새 줄 대기")
+    build_cmd.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    sub.add_parser("info", help="파티션 목록")
+    query_cmd = sub.add_parser("query", help="시계열 조회 (조회 시간 측정)")
+    query_cmd.add_argument("--ap", help="AP ID (없으면 구 / 서울 전체)")
+    query_cmd.add_argument("--gu")
+    query_cmd.add_argument("--days", type=int, help="최근 N일 (기본: 전체)")
+    query_cmd.add_argument("--level", choices=LEVELS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        n = build(args.path, args.follow, args.chunk_lines)
+        print(f"{n:,}건 반영: {time.perf_counter() - start:.2f}초")
+
+    elif args.command == "info":
+        for month in months():
+            meta = _read_json(os.path.join(history_dir(), month, "meta.json"))
+            size = sum(
+                os.path.getsize(os.path.join(history_dir(), month, name))
+                for name in os.listdir(os.path.join(history_dir(), month))
+            )
+            first = bucket_start(meta["first"], "hour") if meta["first"] is not None else "-"
+            last = bucket_start(meta["last"], "hour") if meta["last"] is not None else "-"
+            print(f"{month}  AP {len(open_partition(month)['rows']):>9,}  이벤트 {meta['events']:>12,}  "
+                  f"{first} ~ {last}  {size / 1e6:,.1f}MB")
+
+    elif args.command == "query":
+        span_ = time_range()
+        if span_ is None:
+            print("이력이 없습니다")
+            return
+        end = span_[1] + 1
+        start = span_[0] if args.days is None else max(span_[0], end - args.days * 24)
+        usage_series(args.ap, args.gu, start, end, args.level)   # 파티션 열기
+        t = time.perf_counter()
+        series = usage_series(args.ap, args.gu, start, end, args.level)
+        elapsed = (time.perf_counter() - t) * 1000
+        print(series.to_string() if len(series) <= 40 else series.describe().to_string())
+        print(f"{len(series)}개 구간: {elapsed:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+
+from core.ap_data import (
+    CATEGORY_COLUMNS, cache_dir, cast_columns, data_version, normalize_ap_id,
+    publish_snapshot, read_manifest, read_snapshot, set_current_version, snapshot_metadata,
+    snapshot_path,
+)
+from core.features import CLUSTER_FEATURES, assign_clusters, usage_norm, usage_norm_log
+from core.ingest import feature_state
+
+# ===============================
+# AP 이용량 이벤트 스트림 증분 반영
+# ===============================
+# 이벤트 파일(CSV 또는 JSONL, 한 줄에 이벤트 하나): ap_id, ts, usage_gb
+#   ts = 날짜 문자열(시간대 없으면 한국 시간) 또는 epoch 초
+#
+#   python -m core.usage_stream ingest usage.jsonl            # 끝까지 읽고 게시
+#   python -m core.usage_stream ingest usage.jsonl --follow   # 계속 뒤에 붙는 줄을 읽으며 주기적으로 게시
+#   python -m core.usage_stream status
+#
+# 파일은 chunk_lines줄씩만 읽으므로 메모리는 파일 크기와 무관하다.
+# AP별 / 구별로 최근 HOURS시간(시간 단위), DAYS일(일 단위) 이용량을 고리 버퍼(ring)로,
+# 일 이용량 EWMA를 배열 하나로 들고 있다가 게시할 때 스트림에 나온 AP의 usage_gb를
+# 최근 USAGE_WINDOW_DAYS일 합으로 바꾸고 그 AP의 이용량 점수 / 군집만 다시 계산한다
+# (좌표·밀집도는 그대로). 점수 기준값은 core.ingest와 같이 기준 스냅샷 값으로 고정하므로
+# 스트림에 나오지 않은 AP는 원본 usage_gb와 점수를 그대로 유지한다.
+# 한 스냅샷에 두 기준(창 합계 / 원본 값)이 섞이므로 metadata의 usage_stream에
+# AP 수를 나눠 기록하고, 화면에는 usage_basis_note로 표시한다.
+# 읽은 위치(byte offset)와 상태는 캐시 폴더에 저장해서 다시 실행하면 이어서 읽는다.
+#
+# 이미 닫힌 날에 늦게 도착한 이벤트는 창 합계에는 들어가지만 EWMA에는 반영되지 않는다.
+
+HOURS = 24
+DAYS = 31
+USAGE_WINDOW_DAYS = 30
+EWMA_HALFLIFE_DAYS = 7.0
+
+CHUNK_LINES = 100_000
+PUBLISH_EVERY_S = 300.0
+POLL_S = 1.0
+
+LOCAL_TZ = "Asia/Seoul"
+EVENT_COLUMNS = ["ap_id", "ts", "usage_gb"]
+STATE_NAME = "usage_stream.npz"
+
+_TZ_SUFFIX = r"\d:\d\d(?::\d\d(?:\.\d+)?)?(?:Z|[+-]\d\d:?\d\d)$"
+
+_ALPHA = 1.0 - 0.5 ** (1.0 / EWMA_HALFLIFE_DAYS)
+
+# 상태 파일에 저장하는 배열
+_ARRAYS = [
+    "hourly", "daily", "ewma", "total", "events", "first_hour", "last_hour",
+    "gu_hourly", "gu_daily", "gu_ewma",
+]
+
+
+# ===============================
+# 이벤트 파일 읽기 (chunk 단위)
+# ===============================
+
+def _is_jsonl(path):
+    return path.endswith((".jsonl", ".json", ".log"))
+
+
+def event_hours(ts):
+    """이벤트 시각 → 시간 번호 (한국 시간 기준 1970-01-01 00시부터 지난 시간 수)"""
+    # 같은 시각이 많으므로 서로 다른 값만 변환
+    codes, uniq = pd.factorize(ts)
+    uniq = pd.Series(uniq, dtype=object)
+    hours = np.empty(len(uniq), dtype="datetime64[h]")
+
+    # 숫자: epoch 초
+    numeric = pd.to_numeric(uniq, errors="coerce")
+    is_num = numeric.notna().to_numpy()
+    if is_num.any():
+        t = pd.to_datetime(numeric[is_num], unit="s", utc=True)
+        hours[is_num] = t.dt.tz_convert(LOCAL_TZ).dt.tz_localize(None).to_numpy()
+
+    # 문자열: 시간대가 붙은 값은 한국 시간으로 바꾸고, 없는 값은 한국 시간으로 간주
+    text = uniq[~is_num].astype(str)
+    aware = np.zeros(len(uniq), dtype=bool)
+    aware[~is_num] = text.str.contains(_TZ_SUFFIX).to_numpy()
+    naive = ~is_num & ~aware
+    if aware.any():
+        t = pd.to_datetime(uniq[aware].astype(str), format="ISO8601", utc=True)
+        hours[aware] = t.dt.tz_convert(LOCAL_TZ).dt.tz_localize(None).to_numpy()
+    if naive.any():
+        hours[naive] = pd.to_datetime(uniq[naive].astype(str), format="ISO8601").to_numpy()
+    return hours.astype(np.int64)[codes]
+
+
+def _read_chunk(raw, header, jsonl):
+    # 문자열로 고정해서 읽는 빠른 경로 (pyarrow), 숫자가 섞여 있으면 pandas로 다시 읽기
+    try:
+        if jsonl:
+            schema = pa.schema([(c, pa.string()) for c in ("ap_id", "ts")])
+            table = pa_json.read_json(
+                io.BytesIO(raw), parse_options=pa_json.ParseOptions(explicit_schema=schema)
+            )
+        else:
+            table = pa_csv.read_csv(
+                io.BytesIO(header + raw),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={"ap_id": pa.string(), "ts": pa.string()},
+                    strings_can_be_null=True,
+                ),
+            )
+        return table.to_pandas()
+    except pa.ArrowInvalid:
+        if jsonl:
+            return pd.read_json(io.BytesIO(raw), lines=True, dtype={"ap_id": str})
+        return pd.read_csv(io.BytesIO(header + raw), dtype={"ap_id": str})
+
+
+def _parse(lines, header, jsonl):
+    events = _read_chunk(b"".join(lines), header, jsonl)
+    missing = [c for c in EVENT_COLUMNS if c not in events.columns]
+    if missing:
+        raise ValueError(f"이벤트에 필요한 컬럼이 없음: {missing}")
+
+    events = events[EVENT_COLUMNS].dropna()
+    codes, uniq = pd.factorize(events["ap_id"].astype(str))
+    return pd.DataFrame({
+        "ap_id": normalize_ap_id(pd.Series(uniq)).to_numpy()[codes],
+        "hour": event_hours(events["ts"]),
+        "usage_gb": events["usage_gb"].to_numpy(dtype=np.float64),
+    })
+
+
+def read_events(path, offset=0, chunk_lines=CHUNK_LINES, follow=False, poll_s=POLL_S):
+    """
+    offset(바이트)부터 완성된 줄만 chunk_lines줄씩 읽어 (이벤트 DataFrame, 다음 offset) 생성.
+    follow=True면 파일 끝에서 멈추지 않고 새 줄을 기다린다 (쓰는 중인 마지막 줄은 다음에 읽음).
+    """
+    jsonl = _is_jsonl(path)
+    header = b""
+    if not jsonl:
+        with open(path, "rb") as f:
+            header = f.readline()
+        offset = max(offset, len(header))
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            raw = list(itertools.islice(f, chunk_lines))
+            if raw and not raw[-1].endswith(b"\n"):
+                if follow:
+                    f.seek(-len(raw.pop()), os.SEEK_CUR)
+                else:
+                    raw[-1] += b"\n"     # 다 쓴 파일의 마지막 줄
+
+            lines = [line for line in raw if line.strip()]
+            if lines:
+                yield _parse(lines, header, jsonl), f.tell()
+            elif raw:
+                continue
+            elif follow:
+                time.sleep(poll_s)
+            else:
+                return
+
+
+# ===============================
+# 고리 버퍼 상태
+# ===============================
+
+def _clear(ring, start, stop):
+    """ring에서 번호 start..stop-1에 해당하는 칸을 0으로"""
+    if stop <= start:
+        return
+    width = ring.shape[1]
+    if stop - start >= width:
+        ring[:] = 0
+    else:
+        ring[:, np.arange(start, stop) % width] = 0
+
+
+class UsageStream:
+    """
+    AP별 / 구별 이용량 누적 상태.
+    행 순서는 기준 스냅샷의 ap_id 순서 (ap_index), 구는 gu_names 순서.
+    """
+
+    def __init__(self, ap_id, gu, gu_names=None):
+        self.ap_index = pd.Index(np.asarray(ap_id, dtype=str))
+        self.gu_names = list(gu_names) if gu_names is not None else sorted(set(map(str, gu)))
+        self.gu = pd.Index(self.gu_names).get_indexer(np.asarray(gu, dtype=str)).astype(np.int32)
+        n, g = len(self.ap_index), len(self.gu_names)
+
+        self.hourly = np.zeros((n, HOURS), dtype=np.float32)
+        self.daily = np.zeros((n, DAYS), dtype=np.float32)
+        self.ewma = np.zeros(n, dtype=np.float32)
+        self.total = np.zeros(n, dtype=np.float64)
+        self.events = np.zeros(n, dtype=np.int32)
+        self.first_hour = np.full(n, -1, dtype=np.int64)
+        self.last_hour = np.full(n, -1, dtype=np.int64)
+
+        self.gu_hourly = np.zeros((g, HOURS), dtype=np.float64)
+        self.gu_daily = np.zeros((g, DAYS), dtype=np.float64)
+        self.gu_ewma = np.zeros(g, dtype=np.float64)
+
+        self.hour = None              # 가장 최근 이벤트 시각 (시간 번호)
+        self.source = None            # 읽고 있는 파일
+        self.offset = 0               # source에서 다음에 읽을 위치 (바이트)
+        self.stats = {"events": 0, "unknown": 0, "late": 0, "expired": 0}
+
+    # ---------- 시계 ----------
+
+    def _close_days(self, old_day, new_day):
+        """old_day를 닫고 new_day 전날까지 이벤트 없는 날은 0으로 EWMA 갱신"""
+        slot = old_day % DAYS
+        x = self.daily[:, slot]
+        start_day = np.where(self.first_hour >= 0, self.first_hour // 24, np.iinfo(np.int64).max)
+        started = start_day < old_day
+        fresh = start_day == old_day
+        self.ewma[started] += _ALPHA * (x[started] - self.ewma[started])
+        self.ewma[fresh] = x[fresh]
+        self.gu_ewma += _ALPHA * (self.gu_daily[:, slot] - self.gu_ewma)
+
+        gap = new_day - old_day - 1
+        if gap > 0:
+            decay = (1.0 - _ALPHA) ** gap
+            self.ewma[started | fresh] *= decay
+            self.gu_ewma *= decay
+
+    def advance(self, hour):
+        """시계를 hour로 옮기고 창에서 밀려난 칸 비우기"""
+        if self.hour is None:
+            self.hour = int(hour)
+            return
+        if hour <= self.hour:
+            return
+
+        old_day, new_day = self.hour // 24, hour // 24
+        if new_day > old_day:
+            self._close_days(old_day, new_day)
+            _clear(self.daily, old_day + 1, new_day + 1)
+            _clear(self.gu_daily, old_day + 1, new_day + 1)
+        _clear(self.hourly, self.hour + 1, hour + 1)
+        _clear(self.gu_hourly, self.hour + 1, hour + 1)
+        self.hour = int(hour)
+
+    # ---------- 이벤트 반영 ----------
+
+    def add(self, events):
+        """이벤트 DataFrame(ap_id, hour, usage_gb) 반영. 모르는 AP / 창 밖 이벤트는 세기만 함"""
+        rows = self.ap_index.get_indexer(events["ap_id"])
+        known = rows >= 0
+        self.stats["unknown"] += int((~known).sum())
+        rows = rows[known]
+        hours = events["hour"].to_numpy()[known]
+        usage = events["usage_gb"].to_numpy()[known]
+        if len(rows) == 0:
+            return
+
+        order = np.argsort(hours, kind="stable")
+        rows, hours, usage = rows[order], hours[order], usage[order]
+
+        np.add.at(self.total, rows, usage)
+        np.add.at(self.events, rows, 1)
+        np.maximum.at(self.last_hour, rows, hours)
+        # 시간순 정렬이므로 AP별 첫 등장 = 이 chunk의 가장 이른 시각
+        seen, first = np.unique(rows, return_index=True)
+        prev = self.first_hour[seen]
+        self.first_hour[seen] = np.where(prev < 0, hours[first], np.minimum(prev, hours[first]))
+        self.stats["events"] += len(rows)
+
+        # 같은 시간끼리 묶어서 시간 순서대로 반영
+        starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+        ends = np.r_[starts[1:], len(hours)]
+        for start, end in zip(starts, ends):
+            hour = int(hours[start])
+            self.advance(hour)
+            r, u, g = rows[start:end], usage[start:end], self.gu[rows[start:end]]
+
+            if hour > self.hour - HOURS:
+                slot = hour % HOURS
+                np.add.at(self.hourly[:, slot], r, u)
+                np.add.at(self.gu_hourly[:, slot], g, u)
+
+            day, today = hour // 24, self.hour // 24
+            if day > today - DAYS:
+                slot = day % DAYS
+                np.add.at(self.daily[:, slot], r, u)
+                np.add.at(self.gu_daily[:, slot], g, u)
+                if day < today:
+                    self.stats["late"] += end - start
+            else:
+                self.stats["expired"] += end - start
+
+    # ---------- 조회 ----------
+
+    def _day_slots(self, days):
+        today = self.hour // 24
+        return np.arange(today - days + 1, today + 1) % DAYS
+
+    def window_usage(self, days=USAGE_WINDOW_DAYS):
+        """AP별 최근 days일(오늘 포함) 이용량 합"""
+        if self.hour is None:
+            return np.zeros(len(self.ap_index))
+        return self.daily[:, self._day_slots(days)].sum(axis=1, dtype=np.float64)
+
+    def seen(self):
+        """스트림에 한 번이라도 나온 AP"""
+        return self.last_hour >= 0
+
+    def gu_summary(self):
+        """구별 최근 24시간 / 최근 USAGE_WINDOW_DAYS일 이용량 + 일 이용량 EWMA"""
+        if self.hour is None:
+            window = np.zeros(len(self.gu_names))
+        else:
+            window = self.gu_daily[:, self._day_slots(USAGE_WINDOW_DAYS)].sum(axis=1)
+        return pd.DataFrame({
+            "last_24h_gb": self.gu_hourly.sum(axis=1),
+            "window_gb": window,
+            "daily_ewma_gb": self.gu_ewma,
+        }, index=pd.Index(self.gu_names, name="gu"))
+
+    def last_event(self):
+        if self.hour is None:
+            return None
+        return str(np.datetime64(self.hour, "h").astype("datetime64[s]"))
+
+    # ---------- AP 목록이 바뀐 경우 ----------
+
+    def align(self, ap_id, gu):
+        """스냅샷 AP 목록(ap_id, gu)에 맞춰 행 재배치 (없어진 AP 제거, 새 AP는 0부터)"""
+        ap_id = np.asarray(ap_id, dtype=str)
+        if len(ap_id) == len(self.ap_index) and (self.ap_index.to_numpy() == ap_id).all():
+            return self
+
+        gu_names = sorted(set(self.gu_names) | set(map(str, gu)))
+        aligned = UsageStream(ap_id, gu, gu_names)
+        src = self.ap_index.get_indexer(ap_id)
+        hit = src >= 0
+        for name in ["hourly", "daily", "ewma", "total", "events", "first_hour", "last_hour"]:
+            getattr(aligned, name)[hit] = getattr(self, name)[src[hit]]
+        g = pd.Index(gu_names).get_indexer(self.gu_names)
+        for name in ["gu_hourly", "gu_daily", "gu_ewma"]:
+            getattr(aligned, name)[g] = getattr(self, name)
+        aligned.hour, aligned.source, aligned.offset = self.hour, self.source, self.offset
+        aligned.stats = dict(self.stats)
+        return aligned
+
+    # ---------- 저장 / 복원 ----------
+
+    def save(self, path=None):
+        path = path or os.path.join(cache_dir(), STATE_NAME)
+        meta = {
+            "hour": self.hour, "source": self.source, "offset": self.offset,
+            "stats": self.stats, "gu_names": self.gu_names,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            ap_id=self.ap_index.to_numpy(dtype=str), gu=self.gu,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+            **{name: getattr(self, name) for name in _ARRAYS},
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """저장된 상태 복원 (없으면 None)"""
+        path = path or os.path.join(cache_dir(), STATE_NAME)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as saved:
+            meta = json.loads(str(saved["meta"]))
+            gu_names = meta["gu_names"]
+            state = cls(saved["ap_id"], np.asarray(gu_names)[saved["gu"]], gu_names)
+            for name in _ARRAYS:
+                setattr(state, name, saved[name])
+        state.hour, state.source, state.offset = meta["hour"], meta["source"], meta["offset"]
+        state.stats = meta["stats"]
+        return state
+
+
+# ===============================
+# 스냅샷 반영
+# ===============================
+
+def apply_usage_frame(df, rows, usage, state):
+    """
+    스냅샷 DataFrame의 rows(행 번호) usage_gb를 usage로 바꾼 새 DataFrame과 변경 요약 반환.
+    바뀐 행의 이용량 점수와 군집만 기준 스냅샷 기준값(state)으로 다시 계산
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(object)
+
+    old = df["usage_gb"].to_numpy(dtype=float)
+    changed = rows[old[rows] != usage]
+    df.loc[changed, "usage_gb"] = usage[old[rows] != usage]
+
+    new_usage = df.loc[changed, "usage_gb"]
+    df.loc[changed, "usage_norm_log"] = np.clip(
+        usage_norm_log(new_usage, state["log_usage_range"]), 0.0, 1.0
+    )
+    df.loc[changed, "usage_norm"] = usage_norm(new_usage, df.loc[changed, "gu"], state["usage"])
+
+    if len(changed):
+        labels, ranks = assign_clusters(df.loc[changed, CLUSTER_FEATURES].to_numpy(), state)
+        df.loc[changed, "cluster_k3"] = labels.astype(df["cluster_k3"].dtype)
+        df.loc[changed, "cluster_k3_rank"] = ranks.astype(df["cluster_k3_rank"].dtype)
+
+    cast_columns(df)
+
+    summary = {
+        "changed": int(len(changed)),
+        "districts": sorted(str(g) for g in set(df["gu"].to_numpy()[changed])),
+        "reclustered": int(len(changed)),
+        "feature_base": state.get("base"),
+    }
+    return df, summary
+
+
+def publish_usage(stream, note=None):
+    """
+    스트림 상태를 현재 스냅샷에 반영해 새 버전으로 지정.
+    스트림에 나온 AP만 usage_gb를 최근 USAGE_WINDOW_DAYS일 합으로 바꾼다.
+    (스냅샷 AP 목록에 맞춘 stream, 현재 버전, 변경 요약 — 바뀐 것이 없으면 None) 반환
+    """
+    parent = data_version()
+    df = read_snapshot(parent)
+    stream = stream.align(df["ap_id"].to_numpy(dtype=str), df["gu"].astype(str).to_numpy())
+
+    rows = np.flatnonzero(stream.seen())
+    usage = stream.window_usage()[rows]
+    if not (df["usage_gb"].to_numpy()[rows] != usage).any():
+        return stream, parent, None
+
+    key = f"{parent}:usage:{stream.source}:{stream.offset}:{stream.stats['events']}"
+    version = hashlib.sha1(key.encode()).hexdigest()[:12]
+    if any(v["version"] == version for v in read_manifest()["versions"]):
+        set_current_version(version)
+        return stream, version, None
+
+    # 기준 스냅샷이거나 이전 형식이면 현재 점수에서 복원 (core.ingest와 같은 기준)
+    state = snapshot_metadata(parent).get("feature_state")
+    if state is None or "usage" not in state:
+        state = feature_state(df, base=parent)
+
+    df, summary = apply_usage_frame(df, rows, usage, state)
+    stream_meta = {
+        "source": stream.source,
+        "last_event": stream.last_event(),
+        "window_days": USAGE_WINDOW_DAYS,
+        # usage_gb 기준: aps대는 최근 window_days일 합계, static_aps대는 원본 값
+        "aps": int(len(rows)),
+        "static_aps": int(len(df) - len(rows)),
+        **stream.stats,
+    }
+    metadata = {"usage_stream": stream_meta, "usage_update": summary, "feature_state": state}
+    publish_snapshot(
+        df, version, parent,
+        note=note or f"usage stream ~{stream_meta['last_event']}",
+        metadata=metadata,
+    )
+    return stream, version, summary
+
+
+def usage_basis_note(version):
+    """스트림이 반영된 스냅샷이면 usage_gb 기준(창 합계 / 원본 값 AP 수) 안내 문구, 아니면 None"""
+    info = snapshot_metadata(version).get("usage_stream")
+    if not info:
+        return None
+    note = (f"이용량: AP {info['aps']:,}대는 최근 {info['window_days']}일 스트림 합계 "
+            f"(마지막 이벤트 {info['last_event']})")
+    if info.get("static_aps", 0):
+        note += f", 나머지 {info['static_aps']:,}대는 원본 데이터 값"
+    return note
+
+
+# ===============================
+# 스트림 반영 루프
+# ===============================
+
+def load_stream():
+    """저장된 스트림 상태 (없으면 현재 스냅샷 AP 목록으로 새로 시작)"""
+    stream = UsageStream.load()
+    df = pd.read_parquet(snapshot_path(data_version()), columns=["ap_id", "gu"])
+    ap_id, gu = df["ap_id"].to_numpy(dtype=str), df["gu"].astype(str).to_numpy()
+    if stream is None:
+        return UsageStream(ap_id, gu)
+    return stream.align(ap_id, gu)
+
+
+def ingest(path, follow=False, publish_every_s=PUBLISH_EVERY_S, chunk_lines=CHUNK_LINES, log=print):
+    """
+    이벤트 파일을 이어서 읽고 publish_every_s초마다 (그리고 끝에서) 스냅샷 게시.
+    다른 파일이면 처음부터 읽는다 (누적 상태는 유지). 마지막 게시 버전 반환
+    """
+    stream = load_stream()
+    source = os.path.abspath(path)
+    if stream.source != source:
+        stream.source, stream.offset = source, 0
+
+    version = None
+    published_events = stream.stats["events"]
+    last_publish = time.monotonic()
+
+    def publish():
+        nonlocal stream, version, published_events, last_publish
+        last_publish = time.monotonic()
+        if stream.stats["events"] == published_events:
+            return
+        start = time.perf_counter()
+        stream, version, summary = publish_usage(stream)
+        stream.save()
+        published_events = stream.stats["events"]
+        changed = summary["changed"] if summary else 0
+        log(f"스냅샷 {version}: AP {changed:,}대 이용량 변경, "
+            f"마지막 이벤트 {stream.last_event()} ({time.perf_counter() - start:.2f}초)")
+
+    # 중간에 멈추면(Ctrl+C) 마지막 게시 시점의 상태 / 위치부터 다시 읽는다
+    for events, offset in read_events(path, stream.offset, chunk_lines, follow):
+        stream.add(events)
+        stream.offset = offset
+        if time.monotonic() - last_publish >= publish_every_s:
+            publish()
+    publish()
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="AP 이용량 이벤트 스트림 증분 반영")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_cmd = sub.add_parser("ingest", help="이벤트 파일(CSV / JSONL) 읽고 스냅샷 게시")
+    ingest_cmd.add_argument("path")
+    ingest_cmd.add_argument("--follow", action="store_true", help="파일 끝에서 멈추지 않고 새 줄 대기")
+    ingest_cmd.add_argument("--publish-every", type=float, default=PUBLISH_EVERY_S, help="게시 간격 (초)")
+    ingest_cmd.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    sub.add_parser("status", help="저장된 스트림 상태 / 구별 이용량")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        start = time.perf_counter()
+        ingest(args.path, args.follow, args.publish_every, args.chunk_lines)
+        print(f"완료: {time.perf_counter() - start:.2f}초")
+
+    elif args.command == "status":
+        stream = UsageStream.load()
+        if stream is None:
+            print("저장된 스트림 상태가 없습니다")
+            return
+        print(f"source: {stream.source} (offset {stream.offset:,})")
+        print(f"마지막 이벤트: {stream.last_event()}")
+        for key, value in stream.stats.items():
+            print(f"  {key}: {value:,}")
+        print(stream.gu_summary().round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import math
+
+import folium
+import numpy as np
+import streamlit as st
+from streamlit_folium import st_folium
+
+from core.map_cache import FOLIUM_PRIVATE_API, cached_folium_payload, folium_component
+
+if FOLIUM_PRIVATE_API:
+    from core.map_cache import _get_feature_group_string, generate_js_hash
+from core.point_layer import add_point_layer
+from core.profiling import record_payload, span
+from core.spatial import EARTH_RADIUS_M
+
+# ===============================
+# 화면 범위(viewport) 기반 AP 마커 조회
+# ===============================
+# 기본 지도(타일, 고정 마커)는 한 번만 보내고 AP 레이어만 st_folium의
+# feature_group으로 바꿔 끼운다. 지도를 움직이면 st_folium이 bounds/zoom을 돌려주고
+# (다시 실행) 그 범위의 묶음/AP를 미리 계산해 둔 묶음 인덱스(ClusterIndex)에서 찾아 보낸다.
+# → 전송량과 브라우저 작업량은 전체 AP 수가 아니라 화면 크기에 비례
+#
+# streamlit_folium 내부 함수를 쓸 수 없으면(core.map_cache.FOLIUM_PRIVATE_API) 공개
+# st_folium의 feature_group_to_add로 같은 레이어를 그린다 (기본 지도도 매번 전송).
+
+# 화면보다 사방으로 이 비율만큼 넓게 조회 (조금 움직일 때 빈 곳이 보이지 않게)
+VIEW_PAD = 0.25
+
+# 묶음 마커 크기/색 (AP 수 10 / 100 / 1000 기준)
+CLUSTER_BREAKS = [10, 100, 1000]
+CLUSTER_STYLES = {
+    0: {"radius": 9, "fill_color": "#6ECC39"},
+    1: {"radius": 12, "fill_color": "#F0C20C"},
+    2: {"radius": 16, "fill_color": "#F18017"},
+    3: {"radius": 20, "fill_color": "#D9534F"},
+}
+
+_TILE_PX = 256
+
+
+# ===============================
+# 화면 범위 계산
+# ===============================
+
+def meters_per_pixel(zoom, lat):
+    """웹 메르카토르 지도에서 줌/위도별 화면 1픽셀의 실제 거리(m)"""
+    return 2 * math.pi * EARTH_RADIUS_M * math.cos(math.radians(lat)) / (_TILE_PX * 2 ** zoom)
+
+
+def bounds_around(center, zoom, width_px, height_px):
+    """중심/줌/지도 크기로 화면 범위 (남, 서, 북, 동) 추정 - 지도가 처음 그려질 때 사용"""
+    lat, lon = center
+    mpp = meters_per_pixel(zoom, lat)
+    half_lat = math.degrees(height_px / 2 * mpp / EARTH_RADIUS_M)
+    half_lon = math.degrees(width_px / 2 * mpp / (EARTH_RADIUS_M * math.cos(math.radians(lat))))
+    return (lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon)
+
+
+def bounds_from_map_data(map_data):
+    """st_folium 반환값의 bounds → (남, 서, 북, 동). 없으면 None"""
+    bounds = (map_data or {}).get("bounds") or {}
+    sw, ne = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    values = (sw.get("lat"), sw.get("lng"), ne.get("lat"), ne.get("lng"))
+    if any(v is None for v in values):
+        return None
+    return tuple(float(v) for v in values)
+
+
+def snap_bounds(bounds, zoom, pad=VIEW_PAD):
+    """
+    범위를 pad만큼 넓힌 뒤 타일(256px) 격자에 맞춰 바깥쪽으로 맞춤.
+    지도를 조금만 움직이면 같은 범위가 나오므로 레이어를 다시 보내지 않는다.
+    """
+    south, west, north, east = bounds
+    dlat, dlon = (north - south) * pad, (east - west) * pad
+    lat = (south + north) / 2
+    step_lat = math.degrees(_TILE_PX * meters_per_pixel(zoom, lat) / EARTH_RADIUS_M)
+    step_lon = step_lat / math.cos(math.radians(lat))
+    return (
+        math.floor((south - dlat) / step_lat) * step_lat,
+        math.floor((west - dlon) / step_lon) * step_lon,
+        math.ceil((north + dlat) / step_lat) * step_lat,
+        math.ceil((east + dlon) / step_lon) * step_lon,
+    )
+
+
+# ===============================
+# 범위 조회 + 묶음
+# ===============================
+
+def query_viewport(clusters, bounds, zoom):
+    """
+    clusters: ClusterIndex, bounds: (남, 서, 북, 동)
+    반환: {"rows": 개별 AP 행 위치, "clusters": 묶음(AP 2개 이상) DataFrame, "zoom", "bounds"}
+    """
+    with span("viewport.query", zoom=zoom) as s:
+        found = clusters.clusters(*bounds, zoom)
+        single = found["count"].to_numpy() == 1
+        rows = np.sort(found["row"].to_numpy()[single])
+        grouped = found[~single].reset_index(drop=True)
+        s.set(points=len(rows), clusters=len(grouped))
+
+    return {"rows": rows, "clusters": grouped, "zoom": zoom, "bounds": bounds}
+
+
+def add_cluster_layer(parent, clusters):
+    """묶음 마커 (개수별 크기/색, 평균 이용량 툴팁, 클릭하면 묶음이 나뉘는 줌까지 확대)"""
+    if clusters.empty:
+        return None
+    size = np.digitize(clusters["count"].to_numpy(), CLUSTER_BREAKS)
+    return add_point_layer(
+        parent,
+        clusters.assign(size=size),
+        style={"color": "white", "weight": 2, "fill": True, "fill_opacity": 0.8},
+        style_by=("size", CLUSTER_STYLES),
+        tooltip="AP {count}개<br>평균 이용량 점수 {usage_norm:.2f}<br>(클릭하면 확대)",
+        click_zoom="expansion_zoom",
+    )
+
+
+# ===============================
+# 지도 컴포넌트
+# ===============================
+
+def _layer_script(layer):
+    """FeatureGroup → st_folium feature_group 인자 JS (지도 변수 이름은 map_div)"""
+    anchor = folium.Map(location=[0, 0], tiles=None)
+    anchor._id = "div"
+    return _get_feature_group_string(layer, anchor)
+
+
+def st_folium_viewport(kind, params, build, draw, clusters, key=None,
+                       height=700, width=500, returned_objects=None, center=None):
+    """
+    build(): AP를 뺀 기본 folium 지도 (kind, params, 데이터 버전으로 캐시)
+    draw(layer, view): 화면 범위 조회 결과(view)를 FeatureGroup(layer)에 그리는 함수
+    clusters: 그릴 AP의 ClusterIndex (예: get_cluster_index("gu", 선택한 구))
+    center: 기본 지도를 다시 만들지 않고 옮길 중심 [lat, lon] (값이 바뀔 때만 이동)
+    반환값은 st_folium과 같고, 지도를 움직일 때마다(bounds/zoom 변경) 다시 실행된다.
+    """
+    if FOLIUM_PRIVATE_API:
+        payload = cached_folium_payload(kind, params, build)
+        widget_key = generate_js_hash(payload["script"], key or kind, False)
+        default_center, default_zoom = payload.get("center"), payload["zoom"]
+    else:
+        # 공개 st_folium은 위젯 값을 세션에 남기지 않으므로 직전 반환값을 직접 보관
+        m = build()
+        widget_key = f"viewport.{key or kind}"
+        default_center, default_zoom = m.location, m.options.get("zoom")
+
+    # 직전 실행에서 지도가 돌려준 화면 범위 (처음이면 중심/줌으로 추정)
+    last = st.session_state.get(widget_key)
+    zoom = (last or {}).get("zoom") or default_zoom
+    bounds = bounds_from_map_data(last)
+    if center is not None:
+        # 중심이 바뀐 실행에서는 지도가 그 중심으로 옮겨 가므로 새 중심 기준으로 조회
+        center = [float(center[0]), float(center[1])]
+        if st.session_state.get(f"{widget_key}.center") != center:
+            st.session_state[f"{widget_key}.center"] = center
+            bounds = None
+    if bounds is None:
+        bounds = bounds_around(center or default_center, zoom, width or 900, height)
+
+    view = query_viewport(clusters, snap_bounds(bounds, zoom), zoom)
+    with span("viewport.layer"):
+        layer = folium.FeatureGroup(name="AP")
+        draw(layer, view)
+
+    returned = list(returned_objects or [])
+    returned += [name for name in ("bounds", "zoom") if name not in returned]
+    if not FOLIUM_PRIVATE_API:
+        with span(f"st_folium.{kind}"):
+            result = st_folium(m, key=key or kind, height=height, width=width, center=center,
+                               returned_objects=returned, feature_group_to_add=layer)
+        st.session_state[widget_key] = result
+        return result
+
+    with span("viewport.layer"):
+        script = _layer_script(layer)
+    record_payload(f"map.{kind}.layer", script)
+    return folium_component(
+        payload, widget_key, height=height, width=width,
+        returned_objects=returned, feature_group=script, center=center,
+    )
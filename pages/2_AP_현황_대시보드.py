@@ -1,15 +1,24 @@
 import os
 import streamlit as st
-import pandas as pd
-import numpy as np
-import json
 import folium
-from branca.colormap import linear
 import streamlit.components.v1 as components
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 import matplotlib.font_manager as fm
 
+from core.aggregates import get_cube
+from core.ap_data import data_version, load_ap_data
+from core.choropleth import make_metric_choropleth, with_initial_metric
+from core.map_cache import cached_map_html
+from core.point_layer import add_point_layer
+from core.geometry import load_district_geojson
+from core.profiling import span
+from core.replacement import (
+    ACTIONS, LOAD_WEIGHT, OVERLAP_LIMIT, OVERLAP_WEIGHT, USAGE_WEIGHT, default_costs, get_replacement_plan,
+)
+from core.usage_history import show_usage_trend
+from core.usage_stream import usage_basis_note
+
 # ===============================
 # 기본 설정
 # ===============================
@@ -38,66 +47,31 @@ icon("📡")
 st.title("AP 현황 대시보드")
 
 # ===============================
-# 데이터 로드 ( 단일 CSV)
+# 데이터 로드 (공유 AP 데이터)
 # ===============================
 
-data_path = os.path.join(BASE_DIR, "data", "AP_data.csv")
-df = pd.read_csv(data_path)
-
-# (3) 서울 구 경계 geojson 데이터
-@st.cache_resource
-def load_geojson():
-    geojson_path = os.path.join(BASE_DIR, "data", "seoul_gu.geojson")
-    with open(geojson_path, encoding="utf-8") as f:
-        return json.load(f)
+df = load_ap_data()
 
-seoul_geo = load_geojson()
+# 서울 구 경계 geojson 데이터 (지도 줌 11에 맞게 단순화된 버전)
+MAP_ZOOM = 11
+seoul_geo = load_district_geojson(MAP_ZOOM)
 
 # ===============================
-# Choropleth 지도 함수 (df를 인자로 받음)
+# 지표 Choropleth 지도 (경계 1회 + 지표는 지도 안에서 전환)
 # ===============================
 
-def make_choropleth(df_src, var_name, caption, log_scale=False):
-    m = folium.Map(
-        location=[37.5665, 126.9780],
-        zoom_start=11,
-        tiles="cartodbpositron"
-    )
-
-    gu_mean = (
-        df_src.groupby("gu")[var_name]
-              .mean()
-              .reset_index()
-    )
+METRICS = {
+    "density_norm": "와이파이 밀집도",
+    "age_norm": "설치연도 노후도",
+    "usage_norm": "AP 이용량",
+}
 
-    raw_values = gu_mean.set_index("gu")[var_name]
-    values = np.log1p(raw_values) if log_scale else raw_values
-
-    colormap = linear.YlGnBu_09.scale(values.min(), values.max())
-    colormap.caption = caption
-    colormap.add_to(m)
-
-    def style_function(feature):
-        gu_name = feature["properties"]["SIG_KOR_NM"]
-        v = raw_values.get(gu_name, None)
-
-        return {
-            "fillColor": colormap(np.log1p(v) if log_scale else v) if v is not None else "#ffffff",
-            "color": "black",
-            "weight": 1,
-            "fillOpacity": 0.7,
-        }
-
-    folium.GeoJson(
-        seoul_geo,
-        style_function=style_function,
-        tooltip=folium.GeoJsonTooltip(
-            fields=["SIG_KOR_NM"],
-            aliases=["구 이름:"],
-        ),
-    ).add_to(m)
+def load_gu_means():
+    # 구별 평균은 집계 큐브에서 바로 조회
+    return get_cube().rollup(("gu",))[list(METRICS)]
 
-    return m.get_root().render(), gu_mean
+def make_metric_map():
+    return make_metric_choropleth(seoul_geo, load_gu_means(), METRICS, zoom=MAP_ZOOM)
 
 # ===============================
 # 📍 개별 AP 교체·유지관리 지도 (클러스터링 전용)
@@ -106,8 +80,9 @@ def make_choropleth(df_src, var_name, caption, log_scale=False):
 def make_ap_cluster_map():
     m = folium.Map(
         location=[37.5665, 126.9780],
-        zoom_start=11,
-        tiles="cartodbpositron"
+        zoom_start=MAP_ZOOM,
+        tiles="cartodbpositron",
+        prefer_canvas=True,
     )
 
     COLOR_MAP = {
@@ -124,98 +99,103 @@ def make_ap_cluster_map():
         df[df["cluster_k3_rank"].isin([1, 2])]
         .sort_values("cluster_k3_rank")
     )
+    df_target = df_target.assign(status=df_target["cluster_k3_rank"].map(LABEL_MAP))
+
+    # 마커별 JS 대신 좌표/툴팁 컬럼 배열 하나로 전송
+    add_point_layer(
+        m,
+        df_target,
+        style={"fill": True, "fill_opacity": 0.8, "stroke": False, "weight": 0},
+        style_by=("cluster_k3_rank", {
+            1: {"radius": 4, "fill_color": COLOR_MAP[1]},  # 점 작게
+            2: {"radius": 6, "fill_color": COLOR_MAP[2]},
+        }),
+        tooltip=(
+            "<b>상태</b>: {status}<br>"
+            "<b>자치구</b>: {gu}<br>"
+            "<b>설치유형</b>: {install_type}<br>"
+            "<b>노후도 점수</b>: {age_norm:.2f}<br>"
+            "<b>이용량 점수</b>: {usage_norm:.2f}<br>"
+            "<b>밀집도 점수</b>: {density_norm:.2f}"
+        ),
+    )
 
-    for _, row in df_target.iterrows():
-        folium.CircleMarker(
-            location=[row["lat"], row["lon"]],
-            radius=4 if row["cluster_k3_rank"] == 1 else 6,  # 점 작게
-            fill=True,
-            fill_color=COLOR_MAP[row["cluster_k3_rank"]],
-            fill_opacity=0.8,
-            color=None,
-            weight=0,
-            tooltip=f"""
-            <b>상태</b>: {LABEL_MAP[row['cluster_k3_rank']]}<br>
-            <b>자치구</b>: {row['gu']}<br>
-            <b>설치유형</b>: {row['install_type']}<br>
-            <b>노후도 점수</b>: {row['age_norm']:.2f}<br>
-            <b>이용량 점수</b>: {row['usage_norm']:.2f}<br>
-            <b>밀집도 점수</b>: {row['density_norm']:.2f}
-            """
-        ).add_to(m)
-
-    return m.get_root().render()
+    return m
 
 # ===============================
-# 📊 자치구별 설치 수 TOP10 (기본 df 사용)
+# 탭 (선택한 탭만 계산 / 전송)
 # ===============================
 
-# 탭 설정
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📍 위험도", "🕰 노후도", "📶 이용량", "📉 저이용 AP", "📡 설치 현황", "📊 종합 상태"], width=800)
+TABS = ["📍 위험도", "🕰 노후도", "📶 이용량", "📉 저이용 AP", "📡 설치 현황", "📊 종합 상태"]
 
-wifi_recent = (
-    df.groupby("gu")
-      .size()
-      .sort_values(ascending=False)
-      .head(10)
+tab = st.segmented_control(
+    "보기", TABS, default=TABS[0], key="dashboard_tab",
+    label_visibility="collapsed", width=800,
 )
+tab = tab or TABS[0]
 
-# ===============================
-# 📍 지표별 Choropleth 지도 (클러스터링 전용 df 사용)
-# ===============================
-
-with tab1:
-    st.subheader("📍 자치구 공공 Wi-Fi 과밀도 위험도")
+def show_metric_tab(title, metric, top_title):
+    st.subheader(title)
     col_left, col_right = st.columns([2, 1])
-    
+
     with col_left:
-        m_density, mean_value = make_choropleth(df, "density_norm", "와이파이 밀집도")
-        components.html(m_density, height=450, width=MAP_WIDTH)
+        # 렌더링된 지도는 (데이터 버전, 줌) 기준으로 캐시 → 지표만 바꿔 끼움
+        m_html = with_initial_metric(
+            cached_map_html("metric_choropleth", {"zoom": MAP_ZOOM}, make_metric_map), metric
+        )
+        with span("components.html"):
+            components.html(m_html, height=450, width=MAP_WIDTH)
 
     with col_right:
-        st.markdown("### ⬆️ 위험도 Top 5")
-        density_top5 = (mean_value.sort_values('density_norm', ascending=False).head(5))
-        for _, row in density_top5.iterrows():
-            st.markdown(f"**{row['gu']}** — {row['density_norm']:.3f}")
+        st.markdown(f"### ⬆️ {top_title}")
+        top5 = load_gu_means()[metric].sort_values(ascending=False).head(5)
+        for gu, value in top5.items():
+            st.markdown(f"**{gu}** — {value:.3f}")
 
-with tab2:
-    st.subheader("📍 자치구 공공 Wi-Fi 노후도")
-    col_left, col_right = st.columns([2, 1])
+# ===============================
+# 📍 지표별 Choropleth 지도
+# ===============================
 
-    with col_left:
-        m_age, mean_value = make_choropleth(df, "age_norm", "설치연도 노후도")
-        components.html(m_age, height=450, width=MAP_WIDTH)
+if tab == TABS[0]:
+    show_metric_tab("📍 자치구 공공 Wi-Fi 과밀도 위험도", "density_norm", "위험도 Top 5")
 
-    with col_right:
-        st.markdown("### ⬆️ 노후도 Top5")
-        age_top5 = (mean_value.sort_values('age_norm', ascending=False).head(5))
-        for _, row in age_top5.iterrows():
-            st.markdown(f"**{row['gu']}** — {row['age_norm']:.3f}")
+elif tab == TABS[1]:
+    show_metric_tab("📍 자치구 공공 Wi-Fi 노후도", "age_norm", "노후도 Top5")
 
-with tab3:
-    st.subheader("📍 자치구 AP 이용량")
-    col_left, col_right = st.columns([2, 1])
+elif tab == TABS[2]:
+    show_metric_tab("📍 자치구 AP 이용량", "usage_norm", "AP 이용량 Top5")
 
-    with col_left:
-        m_usage, mean_value = make_choropleth(df, "usage_norm", "AP 이용량")
-        components.html(m_usage, height=450, width=MAP_WIDTH)
+    # 이용량 이벤트 스트림이 반영된 스냅샷이면 AP별 이용량 기준 표시
+    usage_note = usage_basis_note(data_version())
+    if usage_note:
+        st.caption(usage_note)
 
-    with col_right:
-        st.markdown("### ⬆️ AP 이용량 Top5")
-        usage_top5 = (mean_value.sort_values('usage_norm', ascending=False).head(5))
-        for _, row in usage_top5.iterrows():
-            st.markdown(f"**{row['gu']}** — {row['usage_norm']:.3f}")
+    # 이용량 이력 저장소에서 기간에 맞는 해상도로 조회
+    st.markdown("### 📈 이용량 추이")
+    trend_gu = st.selectbox(
+        "자치구", ["서울 전체", *df["gu"].cat.categories], key="trend_gu",
+    )
+    show_usage_trend("trend_range_gu", gu=None if trend_gu == "서울 전체" else trend_gu)
 
-with tab4:
+elif tab == TABS[3]:
     st.subheader("📉 저이용 AP 집중 지역")
+
+    # 이용량 이벤트 스트림이 반영된 스냅샷이면 AP별 이용량 기준 표시
+    usage_note = usage_basis_note(data_version())
+    if usage_note:
+        st.caption(usage_note)
+
     col_left, col_right = st.columns([2, 1])
     
-    # 이용량 하위 20%
-    q20 = df["usage_norm"].quantile(0.2)
-    low20 = df[df["usage_norm"] <= q20]
-
-    # 구별 개수 집계
-    low20_counts = (low20.groupby("gu").size().sort_values(ascending=False))
+    # 이용량 하위 20% 기준값 + 구별 개수 (집계 큐브의 분위수 히스토그램 사용)
+    cube = get_cube()
+    q20 = cube.quantile("usage_norm", 0.2)
+    low20_counts = (
+        cube.count_at_most("usage_norm", q20)
+            .round()
+            .astype(int)
+            .sort_values(ascending=False)
+    )
 
     with col_left:
         # 이용량 하위 20% -> 구별 개수 표기 그래프
@@ -225,7 +205,8 @@ with tab4:
         ax.set_ylabel("하위 20% AP 개수", fontproperties=font_prop)
         ax.set_title("자치구별 이용량 하위 20% AP 개수", fontproperties=font_prop)
         ax.set_xticklabels(low20_counts.index, rotation=45, ha="right", fontproperties=font_prop)
-        st.pyplot(fig)
+        with span("st.pyplot"):
+            st.pyplot(fig)
     
     with col_right:
         st.markdown("### ⬆️ AP 저이용 Top5")
@@ -235,9 +216,15 @@ with tab4:
 # -----------------------------
 # 📍 자치구별 공공 Wi-Fi 설치 수 TOP10
 # -----------------------------
-with tab5:
+elif tab == TABS[4]:
     st.subheader("📍 자치구별 공공 Wi-Fi 설치 수 TOP10")
 
+    wifi_recent = (
+        get_cube().rollup(("gu",))["count"]
+          .sort_values(ascending=False)
+          .head(10)
+    )
+
     col_left, col_right = st.columns([2, 1])
 
     with col_left:
@@ -246,7 +233,8 @@ with tab5:
         ax.set_xticklabels(wifi_recent.index, rotation=45, ha="right", fontproperties=font_prop)
         ax.set_xlabel("자치구", fontproperties=font_prop)
         ax.set_ylabel("설치된 AP 수", fontproperties=font_prop)
-        st.pyplot(fig)
+        with span("st.pyplot"):
+            st.pyplot(fig)
 
     with col_right:
         st.markdown("### ⬆️ 설치 수 Top5")
@@ -257,14 +245,17 @@ with tab5:
 # 📍 개별 AP 지도
 # ===============================
 
-with tab6:
+else:
     st.subheader("📍 교체·유지관리 대상 공공 Wi-Fi AP 분포 (개별 AP 기준)")
 
     col_left, col_right = st.columns([2, 1])
 
     with col_left:
-        m_cluster = make_ap_cluster_map()
-        components.html(m_cluster, height=450, width=MAP_WIDTH)
+        m_cluster = cached_map_html(
+            "ap_cluster", {"zoom": MAP_ZOOM, "ranks": [1, 2]}, make_ap_cluster_map
+        )
+        with span("components.html"):
+            components.html(m_cluster, height=450, width=MAP_WIDTH)
 
     with col_right:
         st.markdown("""
@@ -278,3 +269,86 @@ with tab6:
 
         ※ 양호 AP는 시각화에서 제외
         """)
+
+    # -----------------------------
+    # 💰 예산 기반 교체 / 이전 / 철거 계획
+    # -----------------------------
+    st.subheader("💰 예산 기반 교체·이전·철거 계획")
+    st.caption(
+        "유지관리 / 교체권장 AP 중 예산 안에서 커버리지 품질(노후 AP 교체, 공백 칸 이전)과 "
+        "과밀 해소(중복 AP 철거) 효과가 비용 대비 가장 큰 조치부터 고릅니다. "
+        "부하가 큰 칸의 AP를 철거 / 이전하면 남은 AP가 감당하는 수요가 줄어 감점됩니다."
+    )
+
+    # 계획 문제(격자 / 후보 배열)는 계산 버튼을 누를 때만 만든다
+    install_types = list(df["install_type"].cat.categories)
+
+    with st.form("replacement_plan"):
+        budget = st.number_input("예산 (만원)", min_value=0, value=20_000, step=1_000)
+        actions = st.multiselect(
+            "허용할 조치", list(ACTIONS), default=list(ACTIONS), format_func=ACTIONS.get,
+        )
+        with st.expander("단가 / 가중치 설정"):
+            costs = st.data_editor(
+                default_costs(install_types).rename(columns=ACTIONS),
+                key="replacement_costs",
+            ).rename(columns={label: action for action, label in ACTIONS.items()})
+            usage_weight = st.slider("이용량 가중치", 0.0, 5.0, USAGE_WEIGHT, 0.5)
+            load_weight = st.slider("처리 용량 가중치 (남은 AP가 감당하는 부하)", 0.0, 5.0, LOAD_WEIGHT, 0.5)
+            overlap_limit = st.slider("과밀 기준 (반경 안 AP 수)", 1, 20, OVERLAP_LIMIT)
+            overlap_weight = st.slider("과밀 벌점 (초과 AP 1대 · 칸 1개당)", 0.0, 1.0, OVERLAP_WEIGHT, 0.05)
+        submitted = st.form_submit_button("계획 계산")
+
+    if submitted and actions:
+        with st.spinner("계획 계산 중..."):
+            st.session_state.replacement_plan = get_replacement_plan(
+                budget, costs, actions, usage_weight, overlap_limit, overlap_weight, load_weight,
+            )
+
+    if "replacement_plan" in st.session_state:
+        plan, summary = st.session_state.replacement_plan
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("조치 수", f"{len(plan):,}건")
+        m2.metric("사용 예산", f"{summary['spent']:,.0f}만원", f"예산 {summary['budget']:,.0f}만원", delta_color="off")
+        m3.metric(
+            "목적함수",
+            f"{summary['objective_after']:,.0f}",
+            f"{(summary['objective_after'] / summary['objective_before'] - 1) * 100:+.2f}%",
+        )
+
+        if len(plan):
+            # 한계 효과 곡선: 누적 비용 대비 누적 효과 / 조치별 비용 대비 효과
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 3.5))
+            ax1.plot(plan["cum_cost"], plan["cum_gain"])
+            ax1.set_xlabel("누적 비용 (만원)", fontproperties=font_prop)
+            ax1.set_ylabel("누적 효과", fontproperties=font_prop)
+            ax1.set_title("예산 대비 누적 효과", fontproperties=font_prop)
+            ax2.plot(plan["cum_cost"], plan["gain_per_cost"])
+            ax2.set_xlabel("누적 비용 (만원)", fontproperties=font_prop)
+            ax2.set_ylabel("효과 / 비용", fontproperties=font_prop)
+            ax2.set_title("한계 효과", fontproperties=font_prop)
+            fig.tight_layout()
+            with span("st.pyplot"):
+                st.pyplot(fig)
+
+            st.markdown("**구별 조치 수**")
+            st.dataframe(
+                plan.pivot_table(index="gu", columns="action", values="ap_id", aggfunc="count", fill_value=0)
+                .rename(columns=ACTIONS)
+            )
+
+            st.markdown("**계획 (선택 순서)**")
+            shown = plan.assign(action=plan["action"].map(ACTIONS)).rename(columns={
+                "ap_id": "AP ID", "gu": "자치구", "install_type": "설치유형", "rank": "등급",
+                "action": "조치", "cost": "비용", "gain": "효과", "target_lat": "이전 위도",
+                "target_lon": "이전 경도", "cum_cost": "누적 비용", "cum_gain": "누적 효과",
+                "gain_per_cost": "효과/비용",
+            })
+            st.dataframe(shown.drop(columns=["lat", "lon"]).round(4), hide_index=True)
+            st.download_button(
+                "계획 CSV 내려받기",
+                shown.to_csv(index=False).encode("utf-8-sig"),
+                file_name="replacement_plan.csv",
+                mime="text/csv",
+            )
@@ -1,8 +1,17 @@
 import streamlit as st
-import pandas as pd
 import folium
-from folium.plugins import MarkerCluster
-from streamlit_folium import st_folium  
+import pandas as pd
+
+from core.aggregates import get_cube
+from core.ap_data import data_version, load_ap_data
+from core.ap_index import find_ap
+from core.district_bundle import get_district_bundle
+from core.map_cache import st_folium_cached
+from core.point_layer import add_point_layer
+from core.profiling import span
+from core.usage_history import show_usage_trend
+from core.usage_stream import usage_basis_note
+from core.viewport import add_cluster_layer, st_folium_viewport
 
 def icon(emoji: str):
     """Shows an emoji as a Notion-style page icon."""
@@ -41,19 +50,8 @@ with button_col:
 # -----------------------------
 # 1) 데이터 불러오기 (원본은 df_all)
 # -----------------------------
-@st.cache_data
-def load_data():
-    return pd.read_csv("data/AP_data.csv")
-
-df_all = load_data()
-
-# ap_id 문자열 통일
-df_all["ap_id"] = (
-    df_all["ap_id"]
-    .astype(str)
-    .str.strip()
-    .str.replace(r"\.0$", "", regex=True)
-)
+# ap_id는 공유 데이터 로드 시 이미 문자열로 통일되어 있음
+df_all = load_ap_data()
 
 # =====================================================================
 # ① 개요 모드: 자치구별 AP 개수만 보여주는 모드
@@ -61,12 +59,8 @@ df_all["ap_id"] = (
 if st.session_state.mode == "overview":
     # 구별 중심좌표 + AP 개수
     gu_stats = (
-        df_all.groupby("gu")
-        .agg(
-            lat=("lat", "mean"),
-            lon=("lon", "mean"),
-            ap_count=("ap_id", "count")
-        )
+        get_cube().rollup(("gu",))[["lat", "lon", "count"]]
+        .rename(columns={"count": "ap_count"})
         .reset_index()
     )
 
@@ -118,47 +112,50 @@ if st.session_state.mode == "overview":
     center_lat = df_all["lat"].mean()
     center_lon = df_all["lon"].mean()
 
-    # 지도 생성
-    m = folium.Map(
-        location=[37.5665, 126.9780],
-        zoom_start=11,
-        tiles="cartodbpositron",
-    )
+    def make_overview_map():
+        # 지도 생성
+        m = folium.Map(
+            location=[37.5665, 126.9780],
+            zoom_start=11,
+            tiles="cartodbpositron",
+        )
+
+        # 각 구마다 동그란 숫자 마커 (구 이름은 표시 X, 숫자만)
+        for _, row in gu_stats.iterrows():
+            gu_name = row["gu"]
+            count = int(row["ap_count"])
+            color = count_to_color(count)
+
+            html = f"""
+            <div style="
+                width: 40px;
+                height: 40px;
+                border-radius: 50%;
+                background: {color}E6;
+                backdrop-filter: blur(2px);
+                color: #333333;
+                font-size: 14px;
+                font-weight: 700;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                box-shadow:
+                    0 4px 10px rgba(0, 0, 0, 0.35),  
+                    inset 0 2px 4px rgba(255, 255, 255, 0.25);
+            ">
+                {count}
+            </div>
+            """
+            icon_div = folium.DivIcon(html=html)
+
+            folium.Marker(
+                location=[row["lat"], row["lon"]],
+                icon=icon_div,
+                popup=gu_name,                    # ★ 클릭 시 구 이름이 넘어감
+                tooltip=f"{gu_name} (AP {count}개)",
+            ).add_to(m)
 
-    # 각 구마다 동그란 숫자 마커 (구 이름은 표시 X, 숫자만)
-    for _, row in gu_stats.iterrows():
-        gu_name = row["gu"]
-        count = int(row["ap_count"])
-        color = count_to_color(count)
-
-        html = f"""
-        <div style="
-            width: 40px;
-            height: 40px;
-            border-radius: 50%;
-            background: {color}E6;
-            backdrop-filter: blur(2px);
-            color: #333333;
-            font-size: 14px;
-            font-weight: 700;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            box-shadow:
-                0 4px 10px rgba(0, 0, 0, 0.35),  
-                inset 0 2px 4px rgba(255, 255, 255, 0.25);
-        ">
-            {count}
-        </div>
-        """
-        icon_div = folium.DivIcon(html=html)
-
-        folium.Marker(
-            location=[row["lat"], row["lon"]],
-            icon=icon_div,
-            popup=gu_name,                    # ★ 클릭 시 구 이름이 넘어감
-            tooltip=f"{gu_name} (AP {count}개)",
-        ).add_to(m)
+        return m
 
     # 개요 모드: 왼쪽은 안내만, 오른쪽에 지도
     left_col, right_col = st.columns([1, 2])
@@ -168,7 +165,8 @@ if st.session_state.mode == "overview":
         st.write("먼저 오른쪽 지도에서 **자치구를 선택**해 주세요.")
 
     with right_col:
-        map_data = st_folium(m, width=900, height=700)
+        # 렌더링된 지도는 데이터 버전별로 한 번만 만들어 모든 세션이 공유
+        map_data = st_folium_cached("gu_overview", {}, make_overview_map, width=900, height=700)
 
     # 구 클릭 감지 → detail 모드로 전환
     if map_data is not None:
@@ -191,49 +189,58 @@ else:
 
     st.markdown(f"### 2단계: `{selected_gu}` AP 상세 보기")
 
-    # 이 구의 AP만 사용
-    df = df_all[df_all["gu"] == selected_gu].copy()
+    # 이 구의 AP 좌표 / 중심 / 묶음 인덱스 / 표시 좌표는 데이터 버전별로 미리 만든 묶음에서 조회
+    with span("map_detail.bundle", gu=selected_gu):
+        bundle = get_district_bundle(selected_gu)
 
-    if df.empty:
+    if bundle is None or len(bundle.clusters) == 0:
         st.warning(f"{selected_gu} 구에는 AP 데이터가 없습니다.")
     else:
-        center_lat = df["lat"].mean()
-        center_lon = df["lon"].mean()
+        def make_detail_map():
+            center_lat, center_lon = bundle.centroid
+
+            # 지도 생성 (AP는 화면 범위에 맞춰 따로 그림)
+            return folium.Map(
+                location=[center_lat, center_lon],
+                zoom_start=13,
+                tiles="cartodbpositron",
+                prefer_canvas=True,
+            )
 
-        # 지도 생성
-        m = folium.Map(
-            location=[center_lat, center_lon],
-            zoom_start=13,
-            tiles="cartodbpositron",
-        )
+        def draw_detail_aps(layer, view):
+            # 미리 계산한 묶음 마커 + 묶이지 않은 개별 AP
+            add_cluster_layer(layer, view["clusters"])
+            if len(view["rows"]) == 0:
+                return
+
+            visible = pd.DataFrame({"ap_id": df_all["ap_id"].to_numpy()[view["rows"]]})
 
-        marker_cluster = MarkerCluster().add_to(m)
+            # 같은 주소에 겹친 AP도 하나씩 클릭할 수 있도록 미리 펼쳐 둔 좌표로 표시
+            visible["plot_lat"], visible["plot_lon"] = bundle.plot_positions(view["rows"])
 
-        for _, row in df.iterrows():
-            apid = (
-                str(row["ap_id"])
-                .strip()
-                .replace(".0", "")
+            add_point_layer(
+                layer,
+                visible,
+                style={"radius": 4, "color": "blue", "fill": True, "fill_opacity": 0.7},
+                popup="{ap_id}",      # ★ 클릭 시 AP ID가 넘어감
+                tooltip="{ap_id}",
+                position=("plot_lat", "plot_lon"),
             )
-            folium.CircleMarker(
-                location=[row["lat"], row["lon"]],
-                radius=4,
-                popup=apid,      # ★ 클릭 시 AP ID가 넘어감
-                tooltip=apid,
-                color="blue",
-                fill=True,
-                fill_opacity=0.7,
-            ).add_to(marker_cluster)
 
         # 레이아웃: 왼쪽 카드, 오른쪽 지도
         left_col, right_col = st.columns([1, 2])
 
         with right_col:
-            map_data = st_folium(m, width=900, height=700)
+            # 지도에 보이는 범위의 AP만 전송 (지도를 움직이면 다시 조회)
+            map_data = st_folium_viewport(
+                "gu_detail_base", {"gu": selected_gu}, make_detail_map, draw_detail_aps,
+                bundle.clusters, width=900, height=700,
+                returned_objects=["last_object_clicked_popup"],
+            )
 
         with left_col:
             st.subheader("AP 상세 카드")
-            st.caption(f"선택한 구: {selected_gu} (AP {len(df)}개)")
+            st.caption(f"선택한 구: {selected_gu} (AP {len(bundle)}개)")
 
             default_msg = "지도 위 AP 점을 클릭하면 이곳에 상세 정보가 표시됩니다."
 
@@ -245,21 +252,13 @@ else:
                 if ap_id_clicked is None:
                     st.write(default_msg)
                 else:
-                    ap_id_clicked = (
-                        str(ap_id_clicked)
-                        .strip()
-                        .replace(".0", "")
-                    )
-
-                    # 선택한 구 안에서 ap_id로 검색
-                    row_sel = df[df["ap_id"] == ap_id_clicked]
+                    # 데이터 버전별 ap_id 인덱스로 바로 조회 (선택한 구의 AP만)
+                    row = find_ap(ap_id_clicked)
 
-                    if row_sel.empty:
+                    if row is None or row["gu"] != selected_gu:
                         st.write("선택한 AP 정보를 찾을 수 없습니다.")
                         st.write(f"(ap_id: {ap_id_clicked})")
                     else:
-                        row = row_sel.iloc[0]
-
                         st.markdown(f"### AP ID: `{row['ap_id']}`")
                         st.markdown("---")
                         st.markdown(f"**구:** {row['gu']}")
@@ -270,3 +269,9 @@ else:
                         st.markdown(f"**위도(lat):** {row['lat']:.6f}")
                         st.markdown(f"**경도(lon):** {row['lon']:.6f}")
                         st.markdown(f"**이용량(GB):** {row['usage_gb']}")
+                        usage_note = usage_basis_note(data_version())
+                        if usage_note:
+                            st.caption(usage_note)
+
+                        st.markdown("**이용량 추이**")
+                        show_usage_trend("trend_range_ap", ap_id=row["ap_id"], height=200)
@@ -1,6 +1,17 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
+import numpy as np
+import folium
+
+from core.aggregates import get_cube
+from core.ap_data import data_version, load_ap_data
+from core.coverage import CELL_M, METRICS, RADIUS_M, add_coverage_layer, get_coverage
+from core.features import DENSITY_RADIUS_M
+from core.geometry import load_district_geojson
+from core.map_cache import st_folium_cached, st_folium_profiled
+from core.point_layer import add_point_layer
+from core.profiling import cache_lookup, record_cache, span
+from core.scenario import ADD, MOVE, RANK_LABELS, REMOVE, RelocationScenario, get_scenario_base
 
 def icon(emoji: str):
     """Shows an emoji as a Notion-style page icon."""
@@ -17,16 +28,17 @@ st.set_page_config(
 icon("🧭")
 st.title("구별 정책 의사결정 시나리오")
 
+@cache_lookup("policy.load_data")
 @st.cache_data
-def load_data():
-    df = pd.read_csv("data/AP_data.csv")
-    
-    df_risk = df.groupby("gu").agg({
-                    "density_norm": "mean",
-                    "usage_norm": "mean",
-                    "ap_id": "count"
-                }).sort_values("density_norm", ascending=False)
+def load_data(version):
+    record_cache("policy.load_data", "miss")
+    df_risk = (
+        get_cube().rollup(("gu",))[["density_norm", "usage_norm", "count"]]
+        .rename(columns={"count": "ap_id"})
+        .sort_values("density_norm", ascending=False)
+    )
 
+    df = load_ap_data(["gu", "usage_gb"])
     df_seocho = df[df["gu"] == "서초구"]
 
     return df_risk, df_seocho
@@ -38,9 +50,10 @@ def draw_graph(seocho_df):
     ax.set_xlabel("usage_gb")
     ax.set_ylabel("Number of APs")
 
-    st.pyplot(fig, width=500) 
+    with span("st.pyplot"):
+        st.pyplot(fig, width=500)
 
-df_risk, df_seocho = load_data()
+df_risk, df_seocho = load_data(data_version())
 
 st.markdown(
     "<p style='color:#6b7280; font-size:16px;'>데이터 기반 공공 Wi-Fi 재배치 정책 시뮬레이션</p>",
@@ -154,3 +167,250 @@ with col2:
         """,
         unsafe_allow_html=True
     )
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+# -----------------------------
+# 📡 서울 격자 커버리지 분석
+# -----------------------------
+st.markdown("### ③ Wi-Fi 커버리지 공백 분석")
+
+st.caption(
+    f"서울을 {CELL_M:g}m 격자로 나눠 칸마다 가장 가까운 AP까지 거리, "
+    f"반경 {RADIUS_M:g}m 안 AP 수, 예상 부하(AP 이용량을 반경 안 칸에 나눈 값)를 계산했습니다."
+)
+
+coverage = get_coverage()
+
+metric = st.radio(
+    "지표",
+    list(METRICS),
+    format_func=lambda name: METRICS[name][0],
+    horizontal=True,
+    key="coverage_metric",
+)
+
+def make_coverage_map():
+    m = folium.Map(location=[37.5665, 126.9780], zoom_start=11, tiles="cartodbpositron")
+    add_coverage_layer(m, coverage, metric)
+
+    # 구 경계선만 표시
+    folium.GeoJson(
+        load_district_geojson(11),
+        style_function=lambda feature: {"fill": False, "color": "#555555", "weight": 1},
+    ).add_to(m)
+    return m
+
+# 지표별 지도는 데이터 버전별로 한 번만 만들어 모든 세션이 공유
+st_folium_cached(
+    "policy_coverage",
+    {"metric": metric, "cell_m": CELL_M, "radius_m": RADIUS_M},
+    make_coverage_map,
+    width=700,
+    height=520,
+    returned_objects=[],
+)
+
+coverage_by_gu = coverage.summary_by_gu().rename(columns={
+    "cells": "칸 수",
+    "area_km2": "면적(km²)",
+    "covered_share": f"{RADIUS_M:g}m 내 AP 비율",
+    "mean_nearest_m": "평균 거리(m)",
+    "p95_nearest_m": "95% 거리(m)",
+    "mean_count": "평균 AP 수",
+    "load_gb": "예상 부하(GB)",
+})
+st.dataframe(coverage_by_gu.round(2))
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+# -----------------------------
+# 🧪 AP 재배치 what-if 시뮬레이션
+# -----------------------------
+st.markdown("### ④ AP 재배치 what-if 시뮬레이션")
+
+st.caption(
+    f"AP를 삭제 / 이동 / 추가하면 반경 {DENSITY_RADIUS_M:g}m 안 이웃 AP의 밀집도와 군집 등급, "
+    f"반경 {RADIUS_M:g}m 커버리지 공백, 구별 집계만 바로 다시 계산합니다. "
+    "기준값은 위 표와 같은 원본 점수 컬럼이고, 편집 후에도 영향이 없는 AP의 값은 그대로입니다."
+)
+
+# 기준 상태는 데이터 버전별로 공유하고, 편집 내용만 세션에 보관
+scenario_base = get_scenario_base()
+if getattr(st.session_state.get("scenario"), "base", None) is not scenario_base:
+    st.session_state.scenario = RelocationScenario(scenario_base)
+    st.session_state.scenario_elapsed = None
+scenario = st.session_state.scenario
+
+sim_gu = st.selectbox(
+    "자치구",
+    scenario_base.gu_names,
+    index=scenario_base.gu_names.index("서초구") if "서초구" in scenario_base.gu_names else 0,
+    key="scenario_gu",
+)
+gu_code = scenario_base.gu_names.index(sim_gu)
+
+# 편집 후보: 선택한 구의 남아 있는 기준 AP 중 교체권장 → 이웃 수 많은 순
+MAX_CANDIDATES = 300
+with span("scenario.candidates", gu=sim_gu):
+    in_gu = np.flatnonzero(scenario_base.gu == gu_code)
+    in_gu = np.array([r for r in in_gu.tolist() if r not in scenario.removed], dtype=np.int64)
+    counts = scenario.column("counts", in_gu)
+    ranks = scenario.column("rank", in_gu)
+    order = np.lexsort((-counts, -ranks))[:MAX_CANDIDATES]
+    candidate_ids = scenario_base.ap_id[in_gu[order]].tolist()
+    candidate_labels = {
+        ap_id: f"{ap_id} · {RANK_LABELS[int(rank)]} · 이웃 {int(count)}개"
+        for ap_id, rank, count in zip(candidate_ids, ranks[order], counts[order])
+    }
+
+gu_centers = get_cube().rollup(("gu",))[["lat", "lon"]]
+
+def make_scenario_map():
+    center = gu_centers.loc[sim_gu]
+    m = folium.Map(location=[center["lat"], center["lon"]], zoom_start=14, tiles="cartodbpositron")
+    folium.GeoJson(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                f for f in load_district_geojson(14)["features"]
+                if f["properties"].get("SIG_KOR_NM") == sim_gu
+            ],
+        },
+        style_function=lambda feature: {"fill": False, "color": "#555555", "weight": 2},
+    ).add_to(m)
+
+    removed = scenario.removed_rows()
+    if len(removed):
+        add_point_layer(
+            m, removed,
+            style={"radius": 5, "color": "#6b7280", "fill": True, "fill_opacity": 0.3, "dash_array": "2 3"},
+            tooltip="삭제 / 이동 전: {ap_id}",
+        )
+
+    changed = scenario.changed_rows()
+    if len(changed):
+        changed["rank_label"] = changed["rank"].astype(int).map(RANK_LABELS)
+        add_point_layer(
+            m, changed,
+            style={"radius": 5, "color": "#2E7D32", "fill": True, "fill_opacity": 0.8},
+            style_by=("rank", {1: {"color": "#F9A825"}, 2: {"color": "#C62828"}}),
+            tooltip="{ap_id} · {rank_label}<br>이웃 {counts}개 · 밀집도 {density_norm:.2f}",
+        )
+    return m
+
+map_col, edit_col = st.columns([3, 2])
+
+with map_col:
+    sim_map = st_folium_profiled(
+        "policy_scenario", make_scenario_map(),
+        key="scenario_map", width=560, height=460, returned_objects=["last_clicked"],
+    )
+    st.caption("지도를 클릭하면 이동 / 추가 위치가 채워집니다. 빨강: 교체권장, 노랑: 유지관리, 초록: 양호, 회색: 삭제된 자리")
+
+# 지도 클릭 위치 → 좌표 입력칸 (입력칸을 만들기 전에 값 반영)
+clicked = (sim_map or {}).get("last_clicked")
+if clicked and clicked != st.session_state.get("scenario_clicked"):
+    st.session_state.scenario_clicked = clicked
+    st.session_state.scenario_lat = float(clicked["lat"])
+    st.session_state.scenario_lon = float(clicked["lng"])
+st.session_state.setdefault("scenario_lat", float(gu_centers.loc[sim_gu, "lat"]))
+st.session_state.setdefault("scenario_lon", float(gu_centers.loc[sim_gu, "lon"]))
+
+def run_edits(edits):
+    try:
+        st.session_state.scenario_elapsed = scenario.apply(edits)
+    except ValueError as e:
+        st.error(str(e))
+
+with edit_col:
+    remove_tab, move_tab, add_tab = st.tabs(["삭제", "이동", "추가"])
+
+    with remove_tab:
+        to_remove = st.multiselect(
+            "삭제할 AP", candidate_ids, format_func=candidate_labels.get, key=f"scenario_remove_{sim_gu}_{len(scenario.edits)}",
+        )
+        if st.button("삭제 적용", disabled=not to_remove):
+            run_edits([{"op": REMOVE, "ap_id": ap_id} for ap_id in to_remove])
+            st.rerun()
+
+    with move_tab:
+        to_move = st.selectbox(
+            "이동할 AP", candidate_ids, format_func=candidate_labels.get, key=f"scenario_move_{sim_gu}_{len(scenario.edits)}",
+        )
+        st.number_input("위도", key="scenario_lat", format="%.6f", step=0.0001)
+        st.number_input("경도", key="scenario_lon", format="%.6f", step=0.0001)
+        if st.button("이동 적용", disabled=to_move is None):
+            run_edits([{
+                "op": MOVE, "ap_id": to_move,
+                "lat": st.session_state.scenario_lat, "lon": st.session_state.scenario_lon,
+            }])
+            st.rerun()
+
+    with add_tab:
+        st.caption(f"위치: ({st.session_state.scenario_lat:.6f}, {st.session_state.scenario_lon:.6f})")
+        year_lo, year_hi = (int(y) for y in scenario_base.state["year_range"])
+        add_year = st.number_input("설치 연도", year_lo, year_hi, year_hi, key="scenario_year")
+        add_usage = st.number_input(
+            "예상 이용량(GB)", min_value=0.0,
+            value=float(np.nan_to_num(scenario_base.gu_usage[gu_code])), key="scenario_usage",
+        )
+        add_count = st.number_input("추가할 AP 수", 1, 20, 1, key="scenario_add_count")
+        if st.button("추가 적용"):
+            run_edits([{
+                "op": ADD, "lat": st.session_state.scenario_lat, "lon": st.session_state.scenario_lon,
+                "usage_gb": add_usage, "install_year": add_year,
+            }] * int(add_count))
+            st.rerun()
+
+    if st.button("↺ 시나리오 초기화", disabled=not scenario.edits):
+        st.session_state.scenario = RelocationScenario(scenario_base)
+        st.session_state.scenario_elapsed = None
+        st.rerun()
+
+# 결과: 전체 / 구별 기준 대비 변화
+before = scenario.summary_by_gu(base=True)
+after = scenario.summary_by_gu()
+gap_cells = lambda frame: (frame["gap_share"] * scenario_base.cells).round().sum()
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("AP 수", f"{after['ap_count'].sum():,}", f"{after['ap_count'].sum() - before['ap_count'].sum():+,}")
+m2.metric(
+    "교체권장 AP", f"{after['rank_2'].sum():,}", f"{after['rank_2'].sum() - before['rank_2'].sum():+,}",
+    delta_color="inverse",
+)
+m3.metric(
+    "커버리지 공백 칸", f"{gap_cells(after):,.0f}", f"{gap_cells(after) - gap_cells(before):+,.0f}",
+    delta_color="inverse",
+)
+elapsed = st.session_state.get("scenario_elapsed")
+m4.metric("마지막 편집 계산", "-" if elapsed is None else f"{elapsed * 1000:.0f} ms")
+
+if scenario.edits:
+    changed_gu = (after != before).any(axis=1)
+    labels = {
+        "ap_count": "AP 수", "density_mean": "평균 밀집도", "usage_mean": "평균 이용량 점수",
+        **{f"rank_{r}": label for r, label in RANK_LABELS.items()},
+        "gap_share": f"{RADIUS_M:g}m 공백 비율",
+    }
+    district = (
+        before[changed_gu].rename(columns=labels).add_suffix(" (기준)")
+        .join(after[changed_gu].rename(columns=labels))
+    )
+    district = district[[c for name in labels.values() for c in (f"{name} (기준)", name)]]
+    st.markdown("**구별 변화**")
+    st.dataframe(district.round(3))
+
+    changed = scenario.changed_rows()
+    st.markdown(f"**밀집도가 바뀐 AP ({len(changed):,}개)**")
+    st.dataframe(
+        changed.drop(columns=["lat", "lon"]).rename(columns={
+            "counts_before": "이웃 수 (기준)", "counts": "이웃 수",
+            "density_before": "밀집도 (기준)", "density_norm": "밀집도",
+            "rank_before": "등급 (기준)", "rank": "등급", "added": "추가 AP",
+        }).round(3),
+        hide_index=True,
+    )
+
+    with st.expander(f"편집 기록 ({len(scenario.edits)}건)"):
+        st.dataframe(scenario.edits, hide_index=True)
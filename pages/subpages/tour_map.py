@@ -1,23 +1,23 @@
 import streamlit as st
-import pandas as pd
 import folium
-from streamlit_folium import st_folium
-from folium.plugins import MarkerCluster
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("data/AP_data.csv")
+from core.ap_data import data_version, load_ap_data
+from core.ap_index import find_clicked_ap
+from core.cluster_index import get_cluster_index
+from core.point_layer import add_point_layer
+from core.profiling import cache_lookup, record_cache
+from core.viewport import add_cluster_layer, st_folium_viewport
 
+@cache_lookup("tour_map.filter")
 @st.cache_data
-def get_filtered_df(place):
+def get_filtered_df(place, version):
+    record_cache("tour_map.filter", "miss")
     return (
         df.loc[df["install_type"] == place, ["lat", "lon", "address"]]
         .dropna(subset=["lat", "lon"])
     )
 
-def make_map(filtered_df, place):
-    icon_name, icon_color = icon_map.get(place, ("info-sign", "blue"))
-
+def make_base_map(filtered_df):
     if len(filtered_df) > 0:
         center_lat = float(filtered_df["lat"].mean())
         center_lon = float(filtered_df["lon"].mean())
@@ -25,29 +25,30 @@ def make_map(filtered_df, place):
         center_lat = float(df["lat"].mean())
         center_lon = float(df["lon"].mean())
 
-    m = folium.Map(
+    # AP는 화면 범위에 맞춰 따로 그림
+    return folium.Map(
         location=[center_lat, center_lon],
         zoom_start=13,
         tiles="cartodbpositron",
         prefer_canvas=True,
     )
 
-    marker_cluster = MarkerCluster(
-        showCoverageOnHover=False,
-        removeOutsideVisibleBounds=True,
-    ).add_to(m)
-
-    for r in filtered_df.itertuples(index=False):
-        popup = folium.Popup(f"주소: {r.address}", max_width=350)
-        folium.Marker(
-            location=[float(r.lat), float(r.lon)],
-            popup=popup,
-            icon=folium.Icon(icon=icon_name, color=icon_color, prefix="fa"),
-        ).add_to(marker_cluster)
+def draw_place_aps(layer, view, place):
+    # 미리 계산한 묶음 마커 + 묶이지 않은 개별 AP
+    add_cluster_layer(layer, view["clusters"])
+    if len(view["rows"]) == 0:
+        return
 
-    return m
+    icon_name, icon_color = icon_map.get(place, ("info-sign", "blue"))
+    add_point_layer(
+        layer,
+        df.iloc[view["rows"]],
+        style={},
+        popup="<b>AP ID:</b> {ap_id}<br>주소: {address}",
+        icon={"icon": icon_name, "color": icon_color, "prefix": "fa"},
+    )
 
-df = load_data()
+df = load_ap_data(["ap_id", "install_type", "lat", "lon", "address"])
 
 icon_map = {
     '주요거리': ('road', 'blue'),
@@ -79,11 +80,28 @@ def render():
         place = st.radio("장소", available_types, key="place")
 
     # ---- 데이터 필터링(라디오 이후) ----
-    filtered_df = get_filtered_df(place)
+    filtered_df = get_filtered_df(place, data_version())
 
     with left:
         st.write(f"📍 표시중 : {len(filtered_df):,}개")
 
     with right:
-        m = make_map(filtered_df, place)
-        st_folium(m, width=520, height=520, returned_objects=[])
+        # 지도에 보이는 범위의 묶음/AP만 전송 (지도를 움직이면 다시 조회)
+        map_data = st_folium_viewport(
+            "tour_map_base",
+            {"place": place},
+            lambda: make_base_map(filtered_df),
+            lambda layer, view: draw_place_aps(layer, view, place),
+            get_cluster_index("install_type", place),
+            width=520,
+            height=520,
+            returned_objects=["last_object_clicked_popup"],
+        )
+
+    # ---- 왼쪽: 클릭한 AP 정보 (ap_id 인덱스로 조회) ----
+    selected = find_clicked_ap(map_data, ["ap_id", "install_type", "address", "indoor_outdoor"])
+    if selected is not None and selected["install_type"] == place:
+        with left:
+            st.markdown(f"**선택한 AP:** `{selected['ap_id']}`")
+            st.write(f"주소: {selected['address']}")
+            st.write(f"실내/실외: {selected['indoor_outdoor']}")
@@ -1,21 +1,32 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import folium
-from geopy.distance import geodesic
-from streamlit_folium import st_folium
 from streamlit_javascript import st_javascript
 from streamlit_geolocation import streamlit_geolocation
 
+from core.ap_data import load_ap_data
+from core.ap_index import find_clicked_ap
+from core.district_bundle import get_district_bundle
+from core.map_cache import st_folium_profiled
+from core.marker_layout import fan_out
+from core.point_layer import add_point_layer
+from core.profiling import span
+from core.spatial import haversine_m
+from core.ranking import PRESETS, SCORERS, TOP_K, get_ranking_engine, ranked_frame
+from core.viewport import add_cluster_layer, st_folium_viewport
+
 
 # ===============================
-# 데이터 로드 (단일 CSV)
+# 데이터 로드 (공유 AP 데이터)
 # ===============================
-@st.cache_data
-def load_data():
-    return pd.read_csv("data/AP_data.csv")
+df = load_ap_data(["ap_id", "gu", "lat", "lon", "usage_norm"])
+
+# 캐시하는 기본 지도의 중심 (실제 화면은 내 위치로 옮김)
+SEOUL_CENTER = [float(df["lat"].mean()), float(df["lon"].mean())]
+
+# 서울 전체 AP 추천 순위 엔진 (df와 같은 행 순서)
+ranking = get_ranking_engine()
 
-df = load_data()
+CUSTOM_SORT = "직접 설정"
 
 def render():
     st.title("📶 위치별 Wi-Fi 예상 속도 분석")
@@ -39,7 +50,8 @@ def render():
     gu_list = sorted(df["gu"].unique())
     selected_gu = st.selectbox("서울시 자치구", gu_list)
 
-    df_gu = df[df["gu"] == selected_gu].copy()
+    # 선택한 구의 AP 행 / 묶음 인덱스 / 펼친 표시 좌표 (미리 만든 구별 묶음)
+    bundle = get_district_bundle(selected_gu)
 
     # ===============================
     # 레이아웃: 왼쪽(입력/정렬) / 오른쪽(지도)
@@ -67,16 +79,26 @@ def render():
 
         # 정렬 기준
         st.subheader("🔽 정렬 기준 선택")
+        sort_options = list(PRESETS) + [CUSTOM_SORT]
         st.session_state.sort_type = st.radio(
             "정렬 방식",
-            ["가까운 순", "Wi-Fi 빠른 순", "가까움 + 빠름 혼합"],
+            sort_options,
             horizontal=True,
             key="sort_type_radio",
-            index=["가까운 순", "Wi-Fi 빠른 순", "가까움 + 빠름 혼합"].index(
-                st.session_state.sort_type
-            ),
+            index=sort_options.index(st.session_state.sort_type),
         )
 
+        # 직접 설정: 점수 함수별 가중치 (기본값은 가까움 + 빠름 혼합)
+        if st.session_state.sort_type == CUSTOM_SORT:
+            default = PRESETS["가까움 + 빠름 혼합"]
+            weights = {
+                name: st.slider(label, 0.0, 1.0, float(default.get(name, 0.0)), 0.05,
+                                key=f"weight_{name}")
+                for name, (label, _, _) in SCORERS.items()
+            }
+        else:
+            weights = PRESETS[st.session_state.sort_type]
+
         # TOP10 / 전체 토글 버튼 (rerun 제거)
         if st.session_state.show_top10_only:
             btn_label = "전체 AP 지도 보기"
@@ -101,27 +123,19 @@ def render():
             )
 
         # ===== 거리 / 속도 계산 =====
-        def calc_distance(row):
-            return geodesic(
-                (st.session_state.user_lat, st.session_state.user_lon),
-                (row["lat"], row["lon"]),
-            ).meters
-
-        df_gu["distance_m"] = df_gu.apply(calc_distance, axis=1)
-        df_gu["speed_score"] = 1 - df_gu["usage_norm"]
+        user_lat = st.session_state.user_lat
+        user_lon = st.session_state.user_lon
 
         sort_type = st.session_state.sort_type
 
-        if sort_type == "가까운 순":
-            df_sorted = df_gu.sort_values("distance_m")
-        elif sort_type == "Wi-Fi 빠른 순":
-            df_sorted = df_gu.sort_values("speed_score", ascending=False)
-        else:
-            df_gu["distance_score"] = 1 / (df_gu["distance_m"] + 1)
-            df_gu["final_score"] = (
-                0.5 * df_gu["distance_score"] + 0.5 * df_gu["speed_score"]
+        # Wi-Fi 빠른 순은 선택한 구 안에서, 나머지는 서울 전체 AP 대상 (상위 10개만 계산)
+        with span("wifi_speed.rank", sort=sort_type):
+            rows, scores, dist = ranking.top_k(
+                user_lat, user_lon, weights, TOP_K,
+                candidates=bundle.rows if sort_type == "Wi-Fi 빠른 순" else None,
             )
-            df_sorted = df_gu.sort_values("final_score", ascending=False)
+            df_sorted = ranked_frame(df, rows[0], scores[0], dist[0])
+            df_sorted["speed_score"] = 1 - df_sorted["usage_norm"]
 
         # TOP10 만들기 (순위 컬럼 포함)
         df_top10 = df_sorted.head(10).copy()
@@ -129,58 +143,35 @@ def render():
         df_top10["rank_display"] = len(df_top10) - df_top10["rank"] + 1  # 표시용 10~1
 
         # ===== 지도 생성 =====
-        m = folium.Map(
-            location=[st.session_state.user_lat, st.session_state.user_lon],
-            zoom_start=13,
-            tiles="cartodbpositron",
-        )
+        def make_base_map(location):
+            return folium.Map(
+                location=location,
+                zoom_start=13,
+                tiles="cartodbpositron",
+                prefer_canvas=True,
+            )
 
-        # 내 위치 마커 (항상 고정)
-        folium.Marker(
-            location=[st.session_state.user_lat, st.session_state.user_lon],
-            tooltip="내 위치",
-            icon=folium.Icon(color="red", icon="user"),
-        ).add_to(m)
+        def add_user_marker(parent):
+            # 내 위치 마커 (항상 고정)
+            folium.Marker(
+                location=[st.session_state.user_lat, st.session_state.user_lon],
+                tooltip="내 위치",
+                icon=folium.Icon(color="red", icon="user"),
+            ).add_to(parent)
 
-        # 지도에 표시할 데이터 선택
+        # 마커 그리기 (같은 좌표의 AP는 주변에 펼쳐서 표시)
         if st.session_state.show_top10_only:
+            m = make_base_map([st.session_state.user_lat, st.session_state.user_lon])
+            add_user_marker(m)
             data_for_map = df_top10.copy()
-            data_for_map["plot_lat"] = data_for_map["lat"]
-            data_for_map["plot_lon"] = data_for_map["lon"]
-
-            # 같은 좌표 살짝 벌리기
-            dup_groups = (
-                data_for_map.groupby(["lat", "lon"])
-                .size()
-                .reset_index(name="count")
+            data_for_map["plot_lat"], data_for_map["plot_lon"], _ = fan_out(
+                data_for_map["lat"], data_for_map["lon"]
             )
-            data_for_map = data_for_map.merge(
-                dup_groups, on=["lat", "lon"], how="left"
-            )
-            data_for_map["idx_in_group"] = (
-                data_for_map.groupby(["lat", "lon"]).cumcount()
-            )
-
-            base_radius = 0.0001  # 약 11m
-            for i in data_for_map.index:
-                count = data_for_map.at[i, "count"]
-                idx = data_for_map.at[i, "idx_in_group"]
-                if count > 1:
-                    angle = 2 * np.pi * idx / count
-                    r = base_radius
-                    data_for_map.at[i, "plot_lat"] += r * np.cos(angle)
-                    data_for_map.at[i, "plot_lon"] += r * np.sin(angle)
-        else:
-            data_for_map = df_gu.copy()
-            data_for_map["plot_lat"] = data_for_map["lat"]
-            data_for_map["plot_lon"] = data_for_map["lon"]
 
-        # 마커 그리기
-        for _, row in data_for_map.iterrows():
-            lat = row["plot_lat"]
-            lon = row["plot_lon"]
+            for _, row in data_for_map.iterrows():
+                lat = row["plot_lat"]
+                lon = row["plot_lon"]
 
-            if st.session_state.show_top10_only:
                 rank = int(row["rank_display"])
                 html = f"""
                 <div style="
@@ -215,37 +206,55 @@ def render():
                     tooltip=f"{rank}위 / AP {row['ap_id']}",
                     popup=popup_html,
                 ).add_to(m)
-            else:
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=5,
-                    fill=True,
-                    fill_opacity=0.7,
-                    popup=f"""
-                    <b>AP ID:</b> {row['ap_id']}<br>
-                    <b>lat:</b> {row['lat']}<br>
-                    <b>lon:</b> {row['lon']}
-                    """,
-                    color="blue",
-                ).add_to(m)
 
-        # TOP10 모드일 때: bounds 계산에 '내 위치'도 포함
-        if st.session_state.show_top10_only and len(data_for_map) > 0:
-            lat_list = list(data_for_map["plot_lat"]) + [st.session_state.user_lat]
-            lon_list = list(data_for_map["plot_lon"]) + [st.session_state.user_lon]
+            # TOP10 모드일 때: bounds 계산에 '내 위치'도 포함
+            if len(data_for_map) > 0:
+                lat_list = list(data_for_map["plot_lat"]) + [st.session_state.user_lat]
+                lon_list = list(data_for_map["plot_lon"]) + [st.session_state.user_lon]
 
-            min_lat = min(lat_list)
-            max_lat = max(lat_list)
-            min_lon = min(lon_list)
-            max_lon = max(lon_list)
+                min_lat = min(lat_list)
+                max_lat = max(lat_list)
+                min_lon = min(lon_list)
+                max_lon = max(lon_list)
 
-            m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]], padding=(30, 30))
+                m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]], padding=(30, 30))
 
-        map_data = st_folium(
-            m,
-            height=520,
-            returned_objects=["last_clicked"],
-        )
+            map_data = st_folium_profiled(
+                "wifi_speed",
+                m,
+                height=520,
+                returned_objects=["last_clicked", "last_object_clicked_popup"],
+            )
+        else:
+            def draw_gu_aps(layer, view):
+                # 내 위치 + 미리 계산한 묶음 마커 + 묶이지 않은 개별 AP
+                add_user_marker(layer)
+                add_cluster_layer(layer, view["clusters"])
+                if len(view["rows"]) == 0:
+                    return
+
+                visible = df.iloc[view["rows"]].copy()
+                visible["plot_lat"], visible["plot_lon"] = bundle.plot_positions(view["rows"])
+                add_point_layer(
+                    layer,
+                    visible,
+                    style={"radius": 5, "color": "blue", "fill": True, "fill_opacity": 0.7},
+                    popup="<b>AP ID:</b> {ap_id}<br><b>lat:</b> {lat}<br><b>lon:</b> {lon}",
+                    position=("plot_lat", "plot_lon"),
+                )
+
+            # 선택한 구의 AP 중 지도에 보이는 범위만 전송 (지도를 움직이면 다시 조회)
+            # 기본 지도는 위치와 무관하게 하나만 캐시하고, 내 위치는 레이어와 center로 보냄
+            map_data = st_folium_viewport(
+                "wifi_speed_base",
+                {},
+                lambda: make_base_map(SEOUL_CENTER),
+                draw_gu_aps,
+                bundle.clusters,
+                center=[st.session_state.user_lat, st.session_state.user_lon],
+                height=520,
+                returned_objects=["last_clicked", "last_object_clicked_popup"],
+            )
 
     # ===============================
     # 지도 클릭 → 위경도 자동 입력
@@ -260,12 +269,28 @@ def render():
             st.session_state.user_lon = clicked["lng"]
             st.rerun()
 
+    # ===============================
+    # 클릭한 AP 정보 (ap_id 인덱스로 조회)
+    # ===============================
+    selected = find_clicked_ap(map_data, ["ap_id", "gu", "lat", "lon", "usage_norm"])
+    if selected is not None:
+        distance = haversine_m(
+            st.session_state.user_lat, st.session_state.user_lon, selected["lat"], selected["lon"]
+        )
+        st.markdown(
+            f"**선택한 AP:** `{selected['ap_id']}` ({selected['gu']}) · "
+            f"내 위치에서 {float(distance):.1f} m · speed_score {1 - selected['usage_norm']:.3f}"
+        )
+
     # ===============================
     # 결과 테이블 (TOP10)
     # ===============================
     st.subheader("📋 AP 리스트 (상위 10개)")
+    if st.session_state.sort_type != "Wi-Fi 빠른 순":
+        st.caption("거리 기반 정렬은 선택한 자치구와 관계없이 서울 전체 AP를 대상으로 합니다.")
     st.dataframe(
-        df_top10[["rank_display", "rank", "ap_id", "speed_score", "distance_m", "lat", "lon"]]
-        .rename(columns={"rank_display": "표시순위(10→1)", "rank": "실제순위(1→10)"}),
+        df_top10[["rank_display", "rank", "ap_id", "score", "speed_score", "distance_m", "lat", "lon"]]
+        .rename(columns={"rank_display": "표시순위(10→1)", "rank": "실제순위(1→10)",
+                         "score": "종합 점수"}),
         use_container_width=True,
     )
\ No newline at end of file
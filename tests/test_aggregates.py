@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.ap_data import CSV_PATH
+from core.aggregates import DIMENSIONS, N_BINS, SUM_MEASURES, UNKNOWN_LABEL, AggregateCube
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = pd.read_csv(CSV_PATH)
+    # 차원 값이 빈 행도 섞어 둠
+    df.loc[df.index[:7], "install_type"] = np.nan
+    df.loc[df.index[3:9], "install_year"] = np.nan
+    return df
+
+
+@pytest.fixture(scope="module")
+def cube(frame, tmp_path_factory):
+    path = tmp_path_factory.mktemp("cube") / "cube.npz"
+    AggregateCube.build(frame).save(path)
+    return AggregateCube.load(path)
+
+
+def _expected(frame, by, where=None):
+    df = frame.copy()
+    df["install_type"] = df["install_type"].fillna(UNKNOWN_LABEL)
+    for dim, values in (where or {}).items():
+        df = df[df[dim].isin(values)]
+    grouped = df.groupby(list(by), dropna=False)
+    return grouped.size(), grouped[list(SUM_MEASURES)].mean()
+
+
+@pytest.mark.parametrize("by, where", [
+    (("gu",), None),
+    (("gu", "install_type"), None),
+    (("install_year",), {"indoor_outdoor": ["실내"]}),
+    (("gu", "indoor_outdoor"), {"install_type": ["공원(하천)", UNKNOWN_LABEL]}),
+])
+def test_rollup_matches_groupby(cube, frame, by, where):
+    result = cube.rollup(by, where)
+    count, means = _expected(frame, by, where)
+
+    # 빈 값 코드는 맨 뒤라 groupby와 순서가 다를 수 있음
+    assert len(result) == len(count)
+    result = result.reindex(count.index)
+    assert np.array_equal(result["count"].to_numpy(), count.to_numpy())
+    assert np.allclose(result[list(SUM_MEASURES)].to_numpy(), means.to_numpy())
+
+
+def test_count_at_most_exact_on_percentile_edges(cube, frame):
+    i = 2
+    value = cube.edges[1, i * N_BINS // 10]
+    result = cube.count_at_most("age_norm", value)
+    expected = (frame["age_norm"] <= value).groupby(frame["gu"]).sum()
+    assert np.allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_unknown_dimension_values(cube, frame):
+    by_type = cube.rollup(("install_type",))
+    assert by_type.loc[UNKNOWN_LABEL, "count"] == 7
+    assert cube.rollup(("install_year",))["count"].sum() == len(frame)
+    assert set(DIMENSIONS) == set(cube.labels)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from core.ap_index import APIndex, ap_key, popup_ap_id
+
+
+def test_numeric_ids_normalize():
+    # 앞의 0, 공백, ".0" 꼬리, 숫자형은 모두 같은 정수 키
+    assert ap_key("012") == ap_key("12") == ap_key(" 12 ") == 12
+    assert ap_key("12.0") == ap_key(12.0) == ap_key(12) == 12
+    assert list(ap_key(np.array(["012", "12.00", "7"], dtype=object))) == [12, 12, 7]
+
+    # 숫자가 아닌 ID는 음수 해시 키라 숫자 ID와 겹치지 않음
+    assert ap_key("AP-12") < 0
+    assert ap_key("AP-12") == ap_key(" AP-12 ")
+    assert ap_key("AP-12") != ap_key("AP-13")
+    assert ap_key("12.5") < 0
+
+
+def test_index_lookup():
+    ids = np.array(["012", "12", "7", "AP-1", "3.0"], dtype=object)
+    # 조밀 표 / 정렬 배열 두 경로 모두 (큰 숫자 ID가 섞이면 정렬 배열)
+    for index in (APIndex(ids), APIndex(np.r_[ids, ["999999999999"]])):
+        # 같은 키로 정규화되는 "012"와 "12"는 첫 행만 조회
+        assert index.duplicates == 1
+        assert index.row("12") == 0
+        assert index.row("7.0") == 2
+        assert index.row("AP-1") == 3
+        assert index.row(3) == 4
+        assert index.row("8") is None
+        assert index.row("AP-2") is None
+        assert list(index.rows(np.array(["3", "AP-1", "missing"], dtype=object))) == [4, 3, -1]
+
+
+def test_popup_ap_id():
+    assert popup_ap_id("AP ID: 0012\nlat: 37.5") == "0012"
+    assert popup_ap_id("표시 순위: 1위\n실제 순위: 3위\nAP ID: AP-7\n거리: 10 m") == "AP-7"
+    assert popup_ap_id(" 123 ") == "123"
+    assert popup_ap_id(None) is None
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.cluster_index import MAX_ZOOM, MIN_ZOOM, RADIUS_PX, ClusterIndex, world_px
+
+SEOUL = (37.40, 126.75, 37.72, 127.20)   # 남, 서, 북, 동
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(2)
+    lat = np.r_[rng.uniform(37.45, 37.68, 2000), 37.55 + rng.normal(0, 1e-4, 300), [np.nan]]
+    lon = np.r_[rng.uniform(126.80, 127.15, 2000), 126.98 + rng.normal(0, 1e-4, 300), [127.0]]
+    usage = rng.uniform(0, 1, len(lat))
+    rows = np.arange(len(lat)) + 1000
+    return lat, lon, usage, rows
+
+
+@pytest.fixture(scope="module")
+def index(points, tmp_path_factory):
+    lat, lon, usage, rows = points
+    path = tmp_path_factory.mktemp("clusters") / "clusters.npz"
+    ClusterIndex.build(lat, lon, {"usage_norm": usage}, rows=rows).save(path)
+    return ClusterIndex.load(path)
+
+
+def _cells(lat, lon, zoom):
+    x, y = world_px(lat, lon, zoom)
+    return pd.Series(list(zip(np.floor(x / RADIUS_PX), np.floor(y / RADIUS_PX))))
+
+
+@pytest.mark.parametrize("zoom", [MIN_ZOOM, 11, 14, MAX_ZOOM])
+def test_clusters_match_brute_force_grid(index, points, zoom):
+    lat, lon, usage, rows = points
+    valid = np.isfinite(lat)
+    frame = index.clusters(*SEOUL, zoom)
+
+    # 묶음 = 줌 격자 칸: 칸별 개수 / 평균 좌표 / 평균 지표가 같아야 함
+    cells = _cells(lat[valid], lon[valid], zoom)
+    expected = pd.DataFrame({"cell": cells, "lat": lat[valid], "usage_norm": usage[valid]}).groupby("cell")
+    assert frame["count"].sum() == valid.sum()
+    assert sorted(frame["count"]) == sorted(expected.size())
+    assert np.allclose(np.sort(frame["lat"]), np.sort(expected["lat"].mean()))
+    assert np.allclose(np.sort(frame["usage_norm"]), np.sort(expected["usage_norm"].mean()))
+
+    # AP 하나뿐인 칸은 그 AP의 행 번호
+    single = frame[frame["count"] == 1]
+    assert set(single["row"]) <= set(rows[valid])
+
+
+def test_leaves_children_and_expansion(index, points):
+    lat, lon, _, rows = points
+    frame = index.clusters(*SEOUL, 12)
+    big = frame.loc[frame["count"].idxmax()]
+
+    leaves = index.leaves(big["id"])
+    assert len(leaves) == big["count"]
+    members = np.isin(rows, leaves)
+    cells = _cells(lat[members], lon[members], 12)
+    assert cells.nunique() == 1
+
+    # 자식 개수 합 = 부모 개수, 펼쳐지는 줌 = 처음으로 둘 이상의 칸으로 나뉘는 줌
+    assert index.children(big["id"])["count"].sum() == big["count"]
+    split = next((z for z in range(13, MAX_ZOOM + 1)
+                  if _cells(lat[members], lon[members], z).nunique() > 1), MAX_ZOOM + 1)
+    assert index.expansion_zoom(big["id"]) == big["expansion_zoom"] == split
+
+
+def test_individual_points_past_max_zoom(index, points):
+    lat, lon, _, rows = points
+    bbox = (37.549, 126.979, 37.551, 126.981)
+    frame = index.clusters(*bbox, MAX_ZOOM + 1)
+    inside = (lat >= bbox[0]) & (lat <= bbox[2]) & (lon >= bbox[1]) & (lon <= bbox[3])
+
+    assert (frame["count"] == 1).all()
+    assert sorted(frame["row"]) == sorted(rows[inside])
@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.coverage import CoverageGrid, build_coverage
+from core.spatial import haversine_m
+
+LAT0, LON0 = 37.50, 127.00
+
+
+def _square(lat, lon, size):
+    return [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    rng = np.random.default_rng(3)
+    # 붙어 있는 두 구 (서쪽 구에만 AP가 몰려 있음)
+    geojson = {"features": [
+        {"type": "Feature", "properties": {"SIG_KOR_NM": name},
+         "geometry": {"type": "Polygon", "coordinates": [_square(LAT0, LON0 + dx, 0.01)]}}
+        for name, dx in (("서구", 0.0), ("동구", 0.01))
+    ]}
+    lat = LAT0 + rng.uniform(0, 0.01, 150)
+    lon = LON0 + np.r_[rng.uniform(0, 0.01, 140), rng.uniform(0.01, 0.02, 10)]
+    usage = rng.uniform(0, 500, 150)
+    return lat, lon, usage, geojson
+
+
+@pytest.fixture(scope="module")
+def grid(inputs, tmp_path_factory):
+    lat, lon, usage, geojson = inputs
+    path = tmp_path_factory.mktemp("coverage") / "coverage.npz"
+    # 작은 chunk로 나눠 계산해도 결과는 같아야 함
+    build_coverage(lat, lon, usage, geojson, cell_m=50.0, radius_m=100.0, chunk_size=37).save(path)
+    return CoverageGrid.load(path)
+
+
+def test_cells_match_brute_force(grid, inputs):
+    lat, lon, usage, _ = inputs
+    rows, cols = np.nonzero(grid.gu >= 0)
+    clat, clon = grid.cell_centers(rows, cols)
+    dist = haversine_m(clat[:, None], clon[:, None], lat[None], lon[None])
+    within = dist <= grid.radius_m
+
+    assert np.allclose(grid.nearest_m[rows, cols], dist.min(axis=1), atol=1e-2)
+    assert np.array_equal(grid.count[rows, cols], within.sum(axis=1))
+    cells_per_ap = math.pi * grid.radius_m ** 2 / grid.cell_m ** 2
+    assert np.allclose(grid.load_gb[rows, cols], (within * usage).sum(axis=1) / cells_per_ap, rtol=1e-5)
+
+    # 경계 밖 칸은 비어 있음
+    assert np.isnan(grid.nearest_m[grid.gu < 0]).all()
+    assert (grid.count[grid.gu < 0] == 0).all()
+
+
+def test_disk_cells(grid, inputs):
+    lat, lon, _, _ = inputs
+    ptr, cells = grid.disk_cells(lat[:20], lon[:20], chunk_size=7)
+    ny, nx = grid.shape
+    rows, cols = np.nonzero(grid.gu >= 0)
+    clat, clon = grid.cell_centers(rows, cols)
+    for i in range(20):
+        near = haversine_m(lat[i], lon[i], clat, clon) <= grid.radius_m
+        assert set(cells[ptr[i]:ptr[i + 1]]) == set(rows[near] * nx + cols[near])
+
+
+def test_summary_by_gu(grid):
+    summary = grid.summary_by_gu()
+    assert summary["cells"].sum() == (grid.gu >= 0).sum()
+    # AP가 몰린 서구가 더 잘 덮임 (정렬은 커버 비율 오름차순)
+    assert list(summary.index) == ["동구", "서구"]
+    assert summary.loc["서구", "covered_share"] > 0.9
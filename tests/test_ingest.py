@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.ap_data import CSV_PATH
+from core.features import RAW_COLUMNS, compute_features, neighbor_counts
+from core.ingest import NEIGHBOR_COLUMN, apply_delta_frame, feature_state, read_delta
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    df = compute_features(pd.read_csv(CSV_PATH, nrows=600))
+    df["ap_id"] = df["ap_id"].astype(str)
+    df[NEIGHBOR_COLUMN] = neighbor_counts(df["lat"].to_numpy(), df["lon"].to_numpy())
+    return df
+
+
+def _apply(snapshot, tmp_path, delta):
+    path = tmp_path / "delta.csv"
+    delta.to_csv(path, index=False)
+    state = feature_state(snapshot)
+    return apply_delta_frame(snapshot, read_delta(str(path)), state)
+
+
+def test_delete_only_delta(snapshot, tmp_path):
+    gone = snapshot["ap_id"].iloc[[3, 40]].tolist()
+    df, summary = _apply(snapshot, tmp_path, pd.DataFrame({"ap_id": gone, "op": "delete"}))
+
+    assert summary["deleted"] == 2
+    assert summary["added"] == summary["changed"] == 0
+    assert len(df) == len(snapshot) - 2
+    assert not df["ap_id"].isin(gone).any()
+
+
+def test_untouched_scores_unchanged(snapshot, tmp_path):
+    delta = snapshot[RAW_COLUMNS].iloc[[5]].copy()
+    delta["usage_gb"] *= 1.01
+    df, _ = _apply(snapshot, tmp_path, delta)
+
+    # 같은 구의 다른 AP 점수는 기준 스냅샷 값 그대로
+    others = df["ap_id"] != delta["ap_id"].iloc[0]
+    for col in ("age_norm", "usage_norm", "usage_norm_log", "density_norm"):
+        np.testing.assert_allclose(
+            df.loc[others, col].to_numpy(dtype=float),
+            snapshot.loc[others.to_numpy(), col].to_numpy(dtype=float),
+        )
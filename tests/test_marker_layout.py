@@ -0,0 +1,42 @@
+import numpy as np
+
+from core.marker_layout import SPACING_M, coincident_groups, fan_out
+from core.spatial import EARTH_RADIUS_M, haversine_m
+
+LAT0, LON0 = 37.50, 127.00
+M_PER_DEG_LON = np.radians(1) * EARTH_RADIUS_M * np.cos(np.radians(LAT0))
+
+
+def test_pairs_straddling_cell_edges():
+    # 0.5 m 떨어진 쌍을 0.1 m씩 밀어 가며 20쌍: 어떤 격자를 쓰든 칸 경계에 걸친 쌍이 생김
+    start = np.arange(20) * 0.1 + np.arange(20) * 10.0
+    east = np.r_[start, start + 0.5]
+    lat = np.full(len(east), LAT0)
+    lon = LON0 + east / M_PER_DEG_LON
+    group, size, rank = coincident_groups(lat, lon)
+
+    assert (group[:20] == group[20:]).all()
+    assert (size == 2).all()
+    assert sorted(rank[group == group[0]]) == [0, 1]
+
+
+def test_groups_by_distance():
+    # 0.8 m 간격 사슬은 한 그룹, 3 m 떨어진 점은 따로
+    east = np.array([0.0, 0.8, 1.6, 4.6])
+    lat = np.full(len(east), LAT0)
+    lon = LON0 + east / M_PER_DEG_LON
+    group, size, rank = coincident_groups(lat, lon)
+
+    assert len(set(group[:3])) == 1 and group[3] != group[0]
+    assert list(size) == [3, 3, 3, 1]
+    assert list(rank) == [0, 1, 2, 0]
+
+
+def test_fan_out_separates_markers():
+    lat = np.full(5, LAT0)
+    lon = np.full(5, LON0)
+    plot_lat, plot_lon, size = fan_out(lat, lon)
+
+    assert (size == 5).all()
+    gaps = haversine_m(plot_lat[:, None], plot_lon[:, None], plot_lat[None], plot_lon[None])
+    assert gaps[~np.eye(5, dtype=bool)].min() > SPACING_M / 2
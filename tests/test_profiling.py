@@ -0,0 +1,15 @@
+import json
+
+from core.profiling import append_jsonl
+
+
+def test_log_rotates_at_max_bytes(tmp_path):
+    path = tmp_path / "profile.jsonl"
+    for i in range(30):
+        append_jsonl(str(path), {"run": i}, max_bytes=200)
+
+    # 현재 파일 + 이전 파일 1개만 남고, 둘 다 크기 상한 근처
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["profile.jsonl", "profile.jsonl.1"]
+    assert path.stat().st_size < 200 + 20
+    runs = [json.loads(line)["run"] for p in (tmp_path / "profile.jsonl.1", path) for line in p.open()]
+    assert runs == list(range(runs[0], 30))
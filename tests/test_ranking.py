@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.ap_data import CSV_PATH
+from core.ranking import FEATURE_COLUMNS, PRESETS, SCORERS, RankingEngine
+from core.spatial import haversine_m
+
+
+@pytest.fixture(scope="module")
+def engine():
+    features = pd.read_csv(CSV_PATH, usecols=list(dict.fromkeys(FEATURE_COLUMNS + ["lat", "lon"])))
+    return RankingEngine(features, features["lat"].to_numpy(), features["lon"].to_numpy())
+
+
+@pytest.fixture(scope="module")
+def queries(engine):
+    rng = np.random.default_rng(5)
+    # AP 위치 근처 + 서울 바깥 지점 (반경을 끝까지 넓혀 전체 계산으로 넘어가는 경우)
+    near = rng.choice(len(engine.index.lat), 40, replace=False)
+    lat = np.r_[engine.index.lat[near] + rng.normal(0, 1e-3, 40), [37.0, 38.2]]
+    lon = np.r_[engine.index.lon[near] + rng.normal(0, 1e-3, 40), [126.0, 127.9]]
+    return lat, lon
+
+
+def _full_sort(engine, lat, lon, weights, k, candidates=None):
+    """후보 전체 점수를 계산해 정렬한 상위 k개 점수"""
+    cand = np.arange(engine.size) if candidates is None else np.asarray(candidates)
+    dist = haversine_m(lat[:, None], lon[:, None], engine.index.lat[cand][None], engine.index.lon[cand][None])
+    total = np.zeros_like(dist)
+    for name, weight in weights.items():
+        _, kind, fn = SCORERS[name]
+        total += weight * (fn(dist) if kind == "distance" else engine.ap_scores[name][cand][None])
+    return cand, total, -np.sort(-total, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("weights", [
+    PRESETS["가까운 순"],
+    PRESETS["Wi-Fi 빠른 순"],
+    PRESETS["가까움 + 빠름 혼합"],
+    {"distance": 0.05, "speed": 1.0, "placement": 0.5},
+])
+def test_top_k_matches_full_sort(engine, queries, weights):
+    lat, lon = queries
+    rows, scores, dist = engine.top_k(lat, lon, weights, k=10)
+    cand, total, expected = _full_sort(engine, lat, lon, weights, 10)
+
+    assert np.allclose(scores, expected)
+    # 고른 AP의 점수/거리가 실제 값과 같음 (점수가 같은 AP끼리는 순서만 바뀔 수 있음)
+    assert np.allclose(np.take_along_axis(total, rows, axis=1), scores)
+    assert np.allclose(dist, haversine_m(lat[:, None], lon[:, None], engine.index.lat[rows], engine.index.lon[rows]))
+    assert all(len(set(r)) == len(r) for r in rows)
+
+
+def test_top_k_with_candidates(engine, queries):
+    lat, lon = queries
+    candidates = np.flatnonzero(engine.ap_scores["placement"] == 1.0)[::7]
+    rows, scores, _ = engine.top_k(lat, lon, PRESETS["가까움 + 빠름 혼합"], k=5, candidates=candidates)
+    _, _, expected = _full_sort(engine, lat, lon, PRESETS["가까움 + 빠름 혼합"], 5, candidates)
+
+    assert np.isin(rows, candidates).all()
+    assert np.allclose(scores, expected)
+
+
+def test_top_k_fewer_candidates_than_k(engine, queries):
+    lat, lon = queries
+    rows, scores, dist = engine.top_k(lat[:3], lon[:3], PRESETS["가까운 순"], k=10, candidates=[5, 6, 7])
+
+    assert (np.sort(rows[:, :3], axis=1) == [5, 6, 7]).all()
+    assert (rows[:, 3:] == -1).all() and np.isneginf(scores[:, 3:]).all() and np.isinf(dist[:, 3:]).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.coverage import build_coverage
+from core.replacement import OVERLAP_LIMIT, ReplacementProblem, plan_replacements
+
+LAT0, LON0 = 37.50, 127.00
+
+
+@pytest.fixture(scope="module")
+def problem():
+    rng = np.random.default_rng(0)
+    square = [[LON0, LAT0], [LON0 + 0.03, LAT0], [LON0 + 0.03, LAT0 + 0.03], [LON0, LAT0 + 0.03], [LON0, LAT0]]
+    geojson = {"features": [{"type": "Feature", "properties": {"SIG_KOR_NM": "테스트구"},
+                             "geometry": {"type": "Polygon", "coordinates": [square]}}]}
+
+    # 배경 양호 AP 200대 + 이용량이 큰 노후 AP 묶음 / 이용량이 거의 없는 과밀 노후 AP 묶음
+    lat = np.r_[LAT0 + rng.uniform(0.002, 0.028, 200), [LAT0 + 0.010] * 3, [LAT0 + 0.020] * 8]
+    lon = np.r_[LON0 + rng.uniform(0.002, 0.028, 200), [LON0 + 0.010] * 3, [LON0 + 0.020] * 8]
+    usage = np.r_[rng.uniform(50, 150, 200), [3000.0] * 3, [1.0] * 8]
+    rank = np.r_[np.zeros(200, dtype=int), [2] * 3, [2] * 8]
+    df = pd.DataFrame({
+        "ap_id": [f"AP{i}" for i in range(len(lat))], "gu": "테스트구", "install_type": "공공시설",
+        "lat": lat, "lon": lon, "cluster_k3_rank": rank,
+    })
+    return ReplacementProblem(df, build_coverage(lat, lon, usage, geojson))
+
+
+def test_busy_aps_not_removed(problem):
+    plan, _ = plan_replacements(problem, 1e6, actions=("remove",))
+
+    # 과밀 칸의 중복만 철거하고 부하가 큰 칸의 AP는 남긴다
+    removed = set(plan["ap_id"])
+    assert removed
+    assert removed <= {f"AP{i}" for i in range(203, 211)}
+
+
+def test_action_mix(problem):
+    plan, _ = plan_replacements(problem, 1e6)
+    actions = plan.set_index("ap_id")["action"]
+
+    # 부하가 큰 묶음은 제자리 교체, 철거는 과밀 기준을 넘는 중복 AP 수까지만
+    assert (actions.reindex(["AP200", "AP201", "AP202"]) == "replace").all()
+    assert (actions == "remove").sum() <= 8 - OVERLAP_LIMIT
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.ap_data import CSV_PATH
+from core.coverage import build_coverage
+from core.features import compute_features, density_norm, neighbor_stats
+from core.geometry import GEOJSON_PATH
+from core.ingest import feature_state
+from core.scenario import RelocationScenario, ScenarioBase, _aggregate
+from core.spatial import GridIndex
+
+
+@pytest.fixture(scope="module")
+def base():
+    df = compute_features(pd.read_csv(CSV_PATH))
+    df["ap_id"] = df["ap_id"].astype(str)
+    with open(GEOJSON_PATH, encoding="utf-8") as f:
+        geojson = json.load(f)
+    coverage = build_coverage(df["lat"], df["lon"], df["usage_gb"], geojson, cell_m=200.0)
+    counts, _ = neighbor_stats(df["lat"].to_numpy(), df["lon"].to_numpy())
+    return ScenarioBase(df, counts, feature_state(df), coverage)
+
+
+@pytest.fixture(scope="module")
+def scenario(base):
+    rng = np.random.default_rng(4)
+    ids = base.ap_id[rng.choice(len(base), 45, replace=False)]
+    rows = [base.row_of.row(a) for a in ids]
+
+    s = RelocationScenario(base)
+    s.apply([{"op": "remove", "ap_id": a} for a in ids[:15]])
+    s.apply([{"op": "move", "ap_id": a, "lat": base.lat[r] + rng.normal(0, 3e-4),
+              "lon": base.lon[r] + rng.normal(0, 3e-4)} for a, r in zip(ids[15:30], rows[15:30])])
+    for r in rows[30:]:
+        s.apply([{"op": "add", "lat": base.lat[r] + 1e-4, "lon": base.lon[r]}])
+    # 이동한 AP를 다시 옮기고, 추가한 AP를 삭제
+    s.apply([{"op": "move", "ap_id": ids[15], "lat": base.lat[rows[20]], "lon": base.lon[rows[20]]}])
+    s.apply([{"op": "remove", "ap_id": "NEW-3"}])
+    return s
+
+
+def _live(s):
+    total = len(s.base) + len(s.extra)
+    return np.array([r for r in range(total) if r not in s.removed])
+
+
+def test_neighbors_match_full_recompute(scenario):
+    rows = _live(scenario)
+    lat, lon = scenario.column("lat", rows), scenario.column("lon", rows)
+    counts, nearest = neighbor_stats(lat, lon)
+
+    assert np.array_equal(scenario.column("counts", rows), counts)
+    assert np.allclose(scenario.column("density_norm", rows), density_norm(nearest, counts))
+
+    # 다시 계산한 행의 rank는 전체 재계산과 같고, 영향이 없는 행은 기준값 그대로
+    touched = np.isin(rows, list(scenario.rank))
+    ranks = scenario.base._assign(
+        scenario.column("age_norm", rows), scenario.column("usage_norm_log", rows),
+        density_norm(nearest, counts),
+    )
+    assert np.array_equal(scenario.column("rank", rows)[touched], ranks[touched])
+    untouched = rows[~touched]
+    assert np.array_equal(scenario.column("rank", untouched), scenario.base.rank[untouched])
+
+
+def test_aggregates_match_full_recompute(scenario):
+    rows = _live(scenario)
+    agg = np.zeros_like(scenario.base.agg)
+    _aggregate(agg, scenario.column("gu", rows).astype(int), scenario.column("density_norm", rows),
+               scenario.column("usage_norm", rows), scenario.column("rank", rows))
+    assert np.allclose(agg, scenario.base.agg + scenario.agg)
+
+    summary = scenario.summary_by_gu()
+    assert summary["ap_count"].sum() == len(rows) == len(scenario.base) - 15 + 14
+
+
+def test_coverage_gaps_match_full_recompute(scenario):
+    rows = _live(scenario)
+    grid = scenario.base.coverage
+    rr, cc = np.nonzero(grid.gu >= 0)
+    clat, clon = grid.cell_centers(rr, cc)
+    index = GridIndex(scenario.column("lat", rows), scenario.column("lon", rows), cell_m=grid.radius_m)
+    empty = index.count_within(clat, clon, grid.radius_m) == 0
+
+    gap = np.bincount(grid.gu[rr, cc][empty], minlength=len(scenario.base.gu_names))
+    assert np.array_equal(gap, scenario.base.gap_cells + scenario.gap)
+
+
+def test_invalid_edit_changes_nothing(base):
+    s = RelocationScenario(base)
+    with pytest.raises(ValueError):
+        s.apply([{"op": "remove", "ap_id": base.ap_id[0]}, {"op": "remove", "ap_id": "없는 AP"}])
+    assert not s.removed and not s.edits
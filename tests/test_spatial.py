@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from core.spatial import GridIndex, haversine_m
+
+LAT0, LON0 = 37.50, 127.00
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(1)
+    # 흩어진 점 + 한 곳에 몰린 점 + 같은 좌표 중복
+    lat = np.r_[LAT0 + rng.uniform(0, 0.05, 400), LAT0 + 0.02 + rng.normal(0, 2e-4, 100), [LAT0 + 0.01] * 5]
+    lon = np.r_[LON0 + rng.uniform(0, 0.05, 400), LON0 + 0.02 + rng.normal(0, 2e-4, 100), [LON0 + 0.01] * 5]
+    queries = (LAT0 + rng.uniform(-0.01, 0.06, 50), LON0 + rng.uniform(-0.01, 0.06, 50))
+    return lat, lon, queries
+
+
+def _brute(lat, lon, qlat, qlon):
+    return haversine_m(np.asarray(qlat)[:, None], np.asarray(qlon)[:, None], lat[None], lon[None])
+
+
+@pytest.mark.parametrize("cell_m", [30.0, 250.0])
+def test_knn_and_radius_match_brute_force(points, cell_m):
+    lat, lon, (qlat, qlon) = points
+    grid = GridIndex(lat, lon, cell_m=cell_m)
+    dist = _brute(lat, lon, qlat, qlon)
+
+    for q in range(len(qlat)):
+        # kNN: 거리가 같은 점은 순서가 바뀔 수 있으므로 거리로 비교
+        idx, d = grid.query_knn(qlat[q], qlon[q], k=10)
+        assert np.allclose(d, np.sort(dist[q])[:10])
+        assert np.allclose(dist[q, idx], d)
+
+        idx, d = grid.query_radius(qlat[q], qlon[q], 500.0)
+        assert set(idx) == set(np.flatnonzero(dist[q] <= 500.0))
+        assert np.all(np.diff(d) >= 0)
+
+    assert np.array_equal(grid.count_within(qlat, qlon, 500.0), (dist <= 500.0).sum(axis=1))
+
+    idx, d = grid.nearest(qlat, qlon)
+    assert np.allclose(d, dist.min(axis=1))
+
+    q, p, d = grid.pairs_within(qlat, qlon, 300.0)
+    assert set(zip(q, p)) == set(zip(*np.nonzero(dist <= 300.0)))
+
+
+def test_knn_more_than_points(points):
+    lat, lon, _ = points
+    grid = GridIndex(lat[:3], lon[:3])
+    idx, d = grid.query_knn(LAT0, LON0, k=10)
+    assert sorted(idx) == [0, 1, 2]